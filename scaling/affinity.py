@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+import os
+from os import listdir
+from os.path import join
+from distutils.spawn import find_executable
+from multiprocessing import cpu_count
+
+from scaling.util import Placement
+
+CPU_SYSFS_DIR = '/sys/devices/system/cpu'
+
+
+def parse_cpu_list(cpu_list):
+    """Parses a CPU list in the format used by the kernel, e.g. "0-3,8,10-11"
+
+    Parameters
+    ----------
+    cpu_list: string
+        The CPU list
+
+    Returns
+    -------
+    list of int
+        The sorted CPU ids
+
+    Raises
+    ------
+    ValueError
+        If cpu_list is not a valid CPU list
+    """
+    cpus = set()
+    for item in cpu_list.strip().split(','):
+        if not item:
+            continue
+        if '-' in item:
+            first, last = item.split('-', 1)
+            cpus.update(range(int(first), int(last) + 1))
+        else:
+            cpus.add(int(item))
+    return sorted(cpus)
+
+
+def format_cpu_list(cpus):
+    """Formats a list of CPU ids in the format used by the kernel
+
+    Parameters
+    ----------
+    cpus: iterable of int
+        The CPU ids
+
+    Returns
+    -------
+    string
+        The CPU list, collapsing consecutive ids into ranges
+    """
+    ranges = []
+    for cpu in sorted(set(cpus)):
+        if ranges and ranges[-1][1] == cpu - 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(str(f) if f == l else "%d-%d" % (f, l) for f, l in ranges)
+
+
+def get_available_cpus():
+    """Returns the CPUs on which the current process is allowed to run
+
+    Returns
+    -------
+    list of int
+        The sorted CPU ids
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('Cpus_allowed_list:'):
+                    return parse_cpu_list(line.split(':', 1)[1])
+    except (IOError, OSError, ValueError):
+        pass
+    return range(cpu_count())
+
+
+def get_cpu_siblings(cpu):
+    """Returns the hardware threads that share the physical core of cpu
+
+    Parameters
+    ----------
+    cpu: int
+        The CPU id
+
+    Returns
+    -------
+    list of int
+        The sorted CPU ids of the sibling threads, including cpu
+    """
+    fp = join(CPU_SYSFS_DIR, 'cpu%d' % cpu, 'topology', 'thread_siblings_list')
+    try:
+        with open(fp) as f:
+            return parse_cpu_list(f.read())
+    except (IOError, OSError, ValueError):
+        return [cpu]
+
+
+def get_cpu_node(cpu):
+    """Returns the NUMA node of cpu
+
+    Parameters
+    ----------
+    cpu: int
+        The CPU id
+
+    Returns
+    -------
+    int or None
+        The NUMA node id, or None if it is not known
+    """
+    try:
+        entries = listdir(join(CPU_SYSFS_DIR, 'cpu%d' % cpu))
+    except OSError:
+        return None
+    for entry in entries:
+        if entry.startswith('node') and entry[4:].isdigit():
+            return int(entry[4:])
+    return None
+
+
+def allocate_cpu_sets(cpus, cpus_per_set, isolate_siblings=False):
+    """Splits cpus into disjoint sets of cpus_per_set CPUs
+
+    The CPUs of a set are taken from the same NUMA node whenever possible,
+    so the memory of the command can be bound to that node
+
+    Parameters
+    ----------
+    cpus: list of int
+        The available CPU ids
+    cpus_per_set: int
+        The number of CPUs of each set
+    isolate_siblings: bool, optional
+        If True, only one hardware thread of each physical core is used and
+        the sibling threads are left idle
+
+    Returns
+    -------
+    list of tuple of int
+        The CPU sets. The CPUs that do not fill a complete set are not used
+
+    Raises
+    ------
+    ValueError
+        If cpus_per_set is lower than 1
+    """
+    if cpus_per_set < 1:
+        raise ValueError("The number of CPUs per set should be at least 1")
+    available = set(cpus)
+    if isolate_siblings:
+        usable = []
+        seen = set()
+        for cpu in sorted(available):
+            if cpu in seen:
+                continue
+            siblings = get_cpu_siblings(cpu)
+            seen.update(siblings)
+            usable.append(cpu)
+    else:
+        usable = sorted(available)
+
+    # Group the CPUs by NUMA node, keeping the nodes in order
+    nodes = []
+    node_cpus = {}
+    for cpu in usable:
+        node = get_cpu_node(cpu)
+        if node not in node_cpus:
+            nodes.append(node)
+            node_cpus[node] = []
+        node_cpus[node].append(cpu)
+
+    cpu_sets = []
+    leftover = []
+    for node in nodes:
+        group = node_cpus[node]
+        while len(group) >= cpus_per_set:
+            cpu_sets.append(tuple(group[:cpus_per_set]))
+            group = group[cpus_per_set:]
+        leftover.extend(group)
+    # The remaining CPUs of the different nodes can still form sets
+    while len(leftover) >= cpus_per_set:
+        cpu_sets.append(tuple(leftover[:cpus_per_set]))
+        leftover = leftover[cpus_per_set:]
+    return cpu_sets
+
+
+def get_placement(cpus, numa_bind=False):
+    """Returns the placement of a command pinned to cpus
+
+    Parameters
+    ----------
+    cpus: tuple of int
+        The CPU ids to pin the command to
+    numa_bind: bool, optional
+        If True, the memory of the command is bound to the NUMA node of cpus,
+        if all of them belong to the same node and numactl is available
+
+    Returns
+    -------
+    Placement
+        The CPUs and the NUMA node to which the memory is bound (None if it
+        is not bound)
+    """
+    node = None
+    if numa_bind and find_executable('numactl'):
+        nodes = set(get_cpu_node(cpu) for cpu in cpus)
+        if len(nodes) == 1:
+            node = nodes.pop()
+    return Placement(tuple(cpus), node)
+
+
+def can_set_affinity():
+    """Returns whether the CPU affinity of the commands can be set"""
+    return (hasattr(os, 'sched_setaffinity') or
+            find_executable('taskset') is not None)
+
+
+def get_placement_command(cmd, placement):
+    """Wraps cmd so it is executed with the given placement
+
+    The affinity is set with os.sched_setaffinity in the child process if
+    available (see get_affinity_setter). Otherwise, the command is executed
+    through taskset. The memory binding is done through numactl. Both tools
+    replace themselves with the command, so the measurements are not
+    affected.
+
+    Parameters
+    ----------
+    cmd: list of strings
+        The command to execute and its arguments
+    placement: Placement
+        The placement of the command
+
+    Returns
+    -------
+    list of strings
+        The command to execute
+    """
+    cpu_list = format_cpu_list(placement.cpus)
+    if placement.node is not None:
+        return ['numactl', '--membind=%d' % placement.node,
+                '--physcpubind=%s' % cpu_list] + cmd
+    if not hasattr(os, 'sched_setaffinity'):
+        return ['taskset', '-c', cpu_list] + cmd
+    return cmd
+
+
+def get_affinity_setter(placement):
+    """Returns a function that pins the calling process to placement.cpus
+
+    Parameters
+    ----------
+    placement: Placement
+        The placement of the command
+
+    Returns
+    -------
+    function or None
+        The function to execute in the child process before executing the
+        command, or None if the affinity is set by get_placement_command
+    """
+    if placement.node is not None or not hasattr(os, 'sched_setaffinity'):
+        return None
+    cpus = set(placement.cpus)
+
+    def set_affinity():
+        os.sched_setaffinity(0, cpus)
+    return set_affinity
@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+# Archives of benchmark results. The timing directories and the outputs of
+# process-bench-results can be stored in a tar (optionally compressed with
+# gzip, bzip2 or xz) or zip archive, and read back without extracting it to
+# disk. A path inside an archive is written as if the archive were a
+# directory, e.g. pick_otus_20140101_120000.tar.gz/timing/similarity
+
+import os
+import tarfile
+import zipfile
+from os import walk, fsync
+from os.path import join, exists, isfile, isdir, normpath, split, relpath
+from shutil import rmtree
+from subprocess import Popen, PIPE
+
+from scaling.util import TIMING_CACHE_FN
+
+# Supported archive extensions and their format: the compression of the tar
+# archives ('' if not compressed) or 'zip'
+ARCHIVE_FORMATS = [('.tar.gz', 'gz'), ('.tgz', 'gz'), ('.tar.bz2', 'bz2'),
+                   ('.tbz2', 'bz2'), ('.tar.xz', 'xz'), ('.txz', 'xz'),
+                   ('.tar', ''), ('.zip', 'zip')]
+
+
+def get_archive_format(archive_fp):
+    """Returns the format of an archive, given by its extension
+
+    Parameters
+    ----------
+    archive_fp: string
+        Path to the archive
+
+    Returns
+    -------
+    string
+        The compression of the tar archive ('' if not compressed), 'zip', or
+        None if the extension is not a supported archive extension
+    """
+    for ext, fmt in ARCHIVE_FORMATS:
+        if archive_fp.endswith(ext):
+            return fmt
+    return None
+
+
+def is_archive(path):
+    """Returns True if path is a supported archive"""
+    return isfile(path) and get_archive_format(path) is not None
+
+
+def split_archive_path(path):
+    """Splits a path inside an archive into the archive and the member path
+
+    Parameters
+    ----------
+    path: string
+        The path, e.g. suite.tar.gz/timing/similarity
+
+    Returns
+    -------
+    string, string
+        The path to the archive and the path of the member inside it ('' for
+        the top level of the archive), or None and path if path is not
+        inside an archive
+    """
+    head = normpath(path)
+    parts = []
+    while head and not exists(head):
+        head, tail = split(head)
+        parts.insert(0, tail)
+    if head and is_archive(head):
+        return head, "/".join(parts)
+    return None, path
+
+
+def _has_tar_compression(compression):
+    """Returns True if tarfile can handle the compression by itself"""
+    return not compression or compression in tarfile.TarFile.OPEN_METH
+
+
+def _normalize_member(name):
+    """Returns the member name relative to the top level of the archive"""
+    name = normpath(name)
+    return "" if name == "." else name.lstrip("/")
+
+
+def iter_archive(archive_fp):
+    """Streams the members of an archive, without extracting it
+
+    Parameters
+    ----------
+    archive_fp: string
+        Path to the archive
+
+    Returns
+    -------
+    GeneratorType
+        Yields (name, f) for each directory and regular file of the archive,
+        in the order they are stored. f is a file object with the contents of
+        the file, which is only valid until the next member is yielded, or
+        None for the directories
+
+    Raises
+    ------
+    ValueError
+        If the archive format is not supported or the archive is damaged
+    """
+    fmt = get_archive_format(archive_fp)
+    if fmt is None:
+        raise ValueError("Unknown archive format: %s. Should be one of %s"
+                         % (archive_fp, ", ".join(e for e, _ in
+                                                  ARCHIVE_FORMATS)))
+    if fmt == 'zip':
+        try:
+            with zipfile.ZipFile(archive_fp) as zf:
+                for info in zf.infolist():
+                    name = _normalize_member(info.filename)
+                    if info.filename.endswith('/'):
+                        yield name, None
+                    else:
+                        with zf.open(info) as f:
+                            yield name, f
+        except zipfile.BadZipfile as e:
+            raise ValueError("%s: %s" % (archive_fp, e))
+        return
+    proc = None
+    if _has_tar_compression(fmt):
+        # The stream mode reads the archive sequentially, without seeking
+        fileobj = None
+        mode = 'r|%s' % fmt
+    else:
+        # tarfile cannot decompress it (e.g. xz on Python 2): stream it
+        # through the decompressor
+        try:
+            proc = Popen([fmt, '-dc', archive_fp], stdout=PIPE)
+        except OSError as e:
+            raise ValueError("Cannot decompress %s with %s: %s"
+                             % (archive_fp, fmt, e))
+        fileobj = proc.stdout
+        mode = 'r|'
+    complete = False
+    try:
+        with tarfile.open(archive_fp, mode, fileobj) as tf:
+            for member in tf:
+                name = _normalize_member(member.name)
+                if member.isdir():
+                    yield name, None
+                elif member.isfile():
+                    yield name, tf.extractfile(member)
+        complete = True
+    except tarfile.TarError as e:
+        raise ValueError("%s: %s" % (archive_fp, e))
+    finally:
+        if proc is not None:
+            # The decompressor is stopped if the archive is not read to the
+            # end, so its exit status is only checked on a complete read
+            proc.stdout.close()
+            if proc.wait() != 0 and complete:
+                raise ValueError("%s failed decompressing %s"
+                                 % (fmt, archive_fp))
+
+
+def _iter_tree(input_dir):
+    """Yields the path and the archive name of the contents of input_dir
+
+    Each directory is followed by its contents, so the files of a case are
+    stored together. The parse cache of the timing directories is not
+    archived
+    """
+    for dirpath, dirnames, filenames in walk(input_dir):
+        dirnames.sort()
+        if dirpath != input_dir:
+            yield dirpath, relpath(dirpath, input_dir)
+        for name in sorted(filenames):
+            if name == TIMING_CACHE_FN:
+                continue
+            path = join(dirpath, name)
+            yield path, relpath(path, input_dir)
+
+
+def make_bench_archive(input_dir, archive_fp, remove=False):
+    """Compacts a timing directory (or any results tree) into an archive
+
+    The contents of input_dir are stored at the top level of the archive, so
+    the archive can be given to process-bench-results in place of input_dir
+
+    Parameters
+    ----------
+    input_dir: string
+        Path to the directory to archive
+    archive_fp: string
+        Path to the archive. Its format is given by its extension (see
+        ARCHIVE_FORMATS)
+    remove: bool, optional
+        If True, input_dir is removed once the archive is safely written
+
+    Returns
+    -------
+    int
+        The number of files archived
+
+    Raises
+    ------
+    ValueError
+        If input_dir is not a directory, archive_fp already exists or its
+        extension is not a supported archive extension
+    """
+    if not isdir(input_dir):
+        raise ValueError("%s is not a directory" % input_dir)
+    if exists(archive_fp):
+        raise ValueError("%s already exists" % archive_fp)
+    fmt = get_archive_format(archive_fp)
+    if fmt is None:
+        raise ValueError("Unknown archive format: %s. Should be one of %s"
+                         % (archive_fp, ", ".join(e for e, _ in
+                                                  ARCHIVE_FORMATS)))
+    num_files = 0
+    done = False
+    try:
+        if fmt == 'zip':
+            with zipfile.ZipFile(archive_fp, 'w', zipfile.ZIP_DEFLATED,
+                                 allowZip64=True) as zf:
+                for path, name in _iter_tree(input_dir):
+                    zf.write(path, name)
+                    num_files += isfile(path)
+        elif _has_tar_compression(fmt):
+            with tarfile.open(archive_fp, 'w:%s' % fmt) as tf:
+                for path, name in _iter_tree(input_dir):
+                    tf.add(path, name, recursive=False)
+                    num_files += isfile(path)
+        else:
+            with open(archive_fp, 'wb') as out:
+                try:
+                    proc = Popen([fmt, '-c'], stdin=PIPE, stdout=out)
+                except OSError as e:
+                    raise ValueError("Cannot compress %s with %s: %s"
+                                     % (archive_fp, fmt, e))
+                try:
+                    with tarfile.open(archive_fp, 'w|', proc.stdin) as tf:
+                        for path, name in _iter_tree(input_dir):
+                            tf.add(path, name, recursive=False)
+                            num_files += isfile(path)
+                finally:
+                    proc.stdin.close()
+                    if proc.wait() != 0:
+                        raise ValueError("%s failed compressing %s"
+                                         % (fmt, archive_fp))
+        done = True
+    finally:
+        # Do not leave a partial archive behind
+        if not done and exists(archive_fp):
+            os.remove(archive_fp)
+    if remove:
+        # Make sure the archive is on disk before removing the results
+        with open(archive_fp, 'a') as f:
+            fsync(f.fileno())
+        rmtree(input_dir)
+    return num_files
@@ -1,4 +1,5 @@
 #!/usr/bin/env python
+from __future__ import division
 
 __author__ = "Jose Antonio Navas Molina"
 __copyright__ = "Copyright 2014, The QIIME-Scaling Project"
@@ -9,59 +10,274 @@ __maintainer__ = "Jose Antonio Navas Molina"
 __email__ = "josenavasmolina@gmail.com"
 __status__ = "Development"
 
-from subprocess import Popen, PIPE
-from os import environ
-from time import sleep
+from random import uniform
+from time import sleep, time
 
+from scaling.executors import PBSExecutor, get_alive_jobs
+from scaling.util import JobRecord, Throughput
 
-def check_status(jobs_to_monitor):
+# Number of consecutive failed queries to the queue system after which
+# wait_on gives up
+MAX_QUERY_FAILURES = 10
+
+
+def check_status(jobs_to_monitor, executor=None):
     """Check the status of the passed list of jobs
 
     Parameters
     ----------
     jobs_to_monitor: Iterable
         The jobs id
+    executor: Executor, optional
+        The backend that executed the jobs. Defaults to PBSExecutor
 
     Returns
     -------
     list
         A subset of jobs_to_monitor containing those jobs that are still
-            running
+            alive
+    """
+    if executor is None:
+        executor = PBSExecutor()
+    return executor.check_status(jobs_to_monitor)
+
+
+def get_poll_interval(interval, jitter):
+    """Returns interval randomly perturbed by up to +/- jitter
+
+    The jitter avoids that several processes waiting on jobs query the queue
+    system at the same time
+
+    Parameters
+    ----------
+    interval: float
+        The poll interval, in seconds
+    jitter: float
+        The maximum relative perturbation of the interval
+
+    Returns
+    -------
+    float
+        The perturbed interval
     """
-    # Get all the commands running pf the current user
-    user = environ['USER']
-    qstat_cmd = "qstat | grep %s" % user
-    proc = Popen(qstat_cmd, stdout=PIPE, stderr=PIPE, shell=True)
-    (stdout, stderr) = proc.communicate()
-    # Parse the qstat output
-    lines = stdout.splitlines()
-    running_jobs = []
-    for l in lines:
-        job_id, job_name, user, time, status, queue = l.split()
-        job_id = job_id.split('.')[0]
-        # Check if this job is one of the jobs that we have to
-        # monitor and check if it is running or queued
-        if job_id in jobs_to_monitor and status in ['R', 'Q']:
-            running_jobs.append(job_id)
-    # Return the list with the running jobs that we're still waiting for
-    return running_jobs
-
-
-def wait_on(jobs_to_monitor, poll_interval=5):
-    """Block while jobs to monitor are running
+    return interval * uniform(1 - jitter, 1 + jitter)
+
+
+def wait_on(jobs_to_monitor, poll_interval=5, executor=None,
+            max_poll_interval=60, backoff=2, jitter=0.1):
+    """Block while jobs to monitor are alive
+
+    The queue system is queried once per poll. The interval between polls
+    starts at poll_interval and it is multiplied by backoff, up to
+    max_poll_interval, each time that no job has changed its state
 
     Parameters
     ----------
     jobs_to_monitor: Iterable
         The jobs id
-    poll_interval: int
-        interval between checks, in seconds
+    poll_interval: float
+        initial interval between checks, in seconds
+    executor: Executor, optional
+        The backend that executed the jobs. Defaults to PBSExecutor
+    max_poll_interval: float, optional
+        maximum interval between checks, in seconds
+    backoff: float, optional
+        factor by which the interval is increased when no job changes
+    jitter: float, optional
+        maximum relative random perturbation of each interval
+
+    Returns
+    -------
+    dict of {string: JobStatus}
+        The last status reported for each job, keyed by job id. The jobs of
+        a job array are reported individually
+
+    Raises
+    ------
+    RuntimeError
+        If the queue system could not be queried MAX_QUERY_FAILURES times in
+        a row
     """
+    if executor is None:
+        executor = PBSExecutor()
     # Get the jobs ids by up to the first '.' character
     jobs_to_monitor = [job.split('.')[0] for job in jobs_to_monitor]
+    statuses = {}
+    interval = poll_interval
+    failures = 0
     # Loop until there is some job to monitor
     while jobs_to_monitor:
         # Sleep before new job status check
-        sleep(poll_interval)
-        # Check job status and get new set of jobs to wait on
-        jobs_to_monitor = check_status(jobs_to_monitor)
+        sleep(get_poll_interval(interval, jitter))
+        try:
+            new_statuses = executor.query_jobs(jobs_to_monitor)
+        except RuntimeError:
+            # Do not consider the jobs done if the query fails, the queue
+            # system may be temporarily unavailable
+            failures += 1
+            if failures >= MAX_QUERY_FAILURES:
+                raise
+            interval = min(interval * backoff, max_poll_interval)
+            continue
+        failures = 0
+        changed = any(statuses.get(job_id, (None, None))[1] != status.state
+                      for job_id, status in new_statuses.items())
+        statuses.update(new_statuses)
+        # Get the new set of jobs to wait on
+        alive_jobs = get_alive_jobs(jobs_to_monitor, new_statuses,
+                                    executor.alive_states)
+        if changed or len(alive_jobs) != len(jobs_to_monitor):
+            interval = poll_interval
+        else:
+            interval = min(interval * backoff, max_poll_interval)
+        jobs_to_monitor = alive_jobs
+    return statuses
+
+
+def submit_throttled(jobs, executor, max_queued, poll_interval=5,
+                     max_poll_interval=60, backoff=2, jitter=0.1):
+    """Submits the jobs keeping at most max_queued of them alive at once
+
+    The jobs are submitted in order until max_queued of them are queued or
+    running, and the rest are submitted as the earlier ones finish. The queue
+    system is polled as in wait_on. If the queue system rejects a job (e.g.
+    because the queue limit of the user has been reached) the job is not
+    lost: it is submitted again after the next poll
+
+    Parameters
+    ----------
+    jobs: list of (string, string)
+        The (name, script) pairs of the jobs to submit
+    executor: Executor
+        The backend that submits the jobs
+    max_queued: int
+        Maximum number of jobs queued or running at the same time
+    poll_interval: float, optional
+        initial interval between checks, in seconds
+    max_poll_interval: float, optional
+        maximum interval between checks, in seconds
+    backoff: float, optional
+        factor by which the interval is increased when no job changes
+    jitter: float, optional
+        maximum relative random perturbation of each interval
+
+    Returns
+    -------
+    list of JobRecord
+        The submission, start and end times and exit status of each job, in
+        the order of jobs
+
+    Raises
+    ------
+    ValueError
+        If max_queued is lower than 1
+    RuntimeError
+        If a job could not be submitted, or the queue system could not be
+        queried, MAX_QUERY_FAILURES times in a row
+    """
+    if max_queued < 1:
+        raise ValueError("The maximum number of queued jobs should be at "
+                         "least 1")
+    pending = list(range(len(jobs)))
+    # Alive jobs, as {job id: index in jobs}
+    active = {}
+    job_ids = [None] * len(jobs)
+    submit_times = [None] * len(jobs)
+    # Times of the poll in which each job was first seen running or done
+    started = {}
+    ended = {}
+    statuses = {}
+    interval = poll_interval
+    submit_failures = 0
+    query_failures = 0
+    while pending or active:
+        # Fill the free slots
+        while pending and len(active) < max_queued:
+            name, script = jobs[pending[0]]
+            try:
+                job_id = executor.submit_job(script, name)
+            except RuntimeError:
+                submit_failures += 1
+                if submit_failures >= MAX_QUERY_FAILURES:
+                    raise
+                break
+            submit_failures = 0
+            i = pending.pop(0)
+            # Get the job id by up to the first '.' character
+            job_ids[i] = job_id.split('.')[0]
+            submit_times[i] = time()
+            active[job_ids[i]] = i
+        sleep(get_poll_interval(interval, jitter))
+        if not active:
+            # A job was rejected and there is no job to free a slot
+            interval = min(interval * backoff, max_poll_interval)
+            continue
+        try:
+            new_statuses = executor.query_jobs(list(active))
+        except RuntimeError:
+            query_failures += 1
+            if query_failures >= MAX_QUERY_FAILURES:
+                raise
+            interval = min(interval * backoff, max_poll_interval)
+            continue
+        query_failures = 0
+        now = time()
+        changed = any(statuses.get(job_id, (None, None))[1] != status.state
+                      for job_id, status in new_statuses.items())
+        statuses.update(new_statuses)
+        for job_id, status in new_statuses.items():
+            if status.state == 'R':
+                started.setdefault(job_id, now)
+        alive_jobs = get_alive_jobs(list(active), new_statuses,
+                                    executor.alive_states)
+        finished = set(active) - set(alive_jobs)
+        for job_id in finished:
+            ended[job_id] = now
+            del active[job_id]
+        if changed or finished:
+            interval = poll_interval
+        else:
+            interval = min(interval * backoff, max_poll_interval)
+
+    records = []
+    for (name, _), job_id, submit_time in zip(jobs, job_ids, submit_times):
+        status = statuses.get(job_id)
+        start = started.get(job_id)
+        end = ended.get(job_id)
+        exit_status = None
+        if status is not None:
+            if status.queue_wait is not None:
+                start = submit_time + status.queue_wait
+            if start is not None and status.run_time is not None:
+                end = start + status.run_time
+            exit_status = status.exit_status
+        records.append(JobRecord(name, job_id, submit_time, start, end,
+                                 exit_status))
+    return records
+
+
+def get_throughput(records):
+    """Computes the effective throughput of a set of submitted jobs
+
+    Parameters
+    ----------
+    records: list of JobRecord
+        The submitted jobs
+
+    Returns
+    -------
+    Throughput
+        The throughput of the completed jobs, those with a known end time.
+        The makespan, throughput and mean queue wait are None if they cannot
+        be computed
+    """
+    completed = [r for r in records if r.end_time is not None]
+    if not completed:
+        return Throughput(0, None, None, None)
+    makespan = (max(r.end_time for r in completed) -
+                min(r.submit_time for r in records))
+    jobs_per_hour = len(completed) * 3600 / makespan if makespan > 0 else None
+    waits = [r.start_time - r.submit_time for r in completed
+             if r.start_time is not None]
+    mean_wait = sum(waits) / len(waits) if waits else None
+    return Throughput(len(completed), makespan, jobs_per_hour, mean_wait)
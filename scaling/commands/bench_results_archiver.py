@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+from __future__ import division
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+from pyqi.core.command import (Command, CommandIn, CommandOut,
+                               ParameterCollection)
+from pyqi.core.exception import CommandError
+from scaling.archive import make_bench_archive
+
+
+class BenchResultsArchiver(Command):
+    """Subclassing the pyqi.core.command.Command class"""
+    BriefDescription = "Compacts a timing directory into an archive"
+    LongDescription = ("Stores a timing directory (or any benchmark results "
+                       "tree) in a single tar (.tar, .tar.gz, .tar.bz2, "
+                       ".tar.xz) or zip archive, which process-bench-results "
+                       "and compare-bench-results read without extracting "
+                       "it.")
+    CommandIns = ParameterCollection([
+        CommandIn(Name='input_dir', DataType=str,
+                  Description='Path to the directory to archive',
+                  Required=True),
+        CommandIn(Name='archive_fp', DataType=str,
+                  Description='Path to the archive. Its format is given by '
+                  'its extension',
+                  Required=True),
+        CommandIn(Name='remove', DataType=bool,
+                  Description='Remove the directory once it is stored in the '
+                  'archive',
+                  DefaultDescription='False: keep the directory',
+                  Required=False, Default=False)
+    ])
+    CommandOuts = ParameterCollection([
+        CommandOut(Name='archive_fp', DataType=str,
+                   Description='Path to the archive')])
+
+    def run(self, **kwargs):
+        archive_fp = kwargs['archive_fp']
+
+        try:
+            make_bench_archive(kwargs['input_dir'], archive_fp,
+                               kwargs['remove'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        return {'archive_fp': archive_fp}
+
+CommandConstructor = BenchResultsArchiver
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+from __future__ import division
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+from os.path import isfile
+from sqlite3 import DatabaseError
+
+from pyqi.core.command import (Command, CommandIn, CommandOut,
+                               ParameterCollection)
+from pyqi.core.exception import CommandError
+
+from scaling.process_results import (process_benchmark_results,
+                                     compare_benchmark_results,
+                                     get_bench_summary)
+from scaling.results_db import load_bench_runs
+
+
+class BenchResultsExporter(Command):
+    """Subclassing the pyqi.core.command.Command class"""
+    BriefDescription = "Processes the runs stored in a results database"
+    LongDescription = ("Takes a results database created with "
+                       "ingest-bench-results and the ids of one or more of "
+                       "its runs (see query-bench-results), and loads their "
+                       "measurements with a single read of the database. A "
+                       "single run is processed as process-bench-results "
+                       "does; several runs are compared as "
+                       "compare-bench-results does.")
+    CommandIns = ParameterCollection([
+        CommandIn(Name='db_fp', DataType=str,
+                  Description='Path to the results database',
+                  Required=True),
+        CommandIn(Name='run_ids', DataType=list,
+                  Description='List with the ids of the runs',
+                  Required=True),
+        CommandIn(Name='labels', DataType=list,
+                  Description='List of strings to label each run in the '
+                  'comparison plots',
+                  DefaultDescription='The label of each run if all the runs '
+                  'have different labels, or their ids otherwise',
+                  Required=False)
+    ])
+    CommandOuts = ParameterCollection([
+        CommandOut(Name="bench_data", DataType=dict,
+                   Description="The processed results of a single run"),
+        CommandOut(Name="comp_data", DataType=dict,
+                   Description="The comparison of several runs")
+    ])
+
+    def run(self, **kwargs):
+        db_fp = kwargs['db_fp']
+        run_ids = kwargs['run_ids']
+        labels = kwargs['labels']
+
+        if not isfile(db_fp):
+            raise CommandError("The results database %s does not exist."
+                               % db_fp)
+        try:
+            run_ids = [int(run_id) for run_id in run_ids]
+        except ValueError:
+            raise CommandError("The run ids should be integers: %s"
+                               % ", ".join(map(str, run_ids)))
+        if not run_ids:
+            raise CommandError("At least a run id should be provided.")
+        if labels is not None and len(labels) != len(run_ids):
+            raise CommandError("The number of runs and the number of labels "
+                               "should match: %s != %s"
+                               % (len(run_ids), len(labels)))
+        try:
+            runs = load_bench_runs(db_fp, run_ids)
+        except ValueError as e:
+            raise CommandError(str(e))
+        except DatabaseError as e:
+            raise CommandError("The results cannot be read from %s: %s"
+                               % (db_fp, e))
+
+        if len(runs) == 1:
+            return {'bench_data': process_benchmark_results(runs[0][1]),
+                    'comp_data': None}
+
+        if labels is None:
+            labels = [run.label for run, _ in runs]
+            if None in labels or len(set(labels)) != len(labels):
+                labels = [str(run.run_id) for run, _ in runs]
+        if len(set(labels)) != len(labels):
+            raise CommandError("The labels of the runs should be unique: %s"
+                               % ", ".join(labels))
+        summaries = [get_bench_summary(process_benchmark_results(cases))
+                     for _, cases in runs]
+        try:
+            data = compare_benchmark_results(summaries, labels)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        return {'bench_data': None,
+                'comp_data': data}
+
+CommandConstructor = BenchResultsExporter
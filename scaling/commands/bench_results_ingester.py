@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+from __future__ import division
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+from socket import gethostname
+from sqlite3 import DatabaseError
+
+from pyqi.core.command import (Command, CommandIn, CommandOut,
+                               ParameterCollection)
+from pyqi.core.exception import CommandError
+
+from scaling.results_db import ingest_bench_results
+
+
+class BenchResultsIngester(Command):
+    """Subclassing the pyqi.core.command.Command class"""
+    BriefDescription = "Loads benchmark results into a results database"
+    LongDescription = ("Takes the timing directories of one or more runs of "
+                       "the benchmark suites and stores the measurements of "
+                       "every repetition in a SQLite database, indexed by "
+                       "command, parameter, host, QIIME version and case, so "
+                       "the runs can be queried and processed without the "
+                       "timing directories. Ingesting the same results of a "
+                       "timing directory again does not duplicate them.")
+    CommandIns = ParameterCollection([
+        CommandIn(Name='db_fp', DataType=str,
+                  Description='Path to the results database. It is created '
+                  'if it does not exist',
+                  Required=True),
+        CommandIn(Name='bench_results', DataType=list,
+                  Description='List with the timing directory and the '
+                  'benchmark results of each run',
+                  Required=True),
+        CommandIn(Name='command', DataType=str,
+                  Description='Command benchmarked in the runs',
+                  DefaultDescription='The name of the suite directory, '
+                  'without the date added by the bash suites',
+                  Required=False),
+        CommandIn(Name='host', DataType=str,
+                  Description='Host that executed the runs',
+                  DefaultDescription='The host running this command',
+                  Required=False),
+        CommandIn(Name='version', DataType=str,
+                  Description='QIIME version used in the runs',
+                  DefaultDescription='The version is not recorded',
+                  Required=False),
+        CommandIn(Name='label', DataType=str,
+                  Description='Free label to identify the runs',
+                  DefaultDescription='The runs are not labeled',
+                  Required=False)
+    ])
+    CommandOuts = ParameterCollection([
+        CommandOut(Name='run_ids', DataType=list,
+                   Description='The ids of the runs in the database')])
+
+    def run(self, **kwargs):
+        bench_results = list(kwargs['bench_results'])
+        host = kwargs['host']
+
+        if not bench_results:
+            raise CommandError("At least a timing directory should be "
+                               "provided.")
+        if host is None:
+            host = gethostname()
+        try:
+            run_ids = ingest_bench_results(kwargs['db_fp'], bench_results,
+                                           kwargs['command'], host,
+                                           kwargs['version'], kwargs['label'])
+        except DatabaseError as e:
+            raise CommandError("The results cannot be stored in %s: %s"
+                               % (kwargs['db_fp'], e))
+
+        return {'run_ids': run_ids}
+
+CommandConstructor = BenchResultsIngester
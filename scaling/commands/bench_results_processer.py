@@ -10,11 +10,17 @@ __maintainer__ = "Jose Antonio Navas Molina"
 __email__ = "josenavasmolina@gmail.com"
 __status__ = "Development"
 
+from warnings import warn
+
 from pyqi.core.command import (Command, CommandIn, CommandOut,
                                ParameterCollection)
+from pyqi.core.exception import CommandError
 
-from scaling.process_results import (process_benchmark_results, CompData)
+from scaling.process_results import (process_benchmark_results, CompData,
+                                     cross_check_accounting)
 from scaling.cluster_util import wait_on
+from scaling.sentinels import wait_on_sentinels
+from scaling.executors import get_executor
 
 
 class BenchResultsProcesser(Command):
@@ -29,23 +35,95 @@ class BenchResultsProcesser(Command):
                   Required=True),
         CommandIn(Name='job_ids', DataType=list,
                   Description='List of job ids to wait for if running in a '
-                  'pbs cluster', Required=False)
+                  'pbs cluster', Required=False),
+        CommandIn(Name='executor', DataType=str,
+                  Description='Backend that executed the jobs in job_ids or '
+                  'case_jobs: pbs, slurm, fake-pbs or fake-slurm',
+                  DefaultDescription='pbs',
+                  Required=False, Default='pbs'),
+        CommandIn(Name='sentinel_dir', DataType=str,
+                  Description='Directory with the completion sentinels of '
+                  'the benchmark commands. The results are processed once '
+                  'all the sentinels are done, without querying the queue '
+                  'system',
+                  DefaultDescription='Sentinels are not used',
+                  Required=False),
+        CommandIn(Name='timelines', DataType=list,
+                  Description='List with the memory and CPU timelines of '
+                  'each case, as (case, list of Timeline) tuples',
+                  DefaultDescription='No timelines are plotted',
+                  Required=False),
+        CommandIn(Name='case_jobs', DataType=dict,
+                  Description='Ids of the jobs that executed each case, '
+                  'keyed by case. The measurements are cross-checked with the '
+                  'accounting of the jobs reported by the queue system '
+                  '(sacct), which should be available for the executor',
+                  DefaultDescription='The measurements are not cross-checked',
+                  Required=False)
     ])
 
     CommandOuts = ParameterCollection([
         CommandOut(Name="bench_data", DataType=CompData,
                    Description="Dictionary with the benchmark results"),
+        CommandOut(Name="timelines", DataType=list,
+                   Description="The memory and CPU timelines of each case"),
+        CommandOut(Name="job_statuses", DataType=dict,
+                   Description="The final status of the waited jobs, with "
+                   "their exit status, queue wait and run times"),
+        CommandOut(Name="accounting_check", DataType=list,
+                   Description="The mean measurements of each case next to "
+                   "the mean accounting of its jobs"),
     ])
 
     def run(self, **kwargs):
         bench_results = kwargs['bench_results']
         job_ids = kwargs['job_ids']
+        timelines = kwargs['timelines']
+
+        sentinel_dir = kwargs['sentinel_dir']
+        case_jobs = kwargs['case_jobs']
 
-        if job_ids:
-            wait_on(job_ids)
+        job_statuses = None
+        if job_ids and sentinel_dir:
+            raise CommandError("Job ids or a sentinel directory should be "
+                               "provided, but not both.")
+        executor = None
+        if job_ids or case_jobs:
+            try:
+                executor = get_executor(kwargs['executor'])
+            except ValueError as e:
+                raise CommandError(str(e))
+        if sentinel_dir:
+            job_statuses = wait_on_sentinels(sentinel_dir)
+        elif job_ids:
+            job_statuses = wait_on(job_ids, executor=executor)
 
+        try:
+            bench_results = list(bench_results)
+        except (OSError, ValueError) as e:
+            # The timing directory is read lazily, once the jobs are done
+            raise CommandError(str(e))
         data = process_benchmark_results(bench_results)
 
-        return {'bench_data': data}
+        accounting_check = None
+        if case_jobs:
+            all_ids = sorted(set(job_id for ids in case_jobs.values()
+                                 for job_id in ids))
+            try:
+                accounting = executor.get_accounting(all_ids)
+            except ValueError as e:
+                raise CommandError(str(e))
+            except RuntimeError as e:
+                # The results are still useful without the cross-check
+                warn("The accounting of the jobs is not available: %s" % e,
+                     RuntimeWarning)
+            else:
+                accounting_check = cross_check_accounting(
+                    bench_results, case_jobs, accounting)
+
+        return {'bench_data': data,
+                'timelines': timelines,
+                'job_statuses': job_statuses,
+                'accounting_check': accounting_check}
 
 CommandConstructor = BenchResultsProcesser
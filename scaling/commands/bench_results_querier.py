@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+from __future__ import division
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+from os.path import isfile
+from sqlite3 import DatabaseError
+
+from pyqi.core.command import (Command, CommandIn, CommandOut,
+                               ParameterCollection)
+from pyqi.core.exception import CommandError
+
+from scaling.results_db import query_bench_runs
+
+
+class BenchResultsQuerier(Command):
+    """Subclassing the pyqi.core.command.Command class"""
+    BriefDescription = "Lists the runs stored in a results database"
+    LongDescription = ("Takes a results database created with "
+                       "ingest-bench-results and lists the runs that match "
+                       "all the given values, with the id used to export "
+                       "their results.")
+    CommandIns = ParameterCollection([
+        CommandIn(Name='db_fp', DataType=str,
+                  Description='Path to the results database',
+                  Required=True),
+        CommandIn(Name='command', DataType=str,
+                  Description='Command benchmarked in the runs',
+                  Required=False),
+        CommandIn(Name='parameter', DataType=str,
+                  Description='Parameter of the parameter suites',
+                  Required=False),
+        CommandIn(Name='host', DataType=str,
+                  Description='Host that executed the runs',
+                  Required=False),
+        CommandIn(Name='version', DataType=str,
+                  Description='QIIME version used in the runs',
+                  Required=False),
+        CommandIn(Name='label', DataType=str,
+                  Description='Label of the runs',
+                  Required=False),
+        CommandIn(Name='case', DataType=str,
+                  Description='Label of a case (e.g. a parameter value) '
+                  'that the runs should have',
+                  Required=False)
+    ])
+    CommandOuts = ParameterCollection([
+        CommandOut(Name='runs', DataType=list,
+                   Description='The BenchRun of each matching run')])
+
+    def run(self, **kwargs):
+        db_fp = kwargs['db_fp']
+
+        if not isfile(db_fp):
+            raise CommandError("The results database %s does not exist."
+                               % db_fp)
+        try:
+            runs = query_bench_runs(db_fp, kwargs['case'],
+                                    command=kwargs['command'],
+                                    parameter=kwargs['parameter'],
+                                    host=kwargs['host'],
+                                    version=kwargs['version'],
+                                    label=kwargs['label'])
+        except DatabaseError as e:
+            raise CommandError("The results cannot be read from %s: %s"
+                               % (db_fp, e))
+
+        return {'runs': runs}
+
+CommandConstructor = BenchResultsQuerier
@@ -15,6 +15,8 @@ from pyqi.core.command import (Command, CommandIn, CommandOut,
 from pyqi.core.exception import CommandError
 from scaling.make_bench_suite import (make_bench_suite_files,
                                       make_bench_suite_parameters)
+from scaling.util import EXECUTION_ORDERS
+from scaling.executors import get_executor, ThrottledExecutor
 
 
 class BenchSuiteMaker(Command):
@@ -51,9 +53,81 @@ class BenchSuiteMaker(Command):
                   Required=False, Default="-o"),
         CommandIn(Name='pbs', DataType=bool,
                   Description='Flag to determine if the benchmark suite will '
-                  'run in a PBS cluster environment',
+                  'run in a PBS cluster environment. Same as using the pbs '
+                  'executor',
                   DefaultDescription='False: run serially in bash',
                   Required=False, Default=False),
+        CommandIn(Name='executor', DataType=str,
+                  Description='Backend that executes the commands of the '
+                  'suite: local (in the machine running the suite), pbs, '
+                  'slurm, fake-pbs or fake-slurm (local stand-ins for PBS and '
+                  'SLURM, see the fake_qsub and fake_sbatch scripts)',
+                  DefaultDescription='pbs if the pbs flag is set, local '
+                  'otherwise',
+                  Required=False),
+        CommandIn(Name='jobs', DataType=int,
+                  Description='Maximum number of commands executed '
+                  'concurrently by the local executor',
+                  DefaultDescription='1: run serially',
+                  Required=False, Default=1),
+        CommandIn(Name='array_jobs', DataType=bool,
+                  Description='Submit the commands of the suite as a single '
+                  'job array (qsub -t or sbatch --array) instead of one job '
+                  'per command. The commands are written to a manifest file, '
+                  'indexed by $PBS_ARRAYID or $SLURM_ARRAY_TASK_ID. Only for '
+                  'the pbs, slurm, fake-pbs and fake-slurm executors',
+                  DefaultDescription='False: one job per command',
+                  Required=False, Default=False),
+        CommandIn(Name='sentinels', DataType=bool,
+                  Description='Each command creates a completion sentinel '
+                  'file in the suite results, and the results are processed '
+                  'as soon as all the sentinels are done, without querying '
+                  'the queue system. Requires the sentinel_wrapper.sh script '
+                  'in the PATH of the jobs',
+                  DefaultDescription='False: wait on the job ids',
+                  Required=False, Default=False),
+        CommandIn(Name='process_job', DataType=bool,
+                  Description='Submit the processing of the results as a job '
+                  'that the queue system releases once all the benchmark '
+                  'jobs have finished (-W depend=afterany), instead of '
+                  'waiting for them in the machine that runs the suite',
+                  DefaultDescription='False: wait on the job ids',
+                  Required=False, Default=False),
+        CommandIn(Name='max_queued', DataType=int,
+                  Description='Maximum number of jobs queued or running at '
+                  'the same time. The jobs are written to a job list and '
+                  'submitted by submit-jobs, which submits more jobs as the '
+                  'earlier ones finish and records the submission, start and '
+                  'end times of each job. Not compatible with array_jobs or '
+                  'process_job',
+                  DefaultDescription='All the jobs are submitted at once',
+                  Required=False),
+        CommandIn(Name='case_times', DataType=dict,
+                  Description='Estimated running time of each case, in '
+                  'seconds, keyed by case name, e.g. measured by a pilot run '
+                  'of the suite',
+                  DefaultDescription='No estimates are used',
+                  Required=False),
+        CommandIn(Name='bundle_time', DataType=float,
+                  Description='Pack the cases whose estimated running time '
+                  'is lower than this threshold (in seconds) into jobs that '
+                  'execute them sequentially, up to this estimated running '
+                  'time per job. Each case still writes its own timing files. '
+                  'Requires an executor that submits jobs and the running '
+                  'time of each case in a pilot run (--pilot-results): the '
+                  'suite is not generated and an error is reported if it is '
+                  'given without them',
+                  DefaultDescription='Each case is executed by its own job',
+                  Required=False),
+        CommandIn(Name='case_resources', DataType=dict,
+                  Description='Resources (wall time limit, memory and CPUs) '
+                  'requested for the job of each case, as ResourceRequest '
+                  'keyed by case name. A job array requests the largest '
+                  'resources of its cases, and a bundle the sum of the time '
+                  'limits of its cases. Requires an executor that submits '
+                  'jobs',
+                  DefaultDescription='The defaults of the queue are used',
+                  Required=False),
         CommandIn(Name='job_prefix', DataType=str,
                   Description='Prefix for the job name in case of a PBS '
                   'cluster environment',
@@ -67,7 +141,22 @@ class BenchSuiteMaker(Command):
         CommandIn(Name='pbs_extra_args', DataType=str,
                   Description='Any extra arguments needed to qsub',
                   DefaultDescription='No extra arguments are used',
-                  Required=False, Default="")
+                  Required=False, Default=""),
+        CommandIn(Name='order', DataType=str,
+                  Description='Order in which the cases are executed on each '
+                  'repetition: "sequential" (always the same order), '
+                  '"interleaved" (the order is rotated on each repetition) or '
+                  '"random" (the order is shuffled on each repetition with a '
+                  'recorded seed). The order and start time of each command '
+                  'are stored in the file execution_order.txt of the suite '
+                  'results',
+                  DefaultDescription='"sequential"',
+                  Required=False, Default='sequential'),
+        CommandIn(Name='seed', DataType=int,
+                  Description='Seed used to shuffle the cases when order is '
+                  '"random"',
+                  DefaultDescription='A random seed is generated',
+                  Required=False)
     ])
     CommandOuts = ParameterCollection([
         CommandOut(Name='bench_suite', DataType=str,
@@ -84,6 +173,75 @@ class BenchSuiteMaker(Command):
         job_prefix = kwargs['job_prefix']
         queue = kwargs['queue']
         pbs_extra_args = kwargs['pbs_extra_args']
+        order = kwargs['order']
+        seed = kwargs['seed']
+        executor = kwargs['executor']
+        jobs = kwargs['jobs']
+        array_jobs = kwargs['array_jobs']
+        sentinels = kwargs['sentinels']
+        process_job = kwargs['process_job']
+        max_queued = kwargs['max_queued']
+        case_times = kwargs['case_times']
+        bundle_time = kwargs['bundle_time']
+        case_resources = kwargs['case_resources']
+
+        if order not in EXECUTION_ORDERS:
+            raise CommandError("Unknown execution order: %s. Should be one "
+                               "of %s" % (order, ", ".join(EXECUTION_ORDERS)))
+
+        if executor is None:
+            executor = 'pbs' if pbs else 'local'
+        elif pbs and executor != 'pbs':
+            raise CommandError("The pbs flag cannot be used with the %s "
+                               "executor." % executor)
+        executor_args = {'job_prefix': job_prefix, 'queue': queue,
+                         'extra_args': pbs_extra_args}
+        if executor == 'local':
+            executor_args['jobs'] = jobs
+        elif jobs != 1:
+            raise CommandError("The number of jobs can only be used with the "
+                               "local executor.")
+        if array_jobs:
+            if executor not in ['pbs', 'slurm', 'fake-pbs', 'fake-slurm']:
+                raise CommandError("Job arrays can only be used with the pbs, "
+                                   "slurm, fake-pbs and fake-slurm "
+                                   "executors.")
+            executor_args['array'] = True
+        try:
+            executor = get_executor(executor, **executor_args)
+        except ValueError as e:
+            raise CommandError(str(e))
+        if max_queued is not None:
+            if array_jobs or process_job or case_resources:
+                raise CommandError("The throttled submission cannot be used "
+                                   "with job arrays, a processing job or "
+                                   "resource requests.")
+            try:
+                executor = ThrottledExecutor(executor, max_queued)
+            except ValueError as e:
+                raise CommandError(str(e))
+        if process_job:
+            if not executor.submits_jobs:
+                raise CommandError("The results can only be processed by a "
+                                   "dependent job if the executor submits "
+                                   "jobs.")
+            if sentinels:
+                raise CommandError("The results can be processed by a "
+                                   "dependent job or once the sentinels are "
+                                   "done, but not both.")
+        if case_resources and not executor.submits_jobs:
+            raise CommandError("Resources can only be requested if the "
+                               "executor submits jobs.")
+        if bundle_time is not None:
+            if not executor.submits_jobs:
+                raise CommandError("The cases can only be bundled if the "
+                                   "executor submits jobs.")
+            if not case_times:
+                raise CommandError("The running time estimates of the cases "
+                                   "(--pilot-results) are needed to bundle "
+                                   "them.")
+            if bundle_time <= 0:
+                raise CommandError("The bundle time should be positive.")
 
         # Check which type of bench suite are we generating
         if parameters:
@@ -94,7 +252,11 @@ class BenchSuiteMaker(Command):
                                    "provided, but not both.")
             bench_str = make_bench_suite_parameters(command, parameters,
                                                     out_opt, pbs, job_prefix,
-                                                    queue, pbs_extra_args)
+                                                    queue, pbs_extra_args,
+                                                    order, seed, executor,
+                                                    sentinels, process_job,
+                                                    case_times, bundle_time,
+                                                    case_resources)
         elif bench_files:
             # We are generating a benchmark suite based on input files,
             # Check that the number of benchmark files for test case match
@@ -104,7 +266,10 @@ class BenchSuiteMaker(Command):
                                    "must be the same.")
             bench_str = make_bench_suite_files(command, in_opts, bench_files,
                                                out_opt, pbs, job_prefix, queue,
-                                               pbs_extra_args)
+                                               pbs_extra_args, order, seed,
+                                               executor, sentinels,
+                                               process_job, case_times,
+                                               bundle_time, case_resources)
         else:
             # Not enough parameters!
             raise CommandError("Must specify parameters or bench_files.")
@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+from __future__ import division
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+from pyqi.core.command import (Command, CommandIn, CommandOut,
+                               ParameterCollection)
+from pyqi.core.exception import CommandError
+from scaling.run_bench_suite import (get_suite_cases_files,
+                                     get_suite_cases_parameters,
+                                     get_timing_dirs, run_bench_suite)
+from scaling.work_queue import make_work_queue
+
+
+class BenchSuiteRunner(Command):
+    """Subclassing the pyqi.core.command.Command class"""
+    BriefDescription = "Runs a benchmark suite"
+    LongDescription = ("Given a command and a list of benchmarks files or a "
+                       "dictionary with the options to test, executes the "
+                       "complete benchmark suite using a pool of concurrent "
+                       "workers, and stores the timing results in the same "
+                       "layout used by the shell script benchmark suites.")
+    CommandIns = ParameterCollection([
+        CommandIn(Name='command', DataType=str,
+                  Description='command to benchmark', Required=True),
+        CommandIn(Name='output_dir', DataType=str,
+                  Description='Path to the benchmark suite output directory',
+                  Required=True),
+        CommandIn(Name='parameters', DataType=dict,
+                  Description='dictionary where the keys are the parameters '
+                  'to test and the values are a list of values for such '
+                  'parameter.',
+                  DefaultDescription='No parameters used'),
+        CommandIn(Name='bench_files', DataType=list,
+                  Description='List of lists of paths to the benchmark files '
+                  'to use as input for the command. Each inner list is a test '
+                  'case and should have the same length as the in_opts '
+                  'parameter.',
+                  DefaultDescription='No bench_files used',
+                  Required=False),
+        CommandIn(Name='in_opts', DataType=list,
+                  Description='list of options used for providing the '
+                  'benchmark files to the command. It should have the same '
+                  'length and order than the inner lists of bench_files.',
+                  DefaultDescription='["-i"] is used as a default',
+                  Required=False, Default=["-i"]),
+        CommandIn(Name='out_opt', DataType=str,
+                  Description='Option used for providing the output path to '
+                  'the command to benchmark.',
+                  DefaultDescription='"-o" is used as default',
+                  Required=False, Default="-o"),
+        CommandIn(Name='num_reps', DataType=int,
+                  Description='Number of times each case should be executed',
+                  DefaultDescription='1 repetition',
+                  Required=False, Default=1),
+        CommandIn(Name='jobs', DataType=int,
+                  Description='Maximum number of commands to execute '
+                  'concurrently',
+                  DefaultDescription='1: run serially',
+                  Required=False, Default=1),
+        CommandIn(Name='per_core', DataType=bool,
+                  Description='Execute one command per available core, '
+                  'ignoring the jobs parameter',
+                  DefaultDescription='False: use the jobs parameter',
+                  Required=False, Default=False),
+        CommandIn(Name='warmup', DataType=int,
+                  Description='Number of warmup runs of each case, whose '
+                  'results are discarded',
+                  DefaultDescription='0: no warmup runs',
+                  Required=False, Default=0),
+        CommandIn(Name='target_ci', DataType=float,
+                  Description='Repeat each case until the half-width of the '
+                  '95% confidence interval of the wall time mean, relative to '
+                  'the mean, falls below this value. num_reps is used as the '
+                  'minimum number of repetitions',
+                  DefaultDescription='Execute num_reps repetitions',
+                  Required=False),
+        CommandIn(Name='max_reps', DataType=int,
+                  Description='Maximum number of repetitions of each case '
+                  'when target_ci is provided',
+                  DefaultDescription='30 repetitions',
+                  Required=False, Default=30),
+        CommandIn(Name='time_budget', DataType=float,
+                  Description='Maximum number of seconds to spend on each '
+                  'case, including warmup runs',
+                  DefaultDescription='No time budget',
+                  Required=False),
+        CommandIn(Name='sample_interval', DataType=float,
+                  Description='Sample the memory and CPU usage of each '
+                  'command every sample_interval seconds, storing the '
+                  'timelines in the timelines directory of the suite',
+                  DefaultDescription='No sampling',
+                  Required=False),
+        CommandIn(Name='cpus_per_case', DataType=int,
+                  Description='Pin each command to a dedicated set of '
+                  'cpus_per_case CPUs, not shared with the other commands '
+                  'running concurrently. The placement is recorded in the '
+                  'timing files',
+                  DefaultDescription='Commands are not pinned',
+                  Required=False),
+        CommandIn(Name='isolate_siblings', DataType=bool,
+                  Description='Use a single hardware thread of each physical '
+                  'core, keeping the sibling hyperthreads idle. Requires '
+                  'cpus_per_case',
+                  DefaultDescription='False: use all the hardware threads',
+                  Required=False, Default=False),
+        CommandIn(Name='numa_bind', DataType=bool,
+                  Description='Bind the memory of each command to the NUMA '
+                  'node of its CPUs using numactl, if available. Requires '
+                  'cpus_per_case',
+                  DefaultDescription='False: memory is not bound',
+                  Required=False, Default=False),
+        CommandIn(Name='resume', DataType=bool,
+                  Description='Resume a previous execution of the suite '
+                  'stored in output_dir, executing only the repetitions that '
+                  'are missing or whose timing file is malformed',
+                  DefaultDescription='False: execute all the repetitions',
+                  Required=False, Default=False),
+        CommandIn(Name='timeout', DataType=float,
+                  Description='Maximum number of seconds each command can '
+                  'run. Commands running for longer are killed and recorded '
+                  'as censored',
+                  DefaultDescription='No time limit',
+                  Required=False),
+        CommandIn(Name='max_rss', DataType=int,
+                  Description='Maximum resident memory, in MB, of each '
+                  'command and all its descendant processes. Commands using '
+                  'more memory are killed and recorded as censored',
+                  DefaultDescription='No memory limit',
+                  Required=False),
+        CommandIn(Name='max_vmem', DataType=int,
+                  Description='Maximum virtual memory, in MB, of each process '
+                  '(RLIMIT_AS). Commands failing under this limit with an '
+                  'allocation error in their stderr (e.g. MemoryError or '
+                  'ENOMEM) are recorded as censored, other failures as '
+                  'failed runs',
+                  DefaultDescription='No virtual memory limit',
+                  Required=False),
+        CommandIn(Name='order', DataType=str,
+                  Description='Order in which the repetitions of the cases '
+                  'are executed: "sequential" (one block per repetition, '
+                  'executing each case once, in order, on each block), '
+                  '"interleaved" (as sequential, rotating the order of the '
+                  'cases by one position on each block) or "random" (all '
+                  'the (case, repetition) pairs of the suite are shuffled '
+                  'together using a recorded seed). The order is stored in '
+                  'the file execution_order.txt of output_dir',
+                  DefaultDescription='"sequential"',
+                  Required=False, Default='sequential'),
+        CommandIn(Name='seed', DataType=int,
+                  Description='Seed used to shuffle the (case, repetition) '
+                  'pairs when order is "random"',
+                  DefaultDescription='A random seed is generated',
+                  Required=False),
+        CommandIn(Name='cache_mode', DataType=str,
+                  Description='Page cache state of the input files of each '
+                  'case before each repetition: "cold" (evicted from the page '
+                  'cache with posix_fadvise), "warm" (pre-read) or "both" '
+                  '(each repetition is executed cold and then warm, and both '
+                  'measurements are stored)',
+                  DefaultDescription='The page cache is not modified',
+                  Required=False),
+        CommandIn(Name='queue', DataType=bool,
+                  Description='Instead of executing the suite, create a work '
+                  'queue with its repetitions in output_dir, to be executed '
+                  'by "scaling worker" processes started on any host that '
+                  'shares output_dir. The sampling, limits, page cache mode '
+                  'and number of jobs are options of the workers',
+                  DefaultDescription='False: execute the suite',
+                  Required=False, Default=False),
+        CommandIn(Name='timing_log', DataType=bool,
+                  Description='Append the timing results to a single '
+                  'timing log (timing.log) per timing directory instead of '
+                  'writing a timing file per repetition. Recommended for '
+                  'large suites and for the work queue on shared file '
+                  'systems',
+                  DefaultDescription='False: a timing file per repetition',
+                  Required=False, Default=False)
+    ])
+    CommandOuts = ParameterCollection([
+        CommandOut(Name='timing_dirs', DataType=list,
+                   Description='List with the timing directories that hold '
+                   'the benchmark suite results')])
+
+    def run(self, **kwargs):
+        # Get command parameters
+        command = kwargs['command']
+        output_dir = kwargs['output_dir']
+        out_opt = kwargs['out_opt']
+        parameters = kwargs['parameters']
+        bench_files = kwargs['bench_files']
+        in_opts = kwargs['in_opts']
+        num_reps = kwargs['num_reps']
+        jobs = kwargs['jobs']
+        per_core = kwargs['per_core']
+        warmup = kwargs['warmup']
+        target_ci = kwargs['target_ci']
+        max_reps = kwargs['max_reps']
+        time_budget = kwargs['time_budget']
+        sample_interval = kwargs['sample_interval']
+        cpus_per_case = kwargs['cpus_per_case']
+        isolate_siblings = kwargs['isolate_siblings']
+        numa_bind = kwargs['numa_bind']
+        resume = kwargs['resume']
+        timeout = kwargs['timeout']
+        max_rss = kwargs['max_rss']
+        max_vmem = kwargs['max_vmem']
+        order = kwargs['order']
+        seed = kwargs['seed']
+        cache_mode = kwargs['cache_mode']
+        queue = kwargs['queue']
+        timing_log = kwargs['timing_log']
+
+        # Check which type of bench suite are we running
+        if parameters:
+            if bench_files:
+                raise CommandError("Parameters or bench_files should be "
+                                   "provided, but not both.")
+            cases = get_suite_cases_parameters(command, parameters, out_opt)
+        elif bench_files:
+            if not all(len(x) == len(in_opts) for x in bench_files):
+                raise CommandError("The length of bench_files and in_opts "
+                                   "must be the same.")
+            cases = get_suite_cases_files(command, in_opts, bench_files,
+                                          out_opt)
+        else:
+            # Not enough parameters!
+            raise CommandError("Must specify parameters or bench_files.")
+
+        if num_reps < 1:
+            raise CommandError("The number of repetitions should be at "
+                               "least 1.")
+        if jobs < 1 and not per_core:
+            raise CommandError("The number of jobs should be at least 1.")
+        if warmup < 0:
+            raise CommandError("The number of warmup runs cannot be "
+                               "negative.")
+        if target_ci is not None and target_ci <= 0:
+            raise CommandError("The target CI should be greater than 0.")
+        if target_ci is not None and max_reps < num_reps:
+            raise CommandError("The maximum number of repetitions should be "
+                               "at least num_reps.")
+        if sample_interval is not None and sample_interval <= 0:
+            raise CommandError("The sampling interval should be greater than "
+                               "0.")
+
+        if cpus_per_case is not None and cpus_per_case < 1:
+            raise CommandError("The number of CPUs per case should be at "
+                               "least 1.")
+        if cpus_per_case is None and (isolate_siblings or numa_bind):
+            raise CommandError("cpus_per_case is required to isolate the "
+                               "sibling threads or bind the memory.")
+
+        if any(limit is not None and limit <= 0
+               for limit in [timeout, max_rss, max_vmem]):
+            raise CommandError("The limits should be greater than 0.")
+        if queue:
+            if (warmup or target_ci is not None or resume or
+                    cpus_per_case is not None):
+                raise CommandError("The work queue does not support warmup "
+                                   "runs, adaptive repetitions, resuming or "
+                                   "pinning the commands.")
+            if (jobs != 1 or per_core or cache_mode is not None or
+                    any(v is not None for v in [sample_interval, timeout,
+                                                max_rss, max_vmem])):
+                raise CommandError("The sampling, limits, page cache mode "
+                                   "and number of jobs should be given to "
+                                   "the workers of the work queue.")
+            try:
+                make_work_queue(output_dir, cases, num_reps, order, seed,
+                                timing_log)
+            except ValueError as e:
+                raise CommandError(str(e))
+            return {'timing_dirs': get_timing_dirs(output_dir, cases)}
+        # The memory limits are provided in MB, the runner uses KB
+        if max_rss is not None:
+            max_rss *= 1024
+        if max_vmem is not None:
+            max_vmem *= 1024
+
+        try:
+            timing_dirs = run_bench_suite(output_dir, cases, num_reps, jobs,
+                                          per_core, warmup, target_ci,
+                                          max_reps, time_budget,
+                                          sample_interval, cpus_per_case,
+                                          isolate_siblings, numa_bind,
+                                          resume, timeout, max_rss,
+                                          max_vmem, order, seed,
+                                          cache_mode, timing_log)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        return {'timing_dirs': timing_dirs}
+
+CommandConstructor = BenchSuiteRunner
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+from __future__ import division
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+from pyqi.core.command import (Command, CommandIn, CommandOut,
+                               ParameterCollection)
+from pyqi.core.exception import CommandError
+
+from scaling.cluster_util import submit_throttled, get_throughput
+from scaling.executors import get_executor
+from scaling.util import Throughput
+
+
+class JobSubmitter(Command):
+    """Subclassing the pyqi.core.command.Command class"""
+    BriefDescription = "Submits jobs keeping a maximum number of them queued"
+    LongDescription = ("Submits a list of jobs to the queue system keeping at "
+                       "most a given number of them queued or running, "
+                       "submitting more jobs as the earlier ones finish, and "
+                       "waits until all of them are done. The submission, "
+                       "start and end times of each job are recorded to "
+                       "measure the effective throughput of the cluster.")
+    CommandIns = ParameterCollection([
+        CommandIn(Name='jobs', DataType=list,
+                  Description='List with the (name, script) pairs of the '
+                  'jobs to submit, in submission order',
+                  Required=True),
+        CommandIn(Name='max_queued', DataType=int,
+                  Description='Maximum number of jobs queued or running at '
+                  'the same time',
+                  Required=True),
+        CommandIn(Name='executor', DataType=str,
+                  Description='Backend that submits the jobs: pbs, slurm or '
+                  'fake-pbs',
+                  DefaultDescription='pbs',
+                  Required=False, Default='pbs'),
+        CommandIn(Name='queue', DataType=str,
+                  Description='Queue (or partition) to submit the jobs',
+                  DefaultDescription='The default queue',
+                  Required=False, Default=""),
+        CommandIn(Name='extra_args', DataType=str,
+                  Description='Any extra arguments needed by the submission '
+                  'command',
+                  DefaultDescription='No extra arguments',
+                  Required=False, Default=""),
+        CommandIn(Name='poll_interval', DataType=float,
+                  Description='Initial interval between the queries to the '
+                  'queue system, in seconds',
+                  DefaultDescription='5 seconds',
+                  Required=False, Default=5.0)
+    ])
+    CommandOuts = ParameterCollection([
+        CommandOut(Name='job_records', DataType=list,
+                   Description='The submission, start and end times and the '
+                   'exit status of each job'),
+        CommandOut(Name='throughput', DataType=Throughput,
+                   Description='The effective throughput of the jobs')
+    ])
+
+    def run(self, **kwargs):
+        jobs = kwargs['jobs']
+        max_queued = kwargs['max_queued']
+        poll_interval = kwargs['poll_interval']
+
+        if max_queued < 1:
+            raise CommandError("The maximum number of queued jobs should be "
+                               "at least 1.")
+        if poll_interval <= 0:
+            raise CommandError("The poll interval should be greater than 0.")
+        try:
+            executor = get_executor(kwargs['executor'],
+                                    queue=kwargs['queue'],
+                                    extra_args=kwargs['extra_args'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        if not executor.submits_jobs:
+            raise CommandError("The %s executor does not submit jobs."
+                               % executor.name)
+
+        try:
+            records = submit_throttled(jobs, executor, max_queued,
+                                       poll_interval=poll_interval)
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        return {'job_records': records,
+                'throughput': get_throughput(records)}
+
+CommandConstructor = JobSubmitter
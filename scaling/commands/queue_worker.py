@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+from __future__ import division
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+from pyqi.core.command import (Command, CommandIn, CommandOut,
+                               ParameterCollection)
+from pyqi.core.exception import CommandError
+from scaling.work_queue import (run_worker, get_queue_timing_dirs,
+                                CLAIM_LEASE)
+
+
+class QueueWorker(Command):
+    """Subclassing the pyqi.core.command.Command class"""
+    BriefDescription = "Executes the tasks of the work queue of a suite"
+    LongDescription = ("Given a benchmark suite output directory with a work "
+                       "queue (see run-bench-suite --queue), atomically "
+                       "claims its pending repetitions one at a time, "
+                       "executes and measures them, and stores the timing "
+                       "results in the suite directory, until no pending "
+                       "repetitions are left. Any number of workers can be "
+                       "started on the hosts that share the suite directory "
+                       "(e.g. over NFS), so each host executes repetitions "
+                       "as fast as it can.")
+    CommandIns = ParameterCollection([
+        CommandIn(Name='output_dir', DataType=str,
+                  Description='Path to the benchmark suite output directory '
+                  'holding the work queue',
+                  Required=True),
+        CommandIn(Name='jobs', DataType=int,
+                  Description='Maximum number of repetitions executed '
+                  'concurrently by the worker',
+                  DefaultDescription='1: run serially',
+                  Required=False, Default=1),
+        CommandIn(Name='max_tasks', DataType=int,
+                  Description='Maximum number of repetitions executed by the '
+                  'worker',
+                  DefaultDescription='Execute repetitions until the queue '
+                  'has no pending repetitions',
+                  Required=False),
+        CommandIn(Name='sample_interval', DataType=float,
+                  Description='Sample the memory and CPU usage of each '
+                  'command every sample_interval seconds, storing the '
+                  'timelines in the timelines directory of the suite',
+                  DefaultDescription='No sampling',
+                  Required=False),
+        CommandIn(Name='timeout', DataType=float,
+                  Description='Maximum number of seconds each command can '
+                  'run. Commands running for longer are killed and recorded '
+                  'as censored',
+                  DefaultDescription='No time limit',
+                  Required=False),
+        CommandIn(Name='max_rss', DataType=int,
+                  Description='Maximum resident memory, in MB, of each '
+                  'command and all its descendant processes. Commands using '
+                  'more memory are killed and recorded as censored',
+                  DefaultDescription='No memory limit',
+                  Required=False),
+        CommandIn(Name='max_vmem', DataType=int,
+                  Description='Maximum virtual memory, in MB, of each process '
+                  '(RLIMIT_AS). Commands failing under this limit with an '
+                  'allocation error in their stderr (e.g. MemoryError or '
+                  'ENOMEM) are recorded as censored, other failures as '
+                  'failed runs',
+                  DefaultDescription='No virtual memory limit',
+                  Required=False),
+        CommandIn(Name='cache_mode', DataType=str,
+                  Description='Page cache state of the input files of each '
+                  'case before each repetition: "cold", "warm" or "both"',
+                  DefaultDescription='The page cache is not modified',
+                  Required=False),
+        CommandIn(Name='claim_lease', DataType=float,
+                  Description='Seconds after which a claimed repetition '
+                  'whose worker has stopped refreshing its claim is '
+                  'returned to the queue by any worker, on any host. The '
+                  'clocks of the hosts should agree to well within this time',
+                  DefaultDescription='%d seconds' % CLAIM_LEASE,
+                  Required=False, Default=CLAIM_LEASE)
+    ])
+    CommandOuts = ParameterCollection([
+        CommandOut(Name='timing_dirs', DataType=list,
+                   Description='List with the timing directories that hold '
+                   'the benchmark suite results'),
+        CommandOut(Name='tasks', DataType=list,
+                   Description='The (case, repetition) pairs executed by the '
+                   'worker')])
+
+    def run(self, **kwargs):
+        output_dir = kwargs['output_dir']
+        jobs = kwargs['jobs']
+        max_tasks = kwargs['max_tasks']
+        max_rss = kwargs['max_rss']
+        max_vmem = kwargs['max_vmem']
+
+        if jobs < 1:
+            raise CommandError("The number of jobs should be at least 1.")
+        if max_tasks is not None and max_tasks < 1:
+            raise CommandError("The maximum number of tasks should be at "
+                               "least 1.")
+        if kwargs['claim_lease'] <= 0:
+            raise CommandError("The claim lease should be greater than 0.")
+        # The memory limits are provided in MB, the runner uses KB
+        if max_rss is not None:
+            max_rss *= 1024
+        if max_vmem is not None:
+            max_vmem *= 1024
+
+        try:
+            tasks = run_worker(output_dir, jobs, max_tasks,
+                               kwargs['sample_interval'], kwargs['timeout'],
+                               max_rss, max_vmem, kwargs['cache_mode'],
+                               claim_lease=kwargs['claim_lease'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        return {'timing_dirs': get_queue_timing_dirs(output_dir),
+                'tasks': tasks}
+
+CommandConstructor = QueueWorker
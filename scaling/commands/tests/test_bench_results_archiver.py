@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+
+from os import listdir, mkdir
+from os.path import join, exists
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase, main
+
+from pyqi.core.exception import CommandError
+
+from scaling.commands.bench_results_archiver import BenchResultsArchiver
+from scaling.archive import iter_archive
+
+
+class BenchResultsArchiverTests(TestCase):
+    def setUp(self):
+        """Set up data for use in unit tests"""
+        self.cmd = BenchResultsArchiver()
+        self.output_dir = mkdtemp()
+        self.timing_dir = join(self.output_dir, 'timing')
+        mkdir(self.timing_dir)
+        for case in ['10', '20']:
+            mkdir(join(self.timing_dir, case))
+            for rep in ['1.txt', '2.txt']:
+                with open(join(self.timing_dir, case, rep), 'w') as f:
+                    f.write("1.5;1.0;0.5;1024\n")
+
+    def tearDown(self):
+        rmtree(self.output_dir)
+
+    def test_invalid_input(self):
+        """Correctly handles invalid input by raising a CommandError."""
+        with self.assertRaises(CommandError):
+            _ = self.cmd(input_dir=join(self.output_dir, 'foo'),
+                         archive_fp=join(self.output_dir, 'foo.tar.gz'))
+        with self.assertRaises(CommandError):
+            _ = self.cmd(input_dir=self.timing_dir,
+                         archive_fp=join(self.output_dir, 'timing.7z'))
+        self.assertEqual(listdir(self.output_dir), ['timing'])
+
+    def test_bench_results_archiver(self):
+        """Correctly stores the timing directory in an archive"""
+        archive_fp = join(self.output_dir, 'timing.tar.gz')
+        obs = self.cmd(input_dir=self.timing_dir, archive_fp=archive_fp)
+        self.assertEqual(obs, {'archive_fp': archive_fp})
+        self.assertTrue(exists(self.timing_dir))
+        exp = ['10', '10/1.txt', '10/2.txt', '20', '20/1.txt', '20/2.txt']
+        self.assertEqual([name for name, _ in iter_archive(archive_fp)], exp)
+        # The archive is not overwritten
+        with self.assertRaises(CommandError):
+            _ = self.cmd(input_dir=self.timing_dir, archive_fp=archive_fp)
+
+        archive_fp = join(self.output_dir, 'timing.zip')
+        obs = self.cmd(input_dir=self.timing_dir, archive_fp=archive_fp,
+                       remove=True)
+        self.assertFalse(exists(self.timing_dir))
+        self.assertEqual([name for name, _ in iter_archive(archive_fp)], exp)
+
+
+if __name__ == '__main__':
+    main()
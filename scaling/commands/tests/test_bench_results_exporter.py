@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase, main
+
+from pyqi.core.exception import CommandError
+
+from scaling.commands.bench_results_exporter import BenchResultsExporter
+from scaling.results_db import (ingest_bench_results,
+                                  load_bench_runs)
+from scaling.util import BenchCase
+
+
+class BenchResultsExporterTests(TestCase):
+    def setUp(self):
+        """Set up data for use in unit tests"""
+        self.cmd = BenchResultsExporter()
+        self.output_dir = mkdtemp()
+        self.db_fp = join(self.output_dir, 'results.db')
+        cases = [BenchCase('10', [10.0, 12.0], [9.0, 11.0], [0.5, 0.5],
+                           [1024, 1024]),
+                 BenchCase('20', [20.0, 22.0], [19.0, 21.0], [0.5, 0.5],
+                           [2048, 2048]),
+                 BenchCase('30', [30.0, 32.0], [29.0, 31.0], [0.5, 0.5],
+                           [3072, 3072])]
+        ingest_bench_results(self.db_fp, [("bench/timing", cases)],
+                             label='old')
+        # A later run of the same suite directory, with new results
+        new_cases = [case._replace(wall=[w + 1.0 for w in case.wall])
+                     for case in cases]
+        ingest_bench_results(self.db_fp, [("bench/timing", new_cases),
+                                          ("other/timing", cases[:2])],
+                             label='new')
+
+    def tearDown(self):
+        rmtree(self.output_dir)
+
+    def test_invalid_input(self):
+        """Correctly handles invalid input by raising a CommandError."""
+        with self.assertRaises(CommandError):
+            _ = self.cmd(db_fp=join(self.output_dir, 'foo.db'), run_ids=[1])
+        with self.assertRaises(CommandError):
+            _ = self.cmd(db_fp=self.db_fp, run_ids=[])
+        with self.assertRaises(CommandError):
+            _ = self.cmd(db_fp=self.db_fp, run_ids=['a'])
+        with self.assertRaises(CommandError):
+            _ = self.cmd(db_fp=self.db_fp, run_ids=['1', '4'])
+        with self.assertRaises(CommandError):
+            _ = self.cmd(db_fp=self.db_fp, run_ids=['1', '2'], labels=['a'])
+        with self.assertRaises(CommandError):
+            _ = self.cmd(db_fp=self.db_fp, run_ids=['1', '2'],
+                         labels=['a', 'a'])
+        # The runs should have the same cases to be compared
+        with self.assertRaises(CommandError):
+            _ = self.cmd(db_fp=self.db_fp, run_ids=['1', '3'])
+
+    def test_bench_results_exporter_single(self):
+        """Correctly processes a single run"""
+        obs = self.cmd(db_fp=self.db_fp, run_ids=['1'])
+        self.assertEqual(obs['comp_data'], None)
+        data = obs['bench_data']
+        self.assertEqual(data.labels, ['10', '20', '30'])
+        self.assertEqual(data.means.wall, [11.0, 21.0, 31.0])
+        self.assertEqual(data.stdevs.mem, [0.0, 0.0, 0.0])
+
+    def test_bench_results_exporter_compare(self):
+        """Correctly compares several runs"""
+        obs = self.cmd(db_fp=self.db_fp, run_ids=['1', '2'])
+        self.assertEqual(obs['bench_data'], None)
+        data = obs['comp_data']
+        self.assertEqual(data.x, ['10', '20', '30'])
+        self.assertEqual(sorted(data.time), ['new', 'old'])
+        self.assertEqual(data.time['old'], ([11.0, 21.0, 31.0],
+                                            [1.0, 1.0, 1.0]))
+        # The ids are used if the labels of the runs are not unique
+        cases = load_bench_runs(self.db_fp, [1])[0][1]
+        ingest_bench_results(self.db_fp, [("rerun/timing", cases)],
+                             label='old')
+        obs = self.cmd(db_fp=self.db_fp, run_ids=['4', '1'])
+        self.assertEqual(sorted(obs['comp_data'].time), ['1', '4'])
+        obs = self.cmd(db_fp=self.db_fp, run_ids=['2', '1'],
+                       labels=['b', 'a'])
+        self.assertEqual(sorted(obs['comp_data'].mem), ['a', 'b'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+
+from os.path import join
+from shutil import rmtree
+from socket import gethostname
+from tempfile import mkdtemp
+from unittest import TestCase, main
+
+from pyqi.core.exception import CommandError
+
+from scaling.commands.bench_results_ingester import BenchResultsIngester
+from scaling.results_db import query_bench_runs
+from scaling.util import BenchCase
+
+
+class BenchResultsIngesterTests(TestCase):
+    def setUp(self):
+        """Set up data for use in unit tests"""
+        self.cmd = BenchResultsIngester()
+        self.output_dir = mkdtemp()
+        self.db_fp = join(self.output_dir, 'results.db')
+        self.runs = [("bench/timing",
+                      [BenchCase('10', [1.0, 1.5], [0.5, 0.5], [0.1, 0.1],
+                                 [1024, 1024])])]
+
+    def tearDown(self):
+        rmtree(self.output_dir)
+
+    def test_invalid_input(self):
+        """Correctly handles invalid input by raising a CommandError."""
+        with self.assertRaises(CommandError):
+            _ = self.cmd(db_fp=self.db_fp, bench_results=[])
+        with self.assertRaises(CommandError):
+            _ = self.cmd(db_fp=join(self.output_dir, 'foo', 'results.db'),
+                         bench_results=self.runs)
+
+    def test_bench_results_ingester(self):
+        """Correctly stores the runs in the results database"""
+        obs = self.cmd(db_fp=self.db_fp, bench_results=self.runs,
+                       version='1.8.0')
+        self.assertEqual(obs, {'run_ids': [1]})
+        obs = self.cmd(db_fp=self.db_fp,
+                       bench_results=[("other/timing", self.runs[0][1])],
+                       command='pick_otus', host='host1', label='new')
+        self.assertEqual(obs, {'run_ids': [2]})
+        obs = query_bench_runs(self.db_fp)
+        self.assertEqual([(r.command, r.host, r.version, r.label, r.reps)
+                          for r in obs],
+                         [('bench', gethostname(), '1.8.0', None, 2),
+                          ('pick_otus', 'host1', None, 'new', 2)])
+
+    def test_bench_results_ingester_twice(self):
+        """Ingesting the same results twice does not duplicate the runs"""
+        self.cmd(db_fp=self.db_fp, bench_results=self.runs)
+        obs = self.cmd(db_fp=self.db_fp, bench_results=self.runs,
+                       label='again')
+        self.assertEqual(obs, {'run_ids': [1]})
+        obs = query_bench_runs(self.db_fp)
+        self.assertEqual([(r.run_id, r.label, r.reps) for r in obs],
+                         [(1, None, 2)])
+
+
+if __name__ == '__main__':
+    main()
@@ -8,13 +8,24 @@ __version__ = "0.0.2-dev"
 __maintainer__ = "Jose Antonio Navas Molina"
 __email__ = "josenavasmolina@gmail.com"
 
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
 from unittest import TestCase, main
 
 import numpy as np
 from numpy.testing import assert_almost_equal
 
-from scaling.util import BenchCase, BenchData, FittedCurve, SummarizedResults
+from pyqi.core.exception import CommandError
+
+from scaling.util import (BenchCase, BenchData, FittedCurve, SummarizedResults,
+                          Timeline, JobStatus)
 from scaling.commands.bench_results_processer import BenchResultsProcesser
+from scaling.interfaces.optparse.input_handler import parse_timing_directory
+from scaling.cluster_util import wait_on
+from scaling.executors import FakeSlurmExecutor
+from scaling.fake_slurm import sbatch
+from scaling.fake_pbs import FakePBSEnviron
 
 
 class BenchResultsProcesserTests(TestCase):
@@ -37,11 +48,28 @@ class BenchResultsProcesserTests(TestCase):
                                   [8.54, 6.83, 5.12, 6.14, 7.143],
                                   [10541, 10621, 10421, 10514, 10589])]
 
+    def test_invalid_input(self):
+        """Correctly handles invalid input by raising a CommandError."""
+        output_dir = mkdtemp()
+        try:
+            with self.assertRaises(CommandError):
+                _ = self.cmd(bench_results=parse_timing_directory(
+                    join(output_dir, 'timing')))
+            timing_dir = join(output_dir, 'timing.tar.gz', 'similarity')
+            with self.assertRaises(CommandError):
+                _ = self.cmd(bench_results=parse_timing_directory(timing_dir))
+        finally:
+            rmtree(output_dir)
+
     def test_bench_results_processer(self):
         """Correctly processes the benchmark outputs"""
         obs = self.cmd(bench_results=self.results)
 
-        self.assertEqual(obs.keys(), ['bench_data'])
+        self.assertEqual(sorted(obs.keys()), ['accounting_check',
+                                              'bench_data', 'job_statuses',
+                                              'timelines'])
+        self.assertEqual(obs['timelines'], None)
+        self.assertEqual(obs['job_statuses'], None)
         obs = obs['bench_data']
 
         labels = ['file_10', 'file_20', 'file_30']
@@ -64,5 +92,65 @@ class BenchResultsProcesserTests(TestCase):
         assert_almost_equal(obs.mem_curve.poly, exp.mem_curve.poly)
         self.assertEqual(obs.mem_curve.deg, exp.mem_curve.deg)
 
+    def test_bench_results_processer_timelines(self):
+        """Correctly passes the timelines through"""
+        timelines = [('file_10', [Timeline([0.1, 0.2], [1024, 2048],
+                                           [0.05, 0.15], [1, 1], 0.001)])]
+        obs = self.cmd(bench_results=self.results, timelines=timelines)
+        self.assertEqual(obs['timelines'], timelines)
+
+    def test_bench_results_processer_sentinels(self):
+        """Correctly waits on the completion sentinels"""
+        sentinel_dir = mkdtemp()
+        try:
+            for name in ['file_10_1', 'file_20_1']:
+                with open(join(sentinel_dir, name + '.pending'), 'w') as f:
+                    f.write("")
+                with open(join(sentinel_dir, name + '.done'), 'w') as f:
+                    f.write("0\t10.0\t12.0\tnode1\n")
+            obs = self.cmd(bench_results=self.results,
+                           sentinel_dir=sentinel_dir)
+            self.assertEqual(obs['job_statuses'],
+                             {'file_10_1': JobStatus('file_10_1', 'C', 0,
+                                                     None, 2.0),
+                              'file_20_1': JobStatus('file_20_1', 'C', 0,
+                                                     None, 2.0)})
+            with self.assertRaises(CommandError):
+                self.cmd(bench_results=self.results,
+                         sentinel_dir=sentinel_dir, job_ids=['1'])
+        finally:
+            rmtree(sentinel_dir)
+
+    def test_bench_results_processer_accounting(self):
+        """Correctly cross-checks the measurements with the job accounting"""
+        # The fake_sbatch, fake_squeue and fake_sacct scripts are used by the
+        # fake-slurm executor
+        state_dir = mkdtemp()
+        environ = FakePBSEnviron(state_dir, queue_delay=0, scripts=True)
+        environ.start()
+        try:
+            job_ids = [sbatch(["--parsable", "--wrap=sleep 0.2"])
+                       for i in range(2)]
+            wait_on(job_ids, poll_interval=0.2, executor=FakeSlurmExecutor())
+            obs = self.cmd(bench_results=self.results,
+                           case_jobs={'file_10': [job_ids[0]],
+                                      'file_20': [job_ids[1]],
+                                      'file_30': []},
+                           executor='fake-slurm')
+            obs = obs['accounting_check']
+            self.assertEqual([c.label for c in obs], ['file_10', 'file_20'])
+            self.assertAlmostEqual(obs[0].wall, 102.4)
+            self.assertAlmostEqual(obs[0].cpu, 99.796)
+            self.assertTrue(obs[0].elapsed >= 0)
+            self.assertTrue(obs[0].max_rss > 0)
+
+            # The executor should report the accounting of the jobs
+            with self.assertRaises(CommandError):
+                self.cmd(bench_results=self.results,
+                         case_jobs={'file_10': ['1']}, executor='fake-pbs')
+        finally:
+            environ.stop()
+            rmtree(state_dir)
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase, main
+
+from pyqi.core.exception import CommandError
+
+from scaling.commands.bench_results_querier import BenchResultsQuerier
+from scaling.results_db import ingest_bench_results
+from scaling.util import BenchCase
+
+
+class BenchResultsQuerierTests(TestCase):
+    def setUp(self):
+        """Set up data for use in unit tests"""
+        self.cmd = BenchResultsQuerier()
+        self.output_dir = mkdtemp()
+        self.db_fp = join(self.output_dir, 'results.db')
+        cases = [BenchCase('0.97', [1.0, 1.5], [0.5, 0.5], [0.1, 0.1],
+                           [1024, 1024])]
+        ingest_bench_results(self.db_fp,
+                             [("pick_otus_20140101_120000/timing/similarity",
+                               cases)], host='host1', version='1.8.0')
+        ingest_bench_results(self.db_fp, [("bench/timing", cases)],
+                             host='host2', version='1.9.0')
+
+    def tearDown(self):
+        rmtree(self.output_dir)
+
+    def test_invalid_input(self):
+        """Correctly handles invalid input by raising a CommandError."""
+        with self.assertRaises(CommandError):
+            _ = self.cmd(db_fp=join(self.output_dir, 'foo.db'))
+        not_db = join(self.output_dir, 'foo.txt')
+        with open(not_db, 'w') as f:
+            f.write("This is not a database\n" * 100)
+        with self.assertRaises(CommandError):
+            _ = self.cmd(db_fp=not_db)
+
+    def test_bench_results_querier(self):
+        """Correctly lists the matching runs"""
+        obs = self.cmd(db_fp=self.db_fp)
+        self.assertEqual([run.run_id for run in obs['runs']], [1, 2])
+        obs = self.cmd(db_fp=self.db_fp, version='1.8.0', case='0.97')
+        self.assertEqual([(run.run_id, run.command, run.parameter)
+                          for run in obs['runs']],
+                         [(1, 'pick_otus', 'similarity')])
+        obs = self.cmd(db_fp=self.db_fp, host='host1', command='bench')
+        self.assertEqual(obs, {'runs': []})
+
+
+if __name__ == '__main__':
+    main()
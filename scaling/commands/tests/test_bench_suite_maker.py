@@ -11,6 +11,7 @@ __email__ = "josenavasmolina@gmail.com"
 from unittest import TestCase, main
 from pyqi.core.exception import CommandError
 from scaling.commands.bench_suite_maker import BenchSuiteMaker
+from scaling.util import ResourceRequest
 
 
 class BenchSuiteMakerTests(TestCase):
@@ -107,6 +108,179 @@ class BenchSuiteMakerTests(TestCase):
         obs = obs['bench_suite']
         self.assertEqual(obs, pbs_parameter_suite)
 
+    def test_executor_suite(self):
+        """Bench suite correctly generated with a given executor"""
+        obs = self.cmd(command=self.command,
+                       bench_files=self.bench_files_single,
+                       executor='fake-pbs', job_prefix=self.job_prefix)
+        obs = obs['bench_suite']
+        self.assertTrue('| fake_qsub -k oe -N test0' in obs)
+        self.assertTrue('-w $scaling_jobs --executor fake-pbs' in obs)
+
+        # The pbs executor is the same as the pbs flag
+        obs = self.cmd(command=self.command,
+                       bench_files=self.bench_files_single,
+                       in_opts=self.in_opts_single,
+                       executor='pbs',
+                       job_prefix=self.job_prefix,
+                       queue=self.queue,
+                       pbs_extra_args=self.pbs_extra_args)
+        self.assertEqual(obs['bench_suite'], pbs_file_suite)
+
+        obs = self.cmd(command=self.command3,
+                       parameters=self.param_single,
+                       jobs=4)
+        obs = obs['bench_suite']
+        self.assertTrue('while [ `jobs -rp | wc -l` -ge 4 ]' in obs)
+        self.assertTrue('\nwait\n' in obs)
+
+    def test_array_jobs_suite(self):
+        """Bench suite correctly generated with job arrays"""
+        obs = self.cmd(command=self.command,
+                       bench_files=self.bench_files_single,
+                       pbs=True, array_jobs=True,
+                       job_prefix=self.job_prefix)
+        obs = obs['bench_suite']
+        self.assertTrue(">> $dest/scaling_jobs_manifest.txt" in obs)
+        self.assertTrue("| qsub -t 1-" in obs)
+
+        obs = self.cmd(command=self.command,
+                       bench_files=self.bench_files_single,
+                       executor='fake-pbs', array_jobs=True)
+        self.assertTrue("| fake_qsub -t 1-" in obs['bench_suite'])
+
+        obs = self.cmd(command=self.command,
+                       bench_files=self.bench_files_single,
+                       executor='slurm', array_jobs=True)
+        self.assertTrue("sbatch --parsable --array=1-" in obs['bench_suite'])
+
+        with self.assertRaises(CommandError):
+            self.cmd(command=self.command,
+                     bench_files=self.bench_files_single,
+                     jobs=2, array_jobs=True)
+
+    def test_resources_suite(self):
+        """Bench suite correctly generated with resource requests"""
+        resources = {"1000000": ResourceRequest(3600, 2048, 4),
+                     "3000000": ResourceRequest(7200, None, None)}
+        obs = self.cmd(command=self.command,
+                       bench_files=self.bench_files_single,
+                       executor='slurm', case_resources=resources)
+        obs = obs['bench_suite']
+        self.assertTrue("sbatch --parsable -J bench_0 --time=01:00:00 "
+                        "--mem=2048M --cpus-per-task=4 --wrap=" in obs)
+        self.assertTrue("sbatch --parsable -J bench_1 --wrap=" in obs)
+        # The jobs record their ids, which are cross-checked with sacct
+        self.assertTrue("echo \\$SLURM_JOB_ID > "
+                        "$job_ids_dest/1000000/$i.txt; " in obs)
+        self.assertTrue("-j $job_ids_dest -w $scaling_jobs --executor "
+                        "slurm\n" in obs)
+
+        obs = self.cmd(command=self.command,
+                       bench_files=self.bench_files_single,
+                       pbs=True, array_jobs=True, case_resources=resources)
+        self.assertTrue("-k oe -N bench_0 -l walltime=02:00:00,mem=2048mb,"
+                        "nodes=1:ppn=4)\n" in obs['bench_suite'])
+
+        for kwargs in [{},
+                       {'executor': 'pbs', 'max_queued': 2}]:
+            with self.assertRaises(CommandError):
+                self.cmd(command=self.command,
+                         bench_files=self.bench_files_single,
+                         case_resources=resources, **kwargs)
+
+    def test_sentinels_suite(self):
+        """Bench suite correctly generated with completion sentinels"""
+        obs = self.cmd(command=self.command3,
+                       parameters=self.param_single,
+                       pbs=True, sentinels=True)
+        obs = obs['bench_suite']
+        self.assertTrue("sentinel_wrapper.sh $sentinel_dest/" in obs)
+        self.assertTrue(" -s $sentinel_dest/" in obs)
+        self.assertFalse(" -w $" in obs)
+
+    def test_process_job_suite(self):
+        """Bench suite correctly generated with a processing job"""
+        obs = self.cmd(command=self.command,
+                       bench_files=self.bench_files_single,
+                       executor='fake-pbs', process_job=True)
+        obs = obs['bench_suite']
+        self.assertTrue("| fake_qsub -k oe -N bench_process0 -W "
+                        "depend=afterany:${scaling_jobs//,/:}\n" in obs)
+
+        with self.assertRaises(CommandError):
+            self.cmd(command=self.command,
+                     bench_files=self.bench_files_single,
+                     process_job=True)
+        with self.assertRaises(CommandError):
+            self.cmd(command=self.command,
+                     bench_files=self.bench_files_single,
+                     pbs=True, process_job=True, sentinels=True)
+
+    def test_bundled_suite(self):
+        """Bench suite correctly generated with bundled short cases"""
+        case_times = {"1000000": 10.0, "2000000": 20.0, "3000000": 500.0}
+        obs = self.cmd(command=self.command,
+                       bench_files=self.bench_files_single,
+                       pbs=True, case_times=case_times, bundle_time=60.0)
+        obs = obs['bench_suite']
+        self.assertEqual(obs.count("| qsub"), 2)
+        self.assertTrue("$output_dest/1000000/$i; timing_wrapper.sh "
+                        "$timing_dest/2000000/$i.txt" in obs)
+
+        with self.assertRaises(CommandError):
+            self.cmd(command=self.command,
+                     bench_files=self.bench_files_single,
+                     case_times=case_times, bundle_time=60.0)
+        with self.assertRaises(CommandError):
+            self.cmd(command=self.command,
+                     bench_files=self.bench_files_single,
+                     pbs=True, bundle_time=60.0)
+        with self.assertRaises(CommandError):
+            self.cmd(command=self.command,
+                     bench_files=self.bench_files_single,
+                     pbs=True, case_times=case_times, bundle_time=0.0)
+
+    def test_throttled_suite(self):
+        """Bench suite correctly generated with a throttled submission"""
+        obs = self.cmd(command=self.command,
+                       bench_files=self.bench_files_single,
+                       executor='fake-pbs', max_queued=2)
+        obs = obs['bench_suite']
+        self.assertTrue(">> $dest/scaling_jobs_list.txt" in obs)
+        self.assertTrue("scaling submit-jobs -i $dest/scaling_jobs_list.txt "
+                        "-o $dest/scaling_jobs_submissions -n 2 --executor "
+                        "fake-pbs\n" in obs)
+        self.assertFalse("| fake_qsub" in obs)
+        self.assertFalse(" -w $" in obs)
+
+        for kwargs in [{'pbs': True, 'max_queued': 0},
+                       {'max_queued': 2},
+                       {'pbs': True, 'max_queued': 2, 'array_jobs': True},
+                       {'pbs': True, 'max_queued': 2, 'process_job': True}]:
+            with self.assertRaises(CommandError):
+                self.cmd(command=self.command,
+                         bench_files=self.bench_files_single, **kwargs)
+
+    def test_invalid_executor(self):
+        """Correctly handles invalid executors by raising a CommandError"""
+        with self.assertRaises(CommandError):
+            self.cmd(command=self.command,
+                     bench_files=self.bench_files_single,
+                     executor='sge')
+        with self.assertRaises(CommandError):
+            self.cmd(command=self.command,
+                     bench_files=self.bench_files_single,
+                     executor='slurm', pbs=True)
+        with self.assertRaises(CommandError):
+            self.cmd(command=self.command,
+                     bench_files=self.bench_files_single,
+                     executor='pbs', jobs=2)
+        with self.assertRaises(CommandError):
+            self.cmd(command=self.command,
+                     bench_files=self.bench_files_single,
+                     jobs=0)
+
     def test_invalid_input(self):
         """Correctly handles invalid input by raising a CommandError."""
         # Too many options
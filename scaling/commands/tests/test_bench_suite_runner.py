@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+
+from os import listdir
+from multiprocessing import cpu_count
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase, main
+
+from pyqi.core.exception import CommandError
+
+from scaling.commands.bench_suite_runner import BenchSuiteRunner
+
+
+class BenchSuiteRunnerTests(TestCase):
+    def setUp(self):
+        """Set up data for use in unit tests"""
+        self.cmd = BenchSuiteRunner()
+        self.output_dir = mkdtemp()
+        self.dest = join(self.output_dir, 'suite')
+
+    def tearDown(self):
+        rmtree(self.output_dir)
+
+    def test_invalid_input(self):
+        """Correctly handles invalid input by raising a CommandError."""
+        # Too many options
+        with self.assertRaises(CommandError):
+            _ = self.cmd(bench_files=[["foo", "bar"]], command="true",
+                         parameters={"foo": ["bar"]}, output_dir=self.dest)
+
+        # Multiple bench files with different lengths
+        with self.assertRaises(CommandError):
+            _ = self.cmd(bench_files=[["foo", "foo2"], ["bar"]],
+                         command="true", in_opts=["-i", "-j"],
+                         output_dir=self.dest)
+
+        # No bench files nor parameters
+        with self.assertRaises(CommandError):
+            _ = self.cmd(command="true", output_dir=self.dest)
+
+        # Isolating siblings without pinning
+        with self.assertRaises(CommandError):
+            _ = self.cmd(command="true", parameters={"foo": ["bar"]},
+                         output_dir=self.dest, isolate_siblings=True)
+
+        # Not enough CPUs for the requested jobs
+        with self.assertRaises(CommandError):
+            _ = self.cmd(command="true", parameters={"foo": ["bar"]},
+                         output_dir=self.dest, cpus_per_case=1,
+                         jobs=cpu_count() + 1)
+
+        # Wrong number of repetitions
+        with self.assertRaises(CommandError):
+            _ = self.cmd(command="true", parameters={"foo": ["bar"]},
+                         output_dir=self.dest, num_reps=0)
+
+    def test_bench_suite_runner_parameters(self):
+        """Correctly runs a parameter based bench suite"""
+        obs = self.cmd(command="true", output_dir=self.dest, num_reps=2,
+                       jobs=2, parameters={"a": ["1", "2"], "b": ["3"]})
+        self.assertEqual(obs.keys(), ['timing_dirs'])
+        self.assertEqual(sorted(obs['timing_dirs']),
+                         [join(self.dest, 'timing', 'a'),
+                          join(self.dest, 'timing', 'b')])
+        self.assertEqual(sorted(listdir(join(self.dest, 'timing', 'a'))),
+                         ['1', '2'])
+        self.assertEqual(
+            sorted(listdir(join(self.dest, 'timing', 'a', '1'))),
+            ['1.txt', '2.txt'])
+
+    def test_bench_suite_runner_queue(self):
+        """Correctly creates the work queue of a bench suite"""
+        obs = self.cmd(command="true", output_dir=self.dest, num_reps=2,
+                       bench_files=[["10.fna"], ["20.fna"]], queue=True)
+        self.assertEqual(obs, {'timing_dirs': [join(self.dest, 'timing')]})
+        self.assertEqual(len(listdir(join(self.dest, 'queue', 'pending'))),
+                         4)
+        self.assertEqual(listdir(join(self.dest, 'timing', '10')), [])
+
+        # The queue cannot be created twice
+        with self.assertRaises(CommandError):
+            _ = self.cmd(command="true", output_dir=self.dest,
+                         bench_files=[["10.fna"]], queue=True)
+        # The execution options are given to the workers
+        with self.assertRaises(CommandError):
+            _ = self.cmd(command="true", output_dir=self.dest,
+                         bench_files=[["10.fna"]], queue=True, jobs=2)
+        with self.assertRaises(CommandError):
+            _ = self.cmd(command="true", output_dir=self.dest,
+                         bench_files=[["10.fna"]], queue=True, warmup=1)
+
+    def test_bench_suite_runner_files(self):
+        """Correctly runs a file based bench suite"""
+        obs = self.cmd(command="true", output_dir=self.dest,
+                       bench_files=[["10.fna"], ["20.fna"]])
+        self.assertEqual(obs, {'timing_dirs': [join(self.dest, 'timing')]})
+        self.assertEqual(sorted(listdir(join(self.dest, 'timing'))),
+                         ['10', '20'])
+
+    def test_bench_suite_runner_timing_log(self):
+        """Correctly runs a bench suite writing to the timing log"""
+        obs = self.cmd(command="true", output_dir=self.dest, num_reps=2,
+                       bench_files=[["10.fna"], ["20.fna"]], timing_log=True)
+        self.assertEqual(obs, {'timing_dirs': [join(self.dest, 'timing')]})
+        self.assertEqual(listdir(join(self.dest, 'timing')), ['timing.log'])
+        with open(join(self.dest, 'timing', 'timing.log')) as f:
+            self.assertEqual(len(f.readlines()), 4)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase, main
+
+from pyqi.core.exception import CommandError
+
+from scaling.commands.job_submitter import JobSubmitter
+from scaling.fake_pbs import FakePBSEnviron
+
+
+class JobSubmitterTests(TestCase):
+    def setUp(self):
+        """Set up data for use in unit tests"""
+        self.cmd = JobSubmitter()
+        self.state_dir = mkdtemp()
+        self.output_dir = mkdtemp()
+        self.jobs = [("bench_%d" % i, "echo %d > %s/%d.txt"
+                      % (i, self.output_dir, i)) for i in range(3)]
+        # The fake_qsub and fake_qstat scripts are used by the fake-pbs
+        # executor
+        self.environ = FakePBSEnviron(self.state_dir, scripts=True)
+        self.environ.start()
+
+    def tearDown(self):
+        self.environ.stop()
+        rmtree(self.state_dir)
+        rmtree(self.output_dir)
+
+    def test_submit_jobs(self):
+        """Correctly submits the jobs and records their times"""
+        obs = self.cmd(jobs=self.jobs, max_queued=2, executor='fake-pbs',
+                       poll_interval=0.2)
+        records = obs['job_records']
+        self.assertEqual([r.name for r in records],
+                         ['bench_0', 'bench_1', 'bench_2'])
+        self.assertEqual([r.exit_status for r in records], [0, 0, 0])
+        self.assertEqual(obs['throughput'].jobs, 3)
+        for i in range(3):
+            with open(join(self.output_dir, "%d.txt" % i)) as f:
+                self.assertEqual(f.read(), "%d\n" % i)
+
+    def test_invalid_input(self):
+        """Correctly handles invalid input by raising a CommandError"""
+        with self.assertRaises(CommandError):
+            self.cmd(jobs=self.jobs, max_queued=0)
+        with self.assertRaises(CommandError):
+            self.cmd(jobs=self.jobs, max_queued=2, poll_interval=0.0)
+        with self.assertRaises(CommandError):
+            self.cmd(jobs=self.jobs, max_queued=2, executor='sge')
+        with self.assertRaises(CommandError):
+            self.cmd(jobs=self.jobs, max_queued=2, executor='local')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+
+from os import listdir
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase, main
+
+from pyqi.core.exception import CommandError
+
+from scaling.commands.queue_worker import QueueWorker
+from scaling.util import SuiteCase
+from scaling.work_queue import make_work_queue
+
+
+class QueueWorkerTests(TestCase):
+    def setUp(self):
+        """Set up data for use in unit tests"""
+        self.cmd = QueueWorker()
+        self.output_dir = mkdtemp()
+        self.dest = join(self.output_dir, 'suite')
+        self.cases = [SuiteCase("a/1", ["true"], "-o"),
+                      SuiteCase("a/2", ["true"], "-o")]
+
+    def tearDown(self):
+        rmtree(self.output_dir)
+
+    def test_invalid_input(self):
+        """Correctly handles invalid input by raising a CommandError."""
+        # No work queue
+        with self.assertRaises(CommandError):
+            _ = self.cmd(output_dir=self.output_dir)
+        make_work_queue(self.dest, self.cases)
+        with self.assertRaises(CommandError):
+            _ = self.cmd(output_dir=self.dest, jobs=0)
+        with self.assertRaises(CommandError):
+            _ = self.cmd(output_dir=self.dest, max_tasks=0)
+        with self.assertRaises(CommandError):
+            _ = self.cmd(output_dir=self.dest, max_rss=-1)
+        with self.assertRaises(CommandError):
+            _ = self.cmd(output_dir=self.dest, claim_lease=0)
+
+    def test_queue_worker(self):
+        """Correctly executes the pending tasks of the work queue"""
+        make_work_queue(self.dest, self.cases, 2)
+        obs = self.cmd(output_dir=self.dest, max_tasks=3)
+        self.assertEqual(obs, {'timing_dirs': [join(self.dest, 'timing', 'a')],
+                               'tasks': [("a/1", 1), ("a/2", 1), ("a/1", 2)]})
+        obs = self.cmd(output_dir=self.dest, jobs=2)
+        self.assertEqual(obs['tasks'], [("a/2", 2)])
+        self.assertEqual(sorted(listdir(join(self.dest, 'timing', 'a', '2'))),
+                         ['1.txt', '2.txt'])
+
+
+if __name__ == '__main__':
+    main()
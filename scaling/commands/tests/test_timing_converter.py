@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+
+from os import listdir, mkdir
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase, main
+
+from pyqi.core.exception import CommandError
+
+from scaling.commands.timing_converter import TimingConverter
+
+
+class TimingConverterTests(TestCase):
+    def setUp(self):
+        """Set up data for use in unit tests"""
+        self.cmd = TimingConverter()
+        self.timing_dir = mkdtemp()
+        for case in ['10', '20']:
+            mkdir(join(self.timing_dir, case))
+            for rep in ['1.txt', '2.txt']:
+                with open(join(self.timing_dir, case, rep), 'w') as f:
+                    f.write("1.5;1.0;0.5;1024\n")
+
+    def tearDown(self):
+        rmtree(self.timing_dir)
+
+    def test_invalid_input(self):
+        """Correctly handles invalid input by raising a CommandError."""
+        with self.assertRaises(CommandError):
+            _ = self.cmd(input_dir=join(self.timing_dir, 'foo'))
+        with open(join(self.timing_dir, 'foo.txt'), 'w') as f:
+            f.write("1.5;1.0;0.5;1024\n")
+        with self.assertRaises(CommandError):
+            _ = self.cmd(input_dir=self.timing_dir)
+
+    def test_timing_converter(self):
+        """Correctly converts the timing directory to its timing log"""
+        log_fp = join(self.timing_dir, 'timing.log')
+        obs = self.cmd(input_dir=self.timing_dir)
+        self.assertEqual(obs, {'log_fp': log_fp})
+        self.assertEqual(sorted(listdir(self.timing_dir)),
+                         ['10', '20', 'timing.log'])
+        rmtree(join(self.timing_dir, '10'))
+        obs = self.cmd(input_dir=self.timing_dir, remove=True)
+        self.assertEqual(listdir(self.timing_dir), ['timing.log'])
+        with open(log_fp) as f:
+            self.assertEqual(len(f.readlines()), 6)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+from __future__ import division
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+from os.path import isdir
+
+from pyqi.core.command import (Command, CommandIn, CommandOut,
+                               ParameterCollection)
+from pyqi.core.exception import CommandError
+from scaling.timing_log import convert_timing_directory
+
+
+class TimingConverter(Command):
+    """Subclassing the pyqi.core.command.Command class"""
+    BriefDescription = "Converts a timing directory to a timing log"
+    LongDescription = ("Given a timing directory with a timing file per "
+                       "repetition (<case>/<rep>.txt), as written by the bash "
+                       "bench suites or by run-bench-suite without "
+                       "--timing-log, appends all the timing records to the "
+                       "timing log of the directory (timing.log), which is "
+                       "read by process-bench-results in the same way.")
+    CommandIns = ParameterCollection([
+        CommandIn(Name='input_dir', DataType=str,
+                  Description='Path to the timing directory',
+                  Required=True),
+        CommandIn(Name='remove', DataType=bool,
+                  Description='Remove the case directories once their '
+                  'timing files are stored in the timing log',
+                  DefaultDescription='False: keep the timing files',
+                  Required=False, Default=False)
+    ])
+    CommandOuts = ParameterCollection([
+        CommandOut(Name='log_fp', DataType=str,
+                   Description='Path to the timing log')])
+
+    def run(self, **kwargs):
+        input_dir = kwargs['input_dir']
+
+        if not isdir(input_dir):
+            raise CommandError("%s is not a directory." % input_dir)
+        try:
+            log_fp, _ = convert_timing_directory(input_dir, kwargs['remove'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        return {'log_fp': log_fp}
+
+CommandConstructor = TimingConverter
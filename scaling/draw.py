@@ -135,3 +135,98 @@ def make_comparison_plot(x, data, title, ylabel, output_fp, scale=1):
     ax.set_xticks(x)
     ax.set_xticklabels(x_ticks)
     figure.savefig(output_fp)
+
+
+def make_timeline_plot(timelines, output_fp):
+    """Generates a plot with the memory and CPU usage over time of each case
+
+    Parameters
+    ----------
+    timelines : list of (string, list of Timeline)
+        The timelines of each repetition, keyed by case
+    output_fp : string
+        The path to the output figure
+    """
+    figure = plt.figure()
+    mem_ax = figure.add_subplot(211)
+    cpu_ax = figure.add_subplot(212, sharex=mem_ax)
+    colors = plt.cm.jet(np.linspace(0, 1, max(len(timelines), 1)))
+    for (label, case_timelines), color in izip(timelines, colors):
+        # All the repetitions of a case share the color and the label
+        case_label = label
+        for timeline in case_timelines:
+            t = np.asarray(timeline.time)
+            if len(t) == 0:
+                continue
+            # Memory in GB
+            rss = np.asarray(timeline.rss) / (1024.0 * 1024.0)
+            mem_ax.plot(t, rss, color=color, label=case_label)
+            # CPU utilization, in number of cores, between two samples
+            if len(t) > 1:
+                cpu = np.diff(timeline.cpu) / np.diff(t)
+                cpu_ax.step(t[1:], cpu, color=color)
+            case_label = None
+    figure.suptitle("Resource usage over time")
+    mem_ax.set_ylabel("Memory (GB)")
+    cpu_ax.set_ylabel("CPU (cores)")
+    cpu_ax.set_xlabel("Time (seconds)")
+    fontP = FontProperties()
+    fontP.set_size('small')
+    if timelines:
+        mem_ax.legend(loc='best', prop=fontP,
+                      fancybox=True).get_frame().set_alpha(0.2)
+    figure.savefig(output_fp)
+
+
+def make_io_plot(x, time, io, output_fp, scale=1024*1024):
+    """Generates a plot with the running time and the I/O of each case
+
+    The running time and the I/O are plotted on two subplots sharing the x
+    axis, so I/O-bound cases can be told apart from CPU-bound cases
+
+    Parameters
+    ----------
+    x : list
+        The values for the x axis
+    time : dict
+        Dict of {label: tuple(list means, list stdevs)} with the time series
+    io : dict
+        Dict of {label: tuple(list means, list stdevs)} with the I/O series,
+        in bytes
+    output_fp : string
+        The path to the output figure
+    scale : number, optional
+        Value used to scale the I/O values (default: 1024*1024, MB)
+
+    Raises
+    ------
+    ValueError
+        If scale is <= 0
+    """
+    if scale <= 0:
+        raise ValueError("Scale should be an integer greater than 0")
+    # Check if the x axis is numerical
+    x_ticks = x
+    try:
+        x = np.asarray(x, dtype=np.float64)
+    except ValueError:
+        x = np.arange(len(x))
+    figure = plt.figure()
+    time_ax = figure.add_subplot(211)
+    io_ax = figure.add_subplot(212, sharex=time_ax)
+    fontP = FontProperties()
+    fontP.set_size('small')
+    for ax, data, div in ((time_ax, time, 1), (io_ax, io, scale)):
+        for label in sorted(data):
+            y = np.array(data[label][0], dtype=np.float64) / div
+            y_err = np.array(data[label][1], dtype=np.float64) / div
+            ax.errorbar(x, y, yerr=y_err, label=label)
+        ax.legend(loc='best', prop=fontP,
+                  fancybox=True).get_frame().set_alpha(0.2)
+    figure.suptitle("Running time and I/O")
+    time_ax.set_ylabel("Time (seconds)")
+    io_ax.set_ylabel("I/O (MB)")
+    io_ax.set_xlabel("Input file")
+    io_ax.set_xticks(x)
+    io_ax.set_xticklabels(x_ticks)
+    figure.savefig(output_fp)
@@ -0,0 +1,1099 @@
+#!/usr/bin/env python
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME-Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina", "Daniel McDonald"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+import re
+from datetime import datetime
+from getpass import getuser
+from math import ceil
+from shlex import split
+from subprocess import Popen, PIPE
+from xml.etree import ElementTree
+
+from scaling.util import JobStatus, JobAccounting, ResourceRequest
+
+# The PBS template follows this structure - blah=${blah#?}
+# <job id var>+=";"`echo "cd $PWD; <command>" | <qsub> -k oe -N <job_name>
+#   -q <queue> <extra args>`
+# The queue option is omitted if no queue is given
+PBS_CMD_TEMPLATE = ("    %s+=\",\"`echo \"cd $PWD; %s\" | %s -k oe"
+                    " -N %s%d %s%s`")
+
+# The job array templates follow this structure. Each command is appended to
+# a manifest file instead of being submitted
+# echo "cd $PWD; <command>" >> $dest/<job id var>_manifest.txt
+# and, after the loop, a job array with one job per line of the manifest is
+# submitted. Each job executes the line of the manifest given by its index
+# <job id var>=$(echo "sed -n \${PBS_ARRAYID}p <manifest> | bash" |
+#   <qsub> -t 1-<manifest lines> -k oe -N <job_name> <queue> <extra args>)
+ARRAY_MANIFEST = "$dest/%s_manifest.txt"
+ARRAY_CMD_TEMPLATE = "    echo \"cd $PWD; %s\" >> %s"
+PBS_ARRAY_SUBMIT_TEMPLATE = ("%s=$(echo \"sed -n \\${PBS_ARRAYID}p %s | "
+                             "bash\" | %s -t 1-`wc -l < %s` -k oe -N %s%d"
+                             "%s%s)\n")
+
+# The PBS dependent job template follows this structure. The job is released
+# once all the jobs in the comma-separated <job id var> have finished,
+# successfully or not
+# echo "cd $PWD; <command>" | <qsub> -k oe -N <job_name> <queue>
+#   <extra args> -W depend=<afterany|afteranyarray>:<job ids>
+PBS_DEPENDENT_TEMPLATE = ("echo \"cd $PWD; %s\" | %s -k oe -N %s%s%s%s "
+                          "-W depend=%s:${%s//,/:}\n")
+
+# The throttled templates follow this structure. Each command is appended to
+# a job list file, named after the job, instead of being submitted
+# echo "<job_name> cd $PWD; <command>" >> $dest/<job id var>_list.txt
+# and, after the loop, the jobs of the list are submitted by submit-jobs,
+# which keeps at most <max queued> of them alive and waits until all of them
+# are done
+# scaling submit-jobs -i <job list> -o $dest/<job id var>_submissions
+#   -n <max queued> --executor <name> <queue> <extra args>
+THROTTLED_JOB_LIST = "$dest/%s_list.txt"
+THROTTLED_CMD_TEMPLATE = "    echo \"%s%d cd $PWD; %s\" >> %s"
+THROTTLED_SUBMIT_TEMPLATE = ("scaling submit-jobs -i %s -o "
+                             "$dest/%s_submissions -n %d --executor %s%s%s\n")
+
+# Matches the index of a job of a PBS job array, e.g. [3] in 123[3]
+PBS_ARRAY_INDEX_RE = re.compile(r'\[\d+\]$')
+# Matches the index of a task of a SLURM job array, e.g. _3 in 123_3, or the
+# indices of its pending tasks, e.g. _[4-9] in 123_[4-9]
+SLURM_ARRAY_INDEX_RE = re.compile(r'_(\d+|\[[^\]]*\])$')
+
+# The SLURM template follows this structure
+# <job id var>+=","`<sbatch> --parsable -J <job_name> <partition>
+#   <extra args> --wrap="cd $PWD; <command>"`
+SLURM_CMD_TEMPLATE = ("    %s+=\",\"`%s --parsable -J %s%d %s%s"
+                      "--wrap=\"cd $PWD; %s\"`")
+
+# The SLURM array template follows this structure, after appending each
+# command to the manifest as in the PBS job arrays
+# <job id var>=$(<sbatch> --parsable --array=1-<manifest lines>
+#   -J <job_name> <partition> <extra args>
+#   --wrap="sed -n \${SLURM_ARRAY_TASK_ID}p <manifest> | bash")
+SLURM_ARRAY_SUBMIT_TEMPLATE = ("%s=$(%s --parsable --array=1-`wc -l < %s` -J "
+                               "%s%d %s%s--wrap=\"sed -n "
+                               "\\${SLURM_ARRAY_TASK_ID}p %s | bash\")\n")
+
+# The SLURM dependent job template follows this structure
+# <sbatch> -J <job_name> <partition> <extra args>
+#   --dependency=afterany:<job ids> --wrap="cd $PWD; <command>"
+SLURM_DEPENDENT_TEMPLATE = ("%s -J %s%s %s%s--dependency=afterany:${%s//,/:} "
+                            "--wrap=\"cd $PWD; %s\"\n")
+
+# The local pool template waits until there is a free slot and then executes
+# the command in background
+LOCAL_POOL_TEMPLATE = ("    while [ `jobs -rp | wc -l` -ge %d ]; do sleep 1; "
+                       "done\n%s &")
+
+# Job states, as reported by qstat, in which a PBS job is still alive: queued,
+# held, waiting for its execution time, in transit, running, exiting and
+# suspended. The job is done once it reaches the completed (C) state, or once
+# it is no longer listed by qstat
+PBS_ALIVE_STATES = ['Q', 'H', 'W', 'T', 'R', 'E', 'S']
+
+# Error printed by qstat for each queried job that it no longer knows about,
+# which does not prevent it from listing the rest
+PBS_UNKNOWN_JOB_ERROR = "Unknown Job Id"
+
+# Job states, as reported by squeue, in which a SLURM job is still alive
+SLURM_ALIVE_STATES = ['PD', 'R', 'CF', 'CG', 'S', 'RQ']
+
+# Compact codes, as reported by squeue, of the job states reported by sacct
+SACCT_STATES = {'PENDING': 'PD', 'RUNNING': 'R', 'CONFIGURING': 'CF',
+                'COMPLETING': 'CG', 'SUSPENDED': 'S', 'REQUEUED': 'RQ',
+                'COMPLETED': 'CD', 'FAILED': 'F', 'CANCELLED': 'CA',
+                'TIMEOUT': 'TO', 'OUT_OF_MEMORY': 'OOM', 'NODE_FAIL': 'NF',
+                'PREEMPTED': 'PR', 'BOOT_FAIL': 'BF', 'DEADLINE': 'DL'}
+
+# Format of the times reported by sacct
+SACCT_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+# Multipliers to KB of the memory units reported by sacct
+SLURM_MEMORY_UNITS = {'K': 1, 'M': 1024, 'G': 1024 ** 2, 'T': 1024 ** 3}
+
+
+class Executor(object):
+    """Base class of the backends that execute the commands of a bench suite
+
+    An executor generates the bash code that executes each command of a bash
+    benchmark suite and, if the commands are submitted as jobs, queries the
+    state of those jobs so wait_on can block until they are completed
+
+    Parameters
+    ----------
+    job_prefix: string, optional
+        Prefix for the job names
+    queue: string, optional
+        Queue (or partition) to submit the jobs
+    extra_args: string, optional
+        Any extra arguments needed by the submission command
+    """
+    # Name used to select the executor in the command line
+    name = None
+    # Environment variable with the id of the job, inside the job, if the
+    # queue system reports the accounting of the jobs (see get_accounting)
+    job_id_var = None
+
+    def __init__(self, job_prefix="bench_", queue="", extra_args=""):
+        self.job_prefix = job_prefix
+        self.queue = queue
+        self.extra_args = extra_args
+        # Resources requested for each job array, keyed by job id var
+        self._array_resources = {}
+
+    @property
+    def submits_jobs(self):
+        """Whether the commands are submitted as jobs with an id"""
+        return False
+
+    def get_submit_command(self, cmd, jobs_var, job_num, resources=None):
+        """Returns the bash code that executes cmd inside the suite loop
+
+        Parameters
+        ----------
+        cmd: string
+            The bash command of a benchmark case
+        jobs_var: string
+            The bash variable that accumulates the comma-separated ids of
+            the submitted jobs
+        job_num: int
+            The number of the job, used to name it
+        resources: ResourceRequest, optional
+            The resources requested for the job. The executors that do not
+            submit jobs ignore them
+
+        Returns
+        -------
+        string
+            The bash code
+        """
+        raise NotImplementedError("Must define in the subclass")
+
+    def get_resource_args(self, resources):
+        """Returns the submission arguments that request resources
+
+        Parameters
+        ----------
+        resources: ResourceRequest
+            The resources requested for a job, or None
+
+        Returns
+        -------
+        string
+            The arguments, or an empty string if no resource is requested
+        """
+        return ""
+
+    def _get_extra_args(self, resources):
+        """Returns the resource arguments followed by the extra arguments"""
+        return " ".join(a for a in [self.get_resource_args(resources),
+                                    self.extra_args] if a)
+
+    def _add_array_resources(self, jobs_var, resources):
+        """Adds the resources of a job to those of the job array jobs_var
+
+        Every job of an array gets the same resources, so the array requests
+        the largest request of its jobs
+        """
+        if resources is None:
+            return
+        current = self._array_resources.get(jobs_var)
+        if current is not None:
+            resources = ResourceRequest(*_merge_max(current, resources))
+        self._array_resources[jobs_var] = resources
+
+    def get_init_code(self, jobs_var):
+        """Returns the bash code executed before the suite loop
+
+        Parameters
+        ----------
+        jobs_var: string
+            The bash variable that accumulates the ids of the submitted jobs
+
+        Returns
+        -------
+        string
+            The bash code
+        """
+        if not self.submits_jobs:
+            return ""
+        return "%s=\"\"\n" % jobs_var
+
+    def get_barrier(self):
+        """Returns the bash code that waits for the commands, if needed"""
+        return ""
+
+    def get_dependent_command(self, cmd, jobs_var, job_name):
+        """Returns the bash code that submits cmd as a dependent job
+
+        The job is released by the queue system once all the jobs in
+        jobs_var have finished, successfully or not
+
+        Parameters
+        ----------
+        cmd: string
+            The bash command to submit
+        jobs_var: string
+            The bash variable with the comma-separated ids of the jobs that
+            the new job depends on
+        job_name: string
+            The name of the job, appended to the job prefix
+
+        Returns
+        -------
+        string
+            The bash code
+
+        Raises
+        ------
+        ValueError
+            If the executor does not submit jobs
+        """
+        raise ValueError("The %s executor cannot submit dependent jobs"
+                         % self.name)
+
+    def submit_job(self, script, job_name):
+        """Submits script as a job
+
+        Parameters
+        ----------
+        script: string
+            The bash script of the job
+        job_name: string
+            The name of the job
+
+        Returns
+        -------
+        string
+            The id of the job, as reported by the submission command
+
+        Raises
+        ------
+        ValueError
+            If the executor does not submit jobs
+        RuntimeError
+            If the submission command fails, e.g. if the queue system rejects
+            the job
+        """
+        raise ValueError("The %s executor does not submit jobs" % self.name)
+
+    def get_accounting(self, job_ids):
+        """Returns the accounting of the finished jobs of job_ids
+
+        Parameters
+        ----------
+        job_ids: Iterable
+            The ids of the jobs, as given by job_id_var inside each job
+
+        Returns
+        -------
+        dict of {string: JobAccounting}
+            The accounting of the jobs known by the queue system, keyed by
+            job id
+
+        Raises
+        ------
+        ValueError
+            If the queue system does not report the accounting of the jobs
+        RuntimeError
+            If the accounting could not be queried
+        """
+        raise ValueError("The %s executor does not report the accounting of "
+                         "the jobs" % self.name)
+
+    def get_collect_code(self, jobs_var, job_num):
+        """Returns the bash code executed after the suite loop
+
+        Parameters
+        ----------
+        jobs_var: string
+            The bash variable that accumulates the ids of the submitted jobs
+        job_num: int
+            The number of the group of jobs accumulated in jobs_var
+
+        Returns
+        -------
+        string
+            The bash code, which leaves in jobs_var the ids to wait on
+        """
+        if not self.submits_jobs:
+            return ""
+        # Remove the first "," character of the variable
+        return "%s=${%s#?}\n" % (jobs_var, jobs_var)
+
+    def get_wait_option(self, jobs_var):
+        """Returns the process-bench-results option to wait for the jobs
+
+        Parameters
+        ----------
+        jobs_var: string
+            The bash variable with the comma-separated ids of the jobs
+
+        Returns
+        -------
+        string
+            The option, or an empty string if there is nothing to wait for
+        """
+        if not self.submits_jobs:
+            return ""
+        return "-w $%s --executor %s" % (jobs_var, self.name)
+
+    # Job states in which a job is still alive
+    alive_states = []
+
+    def query_jobs(self, job_ids):
+        """Queries the state of the jobs of job_ids with a single command
+
+        Parameters
+        ----------
+        job_ids: Iterable
+            The job ids, up to the first '.' character
+
+        Returns
+        -------
+        dict of {string: JobStatus}
+            The status of the jobs listed by the queue system, keyed by job
+            id. The jobs of a job array are listed individually
+
+        Raises
+        ------
+        RuntimeError
+            If the queue system could not be queried
+        """
+        return {}
+
+    def check_status(self, job_ids):
+        """Returns the jobs of job_ids that are still alive
+
+        Parameters
+        ----------
+        job_ids: Iterable
+            The job ids, up to the first '.' character
+
+        Returns
+        -------
+        list
+            The subset of job_ids whose jobs are still alive
+        """
+        return get_alive_jobs(job_ids, self.query_jobs(job_ids),
+                              self.alive_states)
+
+
+class LocalExecutor(Executor):
+    """Executes the commands in the machine running the suite
+
+    Parameters
+    ----------
+    jobs: int, optional
+        Maximum number of commands executed concurrently. If greater than 1,
+        the commands are executed in background and the suite waits for all
+        of them before processing the results
+
+    Raises
+    ------
+    ValueError
+        If jobs is lower than 1
+    """
+    name = 'local'
+
+    def __init__(self, jobs=1, **kwargs):
+        super(LocalExecutor, self).__init__(**kwargs)
+        if jobs < 1:
+            raise ValueError("The number of jobs should be at least 1")
+        self.jobs = jobs
+
+    def get_submit_command(self, cmd, jobs_var, job_num, resources=None):
+        if self.jobs == 1:
+            return cmd
+        return LOCAL_POOL_TEMPLATE % (self.jobs, cmd)
+
+    def get_barrier(self):
+        return "wait\n" if self.jobs > 1 else ""
+
+
+class PBSExecutor(Executor):
+    """Submits each command as a PBS/Torque job
+
+    Parameters
+    ----------
+    qsub: string, optional
+        Command used to submit the jobs
+    qstat: string, optional
+        Command used to query the state of the jobs
+    array: bool, optional
+        If True, the commands are written to a manifest file and submitted
+        as a single job array (qsub -t), in which each job executes the line
+        of the manifest given by $PBS_ARRAYID. Otherwise, each command is
+        submitted as an independent job
+    """
+    name = 'pbs'
+    alive_states = PBS_ALIVE_STATES
+
+    def __init__(self, qsub="qsub", qstat="qstat", array=False, **kwargs):
+        super(PBSExecutor, self).__init__(**kwargs)
+        self.qsub = qsub
+        self.qstat = qstat
+        self.array = array
+
+    @property
+    def submits_jobs(self):
+        return True
+
+    def get_submit_command(self, cmd, jobs_var, job_num, resources=None):
+        if self.array:
+            self._add_array_resources(jobs_var, resources)
+            return ARRAY_CMD_TEMPLATE % (cmd, ARRAY_MANIFEST % jobs_var)
+        queue = "-q %s " % self.queue if self.queue else ""
+        extra_args = self._get_extra_args(resources)
+        return PBS_CMD_TEMPLATE % (jobs_var, cmd, self.qsub, self.job_prefix,
+                                   job_num, queue, extra_args)
+
+    def get_resource_args(self, resources):
+        if resources is None:
+            return ""
+        limits = []
+        if resources.time is not None:
+            limits.append("walltime=%s" % format_walltime(resources.time))
+        if resources.mem is not None:
+            limits.append("mem=%dmb" % resources.mem)
+        if resources.cpus is not None:
+            limits.append("nodes=1:ppn=%d" % resources.cpus)
+        return "-l %s" % ",".join(limits) if limits else ""
+
+    def get_init_code(self, jobs_var):
+        if self.array:
+            return "touch %s\n" % (ARRAY_MANIFEST % jobs_var)
+        return super(PBSExecutor, self).get_init_code(jobs_var)
+
+    def get_collect_code(self, jobs_var, job_num):
+        if not self.array:
+            return super(PBSExecutor, self).get_collect_code(jobs_var,
+                                                             job_num)
+        manifest = ARRAY_MANIFEST % jobs_var
+        queue = " -q %s" % self.queue if self.queue else ""
+        extra_args = self._get_extra_args(self._array_resources.get(jobs_var))
+        extra_args = " %s" % extra_args if extra_args else ""
+        return PBS_ARRAY_SUBMIT_TEMPLATE % (jobs_var, manifest, self.qsub,
+                                            manifest, self.job_prefix,
+                                            job_num, queue, extra_args)
+
+    def get_dependent_command(self, cmd, jobs_var, job_name):
+        # Torque uses a different dependency type for the job arrays
+        depend = "afteranyarray" if self.array else "afterany"
+        queue = " -q %s" % self.queue if self.queue else ""
+        extra_args = " %s" % self.extra_args if self.extra_args else ""
+        return PBS_DEPENDENT_TEMPLATE % (cmd, self.qsub, self.job_prefix,
+                                         job_name, queue, extra_args, depend,
+                                         jobs_var)
+
+    def get_wait_option(self, jobs_var):
+        # PBS is the executor used by process-bench-results by default.
+        # The id of a job array includes the "[]" characters, so it is quoted
+        if self.array:
+            return "-w \"$%s\"" % jobs_var
+        return "-w $%s" % jobs_var
+
+    def submit_job(self, script, job_name):
+        cmd = split(self.qsub) + ["-k", "oe", "-N", job_name]
+        if self.queue:
+            cmd.extend(["-q", self.queue])
+        cmd.extend(split(self.extra_args))
+        return _submit(cmd, script)
+
+    def query_jobs(self, job_ids):
+        # A single structured query of the submitted jobs only, listing the
+        # jobs of the job arrays. Torque does not support -u with -x
+        job_ids = sorted(set(job_ids))
+        if not job_ids:
+            return {}
+        proc = Popen(split(self.qstat) + ["-x", "-t"] + job_ids, stdout=PIPE,
+                     stderr=PIPE)
+        stdout, stderr = proc.communicate()
+        # The jobs already purged by the server are reported as unknown
+        errors = [line for line in stderr.splitlines()
+                  if line.strip() and PBS_UNKNOWN_JOB_ERROR not in line]
+        if proc.returncode != 0 and (errors or not stderr.strip()):
+            raise RuntimeError("qstat failed: %s" % stderr.strip())
+        return parse_qstat_xml(stdout, job_ids)
+
+
+class SlurmExecutor(Executor):
+    """Submits each command as a SLURM job
+
+    Parameters
+    ----------
+    sbatch: string, optional
+        Command used to submit the jobs
+    squeue: string, optional
+        Command used to query the state of the jobs
+    sacct: string, optional
+        Command used to query the final state and the accounting of the jobs
+        once squeue no longer lists them. If empty, the jobs that are not
+        listed by squeue are done and their accounting is not available
+    array: bool, optional
+        If True, the commands are written to a manifest file and submitted
+        as a single job array (sbatch --array), in which each task executes
+        the line of the manifest given by $SLURM_ARRAY_TASK_ID. Otherwise,
+        each command is submitted as an independent job
+    """
+    name = 'slurm'
+    alive_states = SLURM_ALIVE_STATES
+    job_id_var = 'SLURM_JOB_ID'
+
+    def __init__(self, sbatch="sbatch", squeue="squeue", sacct="sacct",
+                 array=False, **kwargs):
+        super(SlurmExecutor, self).__init__(**kwargs)
+        self.sbatch = sbatch
+        self.squeue = squeue
+        self.sacct = sacct
+        self.array = array
+        if not sacct:
+            self.job_id_var = None
+
+    @property
+    def submits_jobs(self):
+        return True
+
+    def get_submit_command(self, cmd, jobs_var, job_num, resources=None):
+        if self.array:
+            self._add_array_resources(jobs_var, resources)
+            return ARRAY_CMD_TEMPLATE % (cmd, ARRAY_MANIFEST % jobs_var)
+        partition = "-p %s " % self.queue if self.queue else ""
+        extra_args = self._get_extra_args(resources)
+        extra_args = "%s " % extra_args if extra_args else ""
+        return SLURM_CMD_TEMPLATE % (jobs_var, self.sbatch, self.job_prefix,
+                                     job_num, partition, extra_args, cmd)
+
+    def get_resource_args(self, resources):
+        if resources is None:
+            return ""
+        args = []
+        if resources.time is not None:
+            args.append("--time=%s" % format_walltime(resources.time,
+                                                      days=True))
+        if resources.mem is not None:
+            args.append("--mem=%dM" % resources.mem)
+        if resources.cpus is not None:
+            args.append("--cpus-per-task=%d" % resources.cpus)
+        return " ".join(args)
+
+    def get_init_code(self, jobs_var):
+        if self.array:
+            return "touch %s\n" % (ARRAY_MANIFEST % jobs_var)
+        return super(SlurmExecutor, self).get_init_code(jobs_var)
+
+    def get_collect_code(self, jobs_var, job_num):
+        if not self.array:
+            return super(SlurmExecutor, self).get_collect_code(jobs_var,
+                                                               job_num)
+        manifest = ARRAY_MANIFEST % jobs_var
+        partition = "-p %s " % self.queue if self.queue else ""
+        extra_args = self._get_extra_args(self._array_resources.get(jobs_var))
+        extra_args = "%s " % extra_args if extra_args else ""
+        return SLURM_ARRAY_SUBMIT_TEMPLATE % (jobs_var, self.sbatch, manifest,
+                                              self.job_prefix, job_num,
+                                              partition, extra_args, manifest)
+
+    def get_dependent_command(self, cmd, jobs_var, job_name):
+        # afterany on the id of a job array waits for all its tasks
+        partition = "-p %s " % self.queue if self.queue else ""
+        extra_args = "%s " % self.extra_args if self.extra_args else ""
+        return SLURM_DEPENDENT_TEMPLATE % (self.sbatch, self.job_prefix,
+                                           job_name, partition, extra_args,
+                                           jobs_var, cmd)
+
+    def submit_job(self, script, job_name):
+        cmd = split(self.sbatch) + ["--parsable", "-J", job_name]
+        if self.queue:
+            cmd.extend(["-p", self.queue])
+        cmd.extend(split(self.extra_args))
+        cmd.append("--wrap=%s" % script)
+        # sbatch --parsable reports <job id>[;<cluster>]
+        return _submit(cmd).split(';')[0]
+
+    def query_jobs(self, job_ids):
+        cmd = split(self.squeue) + ["-h", "-o", "%i %t", "-u",
+                                    getuser()]
+        proc = Popen(cmd, stdout=PIPE, stderr=PIPE)
+        stdout, stderr = proc.communicate()
+        if proc.returncode != 0:
+            raise RuntimeError("squeue failed: %s" % stderr.strip())
+        statuses = {}
+        for line in stdout.splitlines():
+            fields = line.split()
+            if len(fields) != 2:
+                continue
+            job_id, state = fields
+            if job_id in job_ids or _get_array_id(job_id) in job_ids:
+                statuses[job_id] = JobStatus(job_id, state, None, None, None)
+
+        # squeue forgets the jobs shortly after they finish, so the final
+        # state, exit status and times of the rest come from sacct
+        listed = set(_get_array_id(job_id) for job_id in statuses)
+        missing = [job_id for job_id in job_ids
+                   if job_id not in statuses and job_id not in listed]
+        if not self.sacct or not missing:
+            return statuses
+        cmd = split(self.sacct) + ["-X", "-n", "-P", "-j", ",".join(missing),
+                                   "-o", "JobID,State,ExitCode,Submit,Start,"
+                                   "End"]
+        try:
+            proc = Popen(cmd, stdout=PIPE, stderr=PIPE)
+        except OSError:
+            return statuses
+        stdout, stderr = proc.communicate()
+        if proc.returncode != 0:
+            # Accounting may be disabled in the cluster. The jobs that squeue
+            # does not list are done anyway
+            return statuses
+        for job_id, status in parse_sacct_states(stdout, missing).items():
+            # squeue is the reference for the jobs that are still alive
+            if status.state not in self.alive_states:
+                statuses[job_id] = status
+        return statuses
+
+    def get_accounting(self, job_ids):
+        if not self.sacct:
+            return super(SlurmExecutor, self).get_accounting(job_ids)
+        job_ids = list(job_ids)
+        if not job_ids:
+            return {}
+        cmd = split(self.sacct) + ["-n", "-P", "-j", ",".join(job_ids), "-o",
+                                   "JobIDRaw,Elapsed,TotalCPU,MaxRSS"]
+        try:
+            proc = Popen(cmd, stdout=PIPE, stderr=PIPE)
+        except OSError as e:
+            raise RuntimeError("%s failed: %s" % (cmd[0], e))
+        stdout, stderr = proc.communicate()
+        if proc.returncode != 0:
+            raise RuntimeError("%s failed: %s" % (cmd[0], stderr.strip()))
+        return parse_sacct_accounting(stdout, job_ids)
+
+
+class FakePBSExecutor(PBSExecutor):
+    """Submits each command to the local stand-in for PBS (see fake_pbs)"""
+    name = 'fake-pbs'
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('qsub', 'fake_qsub')
+        kwargs.setdefault('qstat', 'fake_qstat')
+        super(FakePBSExecutor, self).__init__(**kwargs)
+
+    def get_wait_option(self, jobs_var):
+        option = super(FakePBSExecutor, self).get_wait_option(jobs_var)
+        return "%s --executor %s" % (option, self.name)
+
+
+class FakeSlurmExecutor(SlurmExecutor):
+    """Submits each command to the local stand-in for SLURM (see fake_slurm)
+    """
+    name = 'fake-slurm'
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('sbatch', 'fake_sbatch')
+        kwargs.setdefault('squeue', 'fake_squeue')
+        kwargs.setdefault('sacct', 'fake_sacct')
+        super(FakeSlurmExecutor, self).__init__(**kwargs)
+
+
+class ThrottledExecutor(Executor):
+    """Submits the commands keeping at most max_queued jobs alive at once
+
+    The commands are written to a job list file and, after the suite loop,
+    the submit-jobs command submits them with executor, submitting more jobs
+    as the earlier ones finish (see cluster_util.submit_throttled). The suite
+    blocks until all the jobs are done, so there is nothing left to wait for
+    before processing the results
+
+    Parameters
+    ----------
+    executor: Executor
+        The backend that submits the jobs
+    max_queued: int
+        Maximum number of jobs queued or running at the same time
+
+    Raises
+    ------
+    ValueError
+        If executor does not submit independent jobs or max_queued is lower
+        than 1
+    """
+
+    def __init__(self, executor, max_queued):
+        super(ThrottledExecutor, self).__init__(
+            job_prefix=executor.job_prefix, queue=executor.queue,
+            extra_args=executor.extra_args)
+        if not executor.submits_jobs or getattr(executor, 'array', False):
+            raise ValueError("The %s executor cannot submit throttled jobs"
+                             % executor.name)
+        if max_queued < 1:
+            raise ValueError("The maximum number of queued jobs should be at "
+                             "least 1")
+        self.executor = executor
+        self.max_queued = max_queued
+        self.name = executor.name
+        self.alive_states = executor.alive_states
+        self.job_id_var = executor.job_id_var
+
+    @property
+    def submits_jobs(self):
+        return True
+
+    def get_submit_command(self, cmd, jobs_var, job_num, resources=None):
+        if resources is not None:
+            raise ValueError("The throttled jobs cannot request resources")
+        return THROTTLED_CMD_TEMPLATE % (self.job_prefix, job_num, cmd,
+                                         THROTTLED_JOB_LIST % jobs_var)
+
+    def get_init_code(self, jobs_var):
+        return "touch %s\n" % (THROTTLED_JOB_LIST % jobs_var)
+
+    def get_collect_code(self, jobs_var, job_num):
+        queue = " --queue %s" % self.queue if self.queue else ""
+        extra_args = (" --extra-args \"%s\"" % self.extra_args
+                      if self.extra_args else "")
+        return THROTTLED_SUBMIT_TEMPLATE % (THROTTLED_JOB_LIST % jobs_var,
+                                            jobs_var, self.max_queued,
+                                            self.name, queue, extra_args)
+
+    def get_dependent_command(self, cmd, jobs_var, job_name):
+        raise ValueError("The throttled jobs are done once submit-jobs "
+                         "returns, so no job can depend on them")
+
+    def get_wait_option(self, jobs_var):
+        return ""
+
+    def submit_job(self, script, job_name):
+        return self.executor.submit_job(script, job_name)
+
+    def query_jobs(self, job_ids):
+        return self.executor.query_jobs(job_ids)
+
+    def get_accounting(self, job_ids):
+        return self.executor.get_accounting(job_ids)
+
+
+def _submit(cmd, script=None):
+    """Executes the submission command cmd, feeding it script on stdin
+
+    Returns
+    -------
+    string
+        The stripped output of the command
+
+    Raises
+    ------
+    RuntimeError
+        If the command fails
+    """
+    try:
+        proc = Popen(cmd, stdin=PIPE, stdout=PIPE, stderr=PIPE)
+    except OSError as e:
+        raise RuntimeError("%s failed: %s" % (cmd[0], e))
+    stdout, stderr = proc.communicate(script)
+    if proc.returncode != 0:
+        raise RuntimeError("%s failed: %s" % (cmd[0], stderr.strip()))
+    return stdout.strip()
+
+
+def _get_array_id(job_id):
+    """Returns the id of the job array of job_id
+
+    The id of a PBS job array includes the "[]" characters, e.g. 123[] for
+    123[3], while the id of a SLURM job array does not, e.g. 123 for 123_3
+    """
+    return PBS_ARRAY_INDEX_RE.sub('[]', SLURM_ARRAY_INDEX_RE.sub('', job_id))
+
+
+def _merge_max(first, second):
+    """Returns the field-wise maximum of first and second, skipping Nones"""
+    return [b if a is None else (a if b is None else max(a, b))
+            for a, b in zip(first, second)]
+
+
+def format_walltime(seconds, days=False):
+    """Formats seconds as a walltime limit, rounding up to the next second
+
+    Parameters
+    ----------
+    seconds: float
+        The time limit, in seconds
+    days: bool, optional
+        If True, the limits of one day or more are formatted as
+        D-HH:MM:SS, as expected by SLURM. Otherwise, as HH:MM:SS
+
+    Returns
+    -------
+    string
+        The formatted limit
+    """
+    seconds = int(ceil(seconds))
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    if days and hours >= 24:
+        return "%d-%02d:%02d:%02d" % (hours // 24, hours % 24, minutes,
+                                      seconds)
+    return "%02d:%02d:%02d" % (hours, minutes, seconds)
+
+
+def parse_slurm_duration(duration):
+    """Parses a SLURM duration, formatted as [D-][HH:]MM:SS[.mmm]
+
+    Returns
+    -------
+    float
+        The duration in seconds, or None if duration is empty
+    """
+    duration = duration.strip()
+    if not duration:
+        return None
+    days = 0
+    if '-' in duration:
+        days, duration = duration.split('-', 1)
+        days = int(days)
+    seconds = 0.0
+    for field in duration.split(':'):
+        seconds = seconds * 60 + float(field)
+    return days * 86400 + seconds
+
+
+def parse_slurm_memory(memory):
+    """Parses a SLURM memory size, e.g. 1234K or 1.5G
+
+    Returns
+    -------
+    float
+        The size in KB, or None if memory is empty. Sizes without units are
+        in bytes
+    """
+    memory = memory.strip()
+    if not memory:
+        return None
+    unit = memory[-1].upper()
+    if unit in SLURM_MEMORY_UNITS:
+        return float(memory[:-1]) * SLURM_MEMORY_UNITS[unit]
+    return float(memory) / 1024
+
+
+def _parse_sacct_time(timestamp):
+    """Parses a sacct timestamp, returning None if it is not set"""
+    try:
+        return datetime.strptime(timestamp, SACCT_TIME_FORMAT)
+    except ValueError:
+        # e.g. Unknown or None for the jobs that did not start
+        return None
+
+
+def _get_seconds(start, end):
+    """Returns the seconds between start and end, or None if any is unset"""
+    if None in (start, end):
+        return None
+    delta = end - start
+    return delta.days * 86400 + delta.seconds + delta.microseconds / 1e6
+
+
+def parse_sacct_states(output, job_ids):
+    """Parses the output of sacct -X -n -P -o JobID,State,ExitCode,Submit,...
+
+    Parameters
+    ----------
+    output: string
+        The sacct output, with the JobID, State, ExitCode, Submit, Start and
+        End fields of each job separated by '|'
+    job_ids: Iterable
+        The job ids to report. The tasks of a job array are reported if the
+        array id (e.g. 123) is in job_ids
+
+    Returns
+    -------
+    dict of {string: JobStatus}
+        The status of the jobs, keyed by job id. The states are reported
+        with the compact codes used by squeue, e.g. CD for COMPLETED
+
+    Raises
+    ------
+    RuntimeError
+        If the output is not well formed
+    """
+    statuses = {}
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        fields = line.split('|')
+        if len(fields) != 6:
+            raise RuntimeError("Cannot parse the sacct output: %s" % line)
+        job_id, state, exit_code, submit, start, end = fields
+        if job_id not in job_ids and _get_array_id(job_id) not in job_ids:
+            continue
+        # e.g. CANCELLED by 1234
+        state = state.split()[0] if state.strip() else ""
+        state = SACCT_STATES.get(state, state)
+        # The exit code is reported as <exit code>:<signal>
+        exit_status = None
+        if exit_code:
+            code, _, signal = exit_code.partition(':')
+            exit_status = (128 + int(signal) if signal and int(signal)
+                           else int(code))
+        submit, start, end = [_parse_sacct_time(t)
+                              for t in (submit, start, end)]
+        statuses[job_id] = JobStatus(job_id, state, exit_status,
+                                     _get_seconds(submit, start),
+                                     _get_seconds(start, end))
+    return statuses
+
+
+def parse_sacct_accounting(output, job_ids):
+    """Parses the output of sacct -n -P -o JobIDRaw,Elapsed,TotalCPU,MaxRSS
+
+    Parameters
+    ----------
+    output: string
+        The sacct output, with the JobIDRaw, Elapsed, TotalCPU and MaxRSS
+        fields of each job and job step separated by '|'
+    job_ids: Iterable
+        The job ids to report
+
+    Returns
+    -------
+    dict of {string: JobAccounting}
+        The accounting of the jobs, keyed by job id. The steps of a job
+        (e.g. 123.batch) are aggregated: the longest elapsed and CPU times
+        and the largest maximum resident set size
+
+    Raises
+    ------
+    RuntimeError
+        If the output is not well formed
+    """
+    accounting = {}
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        fields = line.split('|')
+        if len(fields) != 4:
+            raise RuntimeError("Cannot parse the sacct output: %s" % line)
+        job_id = fields[0].split('.')[0]
+        if job_id not in job_ids:
+            continue
+        try:
+            values = [parse_slurm_duration(fields[1]),
+                      parse_slurm_duration(fields[2]),
+                      parse_slurm_memory(fields[3])]
+        except ValueError:
+            raise RuntimeError("Cannot parse the sacct output: %s" % line)
+        if job_id in accounting:
+            values = _merge_max(accounting[job_id], values)
+        accounting[job_id] = JobAccounting(*values)
+    return accounting
+
+
+def parse_qstat_xml(xml, job_ids):
+    """Parses the output of qstat -x
+
+    Parameters
+    ----------
+    xml: string
+        The qstat -x output
+    job_ids: Iterable
+        The job ids to report, up to the first '.' character. The jobs of a
+        job array are reported if the array id (e.g. 123[]) is in job_ids
+
+    Returns
+    -------
+    dict of {string: JobStatus}
+        The status of the jobs, keyed by job id
+
+    Raises
+    ------
+    RuntimeError
+        If the output is not well formed
+    """
+    statuses = {}
+    if not xml.strip():
+        # qstat does not print anything if there are no jobs
+        return statuses
+    try:
+        root = ElementTree.fromstring(xml)
+    except ElementTree.ParseError as e:
+        raise RuntimeError("Cannot parse the qstat output: %s" % e)
+    for job in root.findall('Job'):
+        job_id = job.findtext('Job_Id', '').split('.')[0]
+        if job_id not in job_ids and _get_array_id(job_id) not in job_ids:
+            continue
+        # Times are reported in seconds since the epoch
+        times = [job.findtext(key) for key in ['qtime', 'start_time',
+                                                'comp_time']]
+        qtime, start, end = [float(t) if t else None for t in times]
+        queue_wait = start - qtime if None not in (qtime, start) else None
+        run_time = end - start if None not in (start, end) else None
+        exit_status = job.findtext('exit_status')
+        if exit_status is not None:
+            exit_status = int(exit_status)
+        statuses[job_id] = JobStatus(job_id, job.findtext('job_state'),
+                                     exit_status, queue_wait, run_time)
+    return statuses
+
+
+def get_alive_jobs(job_ids, statuses, alive_states):
+    """Returns the jobs of job_ids that are still alive
+
+    Parameters
+    ----------
+    job_ids: Iterable
+        The job ids, up to the first '.' character
+    statuses: dict of {string: JobStatus}
+        The status of the jobs listed by the queue system
+    alive_states: list of strings
+        The states in which a job is still alive
+
+    Returns
+    -------
+    list
+        The subset of job_ids whose jobs are still alive. A job array is
+        alive while any of its jobs is alive. The jobs that are not listed
+        in statuses are done
+    """
+    alive = set()
+    for job_id, status in statuses.items():
+        if status.state in alive_states:
+            alive.add(job_id)
+            alive.add(_get_array_id(job_id))
+    return [job_id for job_id in job_ids if job_id in alive]
+
+
+EXECUTORS = dict((cls.name, cls) for cls in [LocalExecutor, PBSExecutor,
+                                             SlurmExecutor, FakePBSExecutor,
+                                             FakeSlurmExecutor])
+
+
+def get_executor(name, **kwargs):
+    """Returns the executor called name
+
+    Parameters
+    ----------
+    name: string
+        The name of the executor. One of the keys of EXECUTORS
+    kwargs:
+        The arguments of the executor constructor
+
+    Returns
+    -------
+    Executor
+        The executor
+
+    Raises
+    ------
+    ValueError
+        If there is no executor called name
+    """
+    if name not in EXECUTORS:
+        raise ValueError("Unknown executor: %s. Should be one of %s"
+                         % (name, ", ".join(sorted(EXECUTORS))))
+    return EXECUTORS[name](**kwargs)
@@ -0,0 +1,546 @@
+#!/usr/bin/env python
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME-Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+# Local stand-in for the PBS qsub and qstat commands. The jobs are executed in
+# the local machine, after waiting the number of seconds given by the
+# FAKE_PBS_QUEUE_DELAY environment variable (0 by default), so the code that
+# submits and monitors cluster jobs can be tested without a cluster. The
+# state of the jobs is kept in the directory given by the FAKE_PBS_DIR
+# environment variable. If the FAKE_PBS_MAX_QUEUED environment variable is
+# set, qsub rejects the jobs of a user that already has that many jobs queued
+# or running, as a queue with a per-user limit does. The scripts fake_qsub
+# and fake_qstat call this module. The same jobs back the local stand-in for
+# SLURM (see fake_slurm)
+
+import os
+import re
+import sys
+from fcntl import flock, LOCK_EX, LOCK_UN
+from getopt import getopt
+from getpass import getuser
+from os.path import join, exists, dirname, abspath
+from subprocess import Popen
+from tempfile import gettempdir
+from time import sleep, time
+from xml.sax.saxutils import escape
+
+# Host name appended to the job ids, as PBS does
+FAKE_PBS_HOST = 'fakehost'
+
+# Attributes of a job, in the order they are stored in its state file
+JOB_FIELDS = ['id', 'name', 'user', 'queue', 'state', 'submit', 'start', 'end',
+              'exit_status', 'depend', 'maxrss', 'cpu']
+
+# Seconds between the checks of the dependencies of a held job
+DEPEND_POLL_INTERVAL = 0.1
+
+# Matches the id of a job of a job array, e.g. 12[3]
+ARRAY_JOB_ID_RE = re.compile(r'^(\d+)\[(\d+)\]$')
+
+# Header of the qstat output
+QSTAT_HEADER = ("Job ID                    Name             User            "
+                "Time Use S Queue\n"
+                "------------------------- ---------------- --------------- "
+                "-------- - -----")
+
+
+def get_state_dir():
+    """Returns the directory with the state of the fake PBS jobs"""
+    state_dir = os.environ.get('FAKE_PBS_DIR')
+    if state_dir is None:
+        state_dir = join(gettempdir(),
+                         'fake_pbs_%s' % getuser())
+    if not exists(state_dir):
+        os.makedirs(state_dir)
+    return state_dir
+
+
+def get_queue_delay():
+    """Returns the seconds each job waits in the queue"""
+    return float(os.environ.get('FAKE_PBS_QUEUE_DELAY', 0))
+
+
+def get_max_queued():
+    """Returns the maximum number of alive jobs per user, or None"""
+    max_queued = os.environ.get('FAKE_PBS_MAX_QUEUED')
+    return int(max_queued) if max_queued else None
+
+
+class FakePBSEnviron(object):
+    """Sets up the environment of the fake PBS and SLURM commands
+
+    The environment variables are restored on exit. It can be used as a
+    context manager, or through start and stop (e.g. in the setUp and
+    tearDown of a test)
+
+    Parameters
+    ----------
+    state_dir: string
+        The directory holding the state of the jobs (FAKE_PBS_DIR)
+    queue_delay: float, optional
+        Seconds each job waits in the queue (FAKE_PBS_QUEUE_DELAY)
+    scripts: bool, optional
+        If True, the fake_* scripts and this package are added to the PATH
+        and the PYTHONPATH, so the executors can call the scripts by name
+    """
+    # FAKE_PBS_MAX_QUEUED is restored too, as the tests may set it
+    keys = ['FAKE_PBS_DIR', 'FAKE_PBS_QUEUE_DELAY', 'FAKE_PBS_MAX_QUEUED',
+            'PATH', 'PYTHONPATH']
+
+    def __init__(self, state_dir, queue_delay=None, scripts=False):
+        self.state_dir = state_dir
+        self.queue_delay = queue_delay
+        self.scripts = scripts
+        self._orig_env = None
+
+    def start(self):
+        """Sets the environment variables"""
+        self._orig_env = dict((key, os.environ.get(key)) for key in self.keys)
+        os.environ['FAKE_PBS_DIR'] = self.state_dir
+        if self.queue_delay is not None:
+            os.environ['FAKE_PBS_QUEUE_DELAY'] = str(self.queue_delay)
+        if self.scripts:
+            pkg_dir = dirname(dirname(abspath(__file__)))
+            os.environ['PATH'] = os.pathsep.join(
+                [join(pkg_dir, 'scripts'), os.environ.get('PATH', '')])
+            os.environ['PYTHONPATH'] = os.pathsep.join(
+                [pkg_dir] + [p for p in [self._orig_env['PYTHONPATH']] if p])
+
+    def stop(self):
+        """Restores the original environment variables"""
+        for key, value in self._orig_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def _next_job_id(state_dir):
+    """Returns a new job id, unique in state_dir"""
+    with open(join(state_dir, 'counter'), 'a+') as f:
+        flock(f, LOCK_EX)
+        try:
+            f.seek(0)
+            content = f.read().strip()
+            job_id = int(content) + 1 if content else 1
+            f.seek(0)
+            f.truncate()
+            f.write("%d\n" % job_id)
+        finally:
+            flock(f, LOCK_UN)
+    return str(job_id)
+
+
+def write_job(state_dir, job):
+    """Writes the state of a job to state_dir/<job_id>.job
+
+    Parameters
+    ----------
+    state_dir: string
+        The directory with the state of the fake PBS jobs
+    job: dict
+        The job attributes. Keys: id, name, user, queue, state, submit,
+        start, end, exit_status, depend, maxrss (in KB) and cpu (user and
+        system time, in seconds)
+    """
+    fp = join(state_dir, "%s.job" % job['id'])
+    # Write and rename, so the readers never see a partial file
+    with open(fp + '.tmp', 'w') as f:
+        f.write("\t".join(str(job.get(key, '')) for key in JOB_FIELDS))
+        f.write("\n")
+    os.rename(fp + '.tmp', fp)
+
+
+def read_jobs(state_dir):
+    """Reads the state of all the jobs in state_dir
+
+    Parameters
+    ----------
+    state_dir: string
+        The directory with the state of the fake PBS jobs
+
+    Returns
+    -------
+    list of dict
+        The jobs, sorted by id
+    """
+    jobs = []
+    for fn in os.listdir(state_dir):
+        if not fn.endswith('.job'):
+            continue
+        with open(join(state_dir, fn)) as f:
+            values = f.read().rstrip('\n').split('\t')
+        jobs.append(dict(zip(JOB_FIELDS, values)))
+    return sorted(jobs, key=_job_sort_key)
+
+
+def _job_sort_key(job):
+    """Sorts the jobs by id and, in a job array, by index"""
+    match = ARRAY_JOB_ID_RE.match(job['id'])
+    if match:
+        return (int(match.group(1)), int(match.group(2)))
+    return (int(job['id']), 0)
+
+
+def parse_array_request(request):
+    """Parses the indices requested with qsub -t
+
+    Parameters
+    ----------
+    request: string
+        The array request, as a comma-separated list of indices and ranges,
+        e.g. "1-5,8". A slot limit (e.g. "1-5%2") is accepted and ignored
+
+    Returns
+    -------
+    list of int
+        The sorted indices of the array jobs
+
+    Raises
+    ------
+    ValueError
+        If the request is not well formed
+    """
+    indices = set()
+    for item in request.split('%')[0].split(','):
+        bounds = item.split('-')
+        if len(bounds) > 2:
+            raise ValueError("Invalid array request: %s" % request)
+        start, end = int(bounds[0]), int(bounds[-1])
+        if start > end:
+            raise ValueError("Invalid array request: %s" % request)
+        indices.update(range(start, end + 1))
+    return sorted(indices)
+
+
+def parse_depend(attributes):
+    """Returns the ids of the jobs in the dependency of a -W argument
+
+    Parameters
+    ----------
+    attributes: string
+        The value of the -W argument, e.g. depend=afterany:1.host:2.host
+
+    Returns
+    -------
+    string
+        The comma-separated ids, up to the first '.' character, of the jobs
+        that must finish before the job is released
+
+    Raises
+    ------
+    ValueError
+        If the dependency type is not supported
+    """
+    if not attributes.startswith('depend='):
+        return ''
+    dep_type, _, job_ids = attributes[len('depend='):].partition(':')
+    if dep_type not in ['afterany', 'afteranyarray']:
+        raise ValueError("Unsupported dependency type: %s" % dep_type)
+    return ",".join(job_id.split('.')[0] for job_id in job_ids.split(':')
+                    if job_id)
+
+
+def _dependencies_done(state_dir, depend):
+    """Returns whether all the jobs in depend have completed
+
+    The jobs that do not exist are considered completed. A job array is
+    completed once all its jobs are
+    """
+    if not depend:
+        return True
+    jobs = read_jobs(state_dir)
+    for dep_id in depend.split(','):
+        if dep_id.endswith('[]'):
+            prefix = dep_id[:-1]
+            dep_jobs = [j for j in jobs if j['id'].startswith(prefix)]
+        else:
+            dep_jobs = [j for j in jobs if j['id'] == dep_id]
+        if any(j['state'] != 'C' for j in dep_jobs):
+            return False
+    return True
+
+
+def _start_job(job_id):
+    """Executes the job job_id in a detached process"""
+    env = dict(os.environ)
+    pkg_dir = dirname(dirname(abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join(
+        [pkg_dir] + [p for p in [env.get('PYTHONPATH')] if p])
+    with open(os.devnull, 'r+') as devnull:
+        Popen([sys.executable, '-m', 'scaling.fake_pbs', 'run', job_id],
+              stdin=devnull, stdout=devnull, stderr=devnull, env=env,
+              preexec_fn=os.setsid, close_fds=True)
+
+
+def qsub(args, script):
+    """Submits script as a fake PBS job
+
+    Parameters
+    ----------
+    args: list of strings
+        The qsub command line arguments. Only -N (job name), -q (queue),
+        -t (job array indices) and -W depend=<type>:<job ids> are used, the
+        rest are accepted and ignored. The afterany and afteranyarray
+        dependency types are supported
+    script: string
+        The bash script of the job. The jobs of a job array get their index
+        in the PBS_ARRAYID environment variable
+
+    Returns
+    -------
+    string
+        The job id, as printed by qsub. For job arrays, the id of the array
+        (e.g. 12[].fakehost)
+
+    Raises
+    ------
+    RuntimeError
+        If the jobs would exceed the per-user limit of alive jobs
+    """
+    opts, _ = getopt(args, 'N:q:k:l:m:M:o:e:W:t:j:V')
+    opts = dict(opts)
+    state_dir = get_state_dir()
+    max_queued = get_max_queued()
+    if max_queued is not None:
+        num_jobs = len(parse_array_request(opts['-t'])) if '-t' in opts else 1
+        alive = [job for job in read_jobs(state_dir)
+                 if job['user'] == getuser() and job['state'] != 'C']
+        if len(alive) + num_jobs > max_queued:
+            raise RuntimeError("qsub: would exceed the limit of %d queued "
+                               "jobs per user" % max_queued)
+    job_id = _next_job_id(state_dir)
+    with open(join(state_dir, "%s.sh" % job_id), 'w') as f:
+        f.write(script)
+    name = opts.get('-N') or 'STDIN'
+    job = {'id': job_id, 'name': name,
+           'user': getuser(),
+           'queue': opts.get('-q') or 'batch', 'state': 'Q',
+           'submit': "%.6f" % time(),
+           'depend': parse_depend(opts.get('-W', ''))}
+    if '-t' not in opts:
+        write_job(state_dir, job)
+        _start_job(job_id)
+        return "%s.%s" % (job_id, FAKE_PBS_HOST)
+    # Create a job for each index of the array
+    indices = parse_array_request(opts['-t'])
+    for index in indices:
+        job['id'] = "%s[%d]" % (job_id, index)
+        job['name'] = "%s-%d" % (name, index)
+        write_job(state_dir, job)
+    for index in indices:
+        _start_job("%s[%d]" % (job_id, index))
+    return "%s[].%s" % (job_id, FAKE_PBS_HOST)
+
+
+def run_job(job_id):
+    """Executes a fake PBS job after its queue delay and its dependencies
+
+    The output and error of the job are written to
+    state_dir/<name>.o<job_id> and state_dir/<name>.e<job_id>. For the jobs
+    of a job array, the name already includes the index and <job_id> is
+    <array id>-<index>, as PBS does. The job gets its id in the environment
+    variables set by both PBS and SLURM, and its maximum resident set size
+    and CPU time are recorded once it finishes
+
+    Parameters
+    ----------
+    job_id: string
+        The job id
+    """
+    state_dir = get_state_dir()
+    job = dict((j['id'], j) for j in read_jobs(state_dir))[job_id]
+    env = dict(os.environ)
+    env['PBS_JOBID'] = "%s.%s" % (job_id, FAKE_PBS_HOST)
+    env['SLURM_JOB_ID'] = job_id
+    match = ARRAY_JOB_ID_RE.match(job_id)
+    if match:
+        script_id, index = match.groups()
+        env['PBS_ARRAYID'] = env['SLURM_ARRAY_TASK_ID'] = index
+        env['SLURM_ARRAY_JOB_ID'] = script_id
+        env['SLURM_JOB_ID'] = "%s_%s" % (script_id, index)
+        out_id = "%s-%s" % (script_id, index)
+    else:
+        script_id = out_id = job_id
+    sleep(get_queue_delay())
+    # The job is held until the jobs it depends on have finished
+    if not _dependencies_done(state_dir, job.get('depend')):
+        job['state'] = 'H'
+        write_job(state_dir, job)
+        while not _dependencies_done(state_dir, job['depend']):
+            sleep(DEPEND_POLL_INTERVAL)
+    job['state'] = 'R'
+    job['start'] = "%.6f" % time()
+    write_job(state_dir, job)
+    out_fp = join(state_dir, "%s.o%s" % (job['name'], out_id))
+    err_fp = join(state_dir, "%s.e%s" % (job['name'], out_id))
+    with open(out_fp, 'w') as out, open(err_fp, 'w') as err:
+        proc = Popen(['bash', join(state_dir, "%s.sh" % script_id)],
+                     stdout=out, stderr=err, env=env)
+        _, status, rusage = os.wait4(proc.pid, 0)
+    if os.WIFSIGNALED(status):
+        proc.returncode = -os.WTERMSIG(status)
+    else:
+        proc.returncode = os.WEXITSTATUS(status)
+    job['state'] = 'C'
+    job['end'] = "%.6f" % time()
+    job['exit_status'] = proc.returncode
+    job['maxrss'] = rusage.ru_maxrss
+    job['cpu'] = "%.3f" % (rusage.ru_utime + rusage.ru_stime)
+    write_job(state_dir, job)
+
+
+def _summarize_arrays(jobs):
+    """Collapses the jobs of each job array into a single job
+
+    The state of the array is C if all its jobs are completed, Q if all its
+    jobs are queued and R otherwise, as qstat reports it
+    """
+    summary = []
+    arrays = {}
+    for job in jobs:
+        match = ARRAY_JOB_ID_RE.match(job['id'])
+        if not match:
+            summary.append(job)
+            continue
+        array_id = "%s[]" % match.group(1)
+        if array_id not in arrays:
+            array = dict(job)
+            array['id'] = array_id
+            array['name'] = job['name'].rsplit('-', 1)[0]
+            array['states'] = set()
+            arrays[array_id] = array
+            summary.append(array)
+        arrays[array_id]['states'].add(job['state'])
+    for array in arrays.values():
+        states = array.pop('states')
+        if len(states) == 1:
+            array['state'] = states.pop()
+        else:
+            array['state'] = 'R'
+    return summary
+
+
+def qstat_xml(jobs):
+    """Returns the jobs in the qstat -x XML format
+
+    Parameters
+    ----------
+    jobs: list of dict
+        The jobs to list
+
+    Returns
+    -------
+    string
+        The XML document. The times are in seconds since the epoch, and the
+        start time, completion time and exit status are only included once
+        they are known
+    """
+    fields = [('Job_Id', None), ('Job_Name', 'name'), ('Job_Owner', None),
+              ('job_state', 'state'), ('queue', 'queue'), ('qtime', 'submit'),
+              ('start_time', 'start'), ('comp_time', 'end'),
+              ('exit_status', 'exit_status')]
+    xml = ["<Data>"]
+    for job in jobs:
+        values = dict(job)
+        values['Job_Id'] = "%s.%s" % (job['id'], FAKE_PBS_HOST)
+        values['Job_Owner'] = "%s@%s" % (job['user'], FAKE_PBS_HOST)
+        xml.append("<Job>")
+        for tag, key in fields:
+            value = values.get(key or tag)
+            if value:
+                xml.append("<%s>%s</%s>" % (tag, escape(str(value)), tag))
+        xml.append("</Job>")
+    xml.append("</Data>")
+    return "".join(xml) + "\n"
+
+
+def qstat(args):
+    """Returns the fake PBS jobs in the default qstat format
+
+    Parameters
+    ----------
+    args: list of strings
+        The qstat command line arguments. With -t, the jobs of the job arrays
+        are listed; otherwise, a single line summarizes each array. With -x,
+        the jobs are listed in XML (see qstat_xml). If job ids are given,
+        only those jobs (or the jobs of those job arrays) are listed. The
+        rest of the arguments are ignored
+
+    Returns
+    -------
+    string
+        The qstat output
+    """
+    jobs = read_jobs(get_state_dir())
+    job_ids = set(arg.split('.')[0] for arg in args if not arg.startswith('-'))
+    if job_ids:
+        selected = []
+        for job in jobs:
+            match = ARRAY_JOB_ID_RE.match(job['id'])
+            if (job['id'] in job_ids or
+                    (match and "%s[]" % match.group(1) in job_ids)):
+                selected.append(job)
+        jobs = selected
+    if not jobs:
+        return ""
+    if '-t' not in args:
+        jobs = _summarize_arrays(jobs)
+    if '-x' in args:
+        return qstat_xml(jobs)
+    lines = [QSTAT_HEADER]
+    for job in jobs:
+        job_id = "%s.%s" % (job['id'], FAKE_PBS_HOST)
+        lines.append("%-25s %-16s %-15s %8s %s %s"
+                     % (job_id, job['name'][:16], job['user'][:15],
+                        "00:00:00", job['state'], job['queue']))
+    return "\n".join(lines) + "\n"
+
+
+def main(argv):
+    """Executes the fake PBS command given in argv
+
+    Parameters
+    ----------
+    argv: list of strings
+        The command (qsub, qstat or run) and its arguments
+
+    Returns
+    -------
+    int
+        The exit status
+    """
+    if not argv or argv[0] not in ['qsub', 'qstat', 'run']:
+        sys.stderr.write("USAGE: fake_pbs.py {qsub,qstat,run} [args]\n")
+        return 2
+    cmd, args = argv[0], argv[1:]
+    if cmd == 'qsub':
+        try:
+            sys.stdout.write(qsub(args, sys.stdin.read()) + "\n")
+        except RuntimeError as e:
+            sys.stderr.write("%s\n" % e)
+            return 1
+    elif cmd == 'qstat':
+        sys.stdout.write(qstat(args))
+    else:
+        run_job(args[0])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,322 @@
+#!/usr/bin/env python
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME-Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+# Local stand-in for the SLURM sbatch, squeue and sacct commands. The jobs
+# are submitted to the local stand-in for PBS (see fake_pbs), so they honour
+# the same FAKE_PBS_DIR, FAKE_PBS_QUEUE_DELAY and FAKE_PBS_MAX_QUEUED
+# environment variables, and are reported with the SLURM job ids, states and
+# formats. The tasks of a job array are reported as <array id>_<index>. The
+# scripts fake_sbatch, fake_squeue and fake_sacct call this module
+
+import re
+import sys
+from datetime import datetime
+from getopt import getopt, GetoptError
+
+from scaling.fake_pbs import qsub, read_jobs, get_state_dir, ARRAY_JOB_ID_RE
+
+# sbatch options accepted by the stand-in. Only the job name, partition,
+# array, dependency and wrap options are used, the rest are ignored
+SBATCH_SHORT_OPTS = 'J:p:t:n:N:c:o:e:A:q:'
+SBATCH_LONG_OPTS = ['parsable', 'job-name=', 'partition=', 'array=',
+                    'dependency=', 'wrap=', 'time=', 'mem=',
+                    'cpus-per-task=', 'ntasks=', 'nodes=', 'output=',
+                    'error=', 'account=', 'qos=']
+
+# squeue codes of the fake PBS job states
+SQUEUE_STATES = {'Q': 'PD', 'H': 'PD', 'R': 'R'}
+
+# Matches the squeue format specifications, e.g. %i or %.18i
+SQUEUE_FORMAT_RE = re.compile(r'%\.?\d*([a-zA-Z])')
+
+# Format of the times reported by sacct
+SACCT_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+# Fields listed by sacct if -o is not given
+SACCT_DEFAULT_FIELDS = ['JobID', 'JobName', 'Partition', 'State', 'ExitCode']
+
+
+def to_slurm_id(job_id):
+    """Returns the SLURM id of a fake PBS job, e.g. 12_3 for 12[3]"""
+    match = ARRAY_JOB_ID_RE.match(job_id)
+    if match:
+        return "%s_%s" % match.groups()
+    return job_id
+
+
+def parse_dependency(dependency, jobs):
+    """Translates a SLURM dependency into a fake PBS -W argument
+
+    Parameters
+    ----------
+    dependency: string
+        The value of the --dependency option, e.g. afterany:12:13
+    jobs: list of dict
+        The fake PBS jobs
+
+    Returns
+    -------
+    string
+        The -W argument, e.g. depend=afterany:12:13[]. The ids of the job
+        arrays are given as <array id>[], so the job waits for all the tasks
+
+    Raises
+    ------
+    ValueError
+        If the dependency type is not supported
+    """
+    dep_type, _, job_ids = dependency.partition(':')
+    if dep_type != 'afterany':
+        raise ValueError("Unsupported dependency type: %s" % dep_type)
+    arrays = set(ARRAY_JOB_ID_RE.match(job['id']).group(1) for job in jobs
+                 if ARRAY_JOB_ID_RE.match(job['id']))
+    job_ids = ["%s[]" % job_id if job_id in arrays else job_id
+               for job_id in job_ids.split(':') if job_id]
+    return "depend=afterany:%s" % ":".join(job_ids)
+
+
+def sbatch(args, script=None):
+    """Submits a fake SLURM job
+
+    Parameters
+    ----------
+    args: list of strings
+        The sbatch command line arguments. The -J/--job-name,
+        -p/--partition, --array, --dependency=afterany:<job ids>, --wrap and
+        --parsable options are used, the rest of the options listed in
+        SBATCH_LONG_OPTS and SBATCH_SHORT_OPTS are accepted and ignored. The
+        first argument after the options is the path to the job script; the
+        rest are the arguments of the script and are ignored
+    script: string or file, optional
+        The job script, or the file to read it from (e.g. stdin), used if
+        neither --wrap nor a job script path are given. The file is only
+        read once the options are checked
+
+    Returns
+    -------
+    string
+        The sbatch output. With --parsable, the job id (the id of the job
+        array for the job arrays)
+
+    Raises
+    ------
+    ValueError
+        If the arguments are not valid or there is no job script, or it
+        cannot be read
+    RuntimeError
+        If the jobs would exceed the per-user limit of alive jobs
+    """
+    try:
+        opts, script_args = getopt(args, SBATCH_SHORT_OPTS, SBATCH_LONG_OPTS)
+    except GetoptError as e:
+        raise ValueError(str(e))
+    opts = dict(opts)
+    if '--wrap' in opts:
+        script = "%s\n" % opts['--wrap']
+    elif script_args:
+        try:
+            with open(script_args[0], 'U') as f:
+                script = f.read()
+        except IOError as e:
+            raise ValueError("Cannot read the job script: %s" % e)
+    elif script is not None and not isinstance(script, str):
+        script = script.read()
+    if not script:
+        raise ValueError("No job script given")
+    qsub_args = ['-N', opts.get('-J') or opts.get('--job-name') or 'wrap']
+    partition = opts.get('-p') or opts.get('--partition')
+    if partition:
+        qsub_args.extend(['-q', partition])
+    if '--array' in opts:
+        qsub_args.extend(['-t', opts['--array']])
+    if '--dependency' in opts:
+        qsub_args.extend(['-W', parse_dependency(opts['--dependency'],
+                                                 read_jobs(get_state_dir()))])
+    # The PBS ids look like 12.fakehost or 12[].fakehost
+    job_id = qsub(qsub_args, script).split('.')[0].replace('[]', '')
+    if '--parsable' in opts:
+        return job_id
+    return "Submitted batch job %s" % job_id
+
+
+def squeue(args):
+    """Returns the alive fake SLURM jobs
+
+    Parameters
+    ----------
+    args: list of strings
+        The squeue command line arguments. -h omits the header, -u lists
+        the jobs of the given user and -o gives the output format, in which
+        the %i (job id), %j (name), %u (user), %P (partition) and %t (state)
+        specifications are supported. The rest are ignored
+
+    Returns
+    -------
+    string
+        The squeue output
+    """
+    opts, _ = getopt(args, 'ho:u:', ['noheader', 'format=', 'user='])
+    opts = dict(opts)
+    fmt = opts.get('-o') or opts.get('--format') or "%i %P %j %u %t"
+    user = opts.get('-u') or opts.get('--user')
+    lines = []
+    if '-h' not in opts and '--noheader' not in opts:
+        header = {'i': 'JOBID', 'j': 'NAME', 'u': 'USER', 'P': 'PARTITION',
+                  't': 'ST'}
+        lines.append(SQUEUE_FORMAT_RE.sub(
+            lambda m: header.get(m.group(1), m.group(1).upper()), fmt))
+    for job in read_jobs(get_state_dir()):
+        if job['state'] == 'C' or (user and job['user'] != user):
+            continue
+        values = {'i': to_slurm_id(job['id']), 'j': job['name'],
+                  'u': job['user'], 'P': job['queue'],
+                  't': SQUEUE_STATES.get(job['state'], job['state'])}
+        lines.append(SQUEUE_FORMAT_RE.sub(
+            lambda m: values.get(m.group(1), ''), fmt))
+    return "".join("%s\n" % line for line in lines)
+
+
+def _format_time(timestamp):
+    """Formats a fake PBS time as sacct does, or Unknown if it is not set"""
+    if not timestamp:
+        return "Unknown"
+    return datetime.fromtimestamp(float(timestamp)).strftime(
+        SACCT_TIME_FORMAT)
+
+
+def _format_duration(seconds, millis=False):
+    """Formats seconds as [D-]HH:MM:SS, with milliseconds if millis"""
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    duration = ("%02d:%02d:%06.3f" % (hours, minutes, seconds) if millis
+                else "%02d:%02d:%02d" % (hours, minutes, int(seconds)))
+    return "%d-%s" % (days, duration) if days else duration
+
+
+def _sacct_values(job, step=None):
+    """Returns the sacct fields of a fake PBS job, or of one of its steps"""
+    job_id = to_slurm_id(job['id'])
+    if job['state'] == 'C':
+        exit_status = int(job['exit_status'])
+        state = 'COMPLETED' if exit_status == 0 else 'FAILED'
+        # The exit code is reported as <exit code>:<signal>
+        exit_code = ("0:%d" % -exit_status if exit_status < 0
+                     else "%d:0" % exit_status)
+    else:
+        state = 'RUNNING' if job['state'] == 'R' else 'PENDING'
+        exit_code = "0:0"
+    start = float(job['start']) if job['start'] else None
+    end = float(job['end']) if job['end'] else None
+    elapsed = end - start if None not in (start, end) else 0
+    cpu = float(job['cpu']) if job.get('cpu') else 0
+    maxrss = job.get('maxrss')
+    if step is not None:
+        job_id = "%s.%s" % (job_id, step)
+    return {'JobID': job_id, 'JobIDRaw': job_id,
+            'JobName': step or job['name'], 'Partition': job['queue'],
+            'User': job['user'] if step is None else '', 'State': state,
+            'ExitCode': exit_code, 'Submit': _format_time(job['submit']),
+            'Start': _format_time(job['start']),
+            'End': _format_time(job['end']),
+            'Elapsed': _format_duration(elapsed),
+            'TotalCPU': _format_duration(cpu, millis=True),
+            # The memory is only reported by the job steps
+            'MaxRSS': "%sK" % maxrss if step is not None and maxrss else ''}
+
+
+def sacct(args):
+    """Returns the accounting of the fake SLURM jobs
+
+    Parameters
+    ----------
+    args: list of strings
+        The sacct command line arguments. -j lists the given comma-separated
+        jobs (the tasks of a job array are listed with the id of the array),
+        -o gives the comma-separated fields, -n omits the header, -P
+        separates the fields with '|' and -X omits the job steps. The
+        completed jobs have a batch step with their maximum resident set
+        size. The rest of the arguments are ignored
+
+    Returns
+    -------
+    string
+        The sacct output
+
+    Raises
+    ------
+    ValueError
+        If a field is not supported
+    """
+    opts, _ = getopt(args, 'Xnpj:o:PS:E:u:',
+                     ['allocations', 'noheader', 'parsable2', 'jobs=',
+                      'format=', 'starttime=', 'endtime=', 'user='])
+    opts = dict(opts)
+    fields = opts.get('-o') or opts.get('--format')
+    fields = fields.split(',') if fields else SACCT_DEFAULT_FIELDS
+    job_ids = opts.get('-j') or opts.get('--jobs')
+    job_ids = set(job_ids.split(',')) if job_ids else None
+    steps = '-X' not in opts and '--allocations' not in opts
+    rows = []
+    if '-n' not in opts and '--noheader' not in opts:
+        rows.append(fields)
+    for job in read_jobs(get_state_dir()):
+        match = ARRAY_JOB_ID_RE.match(job['id'])
+        ids = [to_slurm_id(job['id'])] + ([match.group(1)] if match else [])
+        if job_ids is not None and not job_ids.intersection(ids):
+            continue
+        values = [_sacct_values(job)]
+        if steps and job['state'] == 'C':
+            values.append(_sacct_values(job, 'batch'))
+        for value in values:
+            try:
+                rows.append([value[field] for field in fields])
+            except KeyError as e:
+                raise ValueError("Unsupported sacct field: %s" % e)
+    if '-P' in opts or '--parsable2' in opts:
+        return "".join("%s\n" % "|".join(row) for row in rows)
+    return "".join("%s\n" % " ".join("%-12s" % v for v in row).rstrip()
+                   for row in rows)
+
+
+def main(argv):
+    """Executes the fake SLURM command given in argv
+
+    Parameters
+    ----------
+    argv: list of strings
+        The command (sbatch, squeue or sacct) and its arguments
+
+    Returns
+    -------
+    int
+        The exit status
+    """
+    if not argv or argv[0] not in ['sbatch', 'squeue', 'sacct']:
+        sys.stderr.write("USAGE: fake_slurm.py {sbatch,squeue,sacct} "
+                         "[args]\n")
+        return 2
+    cmd, args = argv[0], argv[1:]
+    try:
+        if cmd == 'sbatch':
+            sys.stdout.write(sbatch(args, sys.stdin) + "\n")
+        elif cmd == 'squeue':
+            sys.stdout.write(squeue(args))
+        else:
+            sys.stdout.write(sacct(args))
+    except (ValueError, RuntimeError, GetoptError) as e:
+        sys.stderr.write("%s: %s\n" % (cmd, e))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
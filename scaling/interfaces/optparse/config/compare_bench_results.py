@@ -50,7 +50,11 @@ inputs = [
                    Required=True,
                    Help="Comma-separated list with the paths to the "
                         "directories of the time results of different runs of "
-                        "the same bench suite",
+                        "the same bench suite. The binary summary "
+                        "(summarized_results.npz) is used if it is next to "
+                        "the summarized_results.txt file. Archives holding "
+                        "a single results summary are read without "
+                        "extracting them",
                    ),
     OptparseOption(Parameter=cmd_in_lookup('labels'),
                    Type='str',
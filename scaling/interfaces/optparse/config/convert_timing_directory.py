@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+from __future__ import division
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+from pyqi.core.interfaces.optparse import (OptparseUsageExample,
+                                           OptparseOption, OptparseResult)
+from pyqi.core.command import (make_command_in_collection_lookup_f,
+                               make_command_out_collection_lookup_f)
+from pyqi.core.interfaces.optparse.output_handler import print_string
+from scaling.commands.timing_converter import CommandConstructor
+
+# Convenience function for looking up parameters by name.
+cmd_in_lookup = make_command_in_collection_lookup_f(CommandConstructor)
+cmd_out_lookup = make_command_out_collection_lookup_f(CommandConstructor)
+
+# Examples of how the command can be used from the command line using an
+# optparse interface.
+usage_examples = [
+    OptparseUsageExample(ShortDesc="Timing directory conversion example",
+                         LongDesc="Append the timing files of the timing "
+                         "directory pick_otus_bench/timing to its timing "
+                         "log",
+                         Ex="%prog -i pick_otus_bench/timing"),
+    OptparseUsageExample(ShortDesc="Timing directory compaction example",
+                         LongDesc="Append the timing files of the timing "
+                         "directory pick_otus_bench/timing to its timing "
+                         "log and remove them",
+                         Ex="%prog -i pick_otus_bench/timing --remove")
+]
+
+# inputs map command line arguments and values onto Parameters. It is possible
+# to define options here that do not exist as parameters, e.g., an output file.
+inputs = [
+    OptparseOption(Parameter=cmd_in_lookup('input_dir'),
+                   Type='existing_dirpath',
+                   Action='store',
+                   Handler=None,
+                   ShortName='i',
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('remove'),
+                   Type=None,
+                   Action='store_true',
+                   Handler=None,
+                   ShortName=None,
+                   )
+]
+
+# outputs map result keys to output options and handlers. It is not necessary
+# to supply an associated option, but if you do, it must be an option from the
+# inputs list (above).
+outputs = [
+    OptparseResult(Parameter=cmd_out_lookup('log_fp'),
+                   Handler=print_string),
+]
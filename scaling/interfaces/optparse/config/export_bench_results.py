@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+from __future__ import division
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+from pyqi.core.interfaces.optparse import (OptparseUsageExample,
+                                           OptparseOption, OptparseResult)
+from pyqi.core.command import (make_command_in_collection_lookup_f,
+                               make_command_out_collection_lookup_f)
+from pyqi.core.interfaces.optparse.input_handler import string_list_handler
+
+from scaling.commands.bench_results_exporter import CommandConstructor
+from scaling.interfaces.optparse.output_handler import (write_bench_results,
+                                                        write_comp_results)
+
+# Convenience function for looking up parameters by name.
+cmd_in_lookup = make_command_in_collection_lookup_f(CommandConstructor)
+cmd_out_lookup = make_command_out_collection_lookup_f(CommandConstructor)
+
+# Examples of how the command can be used from the command line using an
+# optparse interface.
+usage_examples = [
+    OptparseUsageExample(ShortDesc="Process a run of the results database",
+                         LongDesc="Processes the measurements of the run 3 "
+                         "of the results database results.db, creating the "
+                         "same plots and summary as process-bench-results",
+                         Ex="%prog -d results.db -r 3 -o plots"),
+    OptparseUsageExample(ShortDesc="Compare runs of the results database",
+                         LongDesc="Compares the runs 3 and 7 of the results "
+                         "database results.db, creating the same plots as "
+                         "compare-bench-results",
+                         Ex="%prog -d results.db -r 3,7 -l qiime180,qiime190 "
+                         "-o plots")
+]
+
+# inputs map command line arguments and values onto Parameters. It is possible
+# to define options here that do not exist as parameters, e.g., an output file.
+inputs = [
+    OptparseOption(Parameter=cmd_in_lookup('db_fp'),
+                   Type='existing_filepath',
+                   Action='store',
+                   Handler=None,
+                   ShortName='d',
+                   Name='db_fp',
+                   Required=True,
+                   Help='Path to the results database'),
+    OptparseOption(Parameter=cmd_in_lookup('run_ids'),
+                   Type='str',
+                   Action='store',
+                   Handler=string_list_handler,
+                   ShortName='r',
+                   Name='run_ids',
+                   Required=True,
+                   Help='Comma-separated list with the ids of the runs'),
+    OptparseOption(Parameter=cmd_in_lookup('labels'),
+                   Type='str',
+                   Action='store',
+                   Handler=string_list_handler,
+                   ShortName='l',
+                   Name='labels',
+                   Required=False,
+                   Help='Comma-separated list of strings to label each run'),
+    OptparseOption(Parameter=None,
+                   Type='new_dirpath',
+                   ShortName='o',
+                   Name='output-dir',
+                   Required=True,
+                   Help='The output directory')
+]
+
+# outputs map result keys to output options and handlers. It is not necessary
+# to supply an associated option, but if you do, it must be an option from the
+# inputs list (above).
+outputs = [
+    OptparseResult(Parameter=cmd_out_lookup('bench_data'),
+                   Handler=write_bench_results,
+                   InputName='output-dir'),
+    OptparseResult(Parameter=cmd_out_lookup('comp_data'),
+                   Handler=write_comp_results,
+                   InputName='output-dir'),
+]
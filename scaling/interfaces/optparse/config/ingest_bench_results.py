@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+from __future__ import division
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+from pyqi.core.interfaces.optparse import (OptparseUsageExample,
+                                           OptparseOption, OptparseResult)
+from pyqi.core.command import (make_command_in_collection_lookup_f,
+                               make_command_out_collection_lookup_f)
+from pyqi.core.interfaces.optparse.output_handler import print_list_of_strings
+
+from scaling.commands.bench_results_ingester import CommandConstructor
+from scaling.interfaces.optparse.input_handler import load_timing_directories
+
+# Convenience function for looking up parameters by name.
+cmd_in_lookup = make_command_in_collection_lookup_f(CommandConstructor)
+cmd_out_lookup = make_command_out_collection_lookup_f(CommandConstructor)
+
+# Examples of how the command can be used from the command line using an
+# optparse interface.
+usage_examples = [
+    OptparseUsageExample(ShortDesc="Store the results of a suite",
+                         LongDesc="Stores the measurements of the timing "
+                         "directory of a bash suite in the results database "
+                         "results.db, recording the QIIME version used. The "
+                         "command and the date of the suite are taken from "
+                         "the name of the suite directory",
+                         Ex="%prog -i pick_otus_20140101_120000/timing -d "
+                         "results.db --qiime-version 1.8.0"),
+    OptparseUsageExample(ShortDesc="Store the results of a parameter suite",
+                         LongDesc="Stores the measurements of each parameter "
+                         "of a parameter suite as a different run, labeled "
+                         "as baseline",
+                         Ex="%prog -i pick_otus_bench/timing/similarity,"
+                         "pick_otus_bench/timing/jobs_to_start -d results.db "
+                         "--label baseline")
+]
+
+# inputs map command line arguments and values onto Parameters. It is possible
+# to define options here that do not exist as parameters, e.g., an output file.
+inputs = [
+    OptparseOption(Parameter=cmd_in_lookup('bench_results'),
+                   Type='existing_dirpaths',
+                   Action='store',
+                   Handler=load_timing_directories,
+                   ShortName='i',
+                   Name='input_dirs',
+                   Required=True,
+                   Help='Comma-separated list of the timing directories of '
+                        'the runs'),
+    OptparseOption(Parameter=cmd_in_lookup('db_fp'),
+                   Type='str',
+                   Action='store',
+                   Handler=None,
+                   ShortName='d',
+                   Name='db_fp',
+                   Required=True,
+                   Help='Path to the results database'),
+    OptparseOption(Parameter=cmd_in_lookup('command'),
+                   Type='str',
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('host'),
+                   Type='str',
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('version'),
+                   Type='str',
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   Name='qiime_version',
+                   Required=False,
+                   Help='QIIME version used in the runs'),
+    OptparseOption(Parameter=cmd_in_lookup('label'),
+                   Type='str',
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   )
+]
+
+# outputs map result keys to output options and handlers. It is not necessary
+# to supply an associated option, but if you do, it must be an option from the
+# inputs list (above).
+outputs = [
+    OptparseResult(Parameter=cmd_out_lookup('run_ids'),
+                   Handler=print_list_of_strings),
+]
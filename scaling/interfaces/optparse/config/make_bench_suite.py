@@ -17,8 +17,9 @@ from pyqi.core.command import (make_command_in_collection_lookup_f,
 from pyqi.core.interfaces.optparse.input_handler import string_list_handler
 from pyqi.core.interfaces.optparse.output_handler import write_string
 from scaling.commands.bench_suite_maker import CommandConstructor
-from scaling.interfaces.optparse.input_handler import (get_bench_paths,
-                                                       load_parameters)
+from scaling.interfaces.optparse.input_handler import (
+    get_bench_paths, load_parameters, load_case_time_estimates,
+    load_case_resources)
 
 # Convenience function for looking up parameters by name.
 cmd_in_lookup = make_command_in_collection_lookup_f(CommandConstructor)
@@ -48,7 +49,65 @@ usage_examples = [
                          Ex="%prog -c \"split_librarires_fastq.py -m "
                          "mapping.txt\" -i seqs_folder,barcode_folder "
                          "--in_opts \"-i,-q\" -o "
-                         "split_librarires_fastq_bench_suite.sh")
+                         "split_librarires_fastq_bench_suite.sh"),
+    OptparseUsageExample(ShortDesc="Execution order example usage",
+                         LongDesc="Test the command \"pick_otus.py\" using "
+                         "different input files, rotating the order of the "
+                         "cases on each repetition, so a drift of the machine "
+                         "performance does not bias the results of any case",
+                         Ex="%prog -c \"pick_otus.py\" -i bench_files "
+                         "--order interleaved -o pick_otus_bench_suite.sh"),
+    OptparseUsageExample(ShortDesc="Local cluster stand-in example usage",
+                         LongDesc="Test the command \"pick_otus.py\" using "
+                         "different input files, submitting each command to "
+                         "the local stand-in for PBS (the fake_qsub and "
+                         "fake_qstat scripts), which executes the jobs in the "
+                         "local machine after a queue delay of "
+                         "FAKE_PBS_QUEUE_DELAY seconds",
+                         Ex="%prog -c \"pick_otus.py\" -i bench_files "
+                         "--executor fake-pbs -o pick_otus_bench_suite.sh"),
+    OptparseUsageExample(ShortDesc="Job array example usage",
+                         LongDesc="Test the command \"pick_otus.py\" using "
+                         "different input files in a PBS cluster, submitting "
+                         "all the commands of the suite as a single job array "
+                         "instead of one job per command",
+                         Ex="%prog -c \"pick_otus.py\" -i bench_files --pbs "
+                         "--array-jobs -o pick_otus_bench_suite.sh"),
+    OptparseUsageExample(ShortDesc="Dependent processing job example usage",
+                         LongDesc="Test the command \"pick_otus.py\" using "
+                         "different input files in a PBS cluster, submitting "
+                         "the processing of the results as a job that runs "
+                         "once all the benchmark jobs have finished, so the "
+                         "suite script returns right after submitting them",
+                         Ex="%prog -c \"pick_otus.py\" -i bench_files --pbs "
+                         "--process-job -o pick_otus_bench_suite.sh"),
+    OptparseUsageExample(ShortDesc="Bundled cases example usage",
+                         LongDesc="Test the command \"pick_otus.py\" using "
+                         "different input files in a PBS cluster, packing "
+                         "the cases that took less than 5 minutes in a pilot "
+                         "run into jobs of up to 5 minutes",
+                         Ex="%prog -c \"pick_otus.py\" -i bench_files --pbs "
+                         "--pilot-results pilot/timing --bundle-time 300 -o "
+                         "pick_otus_bench_suite.sh"),
+    OptparseUsageExample(ShortDesc="Throttled submission example usage",
+                         LongDesc="Test the command \"pick_otus.py\" using "
+                         "different input files in a PBS cluster whose queue "
+                         "accepts up to 50 jobs per user, keeping at most 50 "
+                         "jobs queued or running and submitting the rest as "
+                         "the earlier ones finish",
+                         Ex="%prog -c \"pick_otus.py\" -i bench_files --pbs "
+                         "--max-queued 50 -o pick_otus_bench_suite.sh"),
+    OptparseUsageExample(ShortDesc="SLURM job array example usage",
+                         LongDesc="Test the command \"pick_otus.py\" using "
+                         "different input files in a SLURM cluster, "
+                         "submitting all the commands of the suite as a "
+                         "single job array that requests the wall time, "
+                         "memory and CPUs listed in resources.txt. The "
+                         "measurements are cross-checked with the accounting "
+                         "reported by sacct",
+                         Ex="%prog -c \"pick_otus.py\" -i bench_files "
+                         "--executor slurm --array-jobs --resources "
+                         "resources.txt -o pick_otus_bench_suite.sh")
 ]
 
 # inputs map command line arguments and values onto Parameters. It is possible
@@ -121,6 +180,68 @@ inputs = [
                    Handler=None,
                    ShortName=None,
                    ),
+    OptparseOption(Parameter=cmd_in_lookup('executor'),
+                   Type=str,
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('jobs'),
+                   Type=int,
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('array_jobs'),
+                   Type=None,
+                   Action='store_true',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('sentinels'),
+                   Type=None,
+                   Action='store_true',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('process_job'),
+                   Type=None,
+                   Action='store_true',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('max_queued'),
+                   Type=int,
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('case_times'),
+                   Type='existing_dirpath',
+                   Action='store',
+                   Handler=load_case_time_estimates,
+                   ShortName=None,
+                   Name='pilot_results',
+                   Help='Path to the timing directory of a pilot run of the '
+                        'suite, used to estimate the running time of each '
+                        'case'),
+    OptparseOption(Parameter=cmd_in_lookup('case_resources'),
+                   Type='existing_filepath',
+                   Action='store',
+                   Handler=load_case_resources,
+                   ShortName=None,
+                   Name='resources',
+                   Help='Path to the file with the resources requested for '
+                        'the job of each case, one case per line: the case '
+                        'name, the wall time limit in seconds, the memory in '
+                        'MB and the number of CPUs, tab separated. Use - to '
+                        'keep the default of the queue'),
+    OptparseOption(Parameter=cmd_in_lookup('bundle_time'),
+                   Type=float,
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
     OptparseOption(Parameter=cmd_in_lookup('job_prefix'),
                    Type=str,
                    Action='store',
@@ -139,6 +260,18 @@ inputs = [
                    Handler=None,
                    ShortName=None,
                    ),
+    OptparseOption(Parameter=cmd_in_lookup('order'),
+                   Type=str,
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('seed'),
+                   Type=int,
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
     OptparseOption(Parameter=None,
                    Type='new_filepath',
                    ShortName='o',
@@ -17,8 +17,13 @@ from pyqi.core.command import (make_command_in_collection_lookup_f,
 from pyqi.core.interfaces.optparse.input_handler import string_list_handler
 
 from scaling.commands.bench_results_processer import CommandConstructor
-from scaling.interfaces.optparse.output_handler import write_bench_results
-from scaling.interfaces.optparse.input_handler import parse_timing_directory
+from scaling.interfaces.optparse.output_handler import (write_bench_results,
+                                                        write_timelines,
+                                                        write_job_statuses,
+                                                        write_accounting_check)
+from scaling.interfaces.optparse.input_handler import (
+    parse_timing_directory, parse_timelines_directory,
+    parse_job_ids_directory)
 
 # Convenience function for looking up parameters by name.
 cmd_in_lookup = make_command_in_collection_lookup_f(CommandConstructor)
@@ -39,20 +44,56 @@ usage_examples = [
                          " directory and processes the benchmark measurements,"
                          " creating plots and collapsing results in a usable "
                          "form.",
-                         Ex="%prog -i timing -o plots -w 124311,124312,124313")
+                         Ex="%prog -i timing -o plots -w "
+                         "124311,124312,124313"),
+    OptparseUsageExample(ShortDesc="Process the benchmark suite results and "
+                         "plot the memory and CPU usage over time",
+                         LongDesc="Takes the timing and timelines directories "
+                         "of a benchmark suite executed with run-bench-suite "
+                         "--sample-interval and processes the benchmark "
+                         "measurements, also creating a plot with the memory "
+                         "and CPU usage over time of each case.",
+                         Ex="%prog -i timing -t timelines -o plots"),
+    OptparseUsageExample(ShortDesc="Process the benchmark suite results "
+                         "stored in an archive",
+                         LongDesc="Reads the time results of the similarity "
+                         "parameter from the archive created by "
+                         "archive-bench-results, without extracting it, and "
+                         "processes the benchmark measurements.",
+                         Ex="%prog -i timing.tar.xz/similarity -o plots"),
+    OptparseUsageExample(ShortDesc="Wait for the completion sentinels and "
+                         "process the benchmark suite results",
+                         LongDesc="Waits until every pending sentinel in the "
+                         "sentinels directory has been marked as done by "
+                         "sentinel_wrapper.sh, without querying the queue "
+                         "system, and then processes the benchmark "
+                         "measurements.",
+                         Ex="%prog -i timing -s sentinels -o plots"),
+    OptparseUsageExample(ShortDesc="Wait for a SLURM job array and "
+                         "cross-check the measurements with sacct",
+                         LongDesc="Waits for the SLURM job array 4242 and "
+                         "processes the benchmark measurements, comparing the "
+                         "wall time, CPU time and memory of each case with "
+                         "the Elapsed, TotalCPU and MaxRSS reported by sacct "
+                         "for the jobs listed in the job ids directory.",
+                         Ex="%prog -i timing -w 4242 --executor slurm -j "
+                         "job_ids -o plots")
 ]
 
 # inputs map command line arguments and values onto Parameters. It is possible
 # to define options here that do not exist as parameters, e.g., an output file.
 inputs = [
     OptparseOption(Parameter=cmd_in_lookup('bench_results'),
-                   Type='existing_dirpath',
+                   Type='str',
                    Action='store',
                    Handler=parse_timing_directory,
                    ShortName='i',
                    Name='input_dir',
                    Required=True,
-                   Help='Path to the directory with the time results',
+                   Help='Path to the directory with the time results. It can '
+                        'also be an archive with the time results, or a path '
+                        'inside an archive (e.g. timing.tar.gz/similarity), '
+                        'which is read without extracting it',
                    ),
     OptparseOption(Parameter=cmd_in_lookup('job_ids'),
                    Type='str',
@@ -63,6 +104,44 @@ inputs = [
                    Required=False,
                    Help='Comma-separated list of job ids to wait for before '
                         'processing the results'),
+    OptparseOption(Parameter=cmd_in_lookup('executor'),
+                   Type='str',
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   Name='executor',
+                   Required=False,
+                   Help='Backend that executed the jobs to wait for or to '
+                        'cross-check: pbs, slurm, fake-pbs or fake-slurm'),
+    OptparseOption(Parameter=cmd_in_lookup('sentinel_dir'),
+                   Type='existing_dirpath',
+                   Action='store',
+                   Handler=None,
+                   ShortName='s',
+                   Name='sentinel_dir',
+                   Required=False,
+                   Help='Path to the directory with the completion sentinels '
+                        'of the benchmark commands, to wait for them before '
+                        'processing the results'),
+    OptparseOption(Parameter=cmd_in_lookup('timelines'),
+                   Type='existing_dirpath',
+                   Action='store',
+                   Handler=parse_timelines_directory,
+                   ShortName='t',
+                   Name='timelines_dir',
+                   Required=False,
+                   Help='Path to the directory with the memory and CPU '
+                        'timelines'),
+    OptparseOption(Parameter=cmd_in_lookup('case_jobs'),
+                   Type='existing_dirpath',
+                   Action='store',
+                   Handler=parse_job_ids_directory,
+                   ShortName='j',
+                   Name='job_ids_dir',
+                   Required=False,
+                   Help='Path to the directory with the ids of the jobs that '
+                        'executed each case, to cross-check the measurements '
+                        'with the accounting of the jobs'),
     OptparseOption(Parameter=None,
                    Type='new_dirpath',
                    ShortName='o',
@@ -78,4 +157,13 @@ outputs = [
     OptparseResult(Parameter=cmd_out_lookup('bench_data'),
                    Handler=write_bench_results,
                    InputName='output-dir'),
+    OptparseResult(Parameter=cmd_out_lookup('timelines'),
+                   Handler=write_timelines,
+                   InputName='output-dir'),
+    OptparseResult(Parameter=cmd_out_lookup('job_statuses'),
+                   Handler=write_job_statuses,
+                   InputName='output-dir'),
+    OptparseResult(Parameter=cmd_out_lookup('accounting_check'),
+                   Handler=write_accounting_check,
+                   InputName='output-dir'),
 ]
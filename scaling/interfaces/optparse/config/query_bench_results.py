@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+from __future__ import division
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+from pyqi.core.interfaces.optparse import (OptparseUsageExample,
+                                           OptparseOption, OptparseResult)
+from pyqi.core.command import (make_command_in_collection_lookup_f,
+                               make_command_out_collection_lookup_f)
+
+from scaling.commands.bench_results_querier import CommandConstructor
+from scaling.interfaces.optparse.output_handler import write_bench_runs
+
+# Convenience function for looking up parameters by name.
+cmd_in_lookup = make_command_in_collection_lookup_f(CommandConstructor)
+cmd_out_lookup = make_command_out_collection_lookup_f(CommandConstructor)
+
+# Examples of how the command can be used from the command line using an
+# optparse interface.
+usage_examples = [
+    OptparseUsageExample(ShortDesc="List the runs of a command",
+                         LongDesc="Lists the runs of pick_otus stored in the "
+                         "results database results.db",
+                         Ex="%prog -d results.db --command pick_otus"),
+    OptparseUsageExample(ShortDesc="List the runs with a parameter value",
+                         LongDesc="Lists the runs of QIIME 1.8.0 stored in "
+                         "the results database results.db that benchmarked "
+                         "the similarity 0.97, writing them to runs.txt",
+                         Ex="%prog -d results.db --qiime-version 1.8.0 "
+                         "--parameter similarity --case 0.97 -o runs.txt")
+]
+
+# inputs map command line arguments and values onto Parameters. It is possible
+# to define options here that do not exist as parameters, e.g., an output file.
+inputs = [
+    OptparseOption(Parameter=cmd_in_lookup('db_fp'),
+                   Type='existing_filepath',
+                   Action='store',
+                   Handler=None,
+                   ShortName='d',
+                   Name='db_fp',
+                   Required=True,
+                   Help='Path to the results database'),
+    OptparseOption(Parameter=cmd_in_lookup('command'),
+                   Type='str',
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('parameter'),
+                   Type='str',
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('host'),
+                   Type='str',
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('version'),
+                   Type='str',
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   Name='qiime_version',
+                   Required=False,
+                   Help='QIIME version used in the runs'),
+    OptparseOption(Parameter=cmd_in_lookup('label'),
+                   Type='str',
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('case'),
+                   Type='str',
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=None,
+                   Type='new_filepath',
+                   ShortName='o',
+                   Name='output-fp',
+                   Required=False,
+                   Help='Path to the output file',
+                   DefaultDescription='The runs are printed')
+]
+
+# outputs map result keys to output options and handlers. It is not necessary
+# to supply an associated option, but if you do, it must be an option from the
+# inputs list (above).
+outputs = [
+    OptparseResult(Parameter=cmd_out_lookup('runs'),
+                   Handler=write_bench_runs,
+                   InputName='output-fp'),
+]
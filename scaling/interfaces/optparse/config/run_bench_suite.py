@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+from __future__ import division
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+from pyqi.core.interfaces.optparse import (OptparseUsageExample,
+                                           OptparseOption, OptparseResult)
+from pyqi.core.command import (make_command_in_collection_lookup_f,
+                               make_command_out_collection_lookup_f)
+from pyqi.core.interfaces.optparse.input_handler import string_list_handler
+from pyqi.core.interfaces.optparse.output_handler import print_list_of_strings
+from scaling.commands.bench_suite_runner import CommandConstructor
+from scaling.interfaces.optparse.input_handler import (get_bench_paths,
+                                                       load_parameters)
+
+# Convenience function for looking up parameters by name.
+cmd_in_lookup = make_command_in_collection_lookup_f(CommandConstructor)
+cmd_out_lookup = make_command_out_collection_lookup_f(CommandConstructor)
+
+# Examples of how the command can be used from the command line using an
+# optparse interface.
+usage_examples = [
+    OptparseUsageExample(ShortDesc="Parameters example usage",
+                         LongDesc="Run the command \"pick_otus.py\" using "
+                         "different similarity values, executing up to 4 "
+                         "commands at the same time. The file parameters.txt"
+                         " should follow these structure\nsimilarity<tab>"
+                         "val1,val2,val3",
+                         Ex="%prog -c \"pick_otus.py -i seqs.fna\" -p "
+                         "parameters.txt -n 5 -j 4 -o pick_otus_bench"),
+    OptparseUsageExample(ShortDesc="Input files example usage",
+                         LongDesc="Run the command \"pick_otus.py\" using "
+                         "different input files, executing one command per "
+                         "available core. The folder bench_files should "
+                         "include only the input files used by the command",
+                         Ex="%prog -c \"pick_otus.py\" -i bench_files -n 5 "
+                         "--per-core -o pick_otus_bench"),
+    OptparseUsageExample(ShortDesc="Adaptive repetitions example usage",
+                         LongDesc="Run the command \"pick_otus.py\" using "
+                         "different input files. Each case is executed once "
+                         "to warm up, and then repeated (between 3 and 20 "
+                         "times) until the 95% confidence interval of the "
+                         "wall time mean is within 5% of the mean or one hour "
+                         "has been spent on the case",
+                         Ex="%prog -c \"pick_otus.py\" -i bench_files -n 3 "
+                         "--warmup 1 --target-ci 0.05 --max-reps 20 "
+                         "--time-budget 3600 -o pick_otus_bench"),
+    OptparseUsageExample(ShortDesc="Low-noise example usage",
+                         LongDesc="Run the command \"pick_otus.py\" using "
+                         "different input files, executing one command per "
+                         "set of 4 physical cores. Each command is pinned to "
+                         "its cores, the sibling hyperthreads are kept idle "
+                         "and its memory is bound to the local NUMA node",
+                         Ex="%prog -c \"pick_otus.py\" -i bench_files -n 5 "
+                         "--per-core --cpus-per-case 4 --isolate-siblings "
+                         "--numa-bind -o pick_otus_bench"),
+    OptparseUsageExample(ShortDesc="Resume example usage",
+                         LongDesc="Resume the execution of an interrupted "
+                         "suite, executing only the repetitions that did not "
+                         "finish correctly",
+                         Ex="%prog -c \"pick_otus.py\" -i bench_files -n 5 "
+                         "--resume -o pick_otus_bench"),
+    OptparseUsageExample(ShortDesc="Limits example usage",
+                         LongDesc="Run the command \"pick_otus.py\" using "
+                         "different input files, killing the commands that "
+                         "run for more than 2 hours or use more than 16GB of "
+                         "memory. The killed commands are recorded as "
+                         "censored",
+                         Ex="%prog -c \"pick_otus.py\" -i bench_files -n 5 "
+                         "--timeout 7200 --max-rss 16384 -o pick_otus_bench"),
+    OptparseUsageExample(ShortDesc="Execution order example usage",
+                         LongDesc="Run the command \"pick_otus.py\" using "
+                         "different input files, shuffling all the "
+                         "repetitions of all the cases with a fixed seed, so "
+                         "a drift of the machine performance does not bias "
+                         "the results of any case",
+                         Ex="%prog -c \"pick_otus.py\" -i bench_files -n 5 "
+                         "--order random --seed 42 -o pick_otus_bench"),
+    OptparseUsageExample(ShortDesc="Page cache example usage",
+                         LongDesc="Run the command \"pick_otus.py\" using "
+                         "different input files, executing each repetition "
+                         "with the input files evicted from the page cache "
+                         "and then with the input files cached",
+                         Ex="%prog -c \"pick_otus.py\" -i bench_files -n 5 "
+                         "--cache-mode both -o pick_otus_bench"),
+    OptparseUsageExample(ShortDesc="Work queue example usage",
+                         LongDesc="Create a work queue with 5 repetitions of "
+                         "the command \"pick_otus.py\" for each input file "
+                         "in the shared directory /nfs/pick_otus_bench. The "
+                         "repetitions are executed by the \"scaling worker\" "
+                         "processes started on the hosts that mount it",
+                         Ex="%prog -c \"pick_otus.py\" -i bench_files -n 5 "
+                         "--queue -o /nfs/pick_otus_bench"),
+    OptparseUsageExample(ShortDesc="Timing log example usage",
+                         LongDesc="Run the command \"pick_otus.py\" 100 "
+                         "times for each input file, appending the timing "
+                         "results to the timing log pick_otus_bench/timing/"
+                         "timing.log instead of writing a file per "
+                         "repetition",
+                         Ex="%prog -c \"pick_otus.py\" -i bench_files -n 100 "
+                         "--timing-log -o pick_otus_bench")
+]
+
+# inputs map command line arguments and values onto Parameters. It is possible
+# to define options here that do not exist as parameters, e.g., an output file.
+inputs = [
+    OptparseOption(Parameter=cmd_in_lookup('bench_files'),
+                   Type='existing_dirpaths',
+                   Action='store',
+                   Handler=get_bench_paths,
+                   ShortName='i',
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('command'),
+                   Type='str',
+                   Action='store',
+                   Handler=None,
+                   ShortName='c',
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('output_dir'),
+                   Type='new_dirpath',
+                   Action='store',
+                   Handler=None,
+                   ShortName='o',
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('in_opts'),
+                   Type='str',
+                   Action='store',
+                   Handler=string_list_handler,
+                   ShortName=None,
+                   Default='-i',
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('out_opt'),
+                   Type='str',
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('parameters'),
+                   Type='existing_filepath',
+                   Action='store',
+                   Handler=load_parameters,
+                   ShortName='p',
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('num_reps'),
+                   Type=int,
+                   Action='store',
+                   Handler=None,
+                   ShortName='n',
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('jobs'),
+                   Type=int,
+                   Action='store',
+                   Handler=None,
+                   ShortName='j',
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('per_core'),
+                   Type=None,
+                   Action='store_true',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('warmup'),
+                   Type=int,
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('target_ci'),
+                   Type=float,
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('max_reps'),
+                   Type=int,
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('time_budget'),
+                   Type=float,
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('sample_interval'),
+                   Type=float,
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('cpus_per_case'),
+                   Type=int,
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('isolate_siblings'),
+                   Type=None,
+                   Action='store_true',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('numa_bind'),
+                   Type=None,
+                   Action='store_true',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('resume'),
+                   Type=None,
+                   Action='store_true',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('timeout'),
+                   Type=float,
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('max_rss'),
+                   Type=int,
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('max_vmem'),
+                   Type=int,
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('order'),
+                   Type=str,
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('seed'),
+                   Type=int,
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('cache_mode'),
+                   Type=str,
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('queue'),
+                   Type=None,
+                   Action='store_true',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('timing_log'),
+                   Type=None,
+                   Action='store_true',
+                   Handler=None,
+                   ShortName=None,
+                   )
+]
+
+# outputs map result keys to output options and handlers. It is not necessary
+# to supply an associated option, but if you do, it must be an option from the
+# inputs list (above).
+outputs = [
+    OptparseResult(Parameter=cmd_out_lookup('timing_dirs'),
+                   Handler=print_list_of_strings),
+]
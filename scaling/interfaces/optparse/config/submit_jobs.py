@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+from __future__ import division
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+from pyqi.core.interfaces.optparse import (OptparseUsageExample,
+                                           OptparseOption, OptparseResult)
+from pyqi.core.command import (make_command_in_collection_lookup_f,
+                               make_command_out_collection_lookup_f)
+
+from scaling.commands.job_submitter import CommandConstructor
+from scaling.interfaces.optparse.input_handler import load_job_list
+from scaling.interfaces.optparse.output_handler import (write_job_records,
+                                                        write_throughput)
+
+# Convenience function for looking up parameters by name.
+cmd_in_lookup = make_command_in_collection_lookup_f(CommandConstructor)
+cmd_out_lookup = make_command_out_collection_lookup_f(CommandConstructor)
+
+# Examples of how the command can be used from the command line using an
+# optparse interface.
+usage_examples = [
+    OptparseUsageExample(ShortDesc="Submit a list of jobs to PBS keeping at "
+                         "most 50 of them queued",
+                         LongDesc="Submits the jobs of the list, one per line "
+                         "with the job name followed by the job script, "
+                         "keeping at most 50 of them queued or running, and "
+                         "records the submission, start and end times of "
+                         "each job.",
+                         Ex="%prog -i jobs.txt -n 50 -o submissions"),
+    OptparseUsageExample(ShortDesc="Submit a list of jobs to a SLURM "
+                         "partition keeping at most 10 of them queued",
+                         LongDesc="Submits the jobs of the list to the short "
+                         "partition of a SLURM cluster, keeping at most 10 of "
+                         "them queued or running.",
+                         Ex="%prog -i jobs.txt -n 10 --executor slurm "
+                         "--queue short -o submissions")
+]
+
+# inputs map command line arguments and values onto Parameters. It is possible
+# to define options here that do not exist as parameters, e.g., an output file.
+inputs = [
+    OptparseOption(Parameter=cmd_in_lookup('jobs'),
+                   Type='existing_filepath',
+                   Action='store',
+                   Handler=load_job_list,
+                   ShortName='i',
+                   Name='job_list',
+                   Required=True,
+                   Help='Path to the job list file, with one job per line: '
+                        'the job name followed by the job script'),
+    OptparseOption(Parameter=cmd_in_lookup('max_queued'),
+                   Type=int,
+                   Action='store',
+                   Handler=None,
+                   ShortName='n',
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('executor'),
+                   Type=str,
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('queue'),
+                   Type=str,
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('extra_args'),
+                   Type=str,
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('poll_interval'),
+                   Type=float,
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=None,
+                   Type='new_dirpath',
+                   ShortName='o',
+                   Name='output-dir',
+                   Required=True,
+                   Help='The output directory')
+]
+
+# outputs map result keys to output options and handlers. It is not necessary
+# to supply an associated option, but if you do, it must be an option from the
+# inputs list (above).
+outputs = [
+    OptparseResult(Parameter=cmd_out_lookup('job_records'),
+                   Handler=write_job_records,
+                   InputName='output-dir'),
+    OptparseResult(Parameter=cmd_out_lookup('throughput'),
+                   Handler=write_throughput,
+                   InputName='output-dir'),
+]
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+from __future__ import division
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+from pyqi.core.interfaces.optparse import (OptparseUsageExample,
+                                           OptparseOption, OptparseResult)
+from pyqi.core.command import (make_command_in_collection_lookup_f,
+                               make_command_out_collection_lookup_f)
+from pyqi.core.interfaces.optparse.output_handler import print_list_of_strings
+from scaling.commands.queue_worker import CommandConstructor
+
+# Convenience function for looking up parameters by name.
+cmd_in_lookup = make_command_in_collection_lookup_f(CommandConstructor)
+cmd_out_lookup = make_command_out_collection_lookup_f(CommandConstructor)
+
+# Examples of how the command can be used from the command line using an
+# optparse interface.
+usage_examples = [
+    OptparseUsageExample(ShortDesc="Worker example usage",
+                         LongDesc="Execute the pending repetitions of the "
+                         "work queue created with \"run-bench-suite --queue\""
+                         " in the shared directory pick_otus_bench, two at a "
+                         "time. The same command can be started on every "
+                         "host that mounts the directory",
+                         Ex="%prog -o /nfs/pick_otus_bench -j 2"),
+    OptparseUsageExample(ShortDesc="Limited worker example usage",
+                         LongDesc="Execute at most 10 repetitions of the work "
+                         "queue, sampling the memory and CPU usage of each "
+                         "command every second",
+                         Ex="%prog -o /nfs/pick_otus_bench --max-tasks 10 "
+                         "--sample-interval 1")
+]
+
+# inputs map command line arguments and values onto Parameters. It is possible
+# to define options here that do not exist as parameters, e.g., an output file.
+inputs = [
+    OptparseOption(Parameter=cmd_in_lookup('output_dir'),
+                   Type='existing_dirpath',
+                   Action='store',
+                   Handler=None,
+                   ShortName='o',
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('jobs'),
+                   Type=int,
+                   Action='store',
+                   Handler=None,
+                   ShortName='j',
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('max_tasks'),
+                   Type=int,
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('sample_interval'),
+                   Type=float,
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('timeout'),
+                   Type=float,
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('max_rss'),
+                   Type=int,
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('max_vmem'),
+                   Type=int,
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('cache_mode'),
+                   Type=str,
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   ),
+    OptparseOption(Parameter=cmd_in_lookup('claim_lease'),
+                   Type=float,
+                   Action='store',
+                   Handler=None,
+                   ShortName=None,
+                   )
+]
+
+# outputs map result keys to output options and handlers. It is not necessary
+# to supply an associated option, but if you do, it must be an option from the
+# inputs list (above).
+outputs = [
+    OptparseResult(Parameter=cmd_out_lookup('timing_dirs'),
+                   Handler=print_list_of_strings),
+]
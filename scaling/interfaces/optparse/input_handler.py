@@ -9,12 +9,36 @@ __maintainer__ = "Jose Antonio Navas Molina"
 __email__ = "josenavasmolina@gmail.com"
 __status__ = "Development"
 
-from os import listdir
-from os.path import abspath, join, isdir
+from os import listdir, walk, stat, rename, remove, getpid
+from os.path import (abspath, join, isdir, relpath, normpath, exists,
+                     getmtime, splitext, split)
+from marshal import dump, loads
+from multiprocessing.pool import ThreadPool
+from stat import S_ISDIR
+from StringIO import StringIO
 from warnings import warn
 
-from scaling.parse import parse_parameters_file, parse_summarized_results
-from scaling.util import natural_sort, BenchCase
+from scaling.parse import (parse_parameters_file, parse_summarized_results,
+                           parse_timing_file, parse_timeline_file,
+                           parse_job_list, parse_resources_file,
+                           parse_timing_log, parse_summarized_results_npz)
+from scaling.util import (natural_sort, BenchCase, TIMING_LOG_FN,
+                          TIMING_CACHE_FN)
+from scaling.archive import split_archive_path, iter_archive, is_archive
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+# Number of threads that read the timing files of a timing directory
+PARSE_JOBS = 8
+# Version of the format of the parse cache. The caches of other versions are
+# not used
+PARSE_CACHE_VERSION = 1
 
 
 def load_parameters(param_fp):
@@ -34,13 +58,122 @@ def load_parameters(param_fp):
             return parse_parameters_file(param_f)
 
 
+def load_job_list(job_list_fp):
+    """Return a parsed job list file
+
+    Parameters
+    ----------
+    job_list_fp : string
+        Filepath to the job list file
+
+    Returns
+    -------
+    list of (string, string)
+        The (name, script) pairs of the jobs
+    """
+    with open(job_list_fp, 'U') as f:
+        return parse_job_list(f)
+
+
+def load_case_resources(resources_fp):
+    """Return a parsed resources file
+
+    Parameters
+    ----------
+    resources_fp : string
+        Filepath to the resources file
+
+    Returns
+    -------
+    dict of {string: ResourceRequest}
+        The resources requested for each case, or None if resources_fp is
+        not provided
+    """
+    if not resources_fp:
+        return None
+    with open(resources_fp, 'U') as f:
+        return parse_resources_file(f)
+
+
+def get_summary_npz_fp(summary_fp):
+    """Returns the binary summarized results file that goes with summary_fp
+
+    Parameters
+    ----------
+    summary_fp : string
+        Filepath to the results summary file
+
+    Returns
+    -------
+    string
+        The path to the .npz file written alongside summary_fp (see
+        write_bench_results), or None if it does not exist or it is older
+        than summary_fp
+    """
+    npz_fp = splitext(summary_fp)[0] + '.npz'
+    if exists(npz_fp) and getmtime(npz_fp) >= getmtime(summary_fp):
+        return npz_fp
+    return None
+
+
+def load_archived_summary(archive_fp, member=""):
+    """Parses the results summary stored in an archive
+
+    Parameters
+    ----------
+    archive_fp : string
+        Path to the archive (see scaling.archive)
+    member : string, optional
+        Path of the results summary inside the archive, or of the directory
+        that holds it. By default, the only results summary of the archive is
+        used
+
+    Returns
+    -------
+    BenchSummary
+        The parsed results summary. As in load_summarized_results_list, the
+        binary summary (summarized_results.npz) is used if present
+
+    Raises
+    ------
+    ValueError
+        If the archive does not contain exactly one results summary in member
+    """
+    summary_fns = ("summarized_results.txt", "summarized_results.npz")
+    if split(member)[1] in summary_fns:
+        member = split(member)[0]
+    prefix = member + "/" if member else ""
+    found = {}
+    for name, f in iter_archive(archive_fp):
+        summary_dir, filename = split(name)
+        if (f is not None and name.startswith(prefix) and
+                filename in summary_fns):
+            found.setdefault(summary_dir, {})[filename] = f.read()
+    if len(found) != 1:
+        raise ValueError("%s should contain a single results summary "
+                         "(summarized_results.txt) in %s, found %d"
+                         % (archive_fp, member or "any directory",
+                            len(found)))
+    summary = found.values()[0]
+    if "summarized_results.npz" in summary:
+        return parse_summarized_results_npz(
+            StringIO(summary["summarized_results.npz"]))
+    return parse_summarized_results(
+        summary["summarized_results.txt"].splitlines())
+
+
 def load_summarized_results_list(input_fps):
     """Parses all the results summary in input_fps
 
+    The binary summary (.npz) is loaded instead of the text file if it has
+    been written alongside it, so the values do not need to be parsed
+
     Parameters
     ----------
     input_fps : Iterable
-        Filepaths to the results summary files
+        Filepaths to the results summary files, either the text or the
+        binary (.npz) ones, or to archives with the results summary (see
+        load_archived_summary)
 
     Returns
     -------
@@ -48,8 +181,22 @@ def load_summarized_results_list(input_fps):
         Yields the parsed files
     """
     for input_fp in input_fps:
-        with open(input_fp, 'U') as f:
-            yield parse_summarized_results(f)
+        archive_fp = None
+        if is_archive(input_fp) or not exists(input_fp):
+            archive_fp, member = split_archive_path(input_fp)
+        if archive_fp is not None:
+            yield load_archived_summary(archive_fp, member)
+            continue
+        if input_fp.endswith('.npz'):
+            npz_fp = input_fp
+        else:
+            npz_fp = get_summary_npz_fp(input_fp)
+        if npz_fp:
+            with open(npz_fp, 'rb') as f:
+                yield parse_summarized_results_npz(f)
+        else:
+            with open(input_fp, 'U') as f:
+                yield parse_summarized_results(f)
 
 
 def get_bench_paths(input_dirs):
@@ -103,7 +250,162 @@ def get_bench_paths(input_dirs):
         return bench_files
 
 
-def parse_timing_directory(timing_dir):
+def load_timing_log(log_fp):
+    """Retrieves the timing records of a timing log
+
+    The lines of the log that are not well formed are not used, and a warning
+    is shown for each of them. If a repetition is logged more than once, its
+    last record is used
+
+    Parameters
+    ----------
+    log_fp : string
+        path to the timing log
+
+    Returns
+    -------
+    dict of {string: dict of {string: tuple or None}}
+        The parsed timing record of each repetition (see parse_timing_file),
+        keyed by case and repetition
+    """
+    with open(log_fp, 'U') as f:
+        return _group_timing_log(f, log_fp)
+
+
+def _group_timing_log(lines, log_fp):
+    """Groups the timing records of a timing log by case and repetition"""
+    records, malformed = parse_timing_log(lines)
+    for line_num in malformed:
+        warn("Line %d of %s not used" % (line_num, log_fp), RuntimeWarning)
+    result = {}
+    for case, rep, info in records:
+        result.setdefault(case, {})[rep] = info
+    return result
+
+
+def _scan_dir(dirpath):
+    """Lists dirpath with the type, size and modification time of its entries
+
+    Parameters
+    ----------
+    dirpath : string
+        path to the directory
+
+    Returns
+    -------
+    list of (string, bool, int, float)
+        The name of each entry, whether it is a directory, its size and its
+        modification time, in arbitrary order
+    """
+    if scandir is not None:
+        entries = []
+        for entry in scandir(dirpath):
+            st = entry.stat()
+            entries.append((entry.name, S_ISDIR(st.st_mode), st.st_size,
+                            st.st_mtime))
+    else:
+        entries = []
+        for name in listdir(dirpath):
+            st = stat(join(dirpath, name))
+            entries.append((name, S_ISDIR(st.st_mode), st.st_size,
+                            st.st_mtime))
+    return entries
+
+
+def _read_timing_file(filepath):
+    """Parses the timing file filepath (see parse_timing_file)"""
+    with open(filepath, 'U') as f:
+        return parse_timing_file(f)
+
+
+def _load_parse_cache(cache_fp):
+    """Returns the cached timing records, or an empty dict if not available
+
+    A missing, damaged or outdated cache is not an error: the timing files
+    are parsed again
+    """
+    try:
+        with open(cache_fp, 'rb') as f:
+            version, files = loads(f.read())
+        if version == PARSE_CACHE_VERSION and isinstance(files, dict):
+            return files
+    except (IOError, EOFError, ValueError, TypeError):
+        pass
+    return {}
+
+
+def _write_parse_cache(cache_fp, files):
+    """Writes the parse cache, ignoring the timing directories not writable"""
+    tmp_fp = "%s.%d.tmp" % (cache_fp, getpid())
+    try:
+        with open(tmp_fp, 'wb') as f:
+            dump((PARSE_CACHE_VERSION, files), f)
+        # Replace the cache atomically, so a concurrent reader never sees
+        # a partially written cache
+        rename(tmp_fp, cache_fp)
+    except (IOError, OSError):
+        if exists(tmp_fp):
+            remove(tmp_fp)
+
+
+def read_timing_files(timing_dir, files, jobs=PARSE_JOBS, use_cache=True):
+    """Parses the timing files of a timing directory
+
+    The files are read with a pool of threads, which hides the latency of
+    network file systems. The parsed records are stored in a cache in the
+    timing directory (.timing_cache), keyed by the path, size and
+    modification time of each file, so only the new or modified files are
+    read on the next call. The cache is stored with marshal, which loads
+    much faster than JSON and, unlike pickle, does not run any code
+
+    Parameters
+    ----------
+    timing_dir : string
+        path to the timing directory
+    files : dict of {string: (int, float)}
+        The size and modification time of each timing file, keyed by its
+        path relative to timing_dir
+    jobs : int, optional
+        Number of threads used to read the files
+    use_cache : bool, optional
+        If False, all the files are read and the cache is not updated
+
+    Returns
+    -------
+    dict of {string: tuple or None}
+        The parsed timing record of each file (see parse_timing_file), keyed
+        by its path relative to timing_dir
+    """
+    cache_fp = join(timing_dir, TIMING_CACHE_FN)
+    cached = _load_parse_cache(cache_fp) if use_cache else {}
+    records = {}
+    to_read = []
+    for rel_fp, (size, mtime) in files.items():
+        entry = cached.get(rel_fp)
+        if entry is not None and entry[:2] == (size, mtime):
+            records[rel_fp] = entry[2]
+        else:
+            to_read.append(rel_fp)
+    if to_read:
+        filepaths = [join(timing_dir, rel_fp) for rel_fp in to_read]
+        if jobs > 1 and len(to_read) > 1:
+            pool = ThreadPool(min(jobs, len(to_read)))
+            try:
+                parsed = pool.map(_read_timing_file, filepaths)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            parsed = map(_read_timing_file, filepaths)
+        records.update(zip(to_read, parsed))
+    if use_cache and (to_read or len(cached) != len(files)):
+        _write_parse_cache(cache_fp, dict(
+            (rel_fp, (size, mtime, records[rel_fp]))
+            for rel_fp, (size, mtime) in files.items()))
+    return records
+
+
+def parse_timing_directory(timing_dir, jobs=PARSE_JOBS, use_cache=True):
     """Retrieves the timing results stored in timing_dir in a dict form
 
     Parameters
@@ -111,50 +413,350 @@ def parse_timing_directory(timing_dir):
     timing_dir : string
         path to the directory containing the timing results. It should contain
         only directories in the first level in the directory structure and only
-        files on the second level of the directory structure
+        files on the second level of the directory structure, and optionally
+        a timing log (timing.log) in the first level. The repetitions of the
+        timing log take precedence over the timing files of the same case
+        and repetition (<rep>.txt). It can also be an archive, or a path
+        inside an archive (see scaling.archive), which is read without
+        extracting it
+    jobs : int, optional
+        Number of threads used to read the timing files
+    use_cache : bool, optional
+        If False, the parse cache of the timing directory is not used (see
+        read_timing_files)
 
     Returns
     -------
     GeneratorType
-        Yields BenchCase namedtuples
+        Yields BenchCase namedtuples. The repetitions stopped by a runner
+        limit are kept and flagged in the censored attribute
 
     Raises
     ------
     ValueError
-        If there is some file in the first level of the input directory
-        structure
+        If there is some file other than the timing log in the first level
+        of the input directory structure
     """
-    # listdir returns the contents in an arbitrary order - sort them
-    dirlist = listdir(timing_dir)
-    dirlist = natural_sort(dirlist)
-    # Loop over the contents of timing_dir
+    if not isdir(timing_dir):
+        archive_fp, member = split_archive_path(timing_dir)
+        if archive_fp is not None:
+            for case in _parse_timing_archive(timing_dir, archive_fp, member):
+                yield case
+            return
+    logged = {}
+    log_fp = None
+    dirlist = []
+    for name, is_dir, _, _ in _scan_dir(timing_dir):
+        if name == TIMING_CACHE_FN:
+            continue
+        if name == TIMING_LOG_FN:
+            log_fp = join(timing_dir, TIMING_LOG_FN)
+            logged = load_timing_log(log_fp)
+        elif is_dir:
+            dirlist.append(name)
+        else:
+            # Only directories are allowed besides the timing log
+            raise ValueError("%s contains a file: %s. Only directories are "
+                             "allowed!" % (timing_dir, join(timing_dir, name)))
+    # Collect the timing files of all the cases, so they are read at once
+    case_files = {}
+    files = {}
     for dirname in dirlist:
-        # Get the path to the current content
-        dirpath = join(timing_dir, dirname)
-        # Check if it is not a directory - raise a ValueError if True
-        if not isdir(dirpath):
+        case_files[dirname] = []
+        for filename, _, size, mtime in _scan_dir(join(timing_dir, dirname)):
+            rep = filename[:-4] if filename.endswith('.txt') else filename
+            rel_fp = join(dirname, filename)
+            case_files[dirname].append((rep, rel_fp))
+            files[rel_fp] = (size, mtime)
+    records = read_timing_files(timing_dir, files, jobs, use_cache)
+    for case in _make_bench_cases(timing_dir, dirlist, logged, log_fp,
+                                  case_files, records):
+        yield case
+
+
+def _parse_timing_archive(timing_dir, archive_fp, member):
+    """Retrieves the timing results of a timing directory in an archive
+
+    The archive is read sequentially, without extracting it
+
+    Parameters
+    ----------
+    timing_dir : string
+        path to the timing directory, used in the warnings
+    archive_fp : string
+        path to the archive
+    member : string
+        path of the timing directory inside the archive ('' if the timing
+        directory is the top level of the archive)
+
+    Returns
+    -------
+    GeneratorType
+        Yields BenchCase namedtuples (see parse_timing_directory)
+
+    Raises
+    ------
+    ValueError
+        If the timing directory is not in the archive, or it does not have
+        the structure of a timing directory
+    """
+    prefix = member + "/" if member else ""
+    found = not member
+    logged = {}
+    log_fp = None
+    dirlist = set()
+    case_files = {}
+    records = {}
+    for name, f in iter_archive(archive_fp):
+        if name != member and not name.startswith(prefix):
+            continue
+        found = True
+        if name == member:
+            continue
+        parts = name[len(prefix):].split("/")
+        if f is None:
+            # Directories: keep the cases without any timing file
+            if len(parts) == 1:
+                dirlist.add(parts[0])
+        elif parts == [TIMING_CACHE_FN]:
+            continue
+        elif parts == [TIMING_LOG_FN]:
+            log_fp = join(timing_dir, TIMING_LOG_FN)
+            logged = _group_timing_log(f, log_fp)
+        elif len(parts) == 2:
+            dirname, filename = parts
+            dirlist.add(dirname)
+            rep = filename[:-4] if filename.endswith('.txt') else filename
+            rel_fp = join(dirname, filename)
+            case_files.setdefault(dirname, []).append((rep, rel_fp))
+            records[rel_fp] = parse_timing_file(f)
+        elif len(parts) == 1:
             raise ValueError("%s contains a file: %s. Only directories are "
-                             "allowed!" % (timing_dir, dirpath))
+                             "allowed!" % (timing_dir, join(timing_dir, name)))
+        else:
+            raise ValueError("%s contains a nested directory: %s. Only files "
+                             "are allowed in the case directories!"
+                             % (timing_dir, join(timing_dir, name)))
+    if not found:
+        raise ValueError("%s not found in %s" % (member, archive_fp))
+    return _make_bench_cases(timing_dir, dirlist, logged, log_fp, case_files,
+                             records)
+
+
+def _make_bench_cases(timing_dir, dirlist, logged, log_fp, case_files,
+                      records):
+    """Builds the BenchCase of each case of a timing directory
+
+    Parameters
+    ----------
+    timing_dir : string
+        path to the timing directory, used in the warnings
+    dirlist : iterable of strings
+        The case directories
+    logged : dict of {string: dict of {string: tuple or None}}
+        The records of the timing log (see load_timing_log)
+    log_fp : string
+        path to the timing log, used in the warnings
+    case_files : dict of {string: list of (string, string)}
+        The repetition and the path (relative to timing_dir) of each timing
+        file, keyed by case
+    records : dict of {string: tuple or None}
+        The parsed record of each timing file, keyed by its path
+
+    Returns
+    -------
+    GeneratorType
+        Yields BenchCase namedtuples, sorted by case
+    """
+    for dirname in natural_sort(list(set(dirlist).union(logged))):
+        # The repetitions of the case, keyed by repetition, with the timing
+        # file of their measurements (None if logged) and the parsed record
+        reps = dict((rep, (None, info))
+                    for rep, info in logged.get(dirname, {}).items())
+        for rep, rel_fp in case_files.get(dirname, []):
+            if rep not in reps:
+                reps[rep] = (rel_fp, records[rel_fp])
         # Initialize the BenchCase results tuple
-        case = BenchCase(dirname, [], [], [], [])
-        # Loop over the timing files in the current directory
-        filelist = listdir(dirpath)
-        filelist = natural_sort(filelist)
-        for filename in filelist:
-            # Get the path to the current timing file
-            filepath = join(dirpath, filename)
-            # Read the first line of the timing file
-            with open(filepath, 'U') as f:
-                info = f.readline().strip().split(';')
-            # If first line does not follow the structure
-            # <wall time>;<user time>;<cpu time>;<memory>
+        case = BenchCase(dirname, [], [], [], [], {}, [])
+        rep_names = list(reps)
+        # Sort the usual numeric repetitions without the cost of natural_sort
+        if all(rep.isdigit() for rep in rep_names):
+            rep_names.sort(key=int)
+        else:
+            natural_sort(rep_names)
+        for rep in rep_names:
+            rel_fp, info = reps[rep]
+            # If the record does not follow the structure
+            # <wall time>;<user time>;<cpu time>;<memory>[;key=value...]
             # means that the command didn't finish correctly. Print a warning
             # message to let the user know
-            if len(info) != 4:
-                warn("File %s not used" % filepath, RuntimeWarning)
+            if info is None:
+                if rel_fp is None:
+                    source = "Repetition %s of %s in %s" % (rep, dirname,
+                                                            log_fp)
+                else:
+                    source = "File %s" % join(timing_dir, rel_fp)
+                warn("%s not used" % source, RuntimeWarning)
             else:
-                case.wall.append(float(info[0]))
-                case.user.append(float(info[1]))
-                case.kernel.append(float(info[2]))
-                case.mem.append(float(info[3]))
+                extra = dict(info[4])
+                case.censored.append(extra.pop('censored', None) is not None)
+                _add_extra_measurements(case.extra, extra, len(case.wall))
+                case.wall.append(info[0])
+                case.user.append(info[1])
+                case.kernel.append(info[2])
+                case.mem.append(info[3])
+        # Legacy timing files do not have extra measurements
+        if not case.extra:
+            case = case._replace(extra=None)
+        if not any(case.censored):
+            case = case._replace(censored=None)
         yield case
+
+
+def load_timing_directories(timing_dirs):
+    """Retrieves the timing results of several timing directories
+
+    Parameters
+    ----------
+    timing_dirs : list of strings
+        paths to the timing directories (see parse_timing_directory)
+
+    Returns
+    -------
+    list of (string, list of BenchCase)
+        The timing results of each directory, keyed by directory
+    """
+    return [(timing_dir, list(parse_timing_directory(timing_dir)))
+            for timing_dir in timing_dirs]
+
+
+def load_case_time_estimates(timing_dir):
+    """Estimates the running time of each case from a pilot run of a suite
+
+    Parameters
+    ----------
+    timing_dir : string
+        path to the timing directory of a previous run of the benchmark
+        suite. The timing files of each case are in a subdirectory named
+        after the case, which is nested for the parameter suites (e.g.
+        timing/similarity/0.97), or in the timing log of their parent
+        directory (e.g. timing/similarity/timing.log)
+
+    Returns
+    -------
+    dict of {string: float}
+        The estimated running time of each case, keyed by case name: the
+        largest wall time of its repetitions, so the estimate is on the safe
+        side when packing cases. The cases without a valid timing file are
+        not included. None if timing_dir is not provided
+    """
+    if not timing_dir:
+        return None
+    estimates = {}
+    for dirpath, dirnames, filenames in walk(timing_dir):
+        walls = []
+        for filename in filenames:
+            if filename in (TIMING_LOG_FN, TIMING_CACHE_FN):
+                continue
+            with open(join(dirpath, filename), 'U') as f:
+                info = parse_timing_file(f)
+            if info is not None:
+                walls.append(info[0])
+        if walls:
+            estimates[relpath(dirpath, timing_dir)] = max(walls)
+        if TIMING_LOG_FN in filenames:
+            logged = load_timing_log(join(dirpath, TIMING_LOG_FN))
+            for case, reps in logged.items():
+                walls = [info[0] for info in reps.values() if info is not None]
+                if walls:
+                    name = normpath(join(relpath(dirpath, timing_dir), case))
+                    estimates[name] = max([estimates.get(name, 0)] + walls)
+    return estimates
+
+
+def _add_extra_measurements(case_extra, extra, n):
+    """Adds the extra measurements of a repetition to the case measurements
+
+    The lists in case_extra are kept aligned with the repetitions: a metric
+    missing on some repetition (e.g. a legacy timing file) is stored as NaN
+
+    Parameters
+    ----------
+    case_extra : dict of {string: list of float}
+        The extra measurements of the case
+    extra : dict of {string: float}
+        The extra measurements of the repetition
+    n : int
+        The number of repetitions already added to case_extra
+    """
+    for key in extra:
+        if key not in case_extra:
+            case_extra[key] = [float('nan')] * n
+    for key in case_extra:
+        case_extra[key].append(extra.get(key, float('nan')))
+
+
+def parse_timelines_directory(timelines_dir):
+    """Retrieves the timelines stored in timelines_dir
+
+    Parameters
+    ----------
+    timelines_dir : string
+        path to the directory containing the timelines. It follows the same
+        structure as the timing directory: one directory per case containing
+        one file per repetition
+
+    Returns
+    -------
+    list of (string, list of Timeline)
+        The timelines of each repetition, keyed by case
+    """
+    if not timelines_dir:
+        return None
+    result = []
+    for dirname in natural_sort(listdir(timelines_dir)):
+        dirpath = join(timelines_dir, dirname)
+        if not isdir(dirpath):
+            raise ValueError("%s contains a file: %s. Only directories are "
+                             "allowed!" % (timelines_dir, dirpath))
+        timelines = []
+        for filename in natural_sort(listdir(dirpath)):
+            with open(join(dirpath, filename), 'U') as f:
+                timelines.append(parse_timeline_file(f))
+        result.append((dirname, timelines))
+    return result
+
+
+def parse_job_ids_directory(job_ids_dir):
+    """Retrieves the ids of the jobs that executed each benchmark case
+
+    Parameters
+    ----------
+    job_ids_dir : string
+        path to the directory containing the job ids. It follows the same
+        structure as the timing directory: one directory per case containing
+        one file per repetition, with the id of the job that executed it
+
+    Returns
+    -------
+    dict of {string: list of strings}
+        The ids of the jobs of each case, keyed by case. None if job_ids_dir
+        is not provided
+    """
+    if not job_ids_dir:
+        return None
+    result = {}
+    for dirname in natural_sort(listdir(job_ids_dir)):
+        dirpath = join(job_ids_dir, dirname)
+        if not isdir(dirpath):
+            raise ValueError("%s contains a file: %s. Only directories are "
+                             "allowed!" % (job_ids_dir, dirpath))
+        job_ids = []
+        for filename in natural_sort(listdir(dirpath)):
+            with open(join(dirpath, filename), 'U') as f:
+                job_id = f.read().strip()
+            # The file is empty if the job did not start
+            if job_id:
+                job_ids.append(job_id)
+        result[dirname] = job_ids
+    return result
@@ -11,12 +11,21 @@ __status__ = "Development"
 
 from os import mkdir
 from os.path import join, exists, isfile
+from warnings import warn
 
+import numpy as np
 from pyqi.core.exception import IncompetentDeveloperError
-from pyqi.core.interfaces.optparse.output_handler import write_list_of_strings
+from pyqi.core.interfaces.optparse.output_handler import (
+    write_list_of_strings, write_or_print_list_of_strings)
 
-from scaling.util import generate_poly_label
-from scaling.draw import make_bench_plot, make_comparison_plot
+from scaling.util import (generate_poly_label, natural_sort,
+                          SUMMARY_EXTRA_METRICS)
+from scaling.process_results import get_accounting_mismatches
+from scaling.draw import (make_bench_plot, make_comparison_plot,
+                          make_timeline_plot, make_io_plot)
+
+# I/O measurements, in bytes, plotted alongside the running time
+IO_PLOT_METRICS = ['read_bytes', 'write_bytes', 'rchar', 'wchar']
 
 
 def write_bench_results(result_key, data, option_value=None):
@@ -27,7 +36,7 @@ def write_bench_results(result_key, data, option_value=None):
     result_key : string
         The key used in the results dictionary
     data : BenchData namedtuple
-        The results of the command
+        The results of the command. If None, nothing is written
     option_value : string
         Path to the output directory
 
@@ -36,6 +45,8 @@ def write_bench_results(result_key, data, option_value=None):
     IOError
         If the output directory exists and it's a file
     """
+    if data is None:
+        return
     # Check that we are not dealing with incompetent developers
     if option_value is None:
         raise IncompetentDeveloperError("Cannot write output without an "
@@ -53,22 +64,41 @@ def write_bench_results(result_key, data, option_value=None):
 
     # Write a tab delimited file with a summary of the benchmark results
     summary_fp = join(option_value, "summarized_results.txt")
-    lines = ["\t".join(["#label", "wall_mean", "wall_std", "user_mean",
-                        "user_std", "kernel_mean", "kernel_std",
-                        "mem_mean", "mem_std"])]
+    header = ["#label", "wall_mean", "wall_std", "user_mean", "user_std",
+              "kernel_mean", "kernel_std", "mem_mean", "mem_std"]
+    # The extended measurements are appended as additional columns
+    extra = data.extra if data.extra else {}
+    extra_metrics = [m for m in SUMMARY_EXTRA_METRICS if m in extra]
+    for metric in extra_metrics:
+        header.extend(["%s_mean" % metric, "%s_std" % metric])
+    lines = ["\t".join(header)]
     # Loop over all the tests cases
     for i, label in enumerate(data.labels):
-        lines.append("\t".join([label,
-                                str(data.means.wall[i]),
-                                str(data.stdevs.wall[i]),
-                                str(data.means.user[i]),
-                                str(data.stdevs.user[i]),
-                                str(data.means.kernel[i]),
-                                str(data.stdevs.kernel[i]),
-                                str(data.means.mem[i]),
-                                str(data.stdevs.mem[i])
-                                ]))
+        values = [label,
+                  str(data.means.wall[i]),
+                  str(data.stdevs.wall[i]),
+                  str(data.means.user[i]),
+                  str(data.stdevs.user[i]),
+                  str(data.means.kernel[i]),
+                  str(data.stdevs.kernel[i]),
+                  str(data.means.mem[i]),
+                  str(data.stdevs.mem[i])]
+        for metric in extra_metrics:
+            means, stdevs = extra[metric]
+            values.extend([str(means[i]), str(stdevs[i])])
+        lines.append("\t".join(values))
     write_list_of_strings(result_key, lines, option_value=summary_fp)
+    # Write the same columns to a binary file, so compare-bench-results can
+    # load them without parsing the text file
+    columns = {'label': np.array(data.labels, dtype=str)}
+    values = [data.means.wall, data.stdevs.wall, data.means.user,
+              data.stdevs.user, data.means.kernel, data.stdevs.kernel,
+              data.means.mem, data.stdevs.mem]
+    for metric in extra_metrics:
+        values.extend(extra[metric])
+    for column, value in zip(header[1:], values):
+        columns[column] = np.asarray(value, dtype=np.float64)
+    np.savez(join(option_value, "summarized_results.npz"), **columns)
 
     # Write the polynomials that fit the wall time and memory usage in
     # human-readable form
@@ -79,6 +109,20 @@ def write_bench_results(result_key, data, option_value=None):
              generate_poly_label(data.mem_curve.poly, data.mem_curve.deg)]
     write_list_of_strings(result_key, lines, option_value=poly_fp)
 
+    # Write the drift check of the suite, if the start times were recorded
+    if data.drift is not None:
+        drift_fp = join(option_value, "drift.txt")
+        lines = ["#n\tslope\tr\tt\tdrift",
+                 "\t".join([str(data.drift.n), str(data.drift.slope),
+                            str(data.drift.r), str(data.drift.t),
+                            str(data.drift.drift)])]
+        write_list_of_strings(result_key, lines, option_value=drift_fp)
+        if data.drift.drift:
+            warn("The wall time drifts along the execution of the suite "
+                 "(%+.2f%% per hour, r = %.2f). Consider running the suite "
+                 "with a random or interleaved execution order."
+                 % (data.drift.slope * 100, data.drift.r), RuntimeWarning)
+
     # Create plots with benchmark results
     # Create a plot with the time results
     time_plot_fp = join(option_value, "time_fig.png")
@@ -97,6 +141,302 @@ def write_bench_results(result_key, data, option_value=None):
                     "Memory (GB)", data.mem_curve.poly, data.mem_curve.deg,
                     mem_plot_fp, scale=1024*1024)
 
+    # Create a plot with the I/O results alongside the running time
+    io = dict((metric, extra[metric]) for metric in IO_PLOT_METRICS
+              if metric in extra)
+    if io:
+        io_plot_fp = join(option_value, "io_fig.png")
+        time = {'wall': (data.means.wall, data.stdevs.wall),
+                'user': (data.means.user, data.stdevs.user)}
+        make_io_plot(data.labels, time, io, io_plot_fp)
+
+    # Create a plot with the cold and warm page cache running times side by
+    # side, if the suite has been run with both cache modes
+    if 'warm_wall' in extra:
+        cache_plot_fp = join(option_value, "cache_fig.png")
+        wall = {'cold cache': (data.means.wall, data.stdevs.wall),
+                'warm cache': extra['warm_wall']}
+        make_comparison_plot(data.labels, wall, "Running time",
+                             "Time (seconds)", cache_plot_fp)
+
+
+def write_timelines(result_key, data, option_value=None):
+    """Output handler for the timelines of the bench_results_processer command
+
+    Generates a plot with the memory and CPU usage over time of each case and
+    a tab delimited file with the sampling overhead of each case
+
+    Parameters
+    ----------
+    result_key : string
+        The key used in the results dictionary
+    data : list of (string, list of Timeline)
+        The timelines of each repetition, keyed by case. If None, nothing is
+        written
+    option_value : string
+        Path to the output directory
+
+    Raises
+    ------
+    IOError
+        If the output directory exists and it's a file
+    """
+    if data is None:
+        return
+    # Check that we are not dealing with incompetent developers
+    if option_value is None:
+        raise IncompetentDeveloperError("Cannot write output without an "
+                                        "output directory.")
+
+    # Check that the output directory exists
+    if exists(option_value):
+        # Check that it is not a file, so we can use it
+        if isfile(option_value):
+            raise IOError("Output directory '%s' already exists and it is a "
+                          "file." % option_value)
+    else:
+        # The output directory does not exists, create it
+        mkdir(option_value)
+
+    # Write the sampling overhead: the mean time spent sampling each
+    # repetition and its percentage over the wall time of the repetition.
+    # The timelines that do not record the wall time are not used for the
+    # percentage: the time of their last sample underestimates the duration
+    # of the repetition. The percentage is nan if no timeline records it
+    overhead_fp = join(option_value, "sampling_overhead.txt")
+    lines = ["\t".join(["#label", "overhead_mean", "overhead_pct"])]
+    for label, timelines in data:
+        overheads = [t.overhead for t in timelines]
+        pcts = [100 * t.overhead / t.wall for t in timelines if t.wall]
+        pct = sum(pcts) / len(pcts) if pcts else float('nan')
+        lines.append("\t".join([label,
+                                str(sum(overheads) / max(len(overheads), 1)),
+                                str(pct)]))
+    write_list_of_strings(result_key, lines, option_value=overhead_fp)
+
+    # Create a plot with the memory and CPU usage over time
+    timeline_plot_fp = join(option_value, "timeline_fig.png")
+    make_timeline_plot(data, timeline_plot_fp)
+
+
+def write_job_statuses(result_key, data, option_value=None):
+    """Output handler for the job statuses of the bench_results_processer
+
+    Writes a tab delimited file with the final state, exit status, queue
+    wait and run time of each job, and warns if any job failed
+
+    Parameters
+    ----------
+    result_key : string
+        The key used in the results dictionary
+    data : dict of {string: JobStatus}
+        The status of each job, keyed by job id. If None, nothing is written
+    option_value : string
+        Path to the output directory
+
+    Raises
+    ------
+    IOError
+        If the output directory exists and it's a file
+    """
+    if data is None:
+        return
+    # Check that we are not dealing with incompetent developers
+    if option_value is None:
+        raise IncompetentDeveloperError("Cannot write output without an "
+                                        "output directory.")
+
+    # Check that the output directory exists
+    if exists(option_value):
+        # Check that it is not a file, so we can use it
+        if isfile(option_value):
+            raise IOError("Output directory '%s' already exists and it is a "
+                          "file." % option_value)
+    else:
+        # The output directory does not exists, create it
+        mkdir(option_value)
+
+    lines = ["\t".join(["#job_id", "state", "exit_status", "queue_wait",
+                        "run_time"])]
+    failed = []
+    for job_id in natural_sort(list(data)):
+        status = data[job_id]
+        lines.append("\t".join(str(v) for v in status))
+        if status.exit_status:
+            failed.append(job_id)
+    job_times_fp = join(option_value, "job_times.txt")
+    write_list_of_strings(result_key, lines, option_value=job_times_fp)
+    if failed:
+        warn("%d jobs finished with a non-zero exit status: %s. The timing "
+             "results of those jobs may be missing or incomplete"
+             % (len(failed), ", ".join(failed)), RuntimeWarning)
+
+
+def write_job_records(result_key, data, option_value=None):
+    """Output handler for the job records of the job_submitter command
+
+    Writes a tab delimited file with the submission, start and end times and
+    the exit status of each job, and warns if any job failed
+
+    Parameters
+    ----------
+    result_key : string
+        The key used in the results dictionary
+    data : list of JobRecord
+        The submitted jobs
+    option_value : string
+        Path to the output directory
+
+    Raises
+    ------
+    IOError
+        If the output directory exists and it's a file
+    """
+    # Check that we are not dealing with incompetent developers
+    if option_value is None:
+        raise IncompetentDeveloperError("Cannot write output without an "
+                                        "output directory.")
+
+    # Check that the output directory exists
+    if exists(option_value):
+        # Check that it is not a file, so we can use it
+        if isfile(option_value):
+            raise IOError("Output directory '%s' already exists and it is a "
+                          "file." % option_value)
+    else:
+        # The output directory does not exists, create it
+        mkdir(option_value)
+
+    lines = ["\t".join(["#name", "job_id", "submit_time", "start_time",
+                        "end_time", "exit_status"])]
+    failed = []
+    for record in data:
+        lines.append("\t".join(str(v) for v in record))
+        if record.exit_status:
+            failed.append(record.name)
+    submissions_fp = join(option_value, "submissions.txt")
+    write_list_of_strings(result_key, lines, option_value=submissions_fp)
+    if failed:
+        warn("%d jobs finished with a non-zero exit status: %s"
+             % (len(failed), ", ".join(failed)), RuntimeWarning)
+
+
+def write_throughput(result_key, data, option_value=None):
+    """Output handler for the throughput of the job_submitter command
+
+    Parameters
+    ----------
+    result_key : string
+        The key used in the results dictionary
+    data : Throughput
+        The effective throughput of the submitted jobs
+    option_value : string
+        Path to the output directory
+
+    Raises
+    ------
+    IOError
+        If the output directory exists and it's a file
+    """
+    # Check that we are not dealing with incompetent developers
+    if option_value is None:
+        raise IncompetentDeveloperError("Cannot write output without an "
+                                        "output directory.")
+
+    # Check that the output directory exists
+    if exists(option_value):
+        # Check that it is not a file, so we can use it
+        if isfile(option_value):
+            raise IOError("Output directory '%s' already exists and it is a "
+                          "file." % option_value)
+    else:
+        # The output directory does not exists, create it
+        mkdir(option_value)
+
+    lines = ["\t".join(["#jobs", "makespan", "jobs_per_hour",
+                        "mean_queue_wait"]),
+             "\t".join(str(v) for v in data)]
+    throughput_fp = join(option_value, "throughput.txt")
+    write_list_of_strings(result_key, lines, option_value=throughput_fp)
+
+
+def write_accounting_check(result_key, data, option_value=None):
+    """Output handler for the accounting check of the bench_results_processer
+
+    Writes a tab delimited file with the mean measurements of each case next
+    to the mean accounting of its jobs, and warns if they disagree (see
+    get_accounting_mismatches)
+
+    Parameters
+    ----------
+    result_key : string
+        The key used in the results dictionary
+    data : list of AccountingCheck
+        The comparison of each case. If None, nothing is written
+    option_value : string
+        Path to the output directory
+
+    Raises
+    ------
+    IOError
+        If the output directory exists and it's a file
+    """
+    if data is None:
+        return
+    # Check that we are not dealing with incompetent developers
+    if option_value is None:
+        raise IncompetentDeveloperError("Cannot write output without an "
+                                        "output directory.")
+
+    # Check that the output directory exists
+    if exists(option_value):
+        # Check that it is not a file, so we can use it
+        if isfile(option_value):
+            raise IOError("Output directory '%s' already exists and it is a "
+                          "file." % option_value)
+    else:
+        # The output directory does not exists, create it
+        mkdir(option_value)
+
+    lines = ["\t".join(["#label", "wall", "elapsed", "cpu", "total_cpu",
+                        "mem", "max_rss", "mismatches"])]
+    mismatched = []
+    for check in data:
+        mismatches = get_accounting_mismatches(check)
+        lines.append("\t".join([str(v) for v in check] +
+                               [",".join(mismatches) or "-"]))
+        if mismatches:
+            mismatched.append("%s (%s)" % (check.label, ", ".join(mismatches)))
+    check_fp = join(option_value, "accounting_check.txt")
+    write_list_of_strings(result_key, lines, option_value=check_fp)
+    if mismatched:
+        warn("The measurements of %d cases disagree with the accounting of "
+             "their jobs: %s" % (len(mismatched), "; ".join(mismatched)),
+             RuntimeWarning)
+
+
+def write_bench_runs(result_key, data, option_value=None):
+    """Output handler for the bench_results_querier command
+
+    Writes a tab delimited table with the runs of a results database, with
+    a "-" for the unknown values
+
+    Parameters
+    ----------
+    result_key : string
+        The key used in the results dictionary
+    data : list of BenchRun
+        The runs of the database
+    option_value : string, optional
+        Path to the output file. If not provided, the table is printed
+    """
+    lines = ["\t".join(["#run_id", "command", "parameter", "host",
+                        "version", "label", "timestamp", "source", "cases",
+                        "reps"])]
+    for run in data:
+        lines.append("\t".join("-" if v is None else str(v) for v in run))
+    write_or_print_list_of_strings(result_key, lines, option_value)
+
 
 def write_comp_results(result_key, data, option_value=None):
     """Output handler for the bench_results_processer command
@@ -106,7 +446,7 @@ def write_comp_results(result_key, data, option_value=None):
     result_key : string
         The key used in the results dictionary
     data : CompData namedtuple
-        The results of the command
+        The results of the command. If None, nothing is written
     option_value : string
         Path to the output directory
 
@@ -115,6 +455,8 @@ def write_comp_results(result_key, data, option_value=None):
     IOError
         If the output directory exists and it's a file
     """
+    if data is None:
+        return
     # Check that we are not dealing with incompetent developers
     if option_value is None:
         raise IncompetentDeveloperError("Cannot write output without an "
@@ -9,16 +9,28 @@ __maintainer__ = "Jose Antonio Navas Molina"
 __email__ = "josenavasmolina@gmail.com"
 __status__ = "Development"
 
-from os import mkdir
-from os.path import join
-from shutil import rmtree
+from os import mkdir, utime, remove, listdir
+from marshal import dump, load
+from os.path import join, exists
+from shutil import rmtree, copyfile, copytree
 from unittest import TestCase, main
 from tempfile import mkdtemp
+from warnings import catch_warnings, simplefilter
+
+import numpy as np
+from numpy.testing import assert_equal
 
 from scaling.parse import BenchSummary
 from scaling.interfaces.optparse.input_handler import (
-    load_summarized_results_list, load_parameters, get_bench_paths,
-    parse_timing_directory, BenchCase)
+    load_summarized_results_list, get_summary_npz_fp, load_parameters,
+    get_bench_paths, parse_timing_directory, parse_timelines_directory,
+    BenchCase, load_case_time_estimates, load_job_list, load_case_resources,
+    parse_job_ids_directory, load_timing_directories, read_timing_files,
+    load_archived_summary)
+from scaling.util import (Timeline, ResourceRequest, TimingRecord,
+                          TIMING_CACHE_FN)
+from scaling.timing_log import convert_timing_directory, append_timing_log
+from scaling.archive import make_bench_archive
 
 
 class InputHandlerTests(TestCase):
@@ -71,6 +83,16 @@ class InputHandlerTests(TestCase):
         self.summary_fp_2 = join(self.output_dir, 'summary_2')
         with open(self.summary_fp_2, 'w') as f:
             f.write(summary_data)
+        self.summary_npz_fp = join(self.output_dir, 'summarized_results.npz')
+        np.savez(self.summary_npz_fp, label=np.array(['100', '200']),
+                 wall_mean=np.array([20.0, 40.0]),
+                 wall_std=np.array([1.0, 2.0]),
+                 user_mean=np.array([18.0, 36.0]),
+                 user_std=np.array([1.0, 2.0]),
+                 kernel_mean=np.array([2.0, 4.0]),
+                 kernel_std=np.array([0.0, 0.0]),
+                 mem_mean=np.array([1024.0, 2048.0]),
+                 mem_std=np.array([0.0, 0.0]))
 
         # Create a directory with bench results
         self.results_dir = mkdtemp(dir=self.output_dir)
@@ -150,6 +172,28 @@ class InputHandlerTests(TestCase):
         for o in obs:
             self.assertEqual(type(o), BenchSummary)
 
+    def test_load_summarized_results_list_npz(self):
+        """Loads the binary summary if it is next to the text file"""
+        summary_fp = join(self.output_dir, 'summarized_results.txt')
+        copyfile(self.summary_fp_1, summary_fp)
+        # The binary summary is older than the text one
+        utime(self.summary_npz_fp, (0, 0))
+        self.assertEqual(get_summary_npz_fp(summary_fp), None)
+        obs = list(load_summarized_results_list([summary_fp]))
+        self.assertEqual(obs[0].wall_mean, [25, 50, 75, 100, 125])
+
+        utime(self.summary_npz_fp, None)
+        utime(summary_fp, (0, 0))
+        self.assertEqual(get_summary_npz_fp(summary_fp), self.summary_npz_fp)
+        obs = list(load_summarized_results_list([summary_fp,
+                                                 self.summary_npz_fp,
+                                                 self.summary_fp_1]))
+        self.assertEqual(len(obs), 3)
+        for o in obs[:2]:
+            self.assertEqual(o.label, ['100', '200'])
+            assert_equal(o.wall_mean, [20.0, 40.0])
+        self.assertEqual(obs[2].label, ['100', '200', '300', '400', '500'])
+
     def test_get_bench_paths(self):
         """Correctly traverses the input directories and creates paths list"""
         obs = get_bench_paths([self.bench_dir_1])
@@ -183,6 +227,253 @@ class InputHandlerTests(TestCase):
                ]
         self.assertEqual(obs, exp)
 
+    def test_parse_timing_directory_extended(self):
+        """Correctly retrieves the extended measurements"""
+        case_dir = join(self.results_dir, '40')
+        mkdir(case_dir)
+        with open(join(case_dir, '0.txt'), 'w') as f:
+            f.write("1600.5;1500.25;40.75;36000000;minflt=10;nvcsw=4;"
+                    "status=0;signal=0\n")
+        with open(join(case_dir, '1.txt'), 'w') as f:
+            f.write("1580.5;1490.25;39.75;36000100\n")
+        with open(join(case_dir, '2.txt'), 'w') as f:
+            f.write("1590.5;1495.25;38.75;36000200;minflt=12;nvcsw=2;"
+                    "status=0;signal=0\n")
+        with open(join(case_dir, '3.txt'), 'w') as f:
+            f.write("0.5;0.25;0.75;3600;minflt=12;nvcsw=2;status=1;"
+                    "signal=0\n")
+
+        with catch_warnings(record=True):
+            simplefilter('always')
+            obs = list(parse_timing_directory(self.results_dir))
+        self.assertEqual(obs[0].extra, None)
+        obs = obs[3]
+        self.assertEqual(obs.wall, [1600.5, 1580.5, 1590.5])
+        self.assertEqual(obs.mem, [36000000, 36000100, 36000200])
+        self.assertEqual(sorted(obs.extra), ['minflt', 'nvcsw'])
+        assert_equal(obs.extra['minflt'], [10, np.nan, 12])
+        assert_equal(obs.extra['nvcsw'], [4, np.nan, 2])
+
+    def test_parse_timing_directory_censored(self):
+        """Correctly flags the censored repetitions"""
+        case_dir = join(self.results_dir, '40')
+        mkdir(case_dir)
+        with open(join(case_dir, '0.txt'), 'w') as f:
+            f.write("1600.5;1500.25;40.75;36000000;status=0;signal=0\n")
+        with open(join(case_dir, '1.txt'), 'w') as f:
+            f.write("3600.0;3500.25;39.75;36000100;status=0;signal=9;"
+                    "censored=timeout\n")
+
+        obs = list(parse_timing_directory(self.results_dir))
+        self.assertEqual(obs[0].censored, None)
+        obs = obs[3]
+        self.assertEqual(obs.wall, [1600.5, 3600.0])
+        self.assertEqual(obs.censored, [False, True])
+        self.assertEqual(obs.extra, None)
+
+    def test_parse_timing_directory_log(self):
+        """Correctly retrieves the measurements from the timing log"""
+        exp = list(parse_timing_directory(self.results_dir))
+        # The timing files converted to the log are not used twice
+        convert_timing_directory(self.results_dir)
+        self.assertEqual(list(parse_timing_directory(self.results_dir)), exp)
+        for case in ['10', '20', '30']:
+            rmtree(join(self.results_dir, case))
+        self.assertEqual(list(parse_timing_directory(self.results_dir)), exp)
+
+        # The repetitions of the log take precedence over the timing files
+        log_fp = join(self.results_dir, 'timing.log')
+        case_dir = join(self.results_dir, '40')
+        mkdir(case_dir)
+        with open(join(case_dir, '0.txt'), 'w') as f:
+            f.write("1600.5;1500.25;40.75;36000000\n")
+        with open(join(case_dir, '1.txt'), 'w') as f:
+            f.write("1580.5;1490.25;39.75;36000100\n")
+        record = TimingRecord(1590.5, 1495.25, 38.75, 36000200, 12, 0, 2, 0,
+                              0, 0, 0, 0)
+        append_timing_log(log_fp, '40', 1, record)
+        append_timing_log(log_fp, '40', 2, record._replace(status=1))
+        with open(log_fp, 'a') as f:
+            f.write("40\t3\t1.0;0.5")
+        with catch_warnings(record=True) as w:
+            simplefilter('always')
+            obs = list(parse_timing_directory(self.results_dir))
+        self.assertEqual(obs[:3], exp)
+        self.assertEqual(obs[3].wall, [1600.5, 1590.5])
+        assert_equal(obs[3].extra['minflt'], [np.nan, 12])
+        self.assertEqual(sorted(str(x.message) for x in w),
+                         ["Line 18 of %s not used" % log_fp,
+                          "Repetition 2 of 40 in %s not used" % log_fp])
+
+    def test_parse_timing_directory_archive(self):
+        """Correctly retrieves the measurements from an archive"""
+        exp = list(parse_timing_directory(self.results_dir))
+        archive_fp = join(self.output_dir, 'results.tar.gz')
+        make_bench_archive(self.results_dir, archive_fp)
+        self.assertEqual(list(parse_timing_directory(archive_fp)), exp)
+
+        # The timing directory can be inside the archive, and it may have a
+        # timing log
+        suite_dir = join(self.output_dir, 'suite')
+        mkdir(suite_dir)
+        copytree(self.results_dir, join(suite_dir, 'similarity'))
+        log_fp = join(suite_dir, 'similarity', 'timing.log')
+        record = TimingRecord(1590.5, 1495.25, 38.75, 36000200, 12, 0, 2, 0,
+                              0, 0, 0, 0)
+        append_timing_log(log_fp, '40', 0, record)
+        append_timing_log(log_fp, '40', 1, record._replace(status=1))
+        mkdir(join(suite_dir, 'similarity', '50'))
+        archive_fp = join(self.output_dir, 'suite.zip')
+        make_bench_archive(suite_dir, archive_fp)
+        timing_dir = join(archive_fp, 'similarity')
+        with catch_warnings(record=True) as w:
+            simplefilter('always')
+            obs = list(parse_timing_directory(timing_dir))
+        self.assertEqual(obs[:3], exp)
+        self.assertEqual(obs[3].wall, [1590.5])
+        self.assertEqual(obs[3].extra['minflt'], [12])
+        self.assertEqual(obs[4], BenchCase('50', [], [], [], [], None, None))
+        self.assertEqual([str(x.message) for x in w],
+                         ["Repetition 1 of 40 in %s not used"
+                          % join(timing_dir, 'timing.log')])
+
+        with self.assertRaises(ValueError):
+            list(parse_timing_directory(join(archive_fp, 'foo')))
+        # The case directories cannot be nested
+        with self.assertRaises(ValueError):
+            list(parse_timing_directory(archive_fp))
+        # Only directories are allowed besides the timing log
+        with open(join(suite_dir, 'similarity', 'foo.txt'), 'w') as f:
+            f.write('bar\n')
+        archive_fp = join(self.output_dir, 'suite.tar.bz2')
+        make_bench_archive(suite_dir, archive_fp)
+        with self.assertRaises(ValueError):
+            list(parse_timing_directory(join(archive_fp, 'similarity')))
+
+    def test_load_summarized_results_list_archive(self):
+        """Correctly loads the results summary stored in an archive"""
+        out_dir = join(self.output_dir, 'out')
+        mkdir(out_dir)
+        copyfile(self.summary_fp_1, join(out_dir, 'summarized_results.txt'))
+        archive_fp = join(self.output_dir, 'out.tar.gz')
+        make_bench_archive(out_dir, archive_fp)
+        obs = list(load_summarized_results_list(
+            [archive_fp, join(archive_fp, 'summarized_results.txt')]))
+        for o in obs:
+            self.assertEqual(o.label, ['100', '200', '300', '400', '500'])
+            self.assertEqual(o.mem_mean, [1048576, 2097152, 3145728,
+                                          4194304, 5242880])
+
+        # The binary summary is preferred
+        copyfile(self.summary_npz_fp, join(out_dir, 'summarized_results.npz'))
+        archive_fp = join(self.output_dir, 'out.tar.xz')
+        make_bench_archive(out_dir, archive_fp)
+        obs = load_archived_summary(archive_fp)
+        self.assertEqual(obs.label, ['100', '200'])
+        assert_equal(obs.wall_mean, [20.0, 40.0])
+
+        # The archive should contain a single results summary
+        copytree(out_dir, join(out_dir, 'run2'))
+        archive_fp = join(self.output_dir, 'out.zip')
+        make_bench_archive(out_dir, archive_fp)
+        with self.assertRaises(ValueError):
+            load_archived_summary(archive_fp)
+        with self.assertRaises(ValueError):
+            load_archived_summary(archive_fp, 'foo')
+        obs = load_archived_summary(archive_fp, 'run2')
+        self.assertEqual(obs.label, ['100', '200'])
+
+    def test_load_timing_directories(self):
+        """Correctly retrieves the measurements of several directories"""
+        exp = list(parse_timing_directory(self.results_dir))
+        obs = load_timing_directories([self.results_dir, self.results_dir])
+        self.assertEqual(obs, [(self.results_dir, exp),
+                               (self.results_dir, exp)])
+
+    def test_parse_timelines_directory(self):
+        """Correctly retrieves the timelines of each case"""
+        timelines_dir = join(self.output_dir, 'timelines')
+        mkdir(timelines_dir)
+        for case in ['20', '10']:
+            mkdir(join(timelines_dir, case))
+            for rep in ['1', '2']:
+                with open(join(timelines_dir, case, rep + '.txt'), 'w') as f:
+                    f.write("#overhead\t0.001\n#time\trss\tcpu\n"
+                            "0.1\t1024\t0.05\n0.2\t%s\t0.15\n" % case)
+        obs = parse_timelines_directory(timelines_dir)
+        # Timelines without the procs column come from a single process
+        exp = [('10', [Timeline([0.1, 0.2], [1024, 10], [0.05, 0.15], [1, 1],
+                                0.001),
+                       Timeline([0.1, 0.2], [1024, 10], [0.05, 0.15], [1, 1],
+                                0.001)]),
+               ('20', [Timeline([0.1, 0.2], [1024, 20], [0.05, 0.15], [1, 1],
+                                0.001),
+                       Timeline([0.1, 0.2], [1024, 20], [0.05, 0.15], [1, 1],
+                                0.001)])]
+        self.assertEqual(obs, exp)
+        self.assertEqual(parse_timelines_directory(None), None)
+
+    def test_parse_timing_directory_cache(self):
+        """Only reads the timing files not in the parse cache"""
+        exp = list(parse_timing_directory(self.results_dir, jobs=1,
+                                          use_cache=False))
+        cache_fp = join(self.results_dir, TIMING_CACHE_FN)
+        self.assertFalse(exists(cache_fp))
+        self.assertEqual(list(parse_timing_directory(self.results_dir)), exp)
+        self.assertTrue(exists(cache_fp))
+
+        # The records of the files not modified are taken from the cache
+        with open(cache_fp, 'rb') as f:
+            version, files = load(f)
+        files['10/0.txt'] = files['10/0.txt'][:2] + ((1.0, 388.29, 11.35,
+                                                      9710640, {}),)
+        with open(cache_fp, 'wb') as f:
+            dump((version, files), f)
+        obs = list(parse_timing_directory(self.results_dir))
+        self.assertEqual(obs[0].wall[0], 1.0)
+        self.assertEqual(obs[1:], exp[1:])
+        # The modified files are read again
+        case_file = join(self.results_dir, '10', '0.txt')
+        with open(case_file, 'w') as f:
+            f.write("415.30;388.29;11.35;9710640")
+        obs = list(parse_timing_directory(self.results_dir))
+        self.assertEqual(obs[0].wall, [415.30, 392.73, 396.18, 392.42,
+                                       390.61])
+        # The removed files are dropped from the cache
+        remove(join(self.results_dir, '30', '4.txt'))
+        obs = list(parse_timing_directory(self.results_dir))
+        self.assertEqual(obs[2], BenchCase('30', exp[2].wall[:4],
+                                           exp[2].user[:4], exp[2].kernel[:4],
+                                           exp[2].mem[:4]))
+        with open(cache_fp, 'rb') as f:
+            self.assertEqual(len(load(f)[1]), 14)
+        # A damaged cache is not used
+        with open(cache_fp, 'w') as f:
+            f.write("{'files")
+        self.assertEqual(list(parse_timing_directory(self.results_dir))[1:],
+                         exp[1:2] + obs[2:])
+
+    def test_read_timing_files(self):
+        """Correctly reads the timing files with a pool of threads"""
+        files = {'10/0.txt': (27, 0.0), '20/4.txt': (27, 0.0)}
+        exp = {'10/0.txt': (415.29, 388.29, 11.35, 9710640, {}),
+               '20/4.txt': (784.72, 763.28, 11.36, 18744976, {})}
+        self.assertEqual(read_timing_files(self.results_dir, files, jobs=4,
+                                           use_cache=False), exp)
+        self.assertEqual(read_timing_files(self.results_dir, files), exp)
+        self.assertEqual(read_timing_files(self.results_dir, files), exp)
+        # The files are still read if the cache cannot be written
+        cache_fp = join(self.results_dir, TIMING_CACHE_FN)
+        remove(cache_fp)
+        mkdir(cache_fp)
+        with open(join(cache_fp, 'foo'), 'w') as f:
+            f.write('')
+        obs = read_timing_files(self.results_dir, {'10/1.txt': (27, 0.0)})
+        self.assertEqual(obs, {'10/1.txt': (392.73, 381.52, 5.60, 9710576,
+                                            {})})
+        self.assertEqual(sorted(listdir(self.results_dir)),
+                         sorted(['10', '20', '30', TIMING_CACHE_FN]))
+
     def test_parse_timing_directory_bad(self):
         """Raises error with a wrong directory structure"""
         with open(join(self.results_dir, 'foo.txt'), 'w') as f:
@@ -191,6 +482,71 @@ class InputHandlerTests(TestCase):
         with self.assertRaises(ValueError):
             list(parse_timing_directory(self.results_dir))
 
+    def test_load_case_time_estimates(self):
+        """Correctly estimates the running time of each case"""
+        obs = load_case_time_estimates(self.results_dir)
+        self.assertEqual(obs, {'10': 415.29, '20': 820.33, '30': 1240.57})
+
+        # The cases of the parameter suites are nested, and the cases
+        # without a valid timing file are not estimated
+        timing_dir = join(self.output_dir, 'timing')
+        mkdir(timing_dir)
+        mkdir(join(timing_dir, 'similarity'))
+        for val, content in [('0.94', '12.5;10.1;1.2;1024'),
+                             ('0.97', 'Command terminated by signal 9')]:
+            mkdir(join(timing_dir, 'similarity', val))
+            with open(join(timing_dir, 'similarity', val, '0.txt'), 'w') as f:
+                f.write(content)
+        obs = load_case_time_estimates(timing_dir)
+        self.assertEqual(obs, {'similarity/0.94': 12.5})
+        self.assertEqual(load_case_time_estimates(None), None)
+
+        # The cases in the timing logs are estimated in the same way
+        convert_timing_directory(join(timing_dir, 'similarity'), remove=True)
+        record = TimingRecord(30.5, 25.0, 2.5, 2048, 0, 0, 0, 0, 0, 0, 0, 0)
+        append_timing_log(join(timing_dir, 'similarity', 'timing.log'),
+                          '0.99', 1, record)
+        convert_timing_directory(self.results_dir, remove=True)
+        self.assertEqual(load_case_time_estimates(timing_dir),
+                         {'similarity/0.94': 12.5, 'similarity/0.99': 30.5})
+        self.assertEqual(load_case_time_estimates(self.results_dir),
+                         {'10': 415.29, '20': 820.33, '30': 1240.57})
+
+    def test_load_job_list(self):
+        """Correctly loads the list of jobs to submit"""
+        job_list_fp = join(self.output_dir, 'jobs.txt')
+        with open(job_list_fp, 'w') as f:
+            f.write("bench_0 cd /tmp; true\nbench_1 cd /tmp; false\n")
+        obs = load_job_list(job_list_fp)
+        self.assertEqual(obs, [('bench_0', 'cd /tmp; true'),
+                               ('bench_1', 'cd /tmp; false')])
+
+    def test_load_case_resources(self):
+        """Correctly loads the resources requested for each case"""
+        resources_fp = join(self.output_dir, 'resources.txt')
+        with open(resources_fp, 'w') as f:
+            f.write("#case\ttime\tmem\tcpus\n10\t60\t-\t2\n")
+        obs = load_case_resources(resources_fp)
+        self.assertEqual(obs, {'10': ResourceRequest(60, None, 2)})
+        self.assertEqual(load_case_resources(None), None)
+
+    def test_parse_job_ids_directory(self):
+        """Correctly retrieves the ids of the jobs of each case"""
+        job_ids_dir = join(self.output_dir, 'job_ids')
+        mkdir(job_ids_dir)
+        for case, ids in [('10', ['4_1\n', '4_2\n']), ('20', ['5\n', ''])]:
+            mkdir(join(job_ids_dir, case))
+            for i, job_id in enumerate(ids):
+                with open(join(job_ids_dir, case, '%d.txt' % i), 'w') as f:
+                    f.write(job_id)
+        obs = parse_job_ids_directory(job_ids_dir)
+        self.assertEqual(obs, {'10': ['4_1', '4_2'], '20': ['5']})
+        self.assertEqual(parse_job_ids_directory(None), None)
+        with open(join(job_ids_dir, 'foo.txt'), 'w') as f:
+            f.write("1\n")
+        with self.assertRaises(ValueError):
+            parse_job_ids_directory(job_ids_dir)
+
 
 if __name__ == '__main__':
     main()
@@ -10,18 +10,29 @@ __email__ = "josenavasmolina@gmail.com"
 __status__ = "Development"
 
 from imghdr import what
-from os.path import join
+from os.path import join, exists
 from shutil import rmtree
 from unittest import TestCase, main
 from tempfile import mkdtemp
+from warnings import catch_warnings, simplefilter
 
+import numpy as np
+from numpy.testing import assert_equal
 from pyqi.core.exception import IncompetentDeveloperError
 
 from scaling.process_results import (SummarizedResults, BenchData, FittedCurve,
                                      CompData)
 
+from scaling.util import (Timeline, DriftCheck, JobStatus, JobRecord,
+                          Throughput, AccountingCheck, BenchRun)
 from scaling.interfaces.optparse.output_handler import (write_bench_results,
-                                                        write_comp_results)
+                                                        write_comp_results,
+                                                        write_timelines,
+                                                        write_job_statuses,
+                                                        write_job_records,
+                                                        write_throughput,
+                                                        write_accounting_check,
+                                                        write_bench_runs)
 
 
 class OutputHandlerTests(TestCase):
@@ -103,6 +114,101 @@ class OutputHandlerTests(TestCase):
         fp = join(self.output_dir, 'mem_fig.png')
         self.assertEqual(what(fp), 'png')
 
+    def test_write_bench_results_extra(self):
+        """Correctly writes the extended measurements as additional columns"""
+        extra = {'tree_procs': ([1, 2, 3, 4, 5], [0.0, 0.0, 0.5, 0.0, 0.0]),
+                 'tree_rss': ([2048, 4096, 6144, 8192, 10240],
+                              [1, 2, 3, 4, 5])}
+        data = self.num_data._replace(extra=extra)
+        write_bench_results('bench_data', data, self.output_dir)
+
+        fp = join(self.output_dir, 'summarized_results.txt')
+        with open(fp, 'U') as f:
+            obs = f.read()
+        exp = ("#label\twall_mean\twall_std\tuser_mean\tuser_std\t"
+               "kernel_mean\tkernel_std\tmem_mean\tmem_std\ttree_rss_mean\t"
+               "tree_rss_std\ttree_procs_mean\ttree_procs_std\n"
+               "100\t25\t1\t23\t0.9\t2\t0.1\t1048576\t0.0\t2048\t1\t1\t0.0\n"
+               "200\t50\t2\t46\t2\t4\t0.0\t2097152\t0.0\t4096\t2\t2\t0.0\n"
+               "300\t75\t3\t70\t2.9\t5\t0.001\t3145728\t0.0\t6144\t3\t3\t"
+               "0.5\n"
+               "400\t100\t4\t94\t4.1\t6\t0.2\t4194304\t0.2\t8192\t4\t4\t"
+               "0.0\n"
+               "500\t125\t5\t123\t5\t2\t0.02\t5242880\t0.0\t10240\t5\t5\t"
+               "0.0\n")
+        self.assertEqual(obs, exp)
+        # There are no I/O measurements to plot
+        self.assertFalse(exists(join(self.output_dir, 'io_fig.png')))
+
+    def test_write_bench_results_npz(self):
+        """Correctly writes the binary summary alongside the text file"""
+        extra = {'tree_rss': ([2048, 4096, 6144, 8192, 10240],
+                              [1, 2, 3, 4, 5])}
+        data = self.str_data._replace(extra=extra)
+        write_bench_results('bench_data', data, self.output_dir)
+        fp = join(self.output_dir, 'summarized_results.npz')
+        with np.load(fp) as obs:
+            self.assertEqual(sorted(obs.files),
+                             ['kernel_mean', 'kernel_std', 'label',
+                              'mem_mean', 'mem_std', 'tree_rss_mean',
+                              'tree_rss_std', 'user_mean', 'user_std',
+                              'wall_mean', 'wall_std'])
+            self.assertEqual(obs['label'].tolist(), self.str_data.labels)
+            assert_equal(obs['wall_mean'], [25, 50, 75, 100, 125])
+            assert_equal(obs['kernel_std'], [0.1, 0.0, 0.001, 0.2, 0.02])
+            assert_equal(obs['tree_rss_std'], [1, 2, 3, 4, 5])
+
+    def test_write_bench_results_io(self):
+        """Correctly plots the I/O measurements"""
+        extra = {'read_bytes': ([1024, 2048, 3072, 4096, 5120],
+                                [0, 0, 0, 0, 0]),
+                 'wchar': ([2048, 4096, 6144, 8192, 10240],
+                           [1, 2, 3, 4, 5]),
+                 'syscr': ([10, 20, 30, 40, 50], [0, 0, 0, 0, 0])}
+        data = self.str_data._replace(extra=extra)
+        write_bench_results('bench_data', data, self.output_dir)
+        fp = join(self.output_dir, 'summarized_results.txt')
+        with open(fp, 'U') as f:
+            header = f.readline().strip().split('\t')
+        self.assertEqual(header[9:], ['read_bytes_mean', 'read_bytes_std',
+                                      'wchar_mean', 'wchar_std', 'syscr_mean',
+                                      'syscr_std'])
+        fp = join(self.output_dir, 'io_fig.png')
+        self.assertEqual(what(fp), 'png')
+
+    def test_write_bench_results_cache(self):
+        """Correctly plots the cold and warm cache running times"""
+        extra = {'warm_wall': ([20, 40, 60, 80, 100], [1, 1, 1, 1, 1]),
+                 'warm_mem': ([1048576, 2097152, 3145728, 4194304, 5242880],
+                              [0, 0, 0, 0, 0])}
+        data = self.num_data._replace(extra=extra)
+        write_bench_results('bench_data', data, self.output_dir)
+        fp = join(self.output_dir, 'summarized_results.txt')
+        with open(fp, 'U') as f:
+            header = f.readline().strip().split('\t')
+        self.assertEqual(header[9:], ['warm_wall_mean', 'warm_wall_std',
+                                      'warm_mem_mean', 'warm_mem_std'])
+        fp = join(self.output_dir, 'cache_fig.png')
+        self.assertEqual(what(fp), 'png')
+
+    def test_write_bench_results_drift(self):
+        """Correctly writes the drift check and warns about the drift"""
+        no_drift_dir = join(self.output_dir, 'no_drift')
+        write_bench_results('bench_data', self.num_data, no_drift_dir)
+        self.assertFalse(exists(join(no_drift_dir, 'drift.txt')))
+
+        data = self.num_data._replace(drift=DriftCheck(0.5, 0.9, 5.2, 10,
+                                                       True))
+        with catch_warnings(record=True) as w:
+            simplefilter('always')
+            write_bench_results('bench_data', data, self.output_dir)
+        self.assertEqual(len(w), 1)
+        self.assertTrue(issubclass(w[0].category, RuntimeWarning))
+        with open(join(self.output_dir, 'drift.txt'), 'U') as f:
+            obs = f.read()
+        self.assertEqual(obs, "#n\tslope\tr\tt\tdrift\n10\t0.5\t0.9\t5.2\t"
+                         "True\n")
+
     def test_write_bench_results_correct_str(self):
         """Correctly writes the bench results with string labels"""
         write_bench_results('bench_data', self.str_data, self.output_dir)
@@ -134,6 +240,140 @@ class OutputHandlerTests(TestCase):
         fp = join(self.output_dir, 'mem_fig.png')
         self.assertEqual(what(fp), 'png')
 
+    def test_write_timelines(self):
+        """Correctly writes the timelines plot and sampling overhead"""
+        # The overhead is relative to the wall time of the repetition, not to
+        # the time of its last sample
+        timelines = [('10', [Timeline([0.1, 0.2], [1024, 2048], [0.05, 0.15],
+                                      [1, 2], 0.002, 0.4),
+                             Timeline([0.1, 0.4], [1024, 4096], [0.05, 0.35],
+                                      [1, 3], 0.004, 0.8)]),
+                     ('20', [Timeline([0.1, 0.2, 0.3], [1024, 2048, 3072],
+                                      [0.05, 0.15, 0.25], [1, 1, 1], 0.003,
+                                      0.6),
+                             Timeline([0.1], [1024], [0.05], [1], 0.5)]),
+                     ('30', [Timeline([0.1], [1024], [0.05], [1], 0.001)])]
+        write_timelines('timelines', timelines, self.output_dir)
+        fp = join(self.output_dir, 'sampling_overhead.txt')
+        with open(fp, 'U') as f:
+            obs = [l.split('\t') for l in f.read().splitlines()]
+        self.assertEqual(obs[0], ['#label', 'overhead_mean', 'overhead_pct'])
+        self.assertEqual([l[0] for l in obs[1:]], ['10', '20', '30'])
+        self.assertAlmostEqual(float(obs[1][1]), 0.003)
+        self.assertAlmostEqual(float(obs[1][2]), 0.5)
+        # The timelines without wall time are not used for the percentage
+        self.assertAlmostEqual(float(obs[2][1]), 0.2515)
+        self.assertAlmostEqual(float(obs[2][2]), 0.5)
+        self.assertEqual(obs[3][2], 'nan')
+        fp = join(self.output_dir, 'timeline_fig.png')
+        self.assertEqual(what(fp), 'png')
+
+    def test_write_timelines_none(self):
+        """Does not write anything if there are no timelines"""
+        write_timelines('timelines', None, self.output_dir)
+        self.assertFalse(exists(join(self.output_dir, 'timeline_fig.png')))
+
+    def test_write_job_statuses(self):
+        """Correctly writes the job times and warns about failed jobs"""
+        statuses = {'10': JobStatus('10', 'C', 0, 2.5, 100.0),
+                    '9': JobStatus('9', 'C', 0, 1.5, 90.0)}
+        with catch_warnings(record=True) as w:
+            simplefilter('always')
+            write_job_statuses('job_statuses', statuses, self.output_dir)
+        self.assertEqual(len(w), 0)
+        with open(join(self.output_dir, 'job_times.txt'), 'U') as f:
+            obs = f.read()
+        self.assertEqual(obs, "#job_id\tstate\texit_status\tqueue_wait\t"
+                         "run_time\n9\tC\t0\t1.5\t90.0\n"
+                         "10\tC\t0\t2.5\t100.0\n")
+
+        statuses['11'] = JobStatus('11', 'C', 271, 2.0, None)
+        with catch_warnings(record=True) as w:
+            simplefilter('always')
+            write_job_statuses('job_statuses', statuses,
+                               join(self.output_dir, 'failed'))
+        self.assertEqual(len(w), 1)
+        self.assertTrue(issubclass(w[0].category, RuntimeWarning))
+        self.assertTrue("11" in str(w[0].message))
+
+    def test_write_job_statuses_none(self):
+        """Does not write anything if no jobs were waited on"""
+        write_job_statuses('job_statuses', None, self.output_dir)
+        self.assertFalse(exists(join(self.output_dir, 'job_times.txt')))
+
+    def test_write_job_records(self):
+        """Correctly writes the submitted jobs and their throughput"""
+        records = [JobRecord('bench_0', '1', 10.0, 12.0, 20.0, 0),
+                   JobRecord('bench_1', '2', 10.5, 12.5, 30.0, 1)]
+        with catch_warnings(record=True) as w:
+            simplefilter('always')
+            write_job_records('job_records', records, self.output_dir)
+        self.assertEqual(len(w), 1)
+        self.assertTrue(issubclass(w[0].category, RuntimeWarning))
+        self.assertTrue("bench_1" in str(w[0].message))
+        with open(join(self.output_dir, 'submissions.txt'), 'U') as f:
+            obs = f.read()
+        self.assertEqual(obs, "#name\tjob_id\tsubmit_time\tstart_time\t"
+                         "end_time\texit_status\n"
+                         "bench_0\t1\t10.0\t12.0\t20.0\t0\n"
+                         "bench_1\t2\t10.5\t12.5\t30.0\t1\n")
+
+        write_throughput('throughput', Throughput(2, 20.0, 360.0, 2.0),
+                         self.output_dir)
+        with open(join(self.output_dir, 'throughput.txt'), 'U') as f:
+            obs = f.read()
+        self.assertEqual(obs, "#jobs\tmakespan\tjobs_per_hour\t"
+                         "mean_queue_wait\n2\t20.0\t360.0\t2.0\n")
+
+        with self.assertRaises(IncompetentDeveloperError):
+            write_job_records('job_records', records)
+        with self.assertRaises(IncompetentDeveloperError):
+            write_throughput('throughput', Throughput(0, None, None, None))
+
+    def test_write_accounting_check(self):
+        """Correctly writes the accounting check and warns on mismatches"""
+        data = [AccountingCheck('10', 11.0, 12.0, 10.0, 10.0, 1100.0, 1100.0),
+                AccountingCheck('20', 10.0, 20.0, 10.0, None, 1000.0, 900.0)]
+        with catch_warnings(record=True) as w:
+            simplefilter('always')
+            write_accounting_check('accounting_check', data, self.output_dir)
+        self.assertEqual(len(w), 1)
+        self.assertTrue(issubclass(w[0].category, RuntimeWarning))
+        self.assertTrue("20 (wall)" in str(w[0].message))
+        with open(join(self.output_dir, 'accounting_check.txt'), 'U') as f:
+            obs = f.read()
+        self.assertEqual(obs, "#label\twall\telapsed\tcpu\ttotal_cpu\tmem\t"
+                         "max_rss\tmismatches\n"
+                         "10\t11.0\t12.0\t10.0\t10.0\t1100.0\t1100.0\t-\n"
+                         "20\t10.0\t20.0\t10.0\tNone\t1000.0\t900.0\twall\n")
+        # Nothing is written if the measurements were not cross-checked
+        write_accounting_check('accounting_check', None)
+        with self.assertRaises(IncompetentDeveloperError):
+            write_accounting_check('accounting_check', data)
+
+    def test_write_bench_runs(self):
+        """Correctly writes the runs of a results database"""
+        runs = [BenchRun(1, 'pick_otus', 'similarity', 'host1', '1.8.0',
+                         None, '20140101_120000', '/suite/timing/similarity',
+                         4, 12),
+                BenchRun(2, 'pick_otus', None, 'host2', None, 'base', None,
+                         '/bench/timing', 3, 15)]
+        fp = join(self.output_dir, 'runs.txt')
+        write_bench_runs('runs', runs, fp)
+        with open(fp, 'U') as f:
+            obs = f.read()
+        self.assertEqual(obs, "#run_id\tcommand\tparameter\thost\tversion\t"
+                         "label\ttimestamp\tsource\tcases\treps\n"
+                         "1\tpick_otus\tsimilarity\thost1\t1.8.0\t-\t"
+                         "20140101_120000\t/suite/timing/similarity\t4\t12\n"
+                         "2\tpick_otus\t-\thost2\t-\tbase\t-\t"
+                         "/bench/timing\t3\t15\n")
+
+    def test_write_comp_results_none(self):
+        """Nothing is written without comp results"""
+        write_comp_results('comp_data', None)
+        write_bench_results('bench_data', None)
+
     def test_write_comp_results_developer_error(self):
         """Raises an error if a path is not provided"""
         with self.assertRaises(IncompetentDeveloperError):
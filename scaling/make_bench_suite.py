@@ -10,6 +10,10 @@ __email__ = "josenavasmolina@gmail.com"
 __status__ = "Development"
 
 from os.path import basename, splitext
+from random import SystemRandom
+
+from scaling.util import EXECUTION_ORDERS, ResourceRequest
+from scaling.executors import LocalExecutor, PBSExecutor
 
 # Contains the header of the bash bench suite
 BASH_HEADER = """#!/bin/bash
@@ -50,12 +54,6 @@ MKDIR_TIMING_CMD = "mkdir $timing_dest/%s\n"
 COMMAND_TEMPLATE = ("    timing_wrapper.sh $timing_dest/%s/$i.txt %s %s %s "
                     "$output_dest/%s/$i")
 
-# The PBS template follows this structure - blah=${blah#?}
-# <job id var>+=";"`echo "cd $PWD; <command>" | qsub -k oe -N <job_name>
-#   -q <queue> <extra args>`
-PBS_CMD_TEMPLATE = ("    %s+=\",\"`echo \"cd $PWD; %s\" | qsub -k oe"
-                    " -N %s%d -q %s %s`")
-
 # The bash loop used to execute the commands as many times as
 # provided by the user
 FOR_LOOP = """# Loop as many times as desired
@@ -68,9 +66,86 @@ done
 # Get the benchmark results and produce the plots
 """
 
+# Bash function that executes the command of a benchmark case
+CASE_FUNCTION = """run_case_%d() {
+%s
+}
+"""
+
+# The bash loop used to execute the commands as many times as provided by the
+# user, changing the order of the cases on each repetition. The execution
+# order and the start time of each command are recorded in
+# $dest/execution_order.txt
+ORDERED_FOR_LOOP = """# Benchmark cases, executed in %s order
+%scase_names=(%s)
+order_fp=$dest/execution_order.txt
+echo -e "#order\\t%s\\n#seed\\t%s\\n#rep\\tcase\\tstart" > $order_fp
+%s
+# Loop as many times as desired
+for i in `seq $num_rep`
+do
+    order=(`seq 0 %d`)
+%s
+    for c in ${order[@]}
+    do
+        echo -e "$i\\t${case_names[$c]}\\t`date +%%s`" >> $order_fp
+        run_case_$c
+    done
+done
+
+# Get the benchmark results and produce the plots
+"""
+
+# Bash snippet that shuffles the order array (Fisher-Yates) using $RANDOM
+SHUFFLE_ORDER = """    for ((j=${#order[@]}-1; j>0; j--))
+    do
+        k=$((RANDOM % (j+1)))
+        tmp=${order[$j]}
+        order[$j]=${order[$k]}
+        order[$k]=$tmp
+    done"""
+
+# Bash snippet that rotates the order array one position per repetition
+ROTATE_ORDER = """    shift=$(( (i-1) % ${#order[@]} ))
+    order=("${order[@]:$shift}" "${order[@]:0:$shift}")"""
+
+# Largest seed generated for the random execution order. Bash seeds $RANDOM
+# with any integer, but only uses its lower bits
+MAX_SEED = 2 ** 15 - 1
+
+# Bash commands for creating the directory of the completion sentinels
+SENTINEL_HEADER = """sentinel_dest=$dest"/sentinels"
+mkdir $sentinel_dest
+"""
+MKDIR_SENTINEL_CMD = "mkdir $sentinel_dest/%s\n"
+
+# When completion sentinels are used, the suite creates <sentinel>.pending
+# before executing (or submitting) each command, and the command is executed
+# through sentinel_wrapper.sh, which creates <sentinel>.done once finished
+SENTINEL_PATH = "$sentinel_dest/%s_$i"
+SENTINEL_CMD_TEMPLATE = "    sentinel_wrapper.sh %s %s"
+PENDING_CMD_TEMPLATE = "    touch %s.pending\n%s"
+SENTINEL_WAIT_OPTION = "-s $sentinel_dest%s"
+
+# Bash commands for creating the directory of the job ids, used to query the
+# accounting of the jobs once they finish
+JOB_IDS_HEADER = """job_ids_dest=$dest"/job_ids"
+mkdir $job_ids_dest
+"""
+MKDIR_JOB_IDS_CMD = "mkdir $job_ids_dest/%s\n"
+
+# Each command records the id of the job that executes it, given by the job id
+# variable of the executor, which is only expanded inside the job
+JOB_ID_CMD_TEMPLATE = "    echo \\$%s > $job_ids_dest/%s/$i.txt; %s"
+ACCOUNTING_OPTION = "-j $job_ids_dest%s"
+
+# The commands of the cases of a bundle are executed sequentially by a job
+BUNDLE_CMD_TEMPLATE = "    %s"
+
 # Bash command to collapse the results and generate the scaling plots
-GET_RESULTS = ("scaling process-bench-results -i $timing_dest/%s -o "
-               "$dest/plots/%s %s\n")
+PROCESS_RESULTS = ("scaling process-bench-results -i $timing_dest/%s -o "
+                   "$dest/plots/%s")
+GET_RESULTS = "%s %s\n"
 
 
 def get_command_string(command, base_name, opts, values, out_opt):
@@ -112,8 +187,308 @@ def get_command_string(command, base_name, opts, values, out_opt):
                                out_opt, base_name)
 
 
+def get_loop_string(commands, names, order='sequential', seed=None):
+    """Generates the bash loop that executes the commands num_rep times
+
+    Parameters
+    ----------
+    commands: list of strings
+        The bash command of each benchmark case
+    names: list of strings
+        The name of each benchmark case
+    order: {'sequential', 'random', 'interleaved'}, optional
+        'sequential' executes the cases in the same order on every
+        repetition. 'random' shuffles the cases on each repetition using
+        seed. 'interleaved' rotates the cases on each repetition, so each
+        case is executed on every position of the repetition block
+    seed: int, optional
+        Seed of the random order. If not provided, a random seed is used
+
+    Returns
+    -------
+    string
+        The bash loop
+
+    Raises
+    ------
+    ValueError
+        If order is not one of EXECUTION_ORDERS
+    """
+    if order not in EXECUTION_ORDERS:
+        raise ValueError("Unknown execution order: %s. Should be one of %s"
+                         % (order, ", ".join(EXECUTION_ORDERS)))
+    if order == 'sequential':
+        return FOR_LOOP % ("\n".join(commands))
+
+    if order == 'random':
+        if seed is None:
+            seed = SystemRandom().randint(0, MAX_SEED)
+        seed_str = "RANDOM=%d\n" % seed
+        reorder = SHUFFLE_ORDER
+    else:
+        seed_str = ""
+        reorder = ROTATE_ORDER
+    functions = "".join(CASE_FUNCTION % (i, cmd)
+                        for i, cmd in enumerate(commands))
+    names_str = " ".join('"%s"' % name for name in names)
+    return ORDERED_FOR_LOOP % (order, seed_str, names_str, order, seed,
+                               functions, len(commands) - 1, reorder)
+
+
+def bundle_cases(names, estimates, bundle_time):
+    """Packs the short benchmark cases into bundles executed by a single job
+
+    The cases whose estimated running time is lower than bundle_time are
+    packed, first fit decreasing, into bundles whose total estimated running
+    time does not exceed bundle_time. The rest of the cases, including those
+    without an estimate, are executed by a job on their own
+
+    Parameters
+    ----------
+    names: list of strings
+        The name of each benchmark case
+    estimates: dict of {string: float}
+        The estimated running time of the cases, in seconds, keyed by name
+    bundle_time: float
+        The maximum estimated running time of a bundle, in seconds
+
+    Returns
+    -------
+    list of lists of int
+        The indices of the cases of each bundle, sorted by the index of
+        their first case
+
+    Raises
+    ------
+    ValueError
+        If bundle_time is not positive
+    """
+    if bundle_time <= 0:
+        raise ValueError("The bundle time should be positive")
+    bundles = []
+    short = []
+    for i, name in enumerate(names):
+        if name in estimates and estimates[name] < bundle_time:
+            short.append(i)
+        else:
+            bundles.append([i])
+    loads = []
+    short_bundles = []
+    for i in sorted(short, key=lambda i: estimates[names[i]], reverse=True):
+        est = estimates[names[i]]
+        for j, load in enumerate(loads):
+            if load + est <= bundle_time:
+                short_bundles[j].append(i)
+                loads[j] += est
+                break
+        else:
+            short_bundles.append([i])
+            loads.append(est)
+    bundles.extend(sorted(b) for b in short_bundles)
+    return sorted(bundles)
+
+
+def get_bundle_resources(names, resources):
+    """Returns the resources requested for a job that executes the cases
+
+    Parameters
+    ----------
+    names: list of strings
+        The name of each benchmark case executed by the job, sequentially
+    resources: dict of {string: ResourceRequest}
+        The resources requested for each case, keyed by name
+
+    Returns
+    -------
+    ResourceRequest
+        The resources of the job: the sum of the wall time limits of the
+        cases, if all of them have one, and the largest memory and number of
+        CPUs. None if no case requests resources
+    """
+    requests = [resources[name] for name in names if name in resources]
+    if not requests:
+        return None
+    times = [r.time for r in requests]
+    if len(requests) < len(names) or None in times:
+        time = None
+    else:
+        time = sum(times)
+    mems = [r.mem for r in requests if r.mem is not None]
+    cpus = [r.cpus for r in requests if r.cpus is not None]
+    return ResourceRequest(time, max(mems) if mems else None,
+                           max(cpus) if cpus else None)
+
+
+def get_job_command(cmds, names, executor, jobs_var, job_num,
+                    sentinels=False, resources=None, job_ids=False):
+    """Generates the bash code that executes the commands of a job
+
+    Parameters
+    ----------
+    cmds: list of strings
+        The bash commands of the benchmark cases executed by the job, which
+        are executed sequentially
+    names: list of strings
+        The name of each benchmark case
+    executor: Executor
+        The backend that executes the job
+    jobs_var: string
+        The bash variable that accumulates the ids of the submitted jobs
+    job_num: int
+        The number of the job, used to name it
+    sentinels: bool, optional
+        If True, each command creates a completion sentinel in $sentinel_dest
+    resources: ResourceRequest, optional
+        The resources requested for the job
+    job_ids: bool, optional
+        If True, each command records the id of its job in $job_ids_dest
+
+    Returns
+    -------
+    string
+        The bash code
+    """
+    sentinel_fps = [SENTINEL_PATH % name for name in names]
+    if sentinels:
+        cmds = [SENTINEL_CMD_TEMPLATE % (fp, cmd.lstrip())
+                for fp, cmd in zip(sentinel_fps, cmds)]
+    if job_ids:
+        cmds = [JOB_ID_CMD_TEMPLATE % (executor.job_id_var, name, cmd.lstrip())
+                for name, cmd in zip(names, cmds)]
+    if len(cmds) == 1:
+        cmd = cmds[0]
+    else:
+        cmd = BUNDLE_CMD_TEMPLATE % "; ".join(c.strip() for c in cmds)
+    job_cmd = executor.get_submit_command(cmd, jobs_var, job_num, resources)
+    if sentinels:
+        for fp in reversed(sentinel_fps):
+            job_cmd = PENDING_CMD_TEMPLATE % (fp, job_cmd)
+    return job_cmd
+
+
+def get_job_commands(cmds, names, executor, jobs_var, first_job,
+                     sentinels=False, estimates=None, bundle_time=None,
+                     resources=None, job_ids=False):
+    """Generates the bash code that executes the commands of a suite
+
+    Parameters
+    ----------
+    cmds: list of strings
+        The bash command of each benchmark case
+    names: list of strings
+        The name of each benchmark case
+    executor: Executor
+        The backend that executes the commands
+    jobs_var: string
+        The bash variable that accumulates the ids of the submitted jobs
+    first_job: int
+        The number of the first job, used to name the jobs
+    sentinels: bool, optional
+        If True, each command creates a completion sentinel in $sentinel_dest
+    estimates: dict of {string: float}, optional
+        The estimated running time of the cases, in seconds, keyed by name
+    bundle_time: float, optional
+        If provided, the short cases are bundled (see bundle_cases)
+    resources: dict of {string: ResourceRequest}, optional
+        The resources requested for each case, keyed by name. The job of a
+        bundle requests the resources of all its cases (see
+        get_bundle_resources)
+    job_ids: bool, optional
+        If True, each command records the id of its job in $job_ids_dest
+
+    Returns
+    -------
+    list of strings, list of strings
+        The bash code of each job and the name of each job. The name of a
+        bundle is the name of its cases joined by '+'
+
+    Raises
+    ------
+    ValueError
+        If bundle_time or resources are provided and the executor does not
+        submit jobs
+    """
+    if bundle_time is not None and not executor.submits_jobs:
+        raise ValueError("The cases can only be bundled if the executor "
+                         "submits jobs")
+    if resources and not executor.submits_jobs:
+        raise ValueError("Resources can only be requested if the executor "
+                         "submits jobs")
+    if bundle_time is None:
+        bundles = [[i] for i in range(len(cmds))]
+    else:
+        bundles = bundle_cases(names, estimates or {}, bundle_time)
+    job_cmds = []
+    job_names = []
+    for i, bundle in enumerate(bundles):
+        bundle_names = [names[j] for j in bundle]
+        job_resources = (get_bundle_resources(bundle_names, resources)
+                         if resources else None)
+        job_cmds.append(get_job_command([cmds[j] for j in bundle],
+                                        bundle_names, executor, jobs_var,
+                                        first_job + i, sentinels,
+                                        job_resources, job_ids))
+        job_names.append("+".join(bundle_names))
+    return job_cmds, job_names
+
+
+def get_results_command(group, executor, jobs_var, job_num, wait_option,
+                        process_job=False, accounting=False):
+    """Generates the bash code that processes the results of the suite
+
+    Parameters
+    ----------
+    group: string
+        The subdirectory of the timing directory with the results to process
+    executor: Executor
+        The backend that executed the commands
+    jobs_var: string
+        The bash variable with the comma-separated ids of the submitted jobs
+    job_num: int
+        The number of the group, used to name the processing job
+    wait_option: string
+        The process-bench-results option to wait for the commands
+    process_job: bool, optional
+        If True, the processing is submitted as a job that the queue system
+        releases once all the jobs in jobs_var have finished, so nothing
+        waits interactively for the suite. Otherwise, the processing is
+        executed right away, waiting as given by wait_option
+    accounting: bool, optional
+        If True, the measurements are cross-checked with the accounting of
+        the jobs recorded in $job_ids_dest
+
+    Returns
+    -------
+    string
+        The bash code
+    """
+    cmd = PROCESS_RESULTS % (group, group)
+    if accounting:
+        group_dir = "/%s" % group if group else ""
+        cmd = "%s %s" % (cmd, ACCOUNTING_OPTION % group_dir)
+        if "--executor" not in wait_option:
+            cmd = "%s --executor %s" % (cmd, executor.name)
+    if not process_job:
+        return GET_RESULTS % (cmd, wait_option)
+    return executor.get_dependent_command(cmd, jobs_var,
+                                          "process%d" % job_num)
+
+
+def _get_suite_executor(executor, pbs, job_prefix, queue, pbs_extra_args):
+    """Returns the executor of a bash suite, honoring the legacy pbs flag"""
+    if executor is not None:
+        return executor
+    if pbs:
+        return PBSExecutor(job_prefix=job_prefix, queue=queue,
+                           extra_args=pbs_extra_args)
+    return LocalExecutor()
+
+
 def make_bench_suite_files(command, in_opts, bench_files, out_opt, pbs=False,
-                           job_prefix="bench_", queue="", pbs_extra_args=""):
+                           job_prefix="bench_", queue="", pbs_extra_args="",
+                           order='sequential', seed=None, executor=None,
+                           sentinels=False, process_job=False, estimates=None,
+                           bundle_time=None, resources=None):
     """Generates a string with the bash commands to execute the benchmark suite
 
     Parameters
@@ -137,49 +512,102 @@ def make_bench_suite_files(command, in_opts, bench_files, out_opt, pbs=False,
         PBS queue to submit jobs
     pbs_extra_args: string
         Any extra arguments needed to qsub
+    order: {'sequential', 'random', 'interleaved'}, optional
+        The order in which the cases are executed on each repetition (see
+        get_loop_string)
+    seed: int, optional
+        Seed of the random order
+    executor: Executor, optional
+        The backend that executes the commands. If provided, pbs, job_prefix,
+        queue and pbs_extra_args are ignored. By default, a PBSExecutor is
+        used if pbs is True, and a LocalExecutor otherwise
+    sentinels: bool, optional
+        If True, each command creates a completion sentinel and the results
+        are processed once all the sentinels are done, without querying the
+        queue system (see scaling.sentinels)
+    process_job: bool, optional
+        If True, the results are processed by a job that depends on the
+        benchmark jobs (see get_results_command)
+    estimates: dict of {string: float}, optional
+        The estimated running time of the cases, in seconds, keyed by case
+        name, e.g. measured by a pilot run of the suite
+    bundle_time: float, optional
+        If provided, the cases shorter than bundle_time are packed into jobs
+        that execute them sequentially, each one writing its own timing file
+        (see bundle_cases)
+    resources: dict of {string: ResourceRequest}, optional
+        The resources requested for the job of each case, keyed by case name
+
+    Notes
+    -----
+    If the queue system reports the accounting of the jobs (the executor
+    has a job_id_var), each command records the id of its job and the
+    measurements are cross-checked with the accounting of the jobs when the
+    results are processed
+
+    Raises
+    ------
+    ValueError
+        If process_job is True or bundle_time or resources are provided, and
+        the executor does not submit jobs
     """
+    executor = _get_suite_executor(executor, pbs, job_prefix, queue,
+                                   pbs_extra_args)
     # Initialize the result string list with the bash header
     # Get the base name of the command
     base_cmd = command.split(" ")[0].split(".")[0]
     result = [BASH_HEADER % base_cmd]
+    if sentinels:
+        result.append(SENTINEL_HEADER)
+    job_ids = executor.job_id_var is not None
+    if job_ids:
+        result.append(JOB_IDS_HEADER)
     # Iterate over all the benchmark files
     commands = []
+    names = []
     for bfs in bench_files:
         # Add the command to create the directory to store the results of the
         # benchmark suite
         bf = bfs[0]
         base_name = splitext(basename(bf))[0]
+        names.append(base_name)
         result.append(MKDIR_OUTPUT_CMD % base_name)
         result.append(MKDIR_TIMING_CMD % base_name)
+        if job_ids:
+            result.append(MKDIR_JOB_IDS_CMD % base_name)
         # Get the string of the command to be executed
         commands.append(get_command_string(command, base_name, in_opts,
                                            bfs, out_opt))
-    if pbs:
-        # We are creating a benchmark suite in a cluster environment
-        # Clean up the scaling_jobs variable
-        result.append("scaling_jobs=\"\"\n")
-        # Add the qsub command for each job
-        commands = [PBS_CMD_TEMPLATE % ("scaling_jobs", cmd, job_prefix, i,
-                    queue, pbs_extra_args) for i, cmd in enumerate(commands)]
+    # Clean up the scaling_jobs variable, if the executor submits jobs
+    result.append(executor.get_init_code("scaling_jobs"))
+    # Add the submission command for each job
+    commands, names = get_job_commands(commands, names, executor,
+                                       "scaling_jobs", 0, sentinels,
+                                       estimates, bundle_time, resources,
+                                       job_ids)
     # Insert the command in the bash for loop and
     # append these lines to the result string
-    result.append(FOR_LOOP % ("\n".join(commands)))
-    if pbs:
-        # We need to remove the first ";" character of scaling_jobs
-        result.append("scaling_jobs=${scaling_jobs#?}\n")
-        # Append to the results string the command to get the results and
-        # generate the benchmark plots
-        result.append(GET_RESULTS % ("", "", "-w $scaling_jobs"))
+    result.append(get_loop_string(commands, names, order, seed))
+    result.append(executor.get_barrier())
+    # Get the ids of the submitted jobs in scaling_jobs
+    result.append(executor.get_collect_code("scaling_jobs", 0))
+    # Append to the results string the command to get the results and
+    # generate the benchmark plots
+    if sentinels:
+        wait_option = SENTINEL_WAIT_OPTION % ""
     else:
-        # Append to the results string the command to get the results and
-        # generate the benchmark plots
-        result.append(GET_RESULTS % ("", "", ""))
+        wait_option = executor.get_wait_option("scaling_jobs")
+    result.append(get_results_command("", executor, "scaling_jobs", 0,
+                                      wait_option, process_job, job_ids))
     return "".join(result)
 
 
 def make_bench_suite_parameters(command, parameters, out_opt, pbs=False,
                                 job_prefix="bench_", queue="",
-                                pbs_extra_args=""):
+                                pbs_extra_args="", order='sequential',
+                                seed=None, executor=None, sentinels=False,
+                                process_job=False, estimates=None,
+                                bundle_time=None, resources=None):
     """Generates a string with the bash commands to execute the benchmark suite
 
     Parameters
@@ -200,15 +628,61 @@ def make_bench_suite_parameters(command, parameters, out_opt, pbs=False,
         PBS queue to submit jobs
     pbs_extra_args: string
         Any extra arguments needed to qsub
+    order: {'sequential', 'random', 'interleaved'}, optional
+        The order in which the cases are executed on each repetition (see
+        get_loop_string)
+    seed: int, optional
+        Seed of the random order
+    executor: Executor, optional
+        The backend that executes the commands. If provided, pbs, job_prefix,
+        queue and pbs_extra_args are ignored. By default, a PBSExecutor is
+        used if pbs is True, and a LocalExecutor otherwise
+    sentinels: bool, optional
+        If True, each command creates a completion sentinel and the results
+        are processed once all the sentinels are done, without querying the
+        queue system (see scaling.sentinels)
+    process_job: bool, optional
+        If True, the results are processed by a job that depends on the
+        benchmark jobs (see get_results_command)
+    estimates: dict of {string: float}, optional
+        The estimated running time of the cases, in seconds, keyed by case
+        name, e.g. measured by a pilot run of the suite
+    bundle_time: float, optional
+        If provided, the cases shorter than bundle_time are packed into jobs
+        that execute them sequentially, each one writing its own timing file
+        (see bundle_cases)
+    resources: dict of {string: ResourceRequest}, optional
+        The resources requested for the job of each case, keyed by case name
+
+    Notes
+    -----
+    If the queue system reports the accounting of the jobs (the executor
+    has a job_id_var), each command records the id of its job and the
+    measurements are cross-checked with the accounting of the jobs when the
+    results are processed
+
+    Raises
+    ------
+    ValueError
+        If process_job is True or bundle_time or resources are provided, and
+        the executor does not submit jobs
     """
+    executor = _get_suite_executor(executor, pbs, job_prefix, queue,
+                                   pbs_extra_args)
     # Initialize the result string list with the bash header
     # Get the base name of the command
     base_cmd = command.split(" ")[0].split(".")[0]
     result = [BASH_HEADER % base_cmd]
+    if sentinels:
+        result.append(SENTINEL_HEADER)
+    job_ids = executor.job_id_var is not None
+    if job_ids:
+        result.append(JOB_IDS_HEADER)
     # Iterate over the parameters to benchmark
     commands = []
+    names = []
     get_results_list = []
-    # These two variables are used in case of a pbs env
+    # These two variables are used if the executor submits jobs
     count = 0
     var_jobs = []
     for param in parameters:
@@ -216,47 +690,59 @@ def make_bench_suite_parameters(command, parameters, out_opt, pbs=False,
         # results of the benchmark suite
         result.append(MKDIR_OUTPUT_CMD % param)
         result.append(MKDIR_TIMING_CMD % param)
+        if sentinels:
+            result.append(MKDIR_SENTINEL_CMD % param)
+        if job_ids:
+            result.append(MKDIR_JOB_IDS_CMD % param)
         # Loop through all the possible values of the current parameter
         param_cmds = []
+        param_names = []
         for val in parameters[param]:
             # Create a directory for storing the output commands
             # and timing results for current parameter value
             param_dir = "/".join([param, val])
+            param_names.append(param_dir)
             result.append(MKDIR_OUTPUT_CMD % param_dir)
             result.append(MKDIR_TIMING_CMD % param_dir)
+            if job_ids:
+                result.append(MKDIR_JOB_IDS_CMD % param_dir)
             # Get the string of the command to be executed
             param_str = "--" + param
             param_cmds.append(get_command_string(command, param_dir,
                                                  [param_str], [val], out_opt))
         # Check if we are crating the command for a cluster environment
-        if pbs:
-            var_job = "%s_jobs" % param
+        var_job = "%s_jobs" % param
+        if executor.submits_jobs:
             var_jobs.append(var_job)
-            param_cmds = [PBS_CMD_TEMPLATE % (var_job, cmd, job_prefix,
-                          count + i, queue, pbs_extra_args) for i, cmd in
-                          enumerate(param_cmds)]
-            count += len(param_cmds)
-            # Create the process results command
-            get_results_list.append(GET_RESULTS % (param, param,
-                                                   "-w $%s" % var_job))
+        param_cmds, param_names = get_job_commands(
+            param_cmds, param_names, executor, var_job, count, sentinels,
+            estimates, bundle_time, resources, job_ids)
+        count += len(param_cmds)
+        # Create the process results command
+        if sentinels:
+            wait_option = SENTINEL_WAIT_OPTION % ("/" + param)
         else:
-            # Create the process results command
-            get_results_list.append(GET_RESULTS % (param, param, ""))
+            wait_option = executor.get_wait_option(var_job)
+        get_results_list.append(get_results_command(
+            param, executor, var_job, len(get_results_list), wait_option,
+            process_job, job_ids))
         # Extend the commands list with the param commands
         commands.extend(param_cmds)
+        names.extend(param_names)
     # Clean up bash variables
-    # Note that if we are not in a pbs command, var_jobs is empty
+    # Note that if the executor does not submit jobs, var_jobs is empty
     for var_job in var_jobs:
-        result.append("%s=\"\"\n" % var_job)
+        result.append(executor.get_init_code(var_job))
     # Insert the commands in the bash for loop and
     # append these lines to the result string
-    result.append(FOR_LOOP % ("\n".join(commands)))
+    result.append(get_loop_string(commands, names, order, seed))
+    result.append(executor.get_barrier())
     # Append the result string for each parameter to get the
     # results and generate the benchmark plots
     result.append("mkdir $dest/plots\n")
-    # Remove the first ";" character of the bash variables
-    # Note that if we are not in a pbs command, var_jobs is empty
-    for var_job in var_jobs:
-        result.append("%s=${%s#?}\n" % (var_job, var_job))
+    # Get the ids of the submitted jobs in the bash variables
+    # Note that if the executor does not submit jobs, var_jobs is empty
+    for job_num, var_job in enumerate(var_jobs):
+        result.append(executor.get_collect_code(var_job, job_num))
     result.extend(get_results_list)
     return "".join(result)
@@ -0,0 +1,644 @@
+#!/usr/bin/env python
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+from os import (wait4, WIFSIGNALED, WTERMSIG, WEXITSTATUS, devnull, sysconf,
+                listdir, killpg, setpgrp)
+from resource import setrlimit, RLIMIT_AS
+from signal import SIGKILL
+from os.path import join, exists
+from subprocess import Popen
+from sys import platform
+from tempfile import TemporaryFile
+from threading import Thread, Event, Timer, Lock
+from time import time
+from warnings import warn
+
+from scaling.util import TimingRecord, Timeline, Limits
+from scaling.affinity import get_placement_command, get_affinity_setter
+
+# Exit status used when the command cannot be executed, as the shell does
+CMD_NOT_FOUND_STATUS = 127
+
+# Fields of the timing record written after the legacy
+# <wall>;<user>;<kernel>;<mem> fields, in key=value form
+RUSAGE_FIELDS = ('minflt', 'majflt', 'nvcsw', 'nivcsw', 'inblock', 'oublock',
+                 'status', 'signal')
+
+# I/O counters of /proc/<pid>/io recorded for each run, in the order they are
+# written to the timing record
+IO_FIELDS = ('read_bytes', 'write_bytes', 'rchar', 'wchar', 'syscr', 'syscw')
+
+# Messages written to stderr by commands that fail to allocate memory, looked
+# for (case insensitively) when a command fails under the vmem limit
+ALLOC_FAILURE_MARKERS = ('memoryerror', 'cannot allocate memory', 'bad_alloc',
+                         'out of memory', 'enomem')
+
+# Number of bytes at the end of stderr searched for ALLOC_FAILURE_MARKERS
+STDERR_TAIL_SIZE = 64 * 1024
+
+# Seconds between the checks of the RSS limit when the command is not sampled
+LIMIT_SAMPLE_INTERVAL = 0.5
+
+# Number of clock ticks per second, used by the times in /proc/<pid>/stat
+CLK_TCK = sysconf('SC_CLK_TCK')
+
+
+def _read_proc_stat_fields(pid):
+    """Returns the fields of /proc/<pid>/stat after the command name
+
+    The command name may contain spaces, so the fields are read after its
+    closing parenthesis. Thus, the first returned field is the process state
+    (the 3rd field of the stat file)
+    """
+    with open(join('/proc', str(pid), 'stat')) as f:
+        stat = f.read()
+    return stat[stat.rindex(')') + 2:].split()
+
+
+def _read_proc_process(pid):
+    """Reads the current memory and CPU usage of a single process
+
+    Parameters
+    ----------
+    pid: int
+        The process id
+
+    Returns
+    -------
+    tuple of (int, float) or None
+        The resident set size (in KB) and the CPU time (in seconds) of the
+        process, including the CPU time of the children it has waited for,
+        or None if they are not available
+    """
+    try:
+        fields = _read_proc_stat_fields(pid)
+        rss = None
+        with open(join('/proc', str(pid), 'status')) as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    rss = int(line.split()[1])
+                    break
+    except (IOError, OSError, ValueError):
+        return None
+    # Zombie processes do not report their memory
+    if rss is None:
+        return None
+    # utime, stime, cutime and cstime are the 14th to 17th fields
+    cpu = sum(int(v) for v in fields[11:15]) / float(CLK_TCK)
+    return rss, cpu
+
+
+def read_proc_io(pid):
+    """Reads the I/O accounting counters of a single process
+
+    The counters include the I/O of the children that the process has
+    already waited for
+
+    Parameters
+    ----------
+    pid: int
+        The process id
+
+    Returns
+    -------
+    dict of {string: int} or None
+        The values of the IO_FIELDS counters, or None if they are not
+        available (the process has finished, it belongs to another user or
+        the kernel does not provide I/O accounting)
+    """
+    io = {}
+    try:
+        with open(join('/proc', str(pid), 'io')) as f:
+            for line in f:
+                key, value = line.split(':', 1)
+                if key in IO_FIELDS:
+                    io[key] = int(value)
+    except (IOError, OSError, ValueError):
+        return None
+    return io if len(io) == len(IO_FIELDS) else None
+
+
+def _get_children_from_task(pid):
+    """Returns the children of pid using /proc/<pid>/task/<tid>/children
+
+    Raises
+    ------
+    IOError, OSError
+        If the kernel does not provide the children files
+    """
+    children = []
+    task_dir = join('/proc', str(pid), 'task')
+    for tid in listdir(task_dir):
+        with open(join(task_dir, tid, 'children')) as f:
+            children.extend(int(c) for c in f.read().split())
+    return children
+
+
+def _get_children_map():
+    """Returns a dict of {pid: list of children pids} by scanning /proc"""
+    children = {}
+    for name in listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            ppid = int(_read_proc_stat_fields(name)[1])
+        except (IOError, OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(name))
+    return children
+
+
+def get_process_tree(pid):
+    """Returns the pids of pid and all its descendants
+
+    The /proc/<pid>/task/<tid>/children files are used when available, as
+    they are cheaper than scanning the full process table
+
+    Parameters
+    ----------
+    pid: int
+        The process id of the root of the tree
+
+    Returns
+    -------
+    list of int
+        The pids of the process tree, starting with pid
+    """
+    tree = [pid]
+    children_map = None
+    i = 0
+    while i < len(tree):
+        current = tree[i]
+        i += 1
+        if children_map is None:
+            try:
+                tree.extend(_get_children_from_task(current))
+                continue
+            except (IOError, OSError):
+                # The process has finished or the kernel does not provide
+                # the children files: fall back to a full /proc scan
+                children_map = _get_children_map()
+        tree.extend(children_map.get(current, []))
+    return tree
+
+
+def read_proc_sample(pid):
+    """Reads the current memory and CPU usage of the process tree of pid
+
+    Parameters
+    ----------
+    pid: int
+        The process id of the root of the tree
+
+    Returns
+    -------
+    tuple of (int, float, int, dict) or None
+        The resident set size (in KB) and CPU time (user + kernel, in
+        seconds) summed over pid and all its descendants, the number of
+        processes in the tree and a dict with the IO_FIELDS counters summed
+        over the tree (empty if I/O accounting is not available). None if
+        they are not available for pid (the process has finished or there is
+        no /proc filesystem)
+    """
+    if _read_proc_process(pid) is None:
+        return None
+    rss = 0
+    cpu = 0.0
+    procs = 0
+    io = dict((field, 0) for field in IO_FIELDS)
+    io_available = True
+    for p in get_process_tree(pid):
+        usage = _read_proc_process(p)
+        # The process may have finished since we built the tree
+        if usage is None:
+            continue
+        rss += usage[0]
+        cpu += usage[1]
+        procs += 1
+        p_io = read_proc_io(p)
+        if p_io is None:
+            io_available = False
+        elif io_available:
+            for field in IO_FIELDS:
+                io[field] += p_io[field]
+    return rss, cpu, procs, io if io_available else {}
+
+
+class ProcessSampler(Thread):
+    """Thread that periodically samples the usage of a process tree
+
+    Parameters
+    ----------
+    pid: int
+        The process id
+    interval: float
+        Number of seconds between samples
+    start_time: float
+        Time at which the process started, used as time 0 of the samples
+    max_rss: int, optional
+        If provided, on_limit is called once the RSS of the process tree
+        exceeds max_rss KB
+    on_limit: function, optional
+        Function called with the name of the exceeded limit ('rss')
+
+    Attributes
+    ----------
+    samples: list of tuples
+        The (time, rss, cpu, procs) samples collected
+    io: dict of {string: int}
+        The peak value of the I/O counters summed over the process tree. As
+        the counters are cumulative and the counters of the finished
+        processes are added to their parents, this is the I/O done by the
+        tree up to the last sample
+    overhead: float
+        Number of seconds spent by the sampler reading /proc
+    """
+
+    def __init__(self, pid, interval, start_time, max_rss=None,
+                 on_limit=None):
+        super(ProcessSampler, self).__init__()
+        self.daemon = True
+        self.pid = pid
+        self.interval = interval
+        self.start_time = start_time
+        self.max_rss = max_rss
+        self.on_limit = on_limit
+        self.samples = []
+        self.io = {}
+        self.overhead = 0.0
+        self._done = Event()
+
+    def run(self):
+        while not self._done.is_set():
+            t = time()
+            sample = read_proc_sample(self.pid)
+            self.overhead += time() - t
+            if sample is not None:
+                self.samples.append((t - self.start_time,) + sample[:3])
+                for field, value in sample[3].iteritems():
+                    self.io[field] = max(value, self.io.get(field, 0))
+                if self.max_rss is not None and sample[0] > self.max_rss:
+                    self.on_limit('rss')
+            self._done.wait(self.interval)
+
+    def stop(self):
+        """Stops the sampler and waits until it finishes"""
+        self._done.set()
+        self.join()
+
+    def get_timeline(self):
+        """Returns the collected samples as a Timeline"""
+        return Timeline([s[0] for s in self.samples],
+                        [s[1] for s in self.samples],
+                        [s[2] for s in self.samples],
+                        [s[3] for s in self.samples],
+                        self.overhead)
+
+
+class LimitEnforcer(object):
+    """Stops a command, and all its descendants, when it exceeds a limit
+
+    The command should be the leader of its own process group (see
+    get_preexec_fn), so the complete process tree can be killed at once. A
+    command that has already exited, but has not been reaped yet, is not
+    stopped: its process group cannot be reused while it is a zombie
+
+    Parameters
+    ----------
+    pid: int
+        The process id of the command
+
+    Attributes
+    ----------
+    censored: string or None
+        The name of the limit that caused the command to be stopped
+    """
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.censored = None
+        self._lock = Lock()
+        self._finished = False
+
+    def stop(self, limit):
+        """Kills the process group of the command because of limit"""
+        with self._lock:
+            if (self._finished or self.censored is not None or
+                    self._has_exited()):
+                return
+            self.censored = limit
+            try:
+                killpg(self.pid, SIGKILL)
+            except OSError:
+                # The process group has already finished
+                pass
+
+    def _has_exited(self):
+        """Returns whether the command has exited, as far as /proc tells"""
+        try:
+            return _read_proc_stat_fields(self.pid)[0] == 'Z'
+        except (IOError, OSError, IndexError, ValueError):
+            # The command has just been reaped, unless /proc is not available
+            return exists('/proc/self')
+
+    def finish(self):
+        """Signals that the command has finished, so it is no longer killed"""
+        with self._lock:
+            self._finished = True
+
+
+def get_preexec_fn(placement=None, limits=None):
+    """Returns the function to execute in the child before the command
+
+    Parameters
+    ----------
+    placement: Placement, optional
+        The placement of the command
+    limits: Limits, optional
+        The limits enforced on the command. If any limit is provided, the
+        child becomes the leader of a new process group
+
+    Returns
+    -------
+    function or None
+        The function that sets the affinity, process group and resource
+        limits of the child, or None if there is nothing to set
+    """
+    funcs = []
+    if placement is not None:
+        set_affinity = get_affinity_setter(placement)
+        if set_affinity is not None:
+            funcs.append(set_affinity)
+    if limits is not None and any(limits):
+        funcs.append(setpgrp)
+        if limits.vmem is not None:
+            vmem = limits.vmem * 1024
+            funcs.append(lambda: setrlimit(RLIMIT_AS, (vmem, vmem)))
+    if not funcs:
+        return None
+
+    def preexec_fn():
+        for func in funcs:
+            func()
+    return preexec_fn
+
+
+def find_allocation_failure(stderr_f):
+    """Returns the allocation failure reported at the end of stderr_f
+
+    Parameters
+    ----------
+    stderr_f: file object
+        The file where the stderr of the command has been written
+
+    Returns
+    -------
+    str or None
+        The first of ALLOC_FAILURE_MARKERS found in the last STDERR_TAIL_SIZE
+        bytes of stderr_f, or None if it does not report any
+    """
+    stderr_f.seek(0, 2)
+    size = stderr_f.tell()
+    stderr_f.seek(max(0, size - STDERR_TAIL_SIZE))
+    tail = stderr_f.read().lower()
+    for marker in ALLOC_FAILURE_MARKERS:
+        if marker in tail:
+            return marker
+    return None
+
+
+def run_measured(cmd, sample_interval=None, placement=None, limits=None):
+    """Executes cmd and measures its resource usage using wait4
+
+    Parameters
+    ----------
+    cmd: list of strings
+        The command to execute and its arguments
+    sample_interval: float, optional
+        If provided, the memory and CPU usage of the command and all its
+        descendant processes are sampled every sample_interval seconds while
+        it runs
+    placement: Placement, optional
+        If provided, the command is pinned to placement.cpus and its memory
+        is bound to placement.node
+    limits: Limits, optional
+        If provided, the command and its descendants are killed when they
+        run for longer than limits.wall seconds or their summed RSS exceeds
+        limits.rss KB (checked by sampling, every sample_interval or
+        LIMIT_SAMPLE_INTERVAL seconds). limits.vmem is enforced as the
+        RLIMIT_AS of the command, whose stderr is then kept to tell
+        allocation failures apart from other failures.
+
+    Returns
+    -------
+    TimingRecord
+        The resource usage of the command. Times are in seconds and memory
+        in KB, as reported by /usr/bin/time. The I/O counters of the process
+        tree are only available if sample_interval is provided. If the
+        command is stopped because of a limit, or it fails under limits.vmem
+        reporting an allocation failure (see ALLOC_FAILURE_MARKERS), the
+        record is censored: its values are lower bounds of the ones of a
+        complete execution. Any other failure is reported through its exit
+        status or signal
+    Timeline or None
+        The memory and CPU samples of the command, if sample_interval is
+        provided
+    """
+    if limits is None:
+        limits = Limits()
+    if placement is not None:
+        cmd = get_placement_command(cmd, placement)
+    sampler = None
+    timer = None
+    stderr_f = None
+    with open(devnull, 'w') as null:
+        if limits.vmem is not None:
+            stderr_f = TemporaryFile()
+        start = time()
+        try:
+            proc = Popen(cmd, stdout=null,
+                         stderr=null if stderr_f is None else stderr_f,
+                         preexec_fn=get_preexec_fn(placement, limits))
+        except OSError:
+            if stderr_f is not None:
+                stderr_f.close()
+            record = TimingRecord(0.0, 0.0, 0.0, 0, 0, 0, 0, 0, 0, 0,
+                                  CMD_NOT_FOUND_STATUS, 0)
+            return record, None
+        enforcer = LimitEnforcer(proc.pid)
+        if limits.wall is not None:
+            timer = Timer(limits.wall, enforcer.stop, ['timeout'])
+            timer.daemon = True
+            timer.start()
+        if sample_interval is not None or limits.rss is not None:
+            interval = sample_interval
+            if interval is None:
+                interval = LIMIT_SAMPLE_INTERVAL
+            sampler = ProcessSampler(proc.pid, interval, start, limits.rss,
+                                     enforcer.stop)
+            sampler.start()
+        _, status, rusage = wait4(proc.pid, 0)
+        wall = time() - start
+        enforcer.finish()
+    if timer is not None:
+        timer.cancel()
+    timeline = None
+    if sampler is not None:
+        sampler.stop()
+        # The sampler may have been started only to enforce the RSS limit
+        if sample_interval is not None:
+            timeline = sampler.get_timeline()
+
+    if WIFSIGNALED(status):
+        exit_status = 0
+        signal = WTERMSIG(status)
+    else:
+        exit_status = WEXITSTATUS(status)
+        signal = 0
+    # The process has already been reaped, let Popen know about it
+    proc.returncode = -signal if signal else exit_status
+
+    # ru_maxrss is reported in bytes on OS X and in KB on Linux
+    mem = rusage.ru_maxrss
+    if platform == 'darwin':
+        mem = mem // 1024
+
+    io = None
+    if timeline is not None and sampler.io:
+        io = sampler.io
+
+    # A limit that fired once the command had already finished does not
+    # censor it
+    censored = enforcer.censored
+    if signal != SIGKILL:
+        censored = None
+    if stderr_f is not None:
+        if censored is None and (exit_status != 0 or signal != 0):
+            marker = find_allocation_failure(stderr_f)
+            if marker is not None:
+                censored = 'vmem'
+                warn("%s failed under the vmem limit of %d KB reporting an "
+                     "allocation failure ('%s'): recorded as censored"
+                     % (' '.join(cmd), limits.vmem, marker), RuntimeWarning)
+        stderr_f.close()
+
+    record = TimingRecord(wall, rusage.ru_utime, rusage.ru_stime, mem,
+                          rusage.ru_minflt, rusage.ru_majflt,
+                          rusage.ru_nvcsw, rusage.ru_nivcsw,
+                          rusage.ru_inblock, rusage.ru_oublock, exit_status,
+                          signal, io, censored)
+    return record, timeline
+
+
+def format_timing_record(record, extra=None):
+    """Formats a TimingRecord as a line of a timing file
+
+    The line starts with the fields written by timing_wrapper.sh followed by
+    the rest of fields in key=value form:
+        <wall>;<user>;<kernel>;<mem>;minflt=<v>;...;signal=<v>
+    followed by the I/O counters, if available:
+        ...;read_bytes=<v>;...;syscw=<v>
+    and the limit that stopped the command, if it is censored:
+        ...;censored=<limit>
+
+    Parameters
+    ----------
+    record: TimingRecord
+        The measurements of a command execution
+    extra: dict of {string: number}, optional
+        Additional measurements to append to the record, in key=value form
+
+    Returns
+    -------
+    string
+        The formatted timing record
+    """
+    values = ["%.6f" % record.wall, "%.6f" % record.user,
+              "%.6f" % record.kernel, str(record.mem)]
+    values.extend("%s=%s" % (field, getattr(record, field))
+                  for field in RUSAGE_FIELDS)
+    if record.io:
+        values.extend("%s=%s" % (field, record.io[field])
+                      for field in IO_FIELDS)
+    if record.censored:
+        values.append("censored=%s" % record.censored)
+    if extra:
+        values.extend("%s=%s" % (key, extra[key]) for key in sorted(extra))
+    return ";".join(values)
+
+
+def write_timing_file(timing_fp, record, extra=None):
+    """Writes a TimingRecord to timing_fp
+
+    Parameters
+    ----------
+    timing_fp: string
+        Path to the timing file
+    record: TimingRecord
+        The measurements of a command execution
+    extra: dict of {string: number}, optional
+        Additional measurements to append to the record
+    """
+    with open(timing_fp, 'w') as f:
+        f.write(format_timing_record(record, extra))
+        f.write("\n")
+
+
+def get_tree_measurements(timeline):
+    """Summarizes the process tree usage of a Timeline
+
+    Parameters
+    ----------
+    timeline: Timeline
+        The samples of a command execution
+
+    Returns
+    -------
+    dict of {string: float}
+        The peak summed RSS of the process tree (tree_rss, KB), its summed
+        CPU time (tree_cpu, seconds) and the peak number of concurrent
+        processes (tree_procs). Empty if there are no samples
+    """
+    if not timeline.time:
+        return {}
+    return {'tree_rss': max(timeline.rss),
+            'tree_cpu': max(timeline.cpu),
+            'tree_procs': max(timeline.procs)}
+
+
+def write_timeline_file(timeline_fp, timeline):
+    """Writes the samples of a Timeline to timeline_fp
+
+    The file starts with a comment line with the sampling overhead and, if
+    known, a comment line with the wall time of the command, followed by one
+    tab-separated line per sample:
+        #overhead <tab> <seconds>
+        #wall <tab> <seconds>
+        #time <tab> rss <tab> cpu <tab> procs
+        <time> <tab> <rss> <tab> <cpu> <tab> <procs>
+
+    Parameters
+    ----------
+    timeline_fp: string
+        Path to the timeline file
+    timeline: Timeline
+        The samples of a command execution
+    """
+    lines = ["#overhead\t%.6f" % timeline.overhead]
+    if timeline.wall is not None:
+        lines.append("#wall\t%.6f" % timeline.wall)
+    lines.append("#time\trss\tcpu\tprocs")
+    for sample in zip(timeline.time, timeline.rss, timeline.cpu,
+                      timeline.procs):
+        lines.append("%.3f\t%d\t%.2f\t%d" % sample)
+    with open(timeline_fp, 'w') as f:
+        f.write("\n".join(lines))
+        f.write("\n")
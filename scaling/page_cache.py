@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+import os
+from os import walk
+from os.path import isdir, join
+
+# Cache modes of the runner: the input files are evicted from the page cache
+# ('cold'), pre-read into it ('warm') or both measurements are taken on each
+# repetition ('both')
+CACHE_MODES = ['cold', 'warm', 'both']
+
+# Advice values of posix_fadvise on Linux
+POSIX_FADV_DONTNEED = getattr(os, 'POSIX_FADV_DONTNEED', 4)
+
+# Size of the chunks used to pre-read the files
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def _get_libc_fadvise():
+    """Returns posix_fadvise from the C library, used if os lacks it
+
+    Returns
+    -------
+    function or None
+        A function with the signature of os.posix_fadvise, or None if the C
+        library does not provide it
+    """
+    from ctypes import CDLL, c_int, c_longlong
+    from ctypes.util import find_library
+    try:
+        libc = CDLL(find_library('c'), use_errno=True)
+        libc_fadvise = libc.posix_fadvise
+    except (OSError, AttributeError):
+        return None
+    libc_fadvise.argtypes = [c_int, c_longlong, c_longlong, c_int]
+    libc_fadvise.restype = c_int
+
+    def fadvise(fd, offset, length, advice):
+        # posix_fadvise returns the error number instead of setting errno
+        ret = libc_fadvise(fd, offset, length, advice)
+        if ret != 0:
+            raise OSError(ret, os.strerror(ret))
+    return fadvise
+
+
+if hasattr(os, 'posix_fadvise'):
+    posix_fadvise = os.posix_fadvise
+else:
+    posix_fadvise = _get_libc_fadvise()
+
+
+def get_file_paths(paths):
+    """Expands the directories of paths into the files they contain
+
+    Parameters
+    ----------
+    paths: iterable of strings
+        Paths to files or directories
+
+    Returns
+    -------
+    list of strings
+        The paths to the files
+    """
+    files = []
+    for path in paths:
+        if isdir(path):
+            for dirpath, _, filenames in walk(path):
+                files.extend(join(dirpath, fn) for fn in sorted(filenames))
+        else:
+            files.append(path)
+    return files
+
+
+def evict_files(paths):
+    """Evicts paths from the page cache, so the next read hits the disk
+
+    The dirty pages of the files are written back first, as the kernel only
+    drops clean pages
+
+    Parameters
+    ----------
+    paths: iterable of strings
+        Paths to the files or directories to evict
+
+    Raises
+    ------
+    RuntimeError
+        If posix_fadvise is not available in this system
+    """
+    if posix_fadvise is None:
+        raise RuntimeError("posix_fadvise is not available, the files cannot "
+                           "be evicted from the page cache")
+    for fp in get_file_paths(paths):
+        fd = os.open(fp, os.O_RDONLY)
+        try:
+            try:
+                os.fsync(fd)
+            except OSError:
+                pass
+            posix_fadvise(fd, 0, 0, POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def preload_files(paths):
+    """Reads paths completely, so they are in the page cache
+
+    Parameters
+    ----------
+    paths: iterable of strings
+        Paths to the files or directories to pre-read
+    """
+    for fp in get_file_paths(paths):
+        with open(fp, 'rb') as f:
+            while f.read(READ_CHUNK_SIZE):
+                pass
+
+
+def prepare_cache(paths, mode):
+    """Leaves paths in the page cache state required by mode
+
+    Parameters
+    ----------
+    paths: iterable of strings
+        Paths to the files or directories
+    mode: {'cold', 'warm'} or None
+        'cold' evicts the files from the page cache and 'warm' pre-reads them.
+        Nothing is done if mode is None
+    """
+    if mode == 'cold':
+        evict_files(paths)
+    elif mode == 'warm':
+        preload_files(paths)
@@ -9,7 +9,10 @@ __maintainer__ = "Jose Antonio Navas Molina"
 __email__ = "josenavasmolina@gmail.com"
 __status__ = "Development"
 
-from scaling.util import BenchSummary
+import numpy as np
+
+from scaling.util import (BenchSummary, Timeline, ResourceRequest, SuiteCase,
+                          get_checksum)
 
 
 def parse_parameters_file(lines):
@@ -47,6 +50,278 @@ def parse_parameters_file(lines):
     return param_dict
 
 
+def parse_timing_file(lines):
+    """Parses a timing file generated by timing_wrapper.sh or the runner
+
+    The first line of the timing file has the following structure:
+        <wall time>;<user time>;<kernel time>;<memory>
+    optionally followed by additional measurements in key=value form:
+        <wall time>;<user time>;<kernel time>;<memory>;key1=value1;...
+
+    Parameters
+    ----------
+    lines : iterable
+        The contents of the timing file
+
+    Returns
+    -------
+    tuple or None
+        The (wall, user, kernel, mem, extra) values of the timing file, where
+        extra is a dict of {key: float or string} with the additional
+        measurements, or None if the file does not follow the expected
+        structure or records a non-zero exit status or signal, which means
+        that the command didn't finish correctly. Executions stopped by a
+        runner limit are returned, with the limit stored in extra['censored']
+    """
+    for line in lines:
+        info = line.strip().split(';')
+        if len(info) < 4:
+            return None
+        try:
+            values = [float(v) for v in info[:4]]
+            extra = {}
+            for field in info[4:]:
+                key, value = field.split('=', 1)
+                try:
+                    extra[key] = float(value)
+                except ValueError:
+                    # Non numerical values (e.g. the CPU placement) are
+                    # kept as strings
+                    extra[key] = value
+        except ValueError:
+            return None
+        failed = extra.pop('status', 0) != 0 or extra.pop('signal', 0) != 0
+        # The censored executions have been stopped by the runner on
+        # purpose: their values are lower bounds, not errors
+        if failed and 'censored' not in extra:
+            return None
+        values.append(extra)
+        return tuple(values)
+    return None
+
+
+def parse_timing_log(lines):
+    """Parses an append-only timing log
+
+    Each line of the log has the structure:
+        <case> <tab> <repetition> <tab> <timing record> <tab> <checksum>
+    where the timing record follows the format of the timing files (see
+    parse_timing_file) and the checksum is the CRC-32 of the rest of the line
+
+    Parameters
+    ----------
+    lines : iterable
+        The contents of the timing log
+
+    Returns
+    -------
+    list of (string, string, tuple or None), list of int
+        The (case, repetition, parsed timing record) of each line, in order,
+        where the parsed timing record is None if the command didn't finish
+        correctly, and the numbers (starting at 1) of the lines that are not
+        well formed or whose checksum does not match, e.g. the last line of
+        a log written by a writer that died while writing it
+    """
+    records = []
+    malformed = []
+    for i, line in enumerate(lines, 1):
+        values = line.rstrip('\n').split('\t')
+        if (not line.endswith('\n') or len(values) != 4 or
+                get_checksum("\t".join(values[:3])) != values[3]):
+            malformed.append(i)
+            continue
+        records.append((values[0], values[1], parse_timing_file([values[2]])))
+    return records, malformed
+
+
+def parse_manifest_file(lines):
+    """Parses the manifest of completed repetitions of a benchmark suite
+
+    Each line of the manifest has the structure:
+        <case> <tab> <repetition>
+    Lines that do not follow this structure (e.g. the last line of a
+    manifest written by a runner that died while writing it) are ignored
+
+    Parameters
+    ----------
+    lines : iterable
+        The contents of the manifest file
+
+    Returns
+    -------
+    set of (string, int)
+        The (case, repetition) pairs that have been completed
+    """
+    completed = set()
+    for line in lines:
+        if not line.endswith('\n') or line.startswith('#'):
+            continue
+        values = line.strip().split('\t')
+        if len(values) != 2:
+            continue
+        try:
+            completed.add((values[0], int(values[1])))
+        except ValueError:
+            continue
+    return completed
+
+
+def parse_job_list(lines):
+    """Parses the list of jobs to submit of a benchmark suite
+
+    Each line of the list has the structure:
+        <job name> <space> <job script>
+    Empty lines are ignored
+
+    Parameters
+    ----------
+    lines : iterable
+        The contents of the job list file
+
+    Returns
+    -------
+    list of (string, string)
+        The (name, script) pairs of the jobs, in submission order
+
+    Raises
+    ------
+    ValueError
+        If some line does not follow the expected structure
+    """
+    jobs = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        values = line.split(None, 1)
+        if len(values) != 2:
+            raise ValueError("Wrong format of the job list: %s" % line)
+        jobs.append((values[0], values[1]))
+    return jobs
+
+
+def parse_resources_file(lines):
+    """Parses the resources requested for the jobs of the benchmark cases
+
+    Each line of the file has the structure:
+        <case> <tab> <time> <tab> <memory> <tab> <cpus>
+    where time is the wall time limit in seconds, memory is in MB and a '-'
+    leaves the value to the default of the queue. Empty lines and lines
+    starting with '#' are ignored
+
+    Parameters
+    ----------
+    lines : iterable
+        The contents of the resources file
+
+    Returns
+    -------
+    dict of {string: ResourceRequest}
+        The resources requested for each case, keyed by case name
+
+    Raises
+    ------
+    ValueError
+        If some line does not follow the expected structure
+    """
+    resources = {}
+    for line in lines:
+        if not line.strip() or line.startswith('#'):
+            continue
+        values = line.strip().split('\t')
+        if len(values) != 4:
+            raise ValueError("Wrong format of the resources file: %s"
+                             % line.strip())
+        try:
+            time, mem, cpus = [None if v == '-' else t(v) for t, v in
+                               zip([float, int, int], values[1:])]
+        except ValueError:
+            raise ValueError("Wrong format of the resources file: %s"
+                             % line.strip())
+        if any(v is not None and v <= 0 for v in (time, mem, cpus)):
+            raise ValueError("The resources should be positive: %s"
+                             % line.strip())
+        resources[values[0]] = ResourceRequest(time, mem, cpus)
+    return resources
+
+
+def parse_queue_cases_file(lines):
+    """Parses the definition of the cases of a work queue
+
+    Each line of the file has the structure:
+        <case> <tab> <out opt> <tab> <n> <tab> <input 1> ... <input n>
+        <tab> <command argument 1> <tab> <command argument 2> ...
+    where n is the number of input files of the case. Lines starting with
+    '#' are ignored
+
+    Parameters
+    ----------
+    lines : iterable
+        The contents of the cases file
+
+    Returns
+    -------
+    list of SuiteCase
+        The cases of the benchmark suite
+
+    Raises
+    ------
+    ValueError
+        If some line does not follow the expected structure
+    """
+    cases = []
+    for line in lines:
+        if line.startswith('#') or not line.strip():
+            continue
+        values = line.rstrip('\n').split('\t')
+        try:
+            num_inputs = int(values[2])
+        except (IndexError, ValueError):
+            raise ValueError("Wrong format of the cases file: %s"
+                             % line.strip())
+        cmd = values[3 + num_inputs:]
+        if num_inputs < 0 or not cmd:
+            raise ValueError("Wrong format of the cases file: %s"
+                             % line.strip())
+        # The cases without input files have None as inputs
+        cases.append(SuiteCase(values[0], cmd, values[1],
+                               values[3:3 + num_inputs] or None))
+    return cases
+
+
+def parse_timeline_file(lines):
+    """Parses a timeline file generated by the runner
+
+    Parameters
+    ----------
+    lines : iterable
+        The contents of the timeline file
+
+    Returns
+    -------
+    Timeline
+        The memory and CPU samples stored in the file. The wall time is None
+        if the file does not record it
+    """
+    result = Timeline([], [], [], [], 0.0)
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        values = line.split('\t')
+        if line.startswith('#'):
+            if values[0] == '#overhead':
+                result = result._replace(overhead=float(values[1]))
+            elif values[0] == '#wall':
+                result = result._replace(wall=float(values[1]))
+            continue
+        result.time.append(float(values[0]))
+        result.rss.append(float(values[1]))
+        result.cpu.append(float(values[2]))
+        result.procs.append(int(values[3]) if len(values) > 3 else 1)
+    return result
+
+
 def parse_summarized_results(lines):
     """Parses the summarized results file
 
@@ -54,14 +329,33 @@ def parse_summarized_results(lines):
     ----------
     lines : iterable
         The contents of the summarize results file
+
+    Returns
+    -------
+    BenchSummary
+        The summarized results. Any additional <metric>_mean and
+        <metric>_std columns are returned in the extra attribute as a dict of
+        {metric: (list of means, list of stdevs)}, which is None if the file
+        does not have additional columns
     """
     result = BenchSummary([], [], [], [], [], [], [], [], [])
+    extra_metrics = []
     # Begin iterating over lines
     for line in lines:
+        if line.startswith('#label'):
+            header = line.strip().split('\t')
+            extra_metrics = [col[:-len('_mean')] for col in header[9::2]]
+            if extra_metrics:
+                result = result._replace(
+                    extra=dict((m, ([], [])) for m in extra_metrics))
+            continue
         if not line or line.startswith('#'):
             continue
         line = line.strip()
         values = line.split('\t')
+        for i, metric in enumerate(extra_metrics):
+            result.extra[metric][0].append(float(values[9 + 2 * i]))
+            result.extra[metric][1].append(float(values[10 + 2 * i]))
         result.label.append(values[0])
         result.wall_mean.append(float(values[1]))
         result.wall_stdev.append(float(values[2]))
@@ -72,3 +366,39 @@ def parse_summarized_results(lines):
         result.mem_mean.append(float(values[7]))
         result.mem_stdev.append(float(values[8]))
     return result
+
+
+def parse_summarized_results_npz(f):
+    """Parses the binary summarized results file
+
+    The file is a NumPy .npz archive with the columns of the summarized
+    results file, keyed by their name in the header of the text file
+    (label, wall_mean, wall_std, ...)
+
+    Parameters
+    ----------
+    f : file
+        The binary summarized results file, opened for reading
+
+    Returns
+    -------
+    BenchSummary
+        The summarized results (see parse_summarized_results). The labels are
+        a list of strings and the rest of the columns are numpy arrays, as
+        stored in the file
+    """
+    with np.load(f, allow_pickle=False) as npz:
+        columns = dict((key, npz[key]) for key in npz.files)
+    result = BenchSummary(columns.pop('label').tolist(),
+                          columns.pop('wall_mean'), columns.pop('wall_std'),
+                          columns.pop('user_mean'), columns.pop('user_std'),
+                          columns.pop('kernel_mean'),
+                          columns.pop('kernel_std'),
+                          columns.pop('mem_mean'), columns.pop('mem_std'))
+    extra_metrics = [key[:-len('_mean')] for key in columns
+                     if key.endswith('_mean')]
+    if extra_metrics:
+        result = result._replace(
+            extra=dict((m, (columns['%s_mean' % m], columns['%s_std' % m]))
+                       for m in extra_metrics))
+    return result
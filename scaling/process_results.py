@@ -12,7 +12,29 @@ __status__ = "Development"
 from itertools import izip
 import numpy as np
 
-from scaling.util import SummarizedResults, BenchData, FittedCurve, CompData
+from scaling.util import (SummarizedResults, BenchData, FittedCurve, CompData,
+                          DriftCheck, AccountingCheck, BenchSummary,
+                          SUMMARY_EXTRA_METRICS)
+
+# Two-sided 95% critical values of the Student's t distribution, indexed by
+# the degrees of freedom. Over 30 degrees of freedom the normal
+# approximation is used.
+T_CRITICAL_95 = [None, 12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365,
+                 2.306, 2.262, 2.228, 2.201, 2.179, 2.160, 2.145, 2.131,
+                 2.120, 2.110, 2.101, 2.093, 2.086, 2.080, 2.074, 2.069,
+                 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+Z_CRITICAL_95 = 1.960
+
+# Maximum number of refits used to impute the censored points in
+# curve_fitting
+CENSORED_FIT_ITERATIONS = 20
+
+# Relative difference between the measurements of the timing wrapper and the
+# accounting of the queue system over which they disagree. The wall and CPU
+# times that differ by less than ACCOUNTING_MIN_TIME seconds agree, as the
+# accounting includes the start up of the job and has a 1 second resolution
+ACCOUNTING_TOLERANCE = 0.2
+ACCOUNTING_MIN_TIME = 1.0
 
 
 def compute_rsquare(y, SSerr):
@@ -47,15 +69,75 @@ def compute_rsquare(y, SSerr):
     return rsquare
 
 
-def curve_fitting(x, y):
+def compute_relative_ci(values):
+    """Computes the relative half-width of the 95% CI of the mean of values
+
+    The confidence interval is computed using the Student's t distribution:
+
+                            t * s
+            rel_ci = -----------------
+                       sqrt(n) * mean
+
+    Where s is the sample standard deviation and n the number of values
+
+    Parameters
+    ----------
+    values: iterable of floats
+        The measured values
+
+    Returns
+    -------
+    float
+        The half-width of the confidence interval relative to the mean. It is
+        infinite if there are less than two values or the mean is 0 and the
+        values are not all equal.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n < 2:
+        return float('inf')
+    mean = np.mean(values)
+    stdev = np.std(values, ddof=1)
+    if stdev == 0:
+        return 0.0
+    if mean == 0:
+        return float('inf')
+    df = n - 1
+    t = T_CRITICAL_95[df] if df < len(T_CRITICAL_95) else Z_CRITICAL_95
+    return float(t * stdev / (np.sqrt(n) * abs(mean)))
+
+
+def _fit_polynomial(x, y):
+    """Fits the polynomial of lowest degree with an Rsquare over 0.999"""
+    deg = 0
+    rsquare = 0
+    while rsquare < 0.999:
+        deg += 1
+        poly, SSerr, rank, sin, rc = np.polyfit(x, y, deg, full=True)
+        if len(SSerr) == 0:
+            break
+        rsquare = compute_rsquare(y, SSerr)
+
+    return poly, deg
+
+
+def curve_fitting(x, y, lower_bounds=None):
     """Fits a polynomial curve to the data points defined by the arrays x and y
 
+    If some y values are lower bounds (e.g. cases stopped by a runner limit),
+    the curve is first fitted to the exact points. Then, each lower bound is
+    replaced by the fitted value if it is above the bound, and the curve is
+    fitted again to all the points, until the imputed values converge. Thus,
+    a bound never pulls the curve down, but the curve is forced to reach it.
+
     Parameters
     ----------
     x: numpy array of floats
         X values
     y: numpy array of floats
         Y values
+    lower_bounds: numpy array of bool, optional
+        True for the y values that are lower bounds of the actual value
 
     Returns
     -------
@@ -65,18 +147,208 @@ def curve_fitting(x, y):
     float
         The polynomial degree.
     """
-    deg = 0
-    rsquare = 0
-    while rsquare < 0.999:
-        deg += 1
-        poly, SSerr, rank, sin, rc = np.polyfit(x, y, deg, full=True)
-        if len(SSerr) == 0:
+    if lower_bounds is None or not np.any(lower_bounds):
+        return _fit_polynomial(x, y)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    lower_bounds = np.asarray(lower_bounds, dtype=bool)
+    exact = ~lower_bounds
+    # Not enough exact points to start from: use the bounds as values
+    if exact.sum() < 2:
+        return _fit_polynomial(x, y)
+
+    poly, deg = _fit_polynomial(x[exact], y[exact])
+    y_fit = y.copy()
+    for _ in range(CENSORED_FIT_ITERATIONS):
+        imputed = np.maximum(np.polyval(poly, x[lower_bounds]),
+                             y[lower_bounds])
+        y_fit[lower_bounds] = imputed
+        poly, deg = _fit_polynomial(x, y_fit)
+        new_imputed = np.maximum(np.polyval(poly, x[lower_bounds]),
+                                 y[lower_bounds])
+        if np.allclose(new_imputed, imputed):
             break
-        rsquare = compute_rsquare(y, SSerr)
 
     return poly, deg
 
 
+def summarize_extra_measurements(case_results):
+    """Computes the mean and stdev of the extended measurements of each case
+
+    Only the metrics listed in SUMMARY_EXTRA_METRICS are summarized. The
+    repetitions without the measurement (NaN) are ignored.
+
+    Parameters
+    ----------
+    case_results : list of BenchCase
+        The results of each benchmark case
+
+    Returns
+    -------
+    dict of {string: (list of float, list of float)} or None
+        The means and stdevs of each metric, with one value per case (NaN if
+        the case lacks the metric). None if no case has any of the metrics
+    """
+    extra = {}
+    for metric in SUMMARY_EXTRA_METRICS:
+        if not any(case.extra and metric in case.extra
+                   for case in case_results):
+            continue
+        means = []
+        stdevs = []
+        for case in case_results:
+            values = np.asarray((case.extra or {}).get(metric, []),
+                                dtype=np.float64)
+            values = values[np.isfinite(values)]
+            if len(values):
+                means.append(np.mean(values))
+                stdevs.append(np.std(values))
+            else:
+                means.append(np.nan)
+                stdevs.append(np.nan)
+        extra[metric] = (means, stdevs)
+    return extra if extra else None
+
+
+def check_drift(case_results):
+    """Checks if the wall time of the suite drifts along its execution
+
+    The residual of each repetition is its wall time relative to the mean of
+    its case, (wall - mean) / mean, so cases of different sizes can be
+    pooled. A significant linear trend of the residuals against the start
+    time of the repetitions means that the machine performance changed
+    during the execution of the suite (thermal throttling, other jobs...)
+    and the results of the cases executed at different times are biased.
+    The trend is tested with the t statistic of Pearson's r:
+
+                        r * sqrt(n - 2)
+                t = ---------------------
+                       sqrt(1 - r^2)
+
+    Parameters
+    ----------
+    case_results : list of BenchCase
+        The results of each benchmark case. The start time of each repetition
+        is taken from extra['start']. The censored repetitions are ignored
+
+    Returns
+    -------
+    DriftCheck or None
+        The trend of the residuals, with the slope in relative units per
+        hour. None if less than 3 repetitions have a start time
+    """
+    times = []
+    residuals = []
+    for case in case_results:
+        starts = (case.extra or {}).get('start')
+        if not starts:
+            continue
+        censored = case.censored or [False] * len(case.wall)
+        pairs = [(t, w) for t, w, c in izip(starts, case.wall, censored)
+                 if np.isfinite(t) and not c]
+        if not pairs:
+            continue
+        mean = np.mean([w for _, w in pairs])
+        if mean == 0:
+            continue
+        for t, w in pairs:
+            times.append(t)
+            residuals.append((w - mean) / mean)
+
+    n = len(times)
+    if n < 3:
+        return None
+    # Use hours since the first repetition, so the slope is readable
+    times = (np.asarray(times, dtype=np.float64) - min(times)) / 3600.0
+    residuals = np.asarray(residuals, dtype=np.float64)
+    if np.std(times) == 0 or np.std(residuals) == 0:
+        return DriftCheck(0.0, 0.0, 0.0, n, False)
+    slope = np.polyfit(times, residuals, 1)[0]
+    r = np.corrcoef(times, residuals)[0, 1]
+    if abs(r) >= 1:
+        t = float('inf') if r > 0 else float('-inf')
+    else:
+        t = r * np.sqrt((n - 2) / (1 - r * r))
+    df = n - 2
+    t_crit = T_CRITICAL_95[df] if df < len(T_CRITICAL_95) else Z_CRITICAL_95
+    return DriftCheck(float(slope), float(r), float(t), n,
+                      bool(abs(t) > t_crit))
+
+
+def cross_check_accounting(case_results, case_jobs, accounting):
+    """Compares the measurements of each case with the accounting of its jobs
+
+    Parameters
+    ----------
+    case_results : list of BenchCase
+        The results of each benchmark case
+    case_jobs : dict of {string: list of strings}
+        The ids of the jobs that executed each case, keyed by case label
+    accounting : dict of {string: JobAccounting}
+        The accounting of the jobs, keyed by job id
+
+    Returns
+    -------
+    list of AccountingCheck
+        The mean measurements of the timing wrapper and the mean accounting
+        of the jobs of each case. The jobs that executed several cases (a
+        bundle) are not used, as their accounting covers all the cases.
+        The cases without the accounting of any job are not included
+    """
+    owners = {}
+    for label, job_ids in case_jobs.items():
+        for job_id in set(job_ids):
+            owners[job_id] = owners.get(job_id, 0) + 1
+    checks = []
+    for case in case_results:
+        jobs = [accounting[job_id] for job_id in case_jobs.get(case.label, [])
+                if owners[job_id] == 1 and job_id in accounting]
+        if not jobs:
+            continue
+        means = []
+        for field in ['elapsed', 'total_cpu', 'max_rss']:
+            values = [getattr(job, field) for job in jobs
+                      if getattr(job, field) is not None]
+            means.append(float(np.mean(values)) if values else None)
+        checks.append(AccountingCheck(
+            case.label, float(np.mean(case.wall)), means[0],
+            float(np.mean(case.user) + np.mean(case.kernel)), means[1],
+            float(np.mean(case.mem)), means[2]))
+    return checks
+
+
+def get_accounting_mismatches(check, tolerance=ACCOUNTING_TOLERANCE):
+    """Returns the measurements that disagree with the accounting of the jobs
+
+    Parameters
+    ----------
+    check : AccountingCheck
+        The comparison of the measurements of a case with its accounting
+    tolerance : float, optional
+        The relative difference over which a measurement disagrees with the
+        accounting
+
+    Returns
+    -------
+    list of strings
+        The measurements that disagree: 'wall', 'cpu' and/or 'mem'. The
+        measurements without accounting are not compared
+    """
+    mismatches = []
+    for name, measured, accounted in [('wall', check.wall, check.elapsed),
+                                      ('cpu', check.cpu, check.total_cpu),
+                                      ('mem', check.mem, check.max_rss)]:
+        if accounted is None:
+            continue
+        diff = abs(measured - accounted)
+        if name != 'mem' and diff < ACCOUNTING_MIN_TIME:
+            continue
+        if diff > tolerance * max(abs(measured), abs(accounted)):
+            mismatches.append(name)
+    return mismatches
+
+
 def process_benchmark_results(case_results):
     """Processes the benchmark results stored in input_dir
 
@@ -89,9 +361,21 @@ def process_benchmark_results(case_results):
     -------
     SummarizedResults
         namedtuple with the benchmark suite results
+
+    Notes
+    -----
+    The censored repetitions (stopped by a runner limit) are included in the
+    means, so the mean of a case with censored repetitions is a lower bound.
+    The fraction of censored repetitions of each case is stored in
+    extra['censored'] and the fitted curves treat those means as lower
+    bounds (see curve_fitting)
+
+    If the start time of the repetitions is known, the suite is checked for
+    a drift of the wall time along its execution (see check_drift)
     """
     # Get all the benchmark data in a single structure
     # with mean and standard deviation values
+    case_results = list(case_results)
     labels = []
     result_means = BenchData([], [], [], [])
     result_stdev = BenchData([], [], [], [])
@@ -113,18 +397,53 @@ def process_benchmark_results(case_results):
         x = np.asarray(labels, dtype=np.float64)
     except ValueError:
         x = np.arange(len(labels))
+    # Fraction of repetitions of each case stopped by a runner limit
+    censored = [np.mean(case.censored) if case.censored else 0.0
+                for case in case_results]
+    lower_bounds = np.asarray(censored) > 0
     # Get the polynomial that fits the wall time
-    wall_poly, wall_deg = curve_fitting(x, result_means.wall)
+    wall_poly, wall_deg = curve_fitting(x, result_means.wall, lower_bounds)
     wall_curve = FittedCurve(wall_poly, wall_deg)
     # Get the polynomial that fits the memory usage
-    mem_poly, mem_deg = curve_fitting(x, result_means.mem)
+    mem_poly, mem_deg = curve_fitting(x, result_means.mem, lower_bounds)
     mem_curve = FittedCurve(mem_poly, mem_deg)
 
+    extra = summarize_extra_measurements(case_results)
+    if np.any(lower_bounds):
+        if extra is None:
+            extra = {}
+        extra['censored'] = (censored, [0.0] * len(censored))
+
+    drift = check_drift(case_results)
     result = SummarizedResults(labels, result_means, result_stdev, wall_curve,
-                               mem_curve)
+                               mem_curve, extra, drift)
     return result
 
 
+def get_bench_summary(results):
+    """Returns the summary of the processed results of a benchmark suite
+
+    The summary holds the same values as the summarized_results.txt file
+    written for the processed results, so it can be compared with the
+    summaries of other runs of the suite
+
+    Parameters
+    ----------
+    results : SummarizedResults
+        The processed results of the benchmark suite
+
+    Returns
+    -------
+    BenchSummary
+        The summary of the results
+    """
+    return BenchSummary(results.labels, results.means.wall,
+                        results.stdevs.wall, results.means.user,
+                        results.stdevs.user, results.means.kernel,
+                        results.stdevs.kernel, results.means.mem,
+                        results.stdevs.mem, results.extra)
+
+
 def compare_benchmark_results(results, labels):
     """
     Parameters
@@ -0,0 +1,388 @@
+#!/usr/bin/env python
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+# SQLite store of the results of the benchmark suites. Each timing directory
+# loaded into the database is a run, described by the command benchmarked,
+# the parameter of the suite, the host, the QIIME version and a free label.
+# The measurements of every repetition are stored as a row of the reps
+# table, so the runs can be queried and loaded back as BenchCase tuples
+# without going through the timing files again. A run is identified by its
+# timing directory and the checksum of its repetitions, so loading the same
+# results twice does not duplicate them
+
+import sqlite3
+from contextlib import closing
+from hashlib import sha1
+from json import dumps, loads
+from math import isnan
+from numbers import Number
+from os.path import abspath, basename, dirname, normpath
+from re import match
+
+from scaling.util import BenchCase, BenchRun
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    command TEXT NOT NULL,
+    parameter TEXT,
+    host TEXT,
+    version TEXT,
+    label TEXT,
+    timestamp TEXT,
+    source TEXT NOT NULL,
+    checksum TEXT
+);
+CREATE TABLE IF NOT EXISTS reps (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id),
+    case_idx INTEGER NOT NULL,
+    case_label TEXT NOT NULL,
+    rep INTEGER NOT NULL,
+    wall REAL NOT NULL,
+    user REAL NOT NULL,
+    kernel REAL NOT NULL,
+    mem INTEGER NOT NULL,
+    censored INTEGER NOT NULL,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_command ON runs (command);
+CREATE INDEX IF NOT EXISTS runs_parameter ON runs (parameter);
+CREATE INDEX IF NOT EXISTS runs_host ON runs (host);
+CREATE INDEX IF NOT EXISTS runs_version ON runs (version);
+CREATE INDEX IF NOT EXISTS reps_run ON reps (run_id, case_idx, rep);
+CREATE INDEX IF NOT EXISTS reps_case ON reps (case_label);
+"""
+
+# Columns of the reps table that identify a run, in checksum order
+CHECKSUM_COLUMNS = ['case_idx', 'case_label', 'rep', 'wall', 'user',
+                    'kernel', 'mem', 'censored', 'extra']
+
+# Identifies the runs, created once the checksum column is known to exist
+RUNS_SOURCE_INDEX = ("CREATE UNIQUE INDEX IF NOT EXISTS runs_source ON runs "
+                     "(source, checksum)")
+
+# Columns of the runs table that can be used to select runs
+RUN_FILTERS = ['command', 'parameter', 'host', 'version', 'label']
+
+
+def connect_results_db(db_fp):
+    """Opens the results database, creating its tables if needed
+
+    Parameters
+    ----------
+    db_fp: string
+        Path to the SQLite database
+
+    Returns
+    -------
+    sqlite3.Connection
+        The connection to the database
+    """
+    con = sqlite3.connect(db_fp)
+    con.executescript(SCHEMA)
+    # The databases created before the runs were checksummed keep their runs
+    columns = [row[1] for row in con.execute("PRAGMA table_info(runs)")]
+    with con:
+        if 'checksum' not in columns:
+            con.execute("ALTER TABLE runs ADD COLUMN checksum TEXT")
+        _backfill_checksums(con)
+        con.execute(RUNS_SOURCE_INDEX)
+    return con
+
+
+def get_run_checksum(rows):
+    """Returns the SHA-1 of the repetitions of a run
+
+    Parameters
+    ----------
+    rows: Iterable of tuple
+        The values of CHECKSUM_COLUMNS of each repetition, in order of case
+        and repetition
+
+    Returns
+    -------
+    string
+        The checksum, as hexadecimal digits. The values are normalized, so
+        the rows read back from the database give the same checksum as the
+        ones stored
+    """
+    digest = sha1()
+    for row in rows:
+        values = []
+        for value in row:
+            if value is None:
+                value = u"\\N"
+            elif isinstance(value, Number):
+                value = u"%r" % float(value)
+            elif isinstance(value, bytes):
+                value = value.decode('utf-8')
+            values.append(value)
+        digest.update((u"\t".join(values) + u"\n").encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _backfill_checksums(con):
+    """Computes the checksum of the runs stored without it
+
+    A run with the same source and repetitions as an earlier run is a
+    duplicate: its checksum is suffixed with its id, so it is kept but it
+    is never matched by a new ingest
+    """
+    seen = set(con.execute("SELECT source, checksum FROM runs WHERE "
+                           "checksum IS NOT NULL").fetchall())
+    missing = con.execute("SELECT run_id, source FROM runs WHERE checksum IS "
+                          "NULL ORDER BY run_id").fetchall()
+    for run_id, source in missing:
+        checksum = get_run_checksum(con.execute(
+            "SELECT %s FROM reps WHERE run_id = ? ORDER BY case_idx, rep"
+            % ", ".join(CHECKSUM_COLUMNS), (run_id,)))
+        if (source, checksum) in seen:
+            checksum = "%s:%d" % (checksum, run_id)
+        seen.add((source, checksum))
+        con.execute("UPDATE runs SET checksum = ? WHERE run_id = ?",
+                    (checksum, run_id))
+
+
+def get_suite_info(timing_dir):
+    """Returns the command, start time and parameter of a timing directory
+
+    The bash suites store their results in <command>_YYYYMMDD_HHMMSS/timing,
+    and the parameter suites use a timing directory per parameter
+    (e.g. <suite dir>/timing/similarity)
+
+    Parameters
+    ----------
+    timing_dir: string
+        The timing directory, as provided to process-bench-results
+
+    Returns
+    -------
+    string, string, string
+        The command (the name of the suite directory if it does not follow the
+        layout of the bash suites), the start time of the suite
+        (YYYYMMDD_HHMMSS) and the parameter of the suite. The start time and
+        the parameter are None if they are not known
+    """
+    timing_dir = normpath(abspath(timing_dir))
+    parameter = None
+    suite_dir = dirname(timing_dir)
+    if basename(timing_dir) != "timing" and basename(suite_dir) == "timing":
+        parameter = basename(timing_dir)
+        suite_dir = dirname(suite_dir)
+    name = basename(suite_dir)
+    m = match(r"^(.+)_(\d{8}_\d{6})$", name)
+    if m:
+        return m.group(1), m.group(2), parameter
+    return name, None, parameter
+
+
+def _get_rep_extra(case, i):
+    """Returns the extra measurements of the i-th repetition of case"""
+    if not case.extra:
+        return None
+    # The metrics missing on the repetition are stored as NaN in the case
+    extra = dict((key, values[i]) for key, values in case.extra.items()
+                 if not (isinstance(values[i], float) and isnan(values[i])))
+    return dumps(extra, sort_keys=True) if extra else None
+
+
+def ingest_bench_results(db_fp, runs, command=None, host=None, version=None,
+                         label=None):
+    """Loads the results of several timing directories into the database
+
+    All the runs are loaded in a single transaction, so either all of them
+    are stored or none is. A run whose timing directory and repetitions are
+    already in the database is not stored again: the id of the stored run is
+    returned and its command, host, version and label are kept
+
+    Parameters
+    ----------
+    db_fp: string
+        Path to the SQLite database. It is created if it does not exist
+    runs: list of (string, list of BenchCase)
+        The timing directory and the results of each run
+        (see parse_timing_directory)
+    command: string, optional
+        The command benchmarked. Defaults to the one given by the name of the
+        suite directory (see get_suite_info)
+    host: string, optional
+        The host that executed the runs
+    version: string, optional
+        The QIIME version used in the runs
+    label: string, optional
+        A free label to identify the runs
+
+    Returns
+    -------
+    list of int
+        The ids of the runs in the database
+    """
+    run_ids = []
+    with closing(connect_results_db(db_fp)) as con:
+        with con:
+            for timing_dir, cases in runs:
+                suite_cmd, timestamp, parameter = get_suite_info(timing_dir)
+                source = normpath(abspath(timing_dir))
+                rows = []
+                for case_idx, case in enumerate(cases):
+                    for i in range(len(case.wall)):
+                        censored = case.censored[i] if case.censored else 0
+                        rows.append((case_idx, case.label, i, case.wall[i],
+                                     case.user[i], case.kernel[i],
+                                     case.mem[i], int(censored),
+                                     _get_rep_extra(case, i)))
+                checksum = get_run_checksum(rows)
+                cur = con.execute(
+                    "INSERT OR IGNORE INTO runs (command, parameter, host, "
+                    "version, label, timestamp, source, checksum) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (command or suite_cmd, parameter, host, version, label,
+                     timestamp, source, checksum))
+                if cur.rowcount == 0:
+                    # The run is already stored
+                    run_ids.append(con.execute(
+                        "SELECT run_id FROM runs WHERE source = ? AND "
+                        "checksum = ?", (source, checksum)).fetchone()[0])
+                    continue
+                run_id = cur.lastrowid
+                con.executemany("INSERT INTO reps VALUES "
+                                "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                [(run_id,) + row for row in rows])
+                run_ids.append(run_id)
+    return run_ids
+
+
+def _select_runs(con, conds, args):
+    """Returns the runs that match all the SQL conditions in conds"""
+    where = "WHERE %s " % " AND ".join(conds) if conds else ""
+    rows = con.execute(
+        "SELECT r.run_id, r.command, r.parameter, r.host, r.version, "
+        "r.label, r.timestamp, r.source, "
+        "COUNT(DISTINCT p.case_idx), COUNT(p.run_id) "
+        "FROM runs r LEFT JOIN reps p ON p.run_id = r.run_id "
+        "%sGROUP BY r.run_id ORDER BY r.run_id" % where, args).fetchall()
+    return [BenchRun(*row) for row in rows]
+
+
+def query_bench_runs(db_fp, case=None, **filters):
+    """Returns the runs of the database that match all the filters
+
+    Parameters
+    ----------
+    db_fp: string
+        Path to the SQLite database
+    case: string, optional
+        If provided, only the runs with a case with this label (e.g. a
+        parameter value) are returned
+    filters: dict of {string: string}, optional
+        The values that the columns of the runs should have, keyed by column
+        (see RUN_FILTERS). The filters whose value is None are not applied
+
+    Returns
+    -------
+    list of BenchRun
+        The matching runs, ordered by run id
+
+    Raises
+    ------
+    ValueError
+        If a filter is not a column of the runs
+    """
+    unknown = set(filters) - set(RUN_FILTERS)
+    if unknown:
+        raise ValueError("Unknown run filters: %s. Should be any of %s"
+                         % (", ".join(sorted(unknown)),
+                            ", ".join(RUN_FILTERS)))
+    conds = []
+    args = []
+    for column in RUN_FILTERS:
+        if filters.get(column) is not None:
+            conds.append("r.%s = ?" % column)
+            args.append(filters[column])
+    if case is not None:
+        conds.append("r.run_id IN (SELECT run_id FROM reps "
+                     "WHERE case_label = ?)")
+        args.append(case)
+    with closing(connect_results_db(db_fp)) as con:
+        return _select_runs(con, conds, args)
+
+
+def _make_bench_case(label, rows):
+    """Builds the BenchCase of a case from its rows of the reps table"""
+    case = BenchCase(label, [], [], [], [], {}, [])
+    for i, (wall, user, kernel, mem, censored, extra) in enumerate(rows):
+        case.wall.append(wall)
+        case.user.append(user)
+        case.kernel.append(kernel)
+        case.mem.append(mem)
+        case.censored.append(bool(censored))
+        extra = loads(extra) if extra else {}
+        # Keep the extra measurements aligned with the repetitions, as
+        # parse_timing_directory does
+        for key in extra:
+            if key not in case.extra:
+                case.extra[key] = [float('nan')] * i
+        for key in case.extra:
+            case.extra[key].append(extra.get(key, float('nan')))
+    if not case.extra:
+        case = case._replace(extra=None)
+    if not any(case.censored):
+        case = case._replace(censored=None)
+    return case
+
+
+def load_bench_runs(db_fp, run_ids):
+    """Loads the results of several runs with a single read of the database
+
+    Parameters
+    ----------
+    db_fp: string
+        Path to the SQLite database
+    run_ids: list of int
+        The ids of the runs
+
+    Returns
+    -------
+    list of (BenchRun, list of BenchCase)
+        The description and the results of each run, in the order of run_ids.
+        The cases of each run are in the order they were loaded
+
+    Raises
+    ------
+    ValueError
+        If any of the runs is not in the database
+    """
+    run_ids = [int(run_id) for run_id in run_ids]
+    ids = sorted(set(run_ids))
+    placeholders = ", ".join("?" * len(ids))
+    with closing(connect_results_db(db_fp)) as con:
+        runs = dict((run.run_id, run) for run in _select_runs(
+            con, ["r.run_id IN (%s)" % placeholders], ids))
+        missing = [str(run_id) for run_id in ids if run_id not in runs]
+        if missing:
+            raise ValueError("Runs not found in %s: %s"
+                             % (db_fp, ", ".join(missing)))
+        rows = con.execute(
+            "SELECT run_id, case_idx, case_label, wall, user, kernel, mem, "
+            "censored, extra FROM reps WHERE run_id IN (%s) "
+            "ORDER BY run_id, case_idx, rep" % placeholders, ids).fetchall()
+    # Group the rows by run and case
+    results = dict((run_id, []) for run_id in ids)
+    key = None
+    for row in rows:
+        if row[:2] != key:
+            key = row[:2]
+            results[row[0]].append((row[2], []))
+        results[row[0]][-1][1].append(row[3:])
+    cases = dict((run_id, [_make_bench_case(label, case_rows)
+                           for label, case_rows in results[run_id]])
+                 for run_id in ids)
+    return [(runs[run_id], cases[run_id]) for run_id in run_ids]
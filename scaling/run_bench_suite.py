@@ -0,0 +1,838 @@
+#!/usr/bin/env python
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+from os import makedirs
+from os.path import basename, splitext, join, exists, isfile, dirname
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+from threading import Lock
+from random import Random, SystemRandom
+from shlex import split
+from time import time
+from Queue import Queue
+
+from scaling.util import (SuiteCase, CaseRepetitions, RunOptions, Limits,
+                          EXECUTION_ORDERS, TIMING_LOG_FN)
+from scaling.process_results import compute_relative_ci
+from scaling.parse import (parse_timing_file, parse_manifest_file,
+                           parse_timing_log)
+from scaling.measure import (run_measured, write_timing_file,
+                             write_timeline_file, get_tree_measurements)
+from scaling.timing_log import get_timing_log, append_timing_log
+from scaling.page_cache import prepare_cache, posix_fadvise, CACHE_MODES
+from scaling.affinity import (get_available_cpus, allocate_cpu_sets,
+                              get_placement, can_set_affinity,
+                              format_cpu_list)
+
+# Largest seed generated for the random execution order
+MAX_SEED = 2 ** 32 - 1
+
+
+def get_suite_cases_files(command, in_opts, bench_files, out_opt):
+    """Generates the list of cases of a benchmark suite based on input files
+
+    Parameters
+    ----------
+    command: string
+        The base command to execute
+    in_opts: list
+        The options used to provide the input files to the command
+    bench_files: list of lists
+        The input files for each bench case
+    out_opt: string
+        Option used to indicate the output path to the command
+
+    Returns
+    -------
+    list of SuiteCase
+        The cases of the benchmark suite, named after the first input file of
+        each case. The input files of each case are stored in its inputs
+
+    Raises
+    ------
+    ValueError
+        If the number of input options and the number of files of some case
+        does not match
+    """
+    cases = []
+    for bfs in bench_files:
+        if len(in_opts) != len(bfs):
+            raise ValueError("The number of options and the number of values "
+                             "provided must be the same")
+        base_name = splitext(basename(bfs[0]))[0]
+        cmd = split(command)
+        for opt, val in zip(in_opts, bfs):
+            cmd.extend([opt, val])
+        cases.append(SuiteCase(base_name, cmd, out_opt, list(bfs)))
+    return cases
+
+
+def get_suite_cases_parameters(command, parameters, out_opt):
+    """Generates the list of cases of a benchmark suite based on parameters
+
+    Parameters
+    ----------
+    command: string
+        The command to execute
+    parameters: dict of {string: list of strings}
+        The parameter values to test, keyed by parameter
+    out_opt: string
+        The option used to indicate the output path to the command
+
+    Returns
+    -------
+    list of SuiteCase
+        The cases of the benchmark suite, named "<parameter>/<value>". The
+        arguments of the command that are existing files are stored as the
+        inputs of each case
+    """
+    cases = []
+    for param in parameters:
+        for val in parameters[param]:
+            cmd = split(command) + ["--" + param, val]
+            inputs = [arg for arg in cmd[1:] if isfile(arg)]
+            cases.append(SuiteCase("/".join([param, val]), cmd, out_opt,
+                                   inputs if inputs else None))
+    return cases
+
+
+def get_execution_order(cases, num_reps, order='sequential', seed=None):
+    """Returns the order in which the repetitions of the suite are executed
+
+    Parameters
+    ----------
+    cases: list of SuiteCase
+        The cases of the benchmark suite
+    num_reps: int
+        Number of times each case is executed
+    order: {'sequential', 'random', 'interleaved'}, optional
+        'sequential' executes all the cases, in order, once per repetition.
+        'random' shuffles all the (case, repetition) pairs using seed.
+        'interleaved' rotates the cases on each repetition, so each case
+        is executed on every position of the repetition block
+    seed: int, optional
+        Seed of the random order
+
+    Returns
+    -------
+    list of (SuiteCase, int)
+        The (case, repetition) pairs in execution order
+
+    Raises
+    ------
+    ValueError
+        If order is not one of EXECUTION_ORDERS
+    """
+    if order not in EXECUTION_ORDERS:
+        raise ValueError("Unknown execution order: %s. Should be one of %s"
+                         % (order, ", ".join(EXECUTION_ORDERS)))
+    tasks = []
+    for rep in range(1, num_reps + 1):
+        block = list(cases)
+        if order == 'interleaved' and block:
+            shift = (rep - 1) % len(block)
+            block = block[shift:] + block[:shift]
+        tasks.extend((case, rep) for case in block)
+    if order == 'random':
+        Random(seed).shuffle(tasks)
+    return tasks
+
+
+def write_execution_order_file(dest, order, seed, tasks, append=False):
+    """Writes the execution order of the suite to dest/execution_order.txt
+
+    Parameters
+    ----------
+    dest: string
+        The benchmark suite output directory
+    order: string
+        The execution order mode
+    seed: int or None
+        The seed of the random order
+    tasks: list of (SuiteCase, int)
+        The (case, repetition) pairs in execution order
+    append: bool, optional
+        If True, the order is appended to the existing file (e.g. when
+        resuming a suite)
+    """
+    lines = ["#order\t%s" % order, "#seed\t%s" % seed, "#case\trep"]
+    lines.extend("%s\t%d" % (case.name, rep) for case, rep in tasks)
+    with open(join(dest, "execution_order.txt"), 'a' if append else 'w') as f:
+        f.write("\n".join(lines))
+        f.write("\n")
+
+
+def get_timing_dirs(dest, cases):
+    """Returns the timing directories that process-bench-results should use
+
+    Parameters
+    ----------
+    dest: string
+        The benchmark suite output directory
+    cases: list of SuiteCase
+        The cases of the benchmark suite
+
+    Returns
+    -------
+    list of strings
+        The timing directory of the suite if the cases are based on input
+        files, or one timing directory per parameter otherwise
+    """
+    timing_dest = join(dest, "timing")
+    timing_dirs = []
+    for case in cases:
+        if "/" in case.name:
+            param_dir = join(timing_dest, case.name.split("/")[0])
+        else:
+            param_dir = timing_dest
+        if param_dir not in timing_dirs:
+            timing_dirs.append(param_dir)
+    return timing_dirs
+
+
+def make_suite_dirs(dest, cases, timing_log=False):
+    """Creates the directory structure used by the benchmark suite
+
+    The structure is the same one created by the bash bench suites:
+    dest/command_outputs/<case> and dest/timing/<case>
+
+    Parameters
+    ----------
+    dest: string
+        The benchmark suite output directory
+    cases: list of SuiteCase
+        The cases of the benchmark suite
+    timing_log: bool, optional
+        If True, the measurements are stored in timing logs, so only the
+        directories of the timing logs are created under dest/timing
+    """
+    for case in cases:
+        case_dirs = [join(dest, "command_outputs", case.name)]
+        if timing_log:
+            case_dirs.append(dirname(get_timing_log(dest, case.name)[0]))
+        else:
+            case_dirs.append(join(dest, "timing", case.name))
+        for case_dir in case_dirs:
+            if not exists(case_dir):
+                makedirs(case_dir)
+
+
+class SuiteManifest(object):
+    """Keeps track of the completed repetitions of a benchmark suite
+
+    The completed (case, repetition) pairs are appended to
+    dest/manifest.txt as soon as their timing record is written, so a suite
+    that has been interrupted can be resumed without repeating the finished
+    work
+
+    Parameters
+    ----------
+    dest: string
+        The benchmark suite output directory
+    resume: bool, optional
+        If True, the repetitions listed in an existing manifest are kept.
+        Otherwise, a new manifest is started
+    timing_log: bool, optional
+        If True, the timing results are read from the timing logs instead of
+        the timing files
+    """
+
+    def __init__(self, dest, resume=False, timing_log=False):
+        self.fp = join(dest, "manifest.txt")
+        self.dest = dest
+        self.timing_log = timing_log
+        self._lock = Lock()
+        self._completed = set()
+        # Timing records of the timing logs, keyed by log path
+        self._logs = {}
+        if resume and exists(self.fp):
+            with open(self.fp, 'U') as f:
+                self._completed = parse_manifest_file(f)
+        else:
+            with open(self.fp, 'w') as f:
+                f.write("#case\trep\n")
+
+    def get_completed(self, case, rep):
+        """Returns the timing results of a completed repetition
+
+        A repetition is completed if it is listed in the manifest and its
+        timing record can be used by process-bench-results
+
+        Parameters
+        ----------
+        case: SuiteCase
+            The benchmark case
+        rep: int
+            The repetition number
+
+        Returns
+        -------
+        tuple or None
+            The parsed timing record (see parse_timing_file), or None if the
+            repetition should be executed
+        """
+        if (case.name, rep) not in self._completed:
+            return None
+        if self.timing_log:
+            log_fp, label = get_timing_log(self.dest, case.name)
+            with self._lock:
+                if log_fp not in self._logs:
+                    self._logs[log_fp] = self._read_log(log_fp)
+            return self._logs[log_fp].get((label, str(rep)))
+        timing_fp = join(self.dest, "timing", case.name, "%d.txt" % rep)
+        try:
+            with open(timing_fp, 'U') as f:
+                return parse_timing_file(f)
+        except IOError:
+            return None
+
+    def _read_log(self, log_fp):
+        """Returns the timing records of a timing log keyed by (case, rep)"""
+        try:
+            with open(log_fp, 'U') as f:
+                records, _ = parse_timing_log(f)
+        except IOError:
+            return {}
+        # If a repetition is logged more than once, the last record is used
+        return dict(((case, rep), info) for case, rep, info in records)
+
+    def add(self, case, rep):
+        """Records a repetition as completed
+
+        Parameters
+        ----------
+        case: SuiteCase
+            The benchmark case
+        rep: int
+            The repetition number
+        """
+        with self._lock:
+            self._completed.add((case.name, rep))
+            with open(self.fp, 'a') as f:
+                f.write("%s\t%d\n" % (case.name, rep))
+
+
+def _run_placed(case, out_fp, run_opts, cache=None):
+    """Executes the command of case on a free CPU set, if any
+
+    Parameters
+    ----------
+    case: SuiteCase
+        The case to execute
+    out_fp: string
+        Output path provided to the command
+    run_opts: RunOptions
+        Options controlling the execution and measurement of the command
+    cache: {'cold', 'warm'}, optional
+        The page cache state of the inputs of case before the execution
+
+    Returns
+    -------
+    TimingRecord, Timeline or None, float, Placement or None
+        The measurements, the timeline if the command was sampled, the start
+        time and the placement of the command
+    """
+    if case.inputs:
+        prepare_cache(case.inputs, cache)
+    placement = None
+    if run_opts.cpu_sets is not None:
+        # Wait until a CPU set is free, so the concurrent commands never
+        # share a CPU
+        cpus = run_opts.cpu_sets.get()
+        placement = get_placement(cpus, run_opts.numa_bind)
+    start = time()
+    try:
+        record, timeline = run_measured(case.cmd + [case.out_opt, out_fp],
+                                        run_opts.sample_interval, placement,
+                                        run_opts.limits)
+    finally:
+        if placement is not None:
+            run_opts.cpu_sets.put(cpus)
+    return record, timeline, start, placement
+
+
+def _run_timed(case, out_fp, run_opts, timeline_fp=None):
+    """Executes the command of case and gathers its timing record
+
+    If run_opts.cache_mode is 'both', the command is executed with cold
+    inputs and then with warm inputs (writing to out_fp + "_warm"). The wall,
+    user and kernel time and memory of the warm execution are added to the
+    extra measurements as warm_wall, warm_user, warm_kernel and warm_mem
+
+    Parameters
+    ----------
+    case: SuiteCase
+        The case to execute
+    out_fp: string
+        Output path provided to the command
+    run_opts: RunOptions
+        Options controlling the execution and measurement of the command. If
+        cpu_sets is provided, the command is pinned to one of its CPU sets
+        and the placement is recorded in the timing file
+    timeline_fp: string, optional
+        Path to the timeline file, written if the command is sampled
+
+    Returns
+    -------
+    TimingRecord, dict of {string: number}
+        The measurements of the command execution and the extra
+        measurements to store in its timing record
+    """
+    cache = 'cold' if run_opts.cache_mode == 'both' else run_opts.cache_mode
+    record, timeline, start, placement = _run_placed(case, out_fp, run_opts,
+                                                     cache)
+    # The start time is used to check for drift along the suite execution
+    extra = {'start': "%.6f" % start}
+    if timeline is not None:
+        extra.update(get_tree_measurements(timeline))
+        extra['sampling_overhead'] = "%.6f" % timeline.overhead
+        if timeline_fp is not None:
+            write_timeline_file(timeline_fp,
+                                timeline._replace(wall=record.wall))
+    if placement is not None:
+        extra['cpus'] = format_cpu_list(placement.cpus)
+        if placement.node is not None:
+            extra['mem_node'] = placement.node
+    if cache is not None:
+        extra['cache'] = cache
+    failed = (record.censored is not None or record.status != 0 or
+              record.signal != 0)
+    if run_opts.cache_mode == 'both' and not failed:
+        warm_opts = run_opts._replace(sample_interval=None)
+        warm = _run_placed(case, out_fp + "_warm", warm_opts, 'warm')[0]
+        if warm.censored is None and warm.status == 0 and warm.signal == 0:
+            extra['warm_wall'] = "%.6f" % warm.wall
+            extra['warm_user'] = "%.6f" % warm.user
+            extra['warm_kernel'] = "%.6f" % warm.kernel
+            extra['warm_mem'] = warm.mem
+    return record, extra
+
+
+def _write_timing(dest, case_name, rep, record, extra, run_opts):
+    """Stores the timing record of a repetition of the suite
+
+    Parameters
+    ----------
+    dest: string
+        The benchmark suite output directory
+    case_name: string
+        The name of the case
+    rep: int
+        The repetition number
+    record: TimingRecord
+        The measurements of the repetition
+    extra: dict of {string: number}
+        The extra measurements of the repetition
+    run_opts: RunOptions
+        If timing_log is True, the record is appended to the timing log of
+        the case. Otherwise, it is written to dest/timing/<case>/<rep>.txt
+    """
+    if run_opts.timing_log:
+        log_fp, label = get_timing_log(dest, case_name)
+        append_timing_log(log_fp, label, rep, record, extra)
+    else:
+        write_timing_file(join(dest, "timing", case_name, "%d.txt" % rep),
+                          record, extra)
+
+
+def run_bench_case(dest, case, rep, run_opts=None, manifest=None):
+    """Executes a single repetition of a benchmark case
+
+    Parameters
+    ----------
+    dest: string
+        The benchmark suite output directory
+    case: SuiteCase
+        The case to execute
+    rep: int
+        The repetition number
+    run_opts: RunOptions, optional
+        Options controlling the execution and measurement of the command.
+        If sample_interval is set, the timeline of the repetition is stored
+        in dest/timelines/<case>/<rep>.txt. If timing_log is set, the timing
+        record is appended to the timing log of the case instead of written
+        to dest/timing/<case>/<rep>.txt
+    manifest: SuiteManifest, optional
+        If provided, the repetition is recorded in the manifest once its
+        timing record is written
+
+    Returns
+    -------
+    TimingRecord
+        The measurements of the repetition
+    """
+    if run_opts is None:
+        run_opts = RunOptions()
+    out_fp = join(dest, "command_outputs", case.name, str(rep))
+    timeline_fp = None
+    if run_opts.sample_interval is not None:
+        timeline_dir = join(dest, "timelines", case.name)
+        if not exists(timeline_dir):
+            makedirs(timeline_dir)
+        timeline_fp = join(timeline_dir, "%d.txt" % rep)
+    record, extra = _run_timed(case, out_fp, run_opts, timeline_fp)
+    _write_timing(dest, case.name, rep, record, extra, run_opts)
+    if manifest is not None:
+        manifest.add(case, rep)
+    return record
+
+
+def run_warmup_case(dest, case, run, run_opts=None):
+    """Executes a warmup run of a benchmark case
+
+    The timing record is stored under dest/warmup (in dest/warmup/timing.log
+    if run_opts.timing_log is set), so it is never used by
+    process-bench-results
+
+    Parameters
+    ----------
+    dest: string
+        The benchmark suite output directory
+    case: SuiteCase
+        The case to execute
+    run: int
+        The warmup run number
+    run_opts: RunOptions, optional
+        Options controlling the execution and measurement of the command
+    """
+    if run_opts is None:
+        run_opts = RunOptions()
+    warmup_dir = join(dest, "warmup")
+    if not run_opts.timing_log:
+        warmup_dir = join(warmup_dir, case.name)
+    if not exists(warmup_dir):
+        makedirs(warmup_dir)
+    out_fp = join(dest, "command_outputs", case.name, "warmup_%d" % run)
+    record, extra = _run_timed(case, out_fp, run_opts)
+    if run_opts.timing_log:
+        append_timing_log(join(warmup_dir, TIMING_LOG_FN), case.name, run,
+                          record, extra)
+    else:
+        write_timing_file(join(warmup_dir, "%d.txt" % run), record, extra)
+
+
+def run_bench_case_adaptive(dest, case, min_reps=1, warmup=0, target_ci=None,
+                            max_reps=30, time_budget=None, run_opts=None,
+                            manifest=None):
+    """Executes a benchmark case until its wall time estimate is precise
+
+    After discarding `warmup` runs, the case is repeated until the relative
+    95% confidence interval of the wall time mean falls below `target_ci`,
+    `max_reps` repetitions are executed or the time spent on the case
+    exceeds `time_budget`. At least `min_reps` repetitions are executed,
+    unless the time budget is exhausted earlier. If `target_ci` is None,
+    exactly `min_reps` repetitions are executed.
+
+    A censored repetition (stopped by a runner limit) is not used to
+    compute the CI and ends the repetitions of the case.
+
+    The repetitions already completed according to `manifest` are not
+    executed again, but their results are used to compute the CI. The
+    warmup runs are executed just before the first repetition that has to
+    be executed.
+
+    Parameters
+    ----------
+    dest: string
+        The benchmark suite output directory
+    case: SuiteCase
+        The case to execute
+    min_reps: int, optional
+        Minimum number of repetitions
+    warmup: int, optional
+        Number of warmup runs to discard
+    target_ci: float, optional
+        Target relative half-width of the 95% CI of the wall time mean
+    max_reps: int, optional
+        Maximum number of repetitions
+    time_budget: float, optional
+        Maximum number of seconds to spend on the case, including warmup
+    run_opts: RunOptions, optional
+        Options controlling the execution and measurement of the command
+    manifest: SuiteManifest, optional
+        The manifest with the completed repetitions of the suite
+
+    Returns
+    -------
+    CaseRepetitions
+        The number of repetitions executed and the achieved relative CI
+    """
+    start = time()
+    warmed_up = False
+    walls = []
+    rep = 0
+    while True:
+        rep += 1
+        completed = None
+        if manifest is not None:
+            completed = manifest.get_completed(case, rep)
+        if completed is not None:
+            censored = 'censored' in completed[4]
+            if not censored:
+                walls.append(completed[0])
+        else:
+            if not warmed_up:
+                for run in range(1, warmup + 1):
+                    run_warmup_case(dest, case, run, run_opts)
+                warmed_up = True
+            record = run_bench_case(dest, case, rep, run_opts, manifest)
+            censored = record.censored is not None
+            # Failed executions are not used by process-bench-results
+            if not censored and record.status == 0 and record.signal == 0:
+                walls.append(record.wall)
+        rel_ci = compute_relative_ci(walls)
+
+        # The next repetitions would most likely hit the limit too
+        if censored:
+            break
+
+        if target_ci is None:
+            if rep >= min_reps:
+                break
+        elif rep >= max_reps:
+            break
+        elif rep >= min_reps and rel_ci <= target_ci:
+            break
+        if time_budget is not None and time() - start >= time_budget:
+            break
+
+    return CaseRepetitions(case.name, warmup, rep, rel_ci)
+
+
+def _run_bench_case_star(args):
+    """Unpacks the arguments of run_bench_case, used by the pool"""
+    return run_bench_case(*args)
+
+
+def _run_bench_case_adaptive_star(args):
+    """Unpacks the arguments of run_bench_case_adaptive, used by the pool"""
+    return run_bench_case_adaptive(*args)
+
+
+def write_repetitions_file(dest, repetitions):
+    """Writes the number of repetitions and achieved CI of each case
+
+    Parameters
+    ----------
+    dest: string
+        The benchmark suite output directory
+    repetitions: list of CaseRepetitions
+        The repetitions information of each case
+    """
+    lines = ["\t".join(["#case", "warmup", "reps", "rel_ci"])]
+    for case_reps in repetitions:
+        lines.append("\t".join([case_reps.name, str(case_reps.warmup),
+                                str(case_reps.reps), str(case_reps.rel_ci)]))
+    with open(join(dest, "repetitions.txt"), 'w') as f:
+        f.write("\n".join(lines))
+        f.write("\n")
+
+
+def run_bench_suite(dest, cases, num_reps=1, jobs=1, per_core=False,
+                    warmup=0, target_ci=None, max_reps=30, time_budget=None,
+                    sample_interval=None, cpus_per_case=None,
+                    isolate_siblings=False, numa_bind=False, resume=False,
+                    timeout=None, max_rss=None, max_vmem=None,
+                    order='sequential', seed=None, cache_mode=None,
+                    timing_log=False):
+    """Executes the benchmark suite using a bounded pool of workers
+
+    Up to `jobs` commands are running at the same time. The timing results
+    are written following the layout timing/<case>/<rep>.txt, which is the
+    layout expected by parse_timing_directory. If timing_log is True, they
+    are appended instead to the timing log of each timing directory (see
+    scaling.timing_log), so a single file is written per timing directory.
+
+    If neither warmup runs nor a target CI are requested, each
+    (case, repetition) pair is executed independently. Otherwise the
+    repetitions of a case are executed in order by a single worker (see
+    run_bench_case_adaptive) and the number of repetitions used for each
+    case is stored in dest/repetitions.txt
+
+    If cpus_per_case is provided, the available CPUs are split in disjoint
+    sets and each running command is pinned to a set that no other command
+    is using, so concurrent commands do not disturb each other
+
+    The execution order of the repetitions (see get_execution_order) and
+    the seed used are recorded in dest/execution_order.txt. If the
+    repetitions of each case are executed by a single worker, the order
+    applies to the cases ('random' shuffles them and 'interleaved' is the
+    same as 'sequential').
+
+    The completed repetitions are recorded in dest/manifest.txt. If resume
+    is True, the repetitions listed in the manifest whose timing file can be
+    used by process-bench-results are not executed again
+
+    If cache_mode is provided, the input files of each case are evicted from
+    the page cache ('cold') or pre-read into it ('warm') before each
+    repetition. With 'both', each repetition is executed cold and then warm,
+    and the warm measurements are stored as extra measurements of the
+    timing file (see _run_timed)
+
+    Parameters
+    ----------
+    dest: string
+        The benchmark suite output directory
+    cases: list of SuiteCase
+        The cases of the benchmark suite
+    num_reps: int, optional
+        Number of times each case should be executed. If target_ci is
+        provided, minimum number of times each case should be executed
+    jobs: int, optional
+        Maximum number of commands executed concurrently
+    per_core: bool, optional
+        If True, `jobs` is ignored and one command per core is executed
+    warmup: int, optional
+        Number of warmup runs of each case, whose results are discarded
+    target_ci: float, optional
+        Target relative half-width of the 95% CI of the wall time mean
+    max_reps: int, optional
+        Maximum number of repetitions of each case if target_ci is provided
+    time_budget: float, optional
+        Maximum number of seconds to spend on each case
+    sample_interval: float, optional
+        If provided, the memory and CPU usage of each command are sampled
+        every sample_interval seconds and stored in dest/timelines
+    cpus_per_case: int, optional
+        If provided, each command is pinned to a dedicated set of
+        cpus_per_case CPUs. If per_core is True, one command per CPU set is
+        executed
+    isolate_siblings: bool, optional
+        If True, only one hardware thread of each physical core is used, so
+        the sibling hyperthreads are kept idle
+    numa_bind: bool, optional
+        If True and numactl is available, the memory of each command is bound
+        to the NUMA node of its CPU set
+    resume: bool, optional
+        If True, resume a previous execution of the suite in dest, executing
+        only the repetitions that are missing or whose timing file is
+        malformed
+    timeout: float, optional
+        Maximum number of seconds each command can run
+    max_rss: int, optional
+        Maximum RSS, in KB, of the process tree of each command
+    max_vmem: int, optional
+        Maximum virtual memory, in KB, of each process (RLIMIT_AS)
+    order: {'sequential', 'random', 'interleaved'}, optional
+        The execution order of the repetitions
+    seed: int, optional
+        Seed of the random order. If not provided, a random seed is used
+    cache_mode: {'cold', 'warm', 'both'}, optional
+        The page cache state of the input files of each case. By default, the
+        page cache is not modified
+    timing_log: bool, optional
+        If True, the timing results are appended to a timing log per timing
+        directory instead of written to a timing file per repetition
+
+    Returns
+    -------
+    list of strings
+        The timing directories to process with process-bench-results
+
+    Raises
+    ------
+    ValueError
+        If num_reps, jobs, max_reps or cpus_per_case are lower than 1, warmup
+        is negative, target_ci, sample_interval or any limit are not
+        positive, order or cache_mode are unknown, the files cannot be
+        evicted from the page cache or there are not enough CPUs to give each
+        job a dedicated CPU set
+
+    Notes
+    -----
+    The commands that exceed a limit are killed, together with all their
+    descendants, and recorded as censored, so process-bench-results can use
+    them as lower bounds
+    """
+    if num_reps < 1:
+        raise ValueError("The number of repetitions should be at least 1")
+    cpu_sets = None
+    if cpus_per_case is not None:
+        if cpus_per_case < 1:
+            raise ValueError("The number of CPUs per case should be at "
+                             "least 1")
+        if not can_set_affinity():
+            raise ValueError("The CPU affinity cannot be set: "
+                             "os.sched_setaffinity and taskset are not "
+                             "available")
+        available_sets = allocate_cpu_sets(get_available_cpus(),
+                                           cpus_per_case, isolate_siblings)
+        if per_core:
+            jobs = len(available_sets)
+        if jobs > len(available_sets):
+            raise ValueError("Not enough CPUs to pin %d jobs to dedicated "
+                             "sets of %d CPUs" % (jobs, cpus_per_case))
+        cpu_sets = Queue()
+        for cpus in available_sets[:jobs]:
+            cpu_sets.put(cpus)
+    elif isolate_siblings or numa_bind:
+        raise ValueError("The number of CPUs per case is required to isolate "
+                         "the sibling threads or bind the memory")
+    elif per_core:
+        jobs = cpu_count()
+    if jobs < 1:
+        raise ValueError("The number of jobs should be at least 1")
+    if warmup < 0:
+        raise ValueError("The number of warmup runs cannot be negative")
+    if target_ci is not None and target_ci <= 0:
+        raise ValueError("The target CI should be greater than 0")
+    if max_reps < 1:
+        raise ValueError("The maximum number of repetitions should be at "
+                         "least 1")
+    if sample_interval is not None and sample_interval <= 0:
+        raise ValueError("The sampling interval should be greater than 0")
+    limits = Limits(timeout, max_rss, max_vmem)
+    if any(limit is not None and limit <= 0 for limit in limits):
+        raise ValueError("The limits should be greater than 0")
+    if cache_mode is not None:
+        if cache_mode not in CACHE_MODES:
+            raise ValueError("Unknown cache mode: %s. Should be one of %s"
+                             % (cache_mode, ", ".join(CACHE_MODES)))
+        if cache_mode != 'warm' and posix_fadvise is None:
+            raise ValueError("posix_fadvise is not available, the input "
+                             "files cannot be evicted from the page cache")
+    run_opts = RunOptions(sample_interval, cpu_sets, numa_bind, limits,
+                          cache_mode, timing_log)
+    if order not in EXECUTION_ORDERS:
+        raise ValueError("Unknown execution order: %s. Should be one of %s"
+                         % (order, ", ".join(EXECUTION_ORDERS)))
+    if order == 'random' and seed is None:
+        seed = SystemRandom().randint(0, MAX_SEED)
+
+    make_suite_dirs(dest, cases, timing_log)
+    manifest = SuiteManifest(dest, resume, timing_log)
+    pool = ThreadPool(jobs)
+    try:
+        if warmup == 0 and target_ci is None:
+            # By default, loop over repetitions first, so all the cases are
+            # executed once before starting the next repetition, as the bash
+            # suites do
+            execution = [(case, rep) for case, rep in
+                         get_execution_order(cases, num_reps, order, seed)
+                         if manifest.get_completed(case, rep) is None]
+            write_execution_order_file(dest, order, seed, execution, resume)
+            tasks = [(dest, case, rep, run_opts, manifest)
+                     for case, rep in execution]
+            pool.map(_run_bench_case_star, tasks, chunksize=1)
+        else:
+            execution = get_execution_order(cases, 1, order, seed)
+            write_execution_order_file(dest, order, seed, execution, resume)
+            tasks = [(dest, case, num_reps, warmup, target_ci, max_reps,
+                      time_budget, run_opts, manifest)
+                     for case, _ in execution]
+            repetitions = pool.map(_run_bench_case_adaptive_star, tasks,
+                                   chunksize=1)
+            write_repetitions_file(dest, repetitions)
+    finally:
+        pool.close()
+        pool.join()
+
+    return get_timing_dirs(dest, cases)
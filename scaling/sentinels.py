@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+from __future__ import division
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+# Completion detection without querying the queue system. Before submitting
+# each command, the bench suite creates the file <name>.pending in a sentinel
+# directory, and the sentinel_wrapper.sh script that executes the command
+# atomically creates <name>.done once it finishes. The results can be
+# processed once every pending sentinel has its done counterpart
+
+import os
+from os import listdir, stat
+from os.path import join
+from select import select
+from time import sleep, time
+
+from scaling.util import JobStatus
+
+PENDING_EXT = '.pending'
+DONE_EXT = '.done'
+
+# inotify events that signal a new file in the watched directory
+IN_CREATE = 0x100
+IN_MOVED_TO = 0x80
+
+# Size of the buffer used to drain the inotify events
+INOTIFY_BUFFER_SIZE = 4096
+
+
+def _open_inotify(dir_fp):
+    """Returns an inotify file descriptor watching the files created in dir_fp
+
+    Parameters
+    ----------
+    dir_fp: string
+        The directory to watch
+
+    Returns
+    -------
+    int or None
+        The file descriptor, or None if inotify is not available
+    """
+    from ctypes import CDLL, c_int, c_char_p, c_uint32
+    from ctypes.util import find_library
+    try:
+        libc = CDLL(find_library('c'), use_errno=True)
+        inotify_init = libc.inotify_init
+        inotify_add_watch = libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    inotify_add_watch.argtypes = [c_int, c_char_p, c_uint32]
+    inotify_add_watch.restype = c_int
+    fd = inotify_init()
+    if fd < 0:
+        return None
+    if not isinstance(dir_fp, bytes):
+        dir_fp = dir_fp.encode('utf-8')
+    if inotify_add_watch(fd, dir_fp, IN_CREATE | IN_MOVED_TO) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _wait_for_changes(fd, timeout):
+    """Blocks up to timeout seconds, or until fd reports a change
+
+    Parameters
+    ----------
+    fd: int or None
+        The inotify file descriptor. If None, it just sleeps
+    timeout: float
+        The maximum number of seconds to wait
+    """
+    if fd is None:
+        sleep(timeout)
+        return
+    readable, _, _ = select([fd], [], [], timeout)
+    if readable:
+        # Drain the events, we only need to know that something changed
+        os.read(fd, INOTIFY_BUFFER_SIZE)
+
+
+def read_sentinel(sentinel_fp):
+    """Reads a done sentinel, as written by sentinel_wrapper.sh
+
+    Parameters
+    ----------
+    sentinel_fp: string
+        Path to the sentinel file. It contains a single tab delimited line
+        with the exit status of the command, its start and end times (in
+        seconds since the epoch) and the host that executed it
+
+    Returns
+    -------
+    JobStatus
+        The status of the command, with the sentinel name as job id
+
+    Raises
+    ------
+    ValueError
+        If the sentinel is not well formed
+    """
+    name = os.path.basename(sentinel_fp)[:-len(DONE_EXT)]
+    with open(sentinel_fp, 'U') as f:
+        fields = f.read().strip().split('\t')
+    if len(fields) < 3:
+        raise ValueError("Sentinel %s is not well formed" % sentinel_fp)
+    exit_status = int(fields[0])
+    start, end = float(fields[1]), float(fields[2])
+    return JobStatus(name, 'C', exit_status, None, end - start)
+
+
+def get_sentinels(sentinel_dir):
+    """Returns the names of the pending and done sentinels of sentinel_dir
+
+    Parameters
+    ----------
+    sentinel_dir: string
+        The sentinel directory
+
+    Returns
+    -------
+    set, set
+        The names of the pending and the done sentinels
+    """
+    pending = set()
+    done = set()
+    for fn in listdir(sentinel_dir):
+        if fn.endswith(PENDING_EXT):
+            pending.add(fn[:-len(PENDING_EXT)])
+        elif fn.endswith(DONE_EXT):
+            done.add(fn[:-len(DONE_EXT)])
+    return pending, done
+
+
+def wait_on_sentinels(sentinel_dir, poll_interval=1, timeout=None):
+    """Blocks until all the pending sentinels of sentinel_dir are done
+
+    The directory is watched with inotify when available. As inotify does not
+    report the changes made by other hosts in a network file system, the
+    modification time of the directory is also checked every poll_interval
+    seconds, and it is only listed when it changes
+
+    Parameters
+    ----------
+    sentinel_dir: string
+        The sentinel directory
+    poll_interval: float, optional
+        Maximum interval between checks, in seconds
+    timeout: float, optional
+        Maximum number of seconds to wait. Defaults to wait forever
+
+    Returns
+    -------
+    dict of {string: JobStatus}
+        The status of each command, keyed by sentinel name
+
+    Raises
+    ------
+    RuntimeError
+        If the timeout expires before all the sentinels are done
+    """
+    fd = _open_inotify(sentinel_dir)
+    start = time()
+    last_mtime = None
+    try:
+        while True:
+            mtime = stat(sentinel_dir).st_mtime
+            # The modification time may have a resolution of 1 second, so
+            # recent changes are always listed
+            if mtime != last_mtime or time() - mtime < 2:
+                last_mtime = mtime
+                pending, done = get_sentinels(sentinel_dir)
+                if pending <= done:
+                    break
+            if timeout is not None and time() - start > timeout:
+                raise RuntimeError("Timeout waiting for %d sentinels in %s"
+                                   % (len(pending - done), sentinel_dir))
+            _wait_for_changes(fd, poll_interval)
+    finally:
+        if fd is not None:
+            os.close(fd)
+    return dict((name, read_sentinel(join(sentinel_dir, name + DONE_EXT)))
+                for name in done)
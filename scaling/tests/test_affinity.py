@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+import os
+from os import makedirs
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase, main
+
+import scaling.affinity
+from scaling.util import Placement
+from scaling.affinity import (parse_cpu_list, format_cpu_list,
+                              get_available_cpus, get_cpu_siblings,
+                              get_cpu_node, allocate_cpu_sets,
+                              get_placement_command)
+
+
+class TestAffinity(TestCase):
+
+    def setUp(self):
+        # Fake topology with 2 NUMA nodes, each one with 2 physical cores
+        # with 2 hardware threads: cpu N and N + 4 are siblings
+        self.sysfs_dir = mkdtemp()
+        for cpu in range(8):
+            topology_dir = join(self.sysfs_dir, 'cpu%d' % cpu, 'topology')
+            makedirs(topology_dir)
+            makedirs(join(self.sysfs_dir, 'cpu%d' % cpu,
+                          'node%d' % ((cpu % 4) // 2)))
+            with open(join(topology_dir, 'thread_siblings_list'), 'w') as f:
+                f.write("%d,%d\n" % (cpu % 4, cpu % 4 + 4))
+        self.orig_sysfs_dir = scaling.affinity.CPU_SYSFS_DIR
+        scaling.affinity.CPU_SYSFS_DIR = self.sysfs_dir
+
+    def tearDown(self):
+        scaling.affinity.CPU_SYSFS_DIR = self.orig_sysfs_dir
+        rmtree(self.sysfs_dir)
+
+    def test_parse_cpu_list(self):
+        """Correctly parses a CPU list"""
+        self.assertEqual(parse_cpu_list("0-3,8,10-11\n"),
+                         [0, 1, 2, 3, 8, 10, 11])
+        self.assertEqual(parse_cpu_list("5"), [5])
+        with self.assertRaises(ValueError):
+            parse_cpu_list("a-b")
+
+    def test_format_cpu_list(self):
+        """Correctly formats a CPU list"""
+        self.assertEqual(format_cpu_list([0, 1, 2, 3, 8, 10, 11]),
+                         "0-3,8,10-11")
+        self.assertEqual(format_cpu_list((4,)), "4")
+
+    def test_get_available_cpus(self):
+        """Correctly returns the CPUs available to the process"""
+        obs = get_available_cpus()
+        self.assertTrue(len(obs) > 0)
+        self.assertEqual(obs, sorted(obs))
+
+    def test_get_cpu_siblings(self):
+        """Correctly returns the sibling threads of a CPU"""
+        self.assertEqual(get_cpu_siblings(1), [1, 5])
+        self.assertEqual(get_cpu_siblings(6), [2, 6])
+        # Unknown topology
+        self.assertEqual(get_cpu_siblings(100), [100])
+
+    def test_get_cpu_node(self):
+        """Correctly returns the NUMA node of a CPU"""
+        self.assertEqual(get_cpu_node(1), 0)
+        self.assertEqual(get_cpu_node(6), 1)
+        self.assertEqual(get_cpu_node(100), None)
+
+    def test_allocate_cpu_sets(self):
+        """Correctly splits the CPUs in sets"""
+        obs = allocate_cpu_sets(range(8), 2)
+        self.assertEqual(obs, [(0, 1), (4, 5), (2, 3), (6, 7)])
+        obs = allocate_cpu_sets(range(8), 3)
+        self.assertEqual(obs, [(0, 1, 4), (2, 3, 6)])
+
+    def test_allocate_cpu_sets_isolate_siblings(self):
+        """Correctly keeps the sibling threads idle"""
+        obs = allocate_cpu_sets(range(8), 2, isolate_siblings=True)
+        self.assertEqual(obs, [(0, 1), (2, 3)])
+        obs = allocate_cpu_sets(range(8), 1, isolate_siblings=True)
+        self.assertEqual(obs, [(0,), (1,), (2,), (3,)])
+        with self.assertRaises(ValueError):
+            allocate_cpu_sets(range(8), 0)
+
+    def test_get_placement_command(self):
+        """Correctly wraps the command to apply the placement"""
+        cmd = ['pick_otus.py', '-i', 'seqs.fna']
+        obs = get_placement_command(cmd, Placement((0, 1, 2), 1))
+        self.assertEqual(obs, ['numactl', '--membind=1',
+                               '--physcpubind=0-2'] + cmd)
+        obs = get_placement_command(cmd, Placement((0, 1, 2), None))
+        if hasattr(os, 'sched_setaffinity'):
+            self.assertEqual(obs, cmd)
+        else:
+            self.assertEqual(obs, ['taskset', '-c', '0-2'] + cmd)
+
+
+if __name__ == '__main__':
+    main()
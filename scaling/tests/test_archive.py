@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+from os import mkdir
+from os.path import join, exists
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase, main
+
+from scaling.util import TIMING_CACHE_FN
+from scaling.archive import (get_archive_format, is_archive,
+                             split_archive_path, iter_archive,
+                             make_bench_archive)
+
+
+class TestArchive(TestCase):
+    """Tests the archives of benchmark results"""
+
+    def setUp(self):
+        self.output_dir = mkdtemp()
+        self.timing_dir = join(self.output_dir, 'timing')
+        mkdir(self.timing_dir)
+        for case in ['10', '20']:
+            mkdir(join(self.timing_dir, case))
+            for rep in range(2):
+                with open(join(self.timing_dir, case, '%d.txt' % rep),
+                          'w') as f:
+                    f.write("%s.%d;1.0;0.1;1024\n" % (case, rep))
+        mkdir(join(self.timing_dir, '30'))
+        with open(join(self.timing_dir, TIMING_CACHE_FN), 'w') as f:
+            f.write("cache")
+        self.exp = [('10', None), ('10/0.txt', "10.0;1.0;0.1;1024\n"),
+                    ('10/1.txt', "10.1;1.0;0.1;1024\n"), ('20', None),
+                    ('20/0.txt', "20.0;1.0;0.1;1024\n"),
+                    ('20/1.txt', "20.1;1.0;0.1;1024\n"), ('30', None)]
+
+    def tearDown(self):
+        rmtree(self.output_dir)
+
+    def _read_archive(self, archive_fp):
+        """Returns the members of an archive and their contents"""
+        return [(name, None if f is None else f.read())
+                for name, f in iter_archive(archive_fp)]
+
+    def test_get_archive_format(self):
+        """Correctly gets the archive format from its extension"""
+        self.assertEqual(get_archive_format('a/timing.tar.gz'), 'gz')
+        self.assertEqual(get_archive_format('timing.tgz'), 'gz')
+        self.assertEqual(get_archive_format('timing.tar.bz2'), 'bz2')
+        self.assertEqual(get_archive_format('timing.tar.xz'), 'xz')
+        self.assertEqual(get_archive_format('timing.tar'), '')
+        self.assertEqual(get_archive_format('timing.zip'), 'zip')
+        self.assertEqual(get_archive_format('timing.gz'), None)
+        self.assertEqual(get_archive_format('timing'), None)
+
+    def test_split_archive_path(self):
+        """Correctly splits the paths inside an archive"""
+        archive_fp = join(self.output_dir, 'timing.tar.gz')
+        make_bench_archive(self.timing_dir, archive_fp)
+        self.assertTrue(is_archive(archive_fp))
+        self.assertFalse(is_archive(self.timing_dir))
+        self.assertEqual(split_archive_path(archive_fp), (archive_fp, ''))
+        self.assertEqual(split_archive_path(join(archive_fp, 'similarity',
+                                                 '0.97/')),
+                         (archive_fp, 'similarity/0.97'))
+        self.assertEqual(split_archive_path(join(self.timing_dir, '10')),
+                         (None, join(self.timing_dir, '10')))
+        path = join(self.timing_dir, 'foo', 'bar')
+        self.assertEqual(split_archive_path(path), (None, path))
+
+    def test_make_bench_archive(self):
+        """Correctly archives the timing directory in every format"""
+        for ext in ['tar', 'tar.gz', 'tar.bz2', 'tar.xz', 'zip']:
+            archive_fp = join(self.output_dir, 'timing.%s' % ext)
+            obs = make_bench_archive(self.timing_dir, archive_fp)
+            self.assertEqual(obs, 4)
+            # The parse cache is not archived
+            self.assertEqual(self._read_archive(archive_fp), self.exp)
+
+    def test_make_bench_archive_remove(self):
+        """Removes the archived directory"""
+        archive_fp = join(self.output_dir, 'timing.tar.xz')
+        make_bench_archive(self.timing_dir, archive_fp, remove=True)
+        self.assertFalse(exists(self.timing_dir))
+        self.assertEqual(self._read_archive(archive_fp), self.exp)
+
+    def test_make_bench_archive_error(self):
+        """Raises an error with wrong inputs"""
+        archive_fp = join(self.output_dir, 'timing.zip')
+        with self.assertRaises(ValueError):
+            make_bench_archive(join(self.output_dir, 'foo'), archive_fp)
+        with self.assertRaises(ValueError):
+            make_bench_archive(self.timing_dir,
+                               join(self.output_dir, 'timing.rar'))
+        make_bench_archive(self.timing_dir, archive_fp)
+        with self.assertRaises(ValueError):
+            make_bench_archive(self.timing_dir, archive_fp)
+        self.assertTrue(exists(self.timing_dir))
+
+    def test_iter_archive_error(self):
+        """Raises an error if the archive cannot be read"""
+        for ext in ['tar.gz', 'tar.xz', 'zip', 'rar']:
+            archive_fp = join(self.output_dir, 'timing.%s' % ext)
+            with open(archive_fp, 'w') as f:
+                f.write("This is not an archive\n")
+            with self.assertRaises(ValueError):
+                list(iter_archive(archive_fp))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+from unittest import TestCase, main
+
+import scaling.cluster_util
+from scaling.cluster_util import (wait_on, get_poll_interval,
+                                  submit_throttled, get_throughput,
+                                  MAX_QUERY_FAILURES)
+from scaling.executors import PBSExecutor
+from scaling.util import JobStatus, JobRecord, Throughput
+
+
+class ScriptedExecutor(PBSExecutor):
+    """Executor that reports a predefined sequence of job states"""
+
+    def __init__(self, polls, submissions=None, times=(1, 2)):
+        super(ScriptedExecutor, self).__init__()
+        self.polls = polls
+        self.submissions = submissions
+        self.times = times
+        self.queried = []
+        self.events = []
+
+    def submit_job(self, script, job_name):
+        job_id = self.submissions.pop(0)
+        if job_id is None:
+            raise RuntimeError("qsub failed")
+        self.events.append(('submit', job_name))
+        return job_id
+
+    def query_jobs(self, job_ids):
+        self.queried.append(list(job_ids))
+        self.events.append(('query', sorted(job_ids)))
+        poll = self.polls.pop(0)
+        if poll is None:
+            raise RuntimeError("qstat failed")
+        return dict((job_id, JobStatus(job_id, state, exit_status,
+                                       *self.times))
+                    for job_id, (state, exit_status) in poll.items())
+
+
+class TestClusterUtil(TestCase):
+
+    def setUp(self):
+        self.intervals = []
+        self.orig_sleep = scaling.cluster_util.sleep
+        self.orig_time = scaling.cluster_util.time
+        scaling.cluster_util.sleep = self.intervals.append
+        scaling.cluster_util.time = lambda: 100.0 + len(self.intervals)
+
+    def tearDown(self):
+        scaling.cluster_util.sleep = self.orig_sleep
+        scaling.cluster_util.time = self.orig_time
+
+    def test_get_poll_interval(self):
+        """The poll interval is perturbed up to the jitter"""
+        obs = [get_poll_interval(10, 0.1) for _ in range(100)]
+        self.assertTrue(all(9 <= i <= 11 for i in obs))
+        self.assertTrue(len(set(obs)) > 1)
+        self.assertEqual(get_poll_interval(10, 0), 10)
+
+    def test_wait_on(self):
+        """Waits until all the jobs are completed, backing off"""
+        executor = ScriptedExecutor([
+            {'1': ('Q', None), '2': ('H', None)},
+            {'1': ('Q', None), '2': ('H', None)},
+            {'1': ('Q', None), '2': ('H', None)},
+            {'1': ('R', None), '2': ('W', None)},
+            {'1': ('E', None), '2': ('R', None)},
+            {'1': ('C', 0), '2': ('R', None)},
+            {'2': ('C', 1)}])
+        obs = wait_on(['1.host', '2.host'], poll_interval=1,
+                      executor=executor, max_poll_interval=3, jitter=0)
+        self.assertEqual(obs, {'1': JobStatus('1', 'C', 0, 1, 2),
+                               '2': JobStatus('2', 'C', 1, 1, 2)})
+        # The interval grows while nothing changes, and it is reset when a
+        # job changes its state
+        self.assertEqual(self.intervals, [1, 1, 2, 3, 1, 1, 1])
+        self.assertEqual(executor.queried[-1], ['2'])
+
+    def test_wait_on_query_error(self):
+        """The jobs are not considered done if the query fails"""
+        executor = ScriptedExecutor([{'1': ('R', None)}, None, None,
+                                     {'1': ('C', 0)}])
+        obs = wait_on(['1'], poll_interval=1, executor=executor, jitter=0)
+        self.assertEqual(obs['1'].state, 'C')
+        # The interval also grows after each failed query
+        self.assertEqual(self.intervals, [1, 1, 2, 4])
+
+        executor = ScriptedExecutor([None] * MAX_QUERY_FAILURES)
+        with self.assertRaises(RuntimeError):
+            wait_on(['1'], poll_interval=1, executor=executor)
+
+    def test_submit_throttled(self):
+        """Keeps at most max_queued jobs alive, retrying rejected jobs"""
+        jobs = [('a', 'true'), ('b', 'true'), ('c', 'exit 1')]
+        executor = ScriptedExecutor(
+            [{'1': ('R', None), '2': ('Q', None)},
+             {'1': ('C', 0), '2': ('R', None)},
+             {'2': ('R', None)},
+             {'2': ('C', 0), '3': ('C', 1)}],
+            submissions=['1.host', '2.host', None, '3.host'])
+        obs = submit_throttled(jobs, executor, 2, poll_interval=1, jitter=0)
+        # The third job is submitted once the first one finishes. It is
+        # rejected the first time and submitted again after the next poll
+        self.assertEqual(executor.events, [
+            ('submit', 'a'), ('submit', 'b'), ('query', ['1', '2']),
+            ('query', ['1', '2']), ('query', ['2']), ('submit', 'c'),
+            ('query', ['2', '3'])])
+        self.assertEqual(self.intervals, [1, 1, 1, 2])
+        # The times are derived from the queue wait and run time reported by
+        # the queue system
+        self.assertEqual(obs, [JobRecord('a', '1', 100.0, 101.0, 103.0, 0),
+                               JobRecord('b', '2', 100.0, 101.0, 103.0, 0),
+                               JobRecord('c', '3', 103.0, 104.0, 106.0, 1)])
+
+    def test_submit_throttled_observed_times(self):
+        """The observed times are used if the queue system does not report
+        them"""
+        executor = ScriptedExecutor(
+            [{'1': ('Q', None)}, {'1': ('R', None)}, {}],
+            submissions=['1'], times=(None, None))
+        obs = submit_throttled([('a', 'true')], executor, 1, poll_interval=1,
+                               jitter=0)
+        self.assertEqual(obs, [JobRecord('a', '1', 100.0, 102.0, 103.0,
+                                         None)])
+
+    def test_submit_throttled_error(self):
+        """Raises an error if the jobs cannot be submitted"""
+        executor = ScriptedExecutor([], submissions=[None] *
+                                    MAX_QUERY_FAILURES)
+        with self.assertRaises(RuntimeError):
+            submit_throttled([('a', 'true')], executor, 1, poll_interval=1)
+        with self.assertRaises(ValueError):
+            submit_throttled([('a', 'true')], executor, 0)
+
+    def test_get_throughput(self):
+        """Correctly computes the throughput of the completed jobs"""
+        records = [JobRecord('a', '1', 0.0, 10.0, 1800.0, 0),
+                   JobRecord('b', '2', 0.0, 30.0, 3600.0, 0),
+                   JobRecord('c', '3', 5.0, None, None, None)]
+        self.assertEqual(get_throughput(records),
+                         Throughput(2, 3600.0, 2.0, 20.0))
+        self.assertEqual(get_throughput(records[2:]),
+                         Throughput(0, None, None, None))
+
+
+if __name__ == '__main__':
+    main()
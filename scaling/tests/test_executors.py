@@ -0,0 +1,483 @@
+#!/usr/bin/env python
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+from os import chmod
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase, main
+
+from scaling.executors import (LocalExecutor, PBSExecutor, SlurmExecutor,
+                               FakePBSExecutor, FakeSlurmExecutor,
+                               ThrottledExecutor, get_executor,
+                               parse_qstat_xml, get_alive_jobs,
+                               format_walltime, parse_slurm_duration,
+                               parse_slurm_memory, parse_sacct_states,
+                               parse_sacct_accounting, PBS_ALIVE_STATES,
+                               SLURM_ALIVE_STATES)
+from scaling.util import JobStatus, JobAccounting, ResourceRequest
+
+
+class TestExecutors(TestCase):
+
+    def setUp(self):
+        self.cmd = ("    timing_wrapper.sh $timing_dest/1/$i.txt pick_otus.py "
+                    "-i 1.fna -o $output_dest/1/$i")
+        self.tmp_dir = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.tmp_dir)
+
+    def _write_script(self, name, output):
+        """Writes a script that prints output, standing in for a command"""
+        fp = join(self.tmp_dir, name)
+        with open(fp, 'w') as f:
+            f.write("#!/bin/sh\ncat <<EOF\n%sEOF\n" % output)
+        chmod(fp, 0o755)
+        return fp
+
+    def test_local_executor(self):
+        """Correctly executes the commands in the local machine"""
+        executor = LocalExecutor()
+        self.assertFalse(executor.submits_jobs)
+        self.assertEqual(executor.get_submit_command(self.cmd, "jobs", 0),
+                         self.cmd)
+        self.assertEqual(executor.get_barrier(), "")
+        self.assertEqual(executor.get_wait_option("jobs"), "")
+        self.assertEqual(executor.check_status(["1"]), [])
+
+        executor = LocalExecutor(jobs=4)
+        exp = ("    while [ `jobs -rp | wc -l` -ge 4 ]; do sleep 1; done\n"
+               "%s &" % self.cmd)
+        self.assertEqual(executor.get_submit_command(self.cmd, "jobs", 0),
+                         exp)
+        self.assertEqual(executor.get_barrier(), "wait\n")
+
+        with self.assertRaises(ValueError):
+            LocalExecutor(jobs=0)
+
+    def test_pbs_executor(self):
+        """Correctly submits the commands to PBS"""
+        executor = PBSExecutor(job_prefix="test", queue="friendlyq",
+                               extra_args="-m abe")
+        self.assertTrue(executor.submits_jobs)
+        obs = executor.get_submit_command(self.cmd, "scaling_jobs", 3)
+        exp = ('    scaling_jobs+=","`echo "cd $PWD; %s" | qsub -k oe -N '
+               'test3 -q friendlyq -m abe`' % self.cmd)
+        self.assertEqual(obs, exp)
+        self.assertEqual(executor.get_wait_option("scaling_jobs"),
+                         "-w $scaling_jobs")
+        # The queue option is omitted if there is no queue
+        obs = PBSExecutor().get_submit_command(self.cmd, "scaling_jobs", 0)
+        self.assertTrue(obs.endswith("| qsub -k oe -N bench_0 `"))
+
+    def test_pbs_executor_check_status(self):
+        """Correctly queries the state of the jobs with qstat -x"""
+        qstat = self._write_script("qstat", qstat_xml)
+        executor = PBSExecutor(qstat=qstat)
+        obs = executor.query_jobs(["1", "2", "3", "4", "6", "7[]"])
+        self.assertEqual(sorted(obs), ["1", "2", "3", "4", "6", "7[1]",
+                                       "7[2]"])
+        self.assertEqual(obs["3"], JobStatus("3", "C", 0, 20, 100))
+        self.assertEqual(obs["4"], JobStatus("4", "C", 271, 2, 3))
+        self.assertEqual(obs["1"], JobStatus("1", "R", None, 10, None))
+        self.assertEqual(obs["2"], JobStatus("2", "Q", None, None, None))
+        # Held, waiting and exiting jobs are still alive. A job array is
+        # alive while any of its jobs is alive. Job 5 is not listed
+        obs = executor.check_status(["1", "2", "3", "4", "5", "6", "7[]"])
+        self.assertEqual(obs, ["1", "2", "6", "7[]"])
+
+    def test_pbs_executor_check_status_error(self):
+        """Raises an error if qstat fails"""
+        qstat = self._write_script("qstat", "")
+        with open(qstat, 'a') as f:
+            f.write("exit 1\n")
+        executor = PBSExecutor(qstat=qstat)
+        with self.assertRaises(RuntimeError):
+            executor.check_status(["1"])
+        executor = PBSExecutor(qstat=self._write_script("qstat", "<Data>"))
+        with self.assertRaises(RuntimeError):
+            executor.check_status(["1"])
+        # qstat does not list anything if there are no jobs
+        executor = PBSExecutor(qstat=self._write_script("qstat", ""))
+        self.assertEqual(executor.query_jobs(["1"]), {})
+
+    def test_pbs_executor_query_jobs_ids(self):
+        """Only queries the submitted jobs, tolerating the purged ones"""
+        args_fp = join(self.tmp_dir, "args.txt")
+        qstat = self._write_script("qstat", qstat_xml)
+        with open(qstat, 'a') as f:
+            f.write('echo "$@" > %s\n' % args_fp)
+            f.write('echo "qstat: Unknown Job Id Error 5.host" >&2\n')
+            f.write("exit 153\n")
+        executor = PBSExecutor(qstat=qstat)
+        obs = executor.query_jobs(["5", "3", "7[]"])
+        self.assertEqual(sorted(obs), ["3", "7[1]", "7[2]"])
+        with open(args_fp) as f:
+            self.assertEqual(f.read(), "-x -t 3 5 7[]\n")
+        # qstat is not executed without jobs
+        self.assertEqual(executor.query_jobs([]), {})
+
+    def test_pbs_array_executor(self):
+        """Correctly submits the commands to PBS as a job array"""
+        executor = PBSExecutor(job_prefix="test", queue="friendlyq",
+                               extra_args="-m abe", array=True)
+        obs = executor.get_submit_command(self.cmd, "scaling_jobs", 3)
+        exp = ('    echo "cd $PWD; %s" >> $dest/scaling_jobs_manifest.txt'
+               % self.cmd)
+        self.assertEqual(obs, exp)
+        self.assertEqual(executor.get_init_code("scaling_jobs"),
+                         "touch $dest/scaling_jobs_manifest.txt\n")
+        obs = executor.get_collect_code("scaling_jobs", 1)
+        exp = ('scaling_jobs=$(echo "sed -n \\${PBS_ARRAYID}p '
+               '$dest/scaling_jobs_manifest.txt | bash" | qsub -t 1-`wc -l < '
+               '$dest/scaling_jobs_manifest.txt` -k oe -N test1 -q friendlyq '
+               '-m abe)\n')
+        self.assertEqual(obs, exp)
+        self.assertEqual(executor.get_wait_option("scaling_jobs"),
+                         '-w "$scaling_jobs"')
+
+        # Without the job array
+        executor = PBSExecutor()
+        self.assertEqual(executor.get_init_code("scaling_jobs"),
+                         'scaling_jobs=""\n')
+        self.assertEqual(executor.get_collect_code("scaling_jobs", 0),
+                         'scaling_jobs=${scaling_jobs#?}\n')
+
+    def test_get_dependent_command(self):
+        """Correctly submits a job that depends on the submitted jobs"""
+        cmd = "scaling process-bench-results -i $timing_dest/ -o $dest/plots/"
+        executor = PBSExecutor(job_prefix="test", queue="friendlyq",
+                               extra_args="-m abe")
+        obs = executor.get_dependent_command(cmd, "scaling_jobs", "process0")
+        exp = ('echo "cd $PWD; %s" | qsub -k oe -N testprocess0 -q friendlyq '
+               '-m abe -W depend=afterany:${scaling_jobs//,/:}\n' % cmd)
+        self.assertEqual(obs, exp)
+
+        executor = PBSExecutor(array=True)
+        obs = executor.get_dependent_command(cmd, "scaling_jobs", "process0")
+        exp = ('echo "cd $PWD; %s" | qsub -k oe -N bench_process0 '
+               '-W depend=afteranyarray:${scaling_jobs//,/:}\n' % cmd)
+        self.assertEqual(obs, exp)
+
+        executor = SlurmExecutor(queue="short")
+        obs = executor.get_dependent_command(cmd, "scaling_jobs", "process0")
+        exp = ('sbatch -J bench_process0 -p short '
+               '--dependency=afterany:${scaling_jobs//,/:} '
+               '--wrap="cd $PWD; %s"\n' % cmd)
+        self.assertEqual(obs, exp)
+
+        with self.assertRaises(ValueError):
+            LocalExecutor().get_dependent_command(cmd, "scaling_jobs",
+                                                  "process0")
+
+    def test_submit_job(self):
+        """Correctly submits a job from python"""
+        # The submission command prints its arguments and its standard input
+        fp = join(self.tmp_dir, "submit")
+        with open(fp, 'w') as f:
+            f.write('#!/bin/sh\necho "$@"\ncat\n')
+        chmod(fp, 0o755)
+        executor = PBSExecutor(qsub=fp, queue="friendlyq",
+                               extra_args="-m abe")
+        obs = executor.submit_job("cd /tmp; true", "test0")
+        self.assertEqual(obs, "-k oe -N test0 -q friendlyq -m abe\n"
+                              "cd /tmp; true")
+        executor = SlurmExecutor(sbatch=fp)
+        obs = executor.submit_job("cd /tmp && true", "test0")
+        self.assertEqual(obs, "--parsable -J test0 --wrap=cd /tmp && true")
+        # sbatch --parsable may append the cluster name to the job id
+        with open(fp, 'w') as f:
+            f.write('#!/bin/sh\necho "12;cluster"\n')
+        self.assertEqual(executor.submit_job("true", "test0"), "12")
+
+        # The failures of the submission command are reported
+        with open(fp, 'a') as f:
+            f.write("exit 1\n")
+        with self.assertRaises(RuntimeError):
+            PBSExecutor(qsub=fp).submit_job("true", "test0")
+        with self.assertRaises(RuntimeError):
+            PBSExecutor(qsub=join(self.tmp_dir, "missing")).submit_job(
+                "true", "test0")
+        with self.assertRaises(ValueError):
+            LocalExecutor().submit_job("true", "test0")
+
+    def test_throttled_executor(self):
+        """Correctly writes the job list to submit the throttled jobs"""
+        executor = ThrottledExecutor(
+            PBSExecutor(job_prefix="test", queue="friendlyq",
+                        extra_args="-m abe"), 50)
+        self.assertTrue(executor.submits_jobs)
+        self.assertEqual(executor.name, "pbs")
+        obs = executor.get_submit_command(self.cmd, "scaling_jobs", 3)
+        exp = ('    echo "test3 cd $PWD; %s" >> $dest/scaling_jobs_list.txt'
+               % self.cmd)
+        self.assertEqual(obs, exp)
+        self.assertEqual(executor.get_init_code("scaling_jobs"),
+                         "touch $dest/scaling_jobs_list.txt\n")
+        obs = executor.get_collect_code("scaling_jobs", 0)
+        exp = ('scaling submit-jobs -i $dest/scaling_jobs_list.txt -o '
+               '$dest/scaling_jobs_submissions -n 50 --executor pbs --queue '
+               'friendlyq --extra-args "-m abe"\n')
+        self.assertEqual(obs, exp)
+        # The jobs are done once submit-jobs returns
+        self.assertEqual(executor.get_wait_option("scaling_jobs"), "")
+        with self.assertRaises(ValueError):
+            executor.get_dependent_command("true", "scaling_jobs", "process0")
+
+        obs = ThrottledExecutor(SlurmExecutor(), 2).get_collect_code(
+            "scaling_jobs", 0)
+        self.assertTrue(obs.endswith("-n 2 --executor slurm\n"))
+
+        for executor, max_queued in [(LocalExecutor(), 2),
+                                     (PBSExecutor(array=True), 2),
+                                     (PBSExecutor(), 0)]:
+            with self.assertRaises(ValueError):
+                ThrottledExecutor(executor, max_queued)
+
+    def test_parse_qstat_xml(self):
+        """Correctly parses the qstat -x output"""
+        obs = parse_qstat_xml(qstat_xml, ["6", "7[]"])
+        self.assertEqual(obs, {
+            "6": JobStatus("6", "W", None, None, None),
+            "7[1]": JobStatus("7[1]", "C", 0, 1, 1),
+            "7[2]": JobStatus("7[2]", "H", None, None, None)})
+        self.assertEqual(parse_qstat_xml("\n", ["1"]), {})
+
+    def test_get_alive_jobs(self):
+        """Correctly returns the jobs that are still alive"""
+        statuses = {"1": JobStatus("1", "E", None, 1, None),
+                    "2": JobStatus("2", "C", 1, 1, 1),
+                    "3[1]": JobStatus("3[1]", "R", None, 1, None)}
+        obs = get_alive_jobs(["1", "2", "3[]", "4"], statuses,
+                             PBS_ALIVE_STATES)
+        self.assertEqual(obs, ["1", "3[]"])
+
+    def test_slurm_executor(self):
+        """Correctly submits the commands to SLURM"""
+        executor = SlurmExecutor(job_prefix="test", queue="short")
+        self.assertTrue(executor.submits_jobs)
+        obs = executor.get_submit_command(self.cmd, "scaling_jobs", 3)
+        exp = ('    scaling_jobs+=","`sbatch --parsable -J test3 -p short '
+               '--wrap="cd $PWD; %s"`' % self.cmd)
+        self.assertEqual(obs, exp)
+        self.assertEqual(executor.get_wait_option("scaling_jobs"),
+                         "-w $scaling_jobs --executor slurm")
+
+        squeue = self._write_script("squeue", "10 R\n11 PD\n12 CD\n13 F\n")
+        executor = SlurmExecutor(squeue=squeue)
+        obs = executor.check_status(["10", "11", "12", "13"])
+        self.assertEqual(obs, ["10", "11"])
+
+    def test_slurm_array_executor(self):
+        """Correctly submits the commands to SLURM as a job array"""
+        executor = SlurmExecutor(job_prefix="test", queue="short",
+                                 extra_args="--qos=low", array=True)
+        self.assertEqual(executor.get_init_code("scaling_jobs"),
+                         "touch $dest/scaling_jobs_manifest.txt\n")
+        obs = executor.get_submit_command(
+            self.cmd, "scaling_jobs", 3, ResourceRequest(60, 1024, None))
+        exp = ('    echo "cd $PWD; %s" >> $dest/scaling_jobs_manifest.txt'
+               % self.cmd)
+        self.assertEqual(obs, exp)
+        executor.get_submit_command(self.cmd, "scaling_jobs", 4,
+                                    ResourceRequest(30, 2048, 2))
+        # The array requests the largest resources of its jobs
+        obs = executor.get_collect_code("scaling_jobs", 0)
+        exp = ('scaling_jobs=$(sbatch --parsable --array=1-`wc -l < '
+               '$dest/scaling_jobs_manifest.txt` -J test0 -p short '
+               '--time=00:01:00 --mem=2048M --cpus-per-task=2 --qos=low '
+               '--wrap="sed -n \\${SLURM_ARRAY_TASK_ID}p '
+               '$dest/scaling_jobs_manifest.txt | bash")\n')
+        self.assertEqual(obs, exp)
+        self.assertEqual(executor.get_wait_option("scaling_jobs"),
+                         "-w $scaling_jobs --executor slurm")
+
+    def test_resource_args(self):
+        """Correctly requests the resources of the jobs"""
+        resources = ResourceRequest(90061.5, 4096, 8)
+        self.assertEqual(SlurmExecutor().get_resource_args(resources),
+                         "--time=1-01:01:02 --mem=4096M --cpus-per-task=8")
+        self.assertEqual(PBSExecutor().get_resource_args(resources),
+                         "-l walltime=25:01:02,mem=4096mb,nodes=1:ppn=8")
+        self.assertEqual(PBSExecutor().get_resource_args(
+            ResourceRequest(mem=100)), "-l mem=100mb")
+        self.assertEqual(SlurmExecutor().get_resource_args(None), "")
+        self.assertEqual(LocalExecutor().get_resource_args(resources), "")
+        obs = PBSExecutor().get_submit_command(self.cmd, "scaling_jobs", 0,
+                                               ResourceRequest(cpus=2))
+        self.assertTrue(obs.endswith("-N bench_0 -l nodes=1:ppn=2`"))
+        with self.assertRaises(ValueError):
+            ThrottledExecutor(PBSExecutor(), 2).get_submit_command(
+                self.cmd, "scaling_jobs", 0, ResourceRequest(cpus=2))
+
+    def test_format_walltime(self):
+        """Correctly formats the time limits"""
+        self.assertEqual(format_walltime(59.2), "00:01:00")
+        self.assertEqual(format_walltime(3600), "01:00:00")
+        self.assertEqual(format_walltime(90000), "25:00:00")
+        self.assertEqual(format_walltime(90000, days=True), "1-01:00:00")
+
+    def test_parse_slurm_values(self):
+        """Correctly parses the SLURM durations and memory sizes"""
+        self.assertEqual(parse_slurm_duration("00:01:05"), 65)
+        self.assertEqual(parse_slurm_duration("01:05.500"), 65.5)
+        self.assertEqual(parse_slurm_duration("2-00:00:01"), 172801)
+        self.assertEqual(parse_slurm_duration(""), None)
+        self.assertEqual(parse_slurm_memory("1024K"), 1024)
+        self.assertEqual(parse_slurm_memory("1.5M"), 1536)
+        self.assertEqual(parse_slurm_memory("2G"), 2097152)
+        self.assertEqual(parse_slurm_memory("2048"), 2)
+        self.assertEqual(parse_slurm_memory(""), None)
+        with self.assertRaises(ValueError):
+            parse_slurm_duration("a:b")
+
+    def test_parse_sacct_states(self):
+        """Correctly parses the states reported by sacct"""
+        obs = parse_sacct_states(sacct_states, ["20", "21", "22", "23"])
+        self.assertEqual(obs, {
+            "20": JobStatus("20", "CD", 0, 10, 100),
+            "21": JobStatus("21", "CA", 0, None, None),
+            "22_1": JobStatus("22_1", "F", 2, 0, 5),
+            "22_2": JobStatus("22_2", "OOM", 137, 0, 5),
+            "23": JobStatus("23", "PD", 0, None, None)})
+        with self.assertRaises(RuntimeError):
+            parse_sacct_states("20|COMPLETED\n", ["20"])
+
+    def test_parse_sacct_accounting(self):
+        """Correctly parses the accounting reported by sacct"""
+        obs = parse_sacct_accounting(sacct_accounting, ["20", "22_1"])
+        self.assertEqual(obs, {
+            "20": JobAccounting(100, 95.5, 2048),
+            "22_1": JobAccounting(5, 4, None)})
+        with self.assertRaises(RuntimeError):
+            parse_sacct_accounting("20|00:01:40|1:35.500|a\n", ["20"])
+
+    def test_slurm_executor_sacct(self):
+        """Correctly queries sacct for the jobs that squeue does not list"""
+        squeue = self._write_script("squeue", "10 R\n11_[2-3] PD\n")
+        sacct = self._write_script(
+            "sacct", "11_1|COMPLETED|0:0|2014-01-01T10:00:00|"
+            "2014-01-01T10:00:01|2014-01-01T10:00:05\n"
+            "12|FAILED|1:0|2014-01-01T10:00:00|2014-01-01T10:00:01|"
+            "2014-01-01T10:00:05\n"
+            "13|RUNNING|0:0|2014-01-01T10:00:00|2014-01-01T10:00:01|"
+            "Unknown\n")
+        executor = SlurmExecutor(squeue=squeue, sacct=sacct)
+        obs = executor.query_jobs(["10", "11", "12", "13"])
+        self.assertEqual(sorted(obs), ["10", "11_[2-3]", "12"])
+        self.assertEqual(obs["12"], JobStatus("12", "F", 1, 1, 4))
+        self.assertEqual(executor.check_status(["10", "11", "12", "13"]),
+                         ["10", "11"])
+
+        # If sacct fails, the jobs that squeue does not list are done
+        sacct = self._write_script("sacct", "")
+        with open(sacct, 'a') as f:
+            f.write("exit 1\n")
+        executor = SlurmExecutor(squeue=squeue, sacct=sacct)
+        self.assertEqual(sorted(executor.query_jobs(["10", "12"])), ["10"])
+        with self.assertRaises(RuntimeError):
+            executor.get_accounting(["10"])
+
+    def test_get_accounting(self):
+        """Correctly queries the accounting of the jobs"""
+        sacct = self._write_script("sacct", sacct_accounting)
+        executor = SlurmExecutor(sacct=sacct)
+        self.assertEqual(executor.job_id_var, "SLURM_JOB_ID")
+        self.assertEqual(executor.get_accounting(["20"]),
+                         {"20": JobAccounting(100, 95.5, 2048)})
+        self.assertEqual(executor.get_accounting([]), {})
+        self.assertEqual(
+            ThrottledExecutor(executor, 2).get_accounting(["20"]),
+            {"20": JobAccounting(100, 95.5, 2048)})
+
+        # Without sacct, the accounting is not available
+        executor = SlurmExecutor(sacct="")
+        self.assertEqual(executor.job_id_var, None)
+        for executor in [executor, PBSExecutor(), LocalExecutor()]:
+            with self.assertRaises(ValueError):
+                executor.get_accounting(["20"])
+
+    def test_get_alive_jobs_slurm(self):
+        """A SLURM job array is alive while any of its tasks is alive"""
+        statuses = {"5_1": JobStatus("5_1", "CD", 0, 1, 1),
+                    "5_[2-4]": JobStatus("5_[2-4]", "PD", None, None, None),
+                    "6_1": JobStatus("6_1", "CD", 0, 1, 1)}
+        obs = get_alive_jobs(["5", "6"], statuses, SLURM_ALIVE_STATES)
+        self.assertEqual(obs, ["5"])
+
+    def test_fake_slurm_executor(self):
+        """Correctly submits the commands to the local stand-in for SLURM"""
+        executor = get_executor('fake-slurm')
+        self.assertTrue(isinstance(executor, FakeSlurmExecutor))
+        obs = executor.get_submit_command(self.cmd, "scaling_jobs", 0)
+        self.assertTrue("`fake_sbatch --parsable" in obs)
+        self.assertEqual(executor.sacct, "fake_sacct")
+        self.assertEqual(executor.get_wait_option("scaling_jobs"),
+                         "-w $scaling_jobs --executor fake-slurm")
+
+    def test_fake_pbs_executor(self):
+        """Correctly submits the commands to the local stand-in for PBS"""
+        executor = FakePBSExecutor()
+        obs = executor.get_submit_command(self.cmd, "scaling_jobs", 0)
+        self.assertTrue("| fake_qsub -k oe" in obs)
+        self.assertEqual(executor.qstat, "fake_qstat")
+        self.assertEqual(executor.get_wait_option("scaling_jobs"),
+                         "-w $scaling_jobs --executor fake-pbs")
+
+    def test_get_executor(self):
+        """Correctly returns the executor by name"""
+        obs = get_executor('pbs', queue="friendlyq")
+        self.assertTrue(isinstance(obs, PBSExecutor))
+        self.assertEqual(obs.queue, "friendlyq")
+        obs = get_executor('local', jobs=2)
+        self.assertEqual(obs.jobs, 2)
+        with self.assertRaises(ValueError):
+            get_executor('sge')
+
+
+qstat_xml = """<Data><Job><Job_Id>1.host</Job_Id><Job_Name>bench_0</Job_Name>\
+<job_state>R</job_state><qtime>1000</qtime><start_time>1010</start_time></Job>\
+<Job><Job_Id>2.host</Job_Id><job_state>Q</job_state><qtime>1000</qtime></Job>\
+<Job><Job_Id>3.host</Job_Id><job_state>C</job_state><qtime>1000</qtime>\
+<start_time>1020</start_time><comp_time>1120</comp_time>\
+<exit_status>0</exit_status></Job>\
+<Job><Job_Id>4.host</Job_Id><job_state>C</job_state><qtime>1000</qtime>\
+<start_time>1002</start_time><comp_time>1005</comp_time>\
+<exit_status>271</exit_status></Job>\
+<Job><Job_Id>6.host</Job_Id><job_state>W</job_state></Job>\
+<Job><Job_Id>7[1].host</Job_Id><job_state>C</job_state><qtime>1000</qtime>\
+<start_time>1001</start_time><comp_time>1002</comp_time>\
+<exit_status>0</exit_status></Job>\
+<Job><Job_Id>7[2].host</Job_Id><job_state>H</job_state></Job>\
+<Job><Job_Id>8.host</Job_Id><job_state>R</job_state></Job></Data>
+"""
+
+sacct_states = """20|COMPLETED|0:0|2014-01-01T10:00:00|2014-01-01T10:00:10|\
+2014-01-01T10:01:50
+21|CANCELLED by 1000|0:0|2014-01-01T10:00:00|None|2014-01-01T10:00:10
+22_1|FAILED|2:0|2014-01-01T10:00:00|2014-01-01T10:00:00|2014-01-01T10:00:05
+22_2|OUT_OF_MEMORY|0:9|2014-01-01T10:00:00|2014-01-01T10:00:00|\
+2014-01-01T10:00:05
+23|PENDING|0:0|2014-01-01T10:00:00|Unknown|Unknown
+24|COMPLETED|0:0|2014-01-01T10:00:00|2014-01-01T10:00:00|2014-01-01T10:00:05
+"""
+
+sacct_accounting = """20|00:01:40|01:35.500|
+20.batch|00:01:40|01:35.500|2048K
+20.extern|00:01:40|00:00:00|1M
+22_1|00:00:05|00:04.000|
+21|00:00:01|00:00:00|10K
+"""
+
+
+if __name__ == '__main__':
+    main()
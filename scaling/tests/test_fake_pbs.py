@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+import os
+from os.path import join, exists
+from shutil import rmtree
+from subprocess import Popen, PIPE
+from sys import executable
+from tempfile import mkdtemp
+from time import sleep, time
+from unittest import TestCase, main
+
+from scaling.fake_pbs import (qsub, qstat, read_jobs, parse_array_request,
+                              parse_depend, FakePBSEnviron)
+from scaling.executors import FakePBSExecutor
+from scaling.cluster_util import wait_on, submit_throttled
+
+
+class TestFakePBS(TestCase):
+
+    def setUp(self):
+        self.state_dir = mkdtemp()
+        self.output_dir = mkdtemp()
+        self.environ = FakePBSEnviron(self.state_dir, queue_delay=0.5)
+        self.environ.start()
+        self.fake_pbs = "%s -m scaling.fake_pbs" % executable
+
+    def tearDown(self):
+        self.environ.stop()
+        rmtree(self.state_dir)
+        rmtree(self.output_dir)
+
+    def test_fake_pbs_environ(self):
+        """The environment of the fake commands is set and restored"""
+        orig_path = os.environ.get('PATH')
+        with FakePBSEnviron(self.output_dir, queue_delay=2,
+                            scripts=True) as environ:
+            self.assertEqual(os.environ['FAKE_PBS_DIR'], self.output_dir)
+            self.assertEqual(os.environ['FAKE_PBS_QUEUE_DELAY'], '2')
+            self.assertTrue(os.environ['PATH'].split(os.pathsep)[0]
+                            .endswith('scripts'))
+            os.environ['FAKE_PBS_MAX_QUEUED'] = '1'
+        self.assertEqual(environ.state_dir, self.output_dir)
+        self.assertEqual(os.environ['FAKE_PBS_DIR'], self.state_dir)
+        self.assertEqual(os.environ['FAKE_PBS_QUEUE_DELAY'], '0.5')
+        self.assertEqual(os.environ.get('PATH'), orig_path)
+        self.assertFalse('FAKE_PBS_MAX_QUEUED' in os.environ)
+
+    def test_qsub_qstat(self):
+        """Jobs are queued, executed and completed"""
+        out_fp = join(self.output_dir, 'out.txt')
+        obs = qsub(["-k", "oe", "-N", "bench_0", "-q", "friendlyq"],
+                   "echo done > %s\n" % out_fp)
+        self.assertEqual(obs, "1.fakehost")
+        obs = qsub(["-N", "bench_1"], "exit 3\n")
+        self.assertEqual(obs, "2.fakehost")
+
+        lines = qstat([]).splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(lines[2].split()[1:], ["bench_0", lines[2].split()[2],
+                                                "00:00:00", "Q", "friendlyq"])
+
+        # Wait for the jobs to complete
+        self._wait_completed()
+        jobs = read_jobs(self.state_dir)
+        self.assertEqual([job['exit_status'] for job in jobs], ['0', '3'])
+        self.assertTrue(float(jobs[0]['start']) - float(jobs[0]['submit']) >=
+                        0.5)
+        with open(out_fp) as f:
+            self.assertEqual(f.read(), "done\n")
+
+    def _wait_completed(self):
+        """Waits until all the fake PBS jobs are completed"""
+        start = time()
+        while any(job['state'] != 'C' for job in read_jobs(self.state_dir)):
+            self.assertTrue(time() - start < 10)
+            sleep(0.1)
+
+    def test_parse_array_request(self):
+        """Correctly parses the indices of a job array"""
+        self.assertEqual(parse_array_request("1-3"), [1, 2, 3])
+        self.assertEqual(parse_array_request("5,1-2,2"), [1, 2, 5])
+        self.assertEqual(parse_array_request("1-4%2"), [1, 2, 3, 4])
+        self.assertEqual(parse_array_request("7"), [7])
+        for request in ["3-1", "1-2-3", "a"]:
+            with self.assertRaises(ValueError):
+                parse_array_request(request)
+
+    def test_qsub_qstat_array(self):
+        """Each job of an array is executed with its index"""
+        os.environ['FAKE_PBS_QUEUE_DELAY'] = '0'
+        obs = qsub(["-N", "bench_0", "-t", "1-3"],
+                   "echo $PBS_ARRAYID > %s/$PBS_ARRAYID.txt\n"
+                   % self.output_dir)
+        self.assertEqual(obs, "1[].fakehost")
+        self.assertEqual([job['id'] for job in read_jobs(self.state_dir)],
+                         ["1[1]", "1[2]", "1[3]"])
+        self._wait_completed()
+        # The array is summarized in a single line, unless -t is given
+        lines = qstat([]).splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[2].split()[:2], ["1[].fakehost", "bench_0"])
+        self.assertEqual(lines[2].split()[4], "C")
+        lines = qstat(["-t"]).splitlines()
+        self.assertEqual([l.split()[1] for l in lines[2:]],
+                         ["bench_0-1", "bench_0-2", "bench_0-3"])
+        for i in range(1, 4):
+            with open(join(self.output_dir, "%d.txt" % i)) as f:
+                self.assertEqual(f.read(), "%d\n" % i)
+            self.assertTrue(exists(join(self.state_dir,
+                                        "bench_0-%d.o1-%d" % (i, i))))
+
+    def test_array_suite(self):
+        """The job array of a suite executes each line of its manifest"""
+        executor = FakePBSExecutor(qsub="%s qsub" % self.fake_pbs,
+                                   qstat="%s qstat" % self.fake_pbs,
+                                   array=True)
+        lines = ["dest=%s" % self.output_dir,
+                 executor.get_init_code("scaling_jobs")]
+        for i in range(3):
+            lines.append(executor.get_submit_command(
+                "echo %d > $dest/%d.txt" % (i, i), "scaling_jobs", i))
+        lines.append(executor.get_collect_code("scaling_jobs", 0))
+        lines.append("echo $scaling_jobs")
+        proc = Popen(["bash", "-c", "\n".join(lines)], stdout=PIPE)
+        stdout, _ = proc.communicate()
+        self.assertEqual(stdout, "1[].fakehost\n")
+        wait_on([stdout.strip()], poll_interval=0.2, executor=executor)
+        for i in range(3):
+            with open(join(self.output_dir, "%d.txt" % i)) as f:
+                self.assertEqual(f.read(), "%d\n" % i)
+
+    def test_parse_depend(self):
+        """Correctly parses the dependencies of a job"""
+        self.assertEqual(parse_depend("depend=afterany:1.host:2.host"), "1,2")
+        self.assertEqual(parse_depend("depend=afteranyarray:3[].host"), "3[]")
+        self.assertEqual(parse_depend(""), "")
+        with self.assertRaises(ValueError):
+            parse_depend("depend=afterok:1.host")
+
+    def test_dependent_job(self):
+        """A dependent job is held until the jobs it depends on finish"""
+        executor = FakePBSExecutor(qsub="%s qsub" % self.fake_pbs)
+        out_fp = join(self.output_dir, 'processed.txt')
+        lines = ['scaling_jobs=""']
+        for i in range(2):
+            lines.append(executor.get_submit_command("sleep 0.5; exit %d" % i,
+                                                     "scaling_jobs", i))
+        lines.append(executor.get_collect_code("scaling_jobs", 0))
+        lines.append(executor.get_dependent_command(
+            "echo processed > %s" % out_fp, "scaling_jobs", "process0"))
+        proc = Popen(["bash", "-c", "\n".join(lines)], stdout=PIPE)
+        stdout, _ = proc.communicate()
+        self.assertEqual(stdout, "3.fakehost\n")
+        sleep(0.7)
+        jobs = read_jobs(self.state_dir)
+        self.assertEqual(jobs[2]['depend'], '1,2')
+        self.assertEqual(jobs[2]['name'], 'bench_process0')
+        self.assertEqual(jobs[2]['state'], 'H')
+        self._wait_completed()
+        jobs = read_jobs(self.state_dir)
+        # The dependent job was released once the others finished, even if
+        # one of them failed
+        self.assertTrue(float(jobs[2]['start']) >=
+                        max(float(j['end']) for j in jobs[:2]))
+        with open(out_fp) as f:
+            self.assertEqual(f.read(), "processed\n")
+
+    def test_fake_qsub_command(self):
+        """The command line interface reads the job script from stdin"""
+        proc = Popen("echo 'true' | %s qsub -N test" % self.fake_pbs,
+                     shell=True, stdout=PIPE)
+        stdout, _ = proc.communicate()
+        self.assertEqual(stdout, "1.fakehost\n")
+        self.assertEqual(read_jobs(self.state_dir)[0]['name'], "test")
+
+    def test_wait_on(self):
+        """wait_on blocks until the fake PBS jobs are completed"""
+        job_ids = [qsub(["-N", "bench_%d" % i], "sleep 0.5\n")
+                   for i in range(3)]
+        executor = FakePBSExecutor(qstat="%s qstat" % self.fake_pbs)
+        self.assertEqual(executor.check_status(['1', '2', '3']),
+                         ['1', '2', '3'])
+        start = time()
+        obs = wait_on(job_ids, poll_interval=0.2, executor=executor)
+        # The jobs waited in the queue and then ran
+        self.assertTrue(time() - start >= 1)
+        self.assertTrue(all(job['state'] == 'C'
+                            for job in read_jobs(self.state_dir)))
+        self.assertTrue(exists(join(self.state_dir, "bench_0.o1")))
+        # The queue wait and run times are reported
+        self.assertEqual(sorted(obs), ['1', '2', '3'])
+        for status in obs.values():
+            self.assertEqual(status.state, 'C')
+            self.assertEqual(status.exit_status, 0)
+            self.assertTrue(status.queue_wait >= 0.5)
+            self.assertTrue(status.run_time >= 0.5)
+
+    def test_qsub_max_queued(self):
+        """qsub rejects the jobs over the per-user limit"""
+        os.environ['FAKE_PBS_MAX_QUEUED'] = '2'
+        qsub(["-N", "bench_0"], "true\n")
+        with self.assertRaises(RuntimeError):
+            qsub(["-N", "bench_1", "-t", "1-2"], "true\n")
+        qsub(["-N", "bench_1"], "true\n")
+        with self.assertRaises(RuntimeError):
+            qsub(["-N", "bench_2"], "true\n")
+        proc = Popen("echo 'true' | %s qsub -N test" % self.fake_pbs,
+                     shell=True, stdout=PIPE, stderr=PIPE)
+        _, stderr = proc.communicate()
+        self.assertEqual(proc.returncode, 1)
+        self.assertTrue("limit of 2 queued jobs" in stderr)
+        # Once the jobs are completed, new jobs are accepted
+        self._wait_completed()
+        qsub(["-N", "bench_2"], "true\n")
+
+    def test_submit_throttled(self):
+        """No job is lost when the queue limits the number of jobs"""
+        os.environ['FAKE_PBS_MAX_QUEUED'] = '2'
+        os.environ['FAKE_PBS_QUEUE_DELAY'] = '0.2'
+        executor = FakePBSExecutor(qsub="%s qsub" % self.fake_pbs,
+                                   qstat="%s qstat" % self.fake_pbs)
+        jobs = [("bench_%d" % i, "echo %d > %s/%d.txt"
+                 % (i, self.output_dir, i)) for i in range(5)]
+        obs = submit_throttled(jobs, executor, 2, poll_interval=0.2)
+        self.assertEqual([r.name for r in obs],
+                         ["bench_%d" % i for i in range(5)])
+        self.assertEqual([r.exit_status for r in obs], [0] * 5)
+        for i, record in enumerate(obs):
+            self.assertTrue(record.submit_time <= record.start_time <=
+                            record.end_time)
+            with open(join(self.output_dir, "%d.txt" % i)) as f:
+                self.assertEqual(f.read(), "%d\n" % i)
+        # At most two jobs were alive at any time
+        for record in obs:
+            alive = [r for r in obs if r.submit_time <= record.submit_time
+                     <= r.end_time]
+            self.assertTrue(len(alive) <= 2)
+
+    def test_qstat_xml(self):
+        """The jobs are listed in XML with qstat -x"""
+        os.environ['FAKE_PBS_QUEUE_DELAY'] = '0'
+        qsub(["-N", "bench_0"], "exit 2\n")
+        qsub(["-N", "bench_1", "-t", "1-2"], "true\n")
+        self._wait_completed()
+        executor = FakePBSExecutor(qstat="%s qstat" % self.fake_pbs)
+        obs = executor.query_jobs(['1', '2[]'])
+        self.assertEqual(sorted(obs), ['1', '2[1]', '2[2]'])
+        self.assertEqual(obs['1'].exit_status, 2)
+        self.assertEqual(obs['2[2]'].state, 'C')
+        self.assertTrue(obs['2[2]'].run_time >= 0)
+        # Without -t, the array is summarized
+        self.assertEqual(qstat(["-x"]).count("<Job>"), 2)
+        # Only the given jobs are listed
+        self.assertEqual(qstat(["-x", "-t", "2[].fakehost"]).count("<Job>"),
+                         2)
+        self.assertEqual(qstat(["-x", "1"]).count("<Job>"), 1)
+
+
+if __name__ == '__main__':
+    main()
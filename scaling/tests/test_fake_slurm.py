@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+import os
+from os.path import join
+from shutil import rmtree
+from subprocess import Popen, PIPE
+from sys import executable
+from tempfile import mkdtemp
+from time import sleep, time
+from unittest import TestCase, main
+
+from scaling.fake_pbs import read_jobs, FakePBSEnviron
+from scaling.fake_slurm import sbatch, squeue, sacct, parse_dependency
+from scaling.executors import FakeSlurmExecutor
+from scaling.cluster_util import wait_on
+from scaling.util import ResourceRequest
+
+
+class TestFakeSlurm(TestCase):
+
+    def setUp(self):
+        self.state_dir = mkdtemp()
+        self.output_dir = mkdtemp()
+        self.environ = FakePBSEnviron(self.state_dir, queue_delay=0.5)
+        self.environ.start()
+        fake_slurm = "%s -m scaling.fake_slurm" % executable
+        self.executor = FakeSlurmExecutor(sbatch="%s sbatch" % fake_slurm,
+                                          squeue="%s squeue" % fake_slurm,
+                                          sacct="%s sacct" % fake_slurm)
+        self.fake_slurm = fake_slurm
+
+    def tearDown(self):
+        self.environ.stop()
+        rmtree(self.state_dir)
+        rmtree(self.output_dir)
+
+    def _wait_completed(self):
+        """Waits until all the fake SLURM jobs are completed"""
+        start = time()
+        while any(job['state'] != 'C' for job in read_jobs(self.state_dir)):
+            self.assertTrue(time() - start < 10)
+            sleep(0.1)
+
+    def test_sbatch_squeue_sacct(self):
+        """Jobs are queued, executed and accounted"""
+        out_fp = join(self.output_dir, 'out.txt')
+        obs = sbatch(["--parsable", "-J", "bench_0", "-p", "short",
+                      "--time=00:10:00", "--wrap=echo $SLURM_JOB_ID > %s"
+                      % out_fp])
+        self.assertEqual(obs, "1")
+        obs = sbatch(["--job-name=bench_1"], "#!/bin/sh\nexit 3\n")
+        self.assertEqual(obs, "Submitted batch job 2")
+
+        self.assertEqual(squeue(["-h", "-o", "%i %t"]), "1 PD\n2 PD\n")
+        lines = squeue([]).splitlines()
+        self.assertEqual(lines[0].split(),
+                         ["JOBID", "PARTITION", "NAME", "USER", "ST"])
+        self.assertEqual(lines[1].split()[:3], ["1", "short", "bench_0"])
+
+        self._wait_completed()
+        self.assertEqual(squeue(["-h"]), "")
+        with open(out_fp) as f:
+            self.assertEqual(f.read(), "1\n")
+        obs = sacct(["-X", "-n", "-P", "-j", "1,2", "-o",
+                     "JobID,State,ExitCode"])
+        self.assertEqual(obs, "1|COMPLETED|0:0\n2|FAILED|3:0\n")
+        # The batch step reports the memory of the job
+        obs = sacct(["-n", "-P", "-j", "1", "-o", "JobIDRaw,MaxRSS"])
+        lines = obs.splitlines()
+        self.assertEqual(lines[0], "1|")
+        self.assertTrue(lines[1].startswith("1.batch|"))
+        self.assertTrue(lines[1].endswith("K"))
+        with self.assertRaises(ValueError):
+            sacct(["-o", "Unknown"])
+        with self.assertRaises(ValueError):
+            sbatch(["--parsable"])
+
+    def test_parse_dependency(self):
+        """Correctly translates the SLURM dependencies"""
+        jobs = [{'id': '1'}, {'id': '2[1]'}, {'id': '2[2]'}]
+        self.assertEqual(parse_dependency("afterany:1:2", jobs),
+                         "depend=afterany:1:2[]")
+        with self.assertRaises(ValueError):
+            parse_dependency("afterok:1", jobs)
+
+    def test_array_suite(self):
+        """The job array of a suite executes each line of its manifest"""
+        os.environ['FAKE_PBS_QUEUE_DELAY'] = '0'
+        executor = FakeSlurmExecutor(sbatch=self.executor.sbatch,
+                                     squeue=self.executor.squeue,
+                                     sacct=self.executor.sacct, array=True)
+        lines = ["dest=%s" % self.output_dir,
+                 executor.get_init_code("scaling_jobs")]
+        for i in range(3):
+            lines.append(executor.get_submit_command(
+                "echo \\$SLURM_JOB_ID > $dest/%d.txt" % i, "scaling_jobs", i,
+                ResourceRequest(60, 100, 1)))
+        lines.append(executor.get_collect_code("scaling_jobs", 0))
+        lines.append(executor.get_dependent_command(
+            "echo done > $dest/processed.txt", "scaling_jobs", "process0"))
+        lines.append("echo $scaling_jobs")
+        proc = Popen(["bash", "-c", "\n".join(lines)], stdout=PIPE)
+        stdout, _ = proc.communicate()
+        self.assertEqual(stdout.splitlines()[-1], "1")
+        obs = wait_on(["1"], poll_interval=0.2, executor=self.executor)
+        self.assertEqual(sorted(obs), ["1_1", "1_2", "1_3"])
+        self.assertEqual(set(s.state for s in obs.values()), set(["CD"]))
+        for i in range(3):
+            with open(join(self.output_dir, "%d.txt" % i)) as f:
+                self.assertEqual(f.read(), "1_%d\n" % (i + 1))
+        # The dependent job waited for all the tasks of the array
+        self._wait_completed()
+        jobs = read_jobs(self.state_dir)
+        self.assertEqual(jobs[-1]['depend'], "1[]")
+        with open(join(self.output_dir, "processed.txt")) as f:
+            self.assertEqual(f.read(), "done\n")
+        obs = self.executor.get_accounting(["1_1", "1_2"])
+        self.assertEqual(sorted(obs), ["1_1", "1_2"])
+        self.assertTrue(obs["1_1"].max_rss > 0)
+
+    def test_fake_sbatch_command(self):
+        """The command line interface reports the errors"""
+        proc = Popen("%s sbatch --afterok" % self.fake_slurm, shell=True,
+                     stdin=PIPE, stdout=PIPE, stderr=PIPE)
+        _, stderr = proc.communicate("")
+        self.assertEqual(proc.returncode, 1)
+        self.assertTrue(stderr.startswith("sbatch: "))
+        proc = Popen("echo 'true' | %s sbatch --parsable" % self.fake_slurm,
+                     shell=True, stdout=PIPE)
+        stdout, _ = proc.communicate()
+        self.assertEqual(stdout, "1\n")
+        # The job script can be given as a path instead of on stdin
+        script_fp = join(self.output_dir, "job.sh")
+        with open(script_fp, 'w') as f:
+            f.write("#!/bin/sh\necho done > %s/script.txt\n"
+                    % self.output_dir)
+        proc = Popen("%s sbatch --parsable %s arg" % (self.fake_slurm,
+                                                      script_fp),
+                     shell=True, stdin=PIPE, stdout=PIPE)
+        stdout, _ = proc.communicate("")
+        self.assertEqual(stdout, "2\n")
+        self._wait_completed()
+        with open(join(self.output_dir, "script.txt")) as f:
+            self.assertEqual(f.read(), "done\n")
+        proc = Popen("%s sbatch %s" % (self.fake_slurm,
+                                       join(self.output_dir, "missing.sh")),
+                     shell=True, stdin=PIPE, stdout=PIPE, stderr=PIPE)
+        _, stderr = proc.communicate("")
+        self.assertEqual(proc.returncode, 1)
+
+
+if __name__ == '__main__':
+    main()
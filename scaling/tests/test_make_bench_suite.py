@@ -11,9 +11,12 @@ __status__ = "Development"
 
 from unittest import TestCase, main
 
-from scaling.make_bench_suite import (get_command_string,
+from scaling.make_bench_suite import (get_command_string, bundle_cases,
+                                      get_bundle_resources,
                                       make_bench_suite_files,
                                       make_bench_suite_parameters)
+from scaling.executors import PBSExecutor, SlurmExecutor
+from scaling.util import ResourceRequest
 
 
 class TestGetCommandString(TestCase):
@@ -55,6 +58,42 @@ class TestGetCommandString(TestCase):
                           values, out_opt)
 
 
+class TestBundleCases(TestCase):
+    """Tests the bundle_cases function"""
+
+    def test_bundle_cases(self):
+        """Correctly packs the short cases into bundles"""
+        names = ["a", "b", "c", "d", "e", "f"]
+        estimates = {"a": 30, "b": 500, "c": 40, "d": 20, "e": 35}
+        # The longest cases are packed first, so 40 and 20 share a bundle
+        obs = bundle_cases(names, estimates, 60)
+        self.assertEqual(obs, [[0], [1], [2, 3], [4], [5]])
+        obs = bundle_cases(names, estimates, 100)
+        self.assertEqual(obs, [[0], [1], [2, 3, 4], [5]])
+        # The cases are not bundled if none of them is short enough
+        obs = bundle_cases(names, estimates, 10)
+        self.assertEqual(obs, [[0], [1], [2], [3], [4], [5]])
+
+    def test_bundle_cases_error(self):
+        """Raises an error if the bundle time is not positive"""
+        with self.assertRaises(ValueError):
+            bundle_cases(["a"], {"a": 1}, 0)
+
+    def test_get_bundle_resources(self):
+        """Correctly merges the resources of the cases of a bundle"""
+        resources = {"a": ResourceRequest(60, 1024, 1),
+                     "b": ResourceRequest(30, 2048, None),
+                     "c": ResourceRequest(None, None, 4)}
+        self.assertEqual(get_bundle_resources(["a", "b"], resources),
+                         ResourceRequest(90, 2048, 1))
+        # The time limit is unknown if any case lacks it
+        self.assertEqual(get_bundle_resources(["a", "c"], resources),
+                         ResourceRequest(None, 1024, 4))
+        self.assertEqual(get_bundle_resources(["a", "d"], resources),
+                         ResourceRequest(None, 1024, 1))
+        self.assertEqual(get_bundle_resources(["d"], resources), None)
+
+
 class TestMakeBenchSuiteFiles(TestCase):
     """Tests the make_bench_suite_files function"""
 
@@ -92,6 +131,165 @@ class TestMakeBenchSuiteFiles(TestCase):
                                      job_prefix, queue, pbs_extra_args)
         self.assertEqual(obs, exp_bench_suite_files_pbs)
 
+    def test_make_bench_suite_files_pbs_array(self):
+        """Correctly generates the bench suite for a pbs job array"""
+        cmd = "pick_otus.py"
+        in_opts = ["-i"]
+        bench_files = [["1000000.fna"], ["2000000.fna"]]
+        out_opt = "-o"
+        executor = PBSExecutor(job_prefix="test", queue="friendlyq",
+                               array=True)
+        obs = make_bench_suite_files(cmd, in_opts, bench_files, out_opt,
+                                     executor=executor)
+        self.assertTrue("touch $dest/scaling_jobs_manifest.txt\n" in obs)
+        self.assertTrue(
+            '    echo "cd $PWD;     timing_wrapper.sh '
+            '$timing_dest/2000000/$i.txt pick_otus.py -i 2000000.fna -o '
+            '$output_dest/2000000/$i" >> $dest/scaling_jobs_manifest.txt\n'
+            in obs)
+        self.assertTrue("-k oe -N test0 -q friendlyq)\n" in obs)
+        self.assertEqual(obs.count("qsub"), 1)
+        self.assertTrue(obs.endswith(
+            'scaling process-bench-results -i $timing_dest/ -o $dest/plots/ '
+            '-w "$scaling_jobs"\n'))
+
+    def test_make_bench_suite_files_sentinels(self):
+        """Correctly generates the bench suite with completion sentinels"""
+        cmd = "pick_otus.py"
+        in_opts = ["-i"]
+        bench_files = [["1000000.fna"], ["2000000.fna"]]
+        out_opt = "-o"
+        obs = make_bench_suite_files(cmd, in_opts, bench_files, out_opt,
+                                     pbs=True, job_prefix="test",
+                                     queue="friendlyq", sentinels=True)
+        self.assertTrue('sentinel_dest=$dest"/sentinels"\n'
+                        'mkdir $sentinel_dest\n' in obs)
+        self.assertTrue(
+            '    touch $sentinel_dest/1000000_$i.pending\n'
+            '    scaling_jobs+=","`echo "cd $PWD;     sentinel_wrapper.sh '
+            '$sentinel_dest/1000000_$i timing_wrapper.sh '
+            '$timing_dest/1000000/$i.txt pick_otus.py -i 1000000.fna -o '
+            '$output_dest/1000000/$i" | qsub -k oe -N test0 -q friendlyq `\n'
+            in obs)
+        # The results are processed without waiting on the job ids
+        self.assertTrue(obs.endswith(
+            'scaling process-bench-results -i $timing_dest/ -o $dest/plots/ '
+            '-s $sentinel_dest\n'))
+
+    def test_make_bench_suite_files_process_job(self):
+        """Correctly generates the bench suite with a processing job"""
+        cmd = "pick_otus.py"
+        in_opts = ["-i"]
+        bench_files = [["1000000.fna"], ["2000000.fna"]]
+        out_opt = "-o"
+        obs = make_bench_suite_files(cmd, in_opts, bench_files, out_opt,
+                                     pbs=True, job_prefix="test",
+                                     queue="friendlyq", process_job=True)
+        self.assertTrue(obs.endswith(
+            'scaling_jobs=${scaling_jobs#?}\n'
+            'echo "cd $PWD; scaling process-bench-results -i $timing_dest/ '
+            '-o $dest/plots/" | qsub -k oe -N testprocess0 -q friendlyq '
+            '-W depend=afterany:${scaling_jobs//,/:}\n'))
+        # The local executor cannot submit the processing job
+        with self.assertRaises(ValueError):
+            make_bench_suite_files(cmd, in_opts, bench_files, out_opt,
+                                   process_job=True)
+
+    def test_make_bench_suite_files_bundles(self):
+        """Correctly generates the bench suite with bundled cases"""
+        cmd = "pick_otus.py"
+        in_opts = ["-i"]
+        bench_files = [["10.fna"], ["20.fna"], ["30.fna"]]
+        out_opt = "-o"
+        estimates = {"10": 10, "20": 20, "30": 300}
+        obs = make_bench_suite_files(cmd, in_opts, bench_files, out_opt,
+                                     pbs=True, job_prefix="test",
+                                     sentinels=True, estimates=estimates,
+                                     bundle_time=60)
+        # The two short cases are executed sequentially by the same job,
+        # each one with its own timing file and sentinel
+        self.assertEqual(obs.count("| qsub"), 2)
+        self.assertTrue(
+            '    touch $sentinel_dest/10_$i.pending\n'
+            '    touch $sentinel_dest/20_$i.pending\n'
+            '    scaling_jobs+=","`echo "cd $PWD;     sentinel_wrapper.sh '
+            '$sentinel_dest/10_$i timing_wrapper.sh $timing_dest/10/$i.txt '
+            'pick_otus.py -i 10.fna -o $output_dest/10/$i; '
+            'sentinel_wrapper.sh $sentinel_dest/20_$i timing_wrapper.sh '
+            '$timing_dest/20/$i.txt pick_otus.py -i 20.fna -o '
+            '$output_dest/20/$i" | qsub -k oe -N test0 `\n' in obs)
+        self.assertTrue("-N test1 `" in obs)
+        # The local executor does not submit jobs to bundle the cases in
+        with self.assertRaises(ValueError):
+            make_bench_suite_files(cmd, in_opts, bench_files, out_opt,
+                                   estimates=estimates, bundle_time=60)
+
+    def test_make_bench_suite_files_slurm(self):
+        """Correctly generates the bench suite for SLURM with accounting"""
+        cmd = "pick_otus.py"
+        in_opts = ["-i"]
+        bench_files = [["10.fna"], ["20.fna"]]
+        out_opt = "-o"
+        resources = {"10": ResourceRequest(600, 512, None)}
+        executor = SlurmExecutor(job_prefix="test")
+        obs = make_bench_suite_files(cmd, in_opts, bench_files, out_opt,
+                                     executor=executor, resources=resources)
+        self.assertTrue('job_ids_dest=$dest"/job_ids"\nmkdir $job_ids_dest\n'
+                        in obs)
+        self.assertTrue("mkdir $job_ids_dest/10\n" in obs)
+        self.assertTrue(
+            '    scaling_jobs+=","`sbatch --parsable -J test0 --time=00:10:00 '
+            '--mem=512M --wrap="cd $PWD;     echo \\$SLURM_JOB_ID > '
+            '$job_ids_dest/10/$i.txt; timing_wrapper.sh $timing_dest/10/$i.txt '
+            'pick_otus.py -i 10.fna -o $output_dest/10/$i"`\n' in obs)
+        self.assertTrue("-J test1 --wrap=" in obs)
+        self.assertTrue(obs.endswith(
+            "scaling process-bench-results -i $timing_dest/ -o $dest/plots/ "
+            "-j $job_ids_dest -w $scaling_jobs --executor slurm\n"))
+
+        # Without sacct, the job ids are not recorded
+        executor = SlurmExecutor(sacct="")
+        obs = make_bench_suite_files(cmd, in_opts, bench_files, out_opt,
+                                     executor=executor)
+        self.assertFalse("job_ids_dest" in obs)
+        # The local executor does not request resources
+        with self.assertRaises(ValueError):
+            make_bench_suite_files(cmd, in_opts, bench_files, out_opt,
+                                   resources=resources)
+
+    def test_make_bench_suite_files_interleaved(self):
+        """Correctly generates the bench suite with an interleaved order"""
+        cmd = "pick_otus.py"
+        in_opts = ["-i"]
+        bench_files = [["1000000.fna"], ["2000000.fna"]]
+        out_opt = "-o"
+        obs = make_bench_suite_files(cmd, in_opts, bench_files, out_opt,
+                                     order='interleaved')
+        self.assertEqual(obs, exp_bench_suite_files_interleaved)
+
+    def test_make_bench_suite_files_random(self):
+        """Correctly generates the bench suite with a random order"""
+        cmd = "pick_otus.py"
+        in_opts = ["-i"]
+        bench_files = [["1000000.fna"], ["2000000.fna"]]
+        out_opt = "-o"
+        obs = make_bench_suite_files(cmd, in_opts, bench_files, out_opt,
+                                     order='random', seed=42)
+        self.assertTrue("RANDOM=42\n" in obs)
+        self.assertTrue("#order\\trandom\\n#seed\\t42" in obs)
+        self.assertTrue('case_names=("1000000" "2000000")' in obs)
+        self.assertTrue("k=$((RANDOM % (j+1)))" in obs)
+        # The seed is generated if not provided
+        obs = make_bench_suite_files(cmd, in_opts, bench_files, out_opt,
+                                     order='random')
+        self.assertTrue("RANDOM=" in obs)
+
+    def test_make_bench_suite_files_order_error(self):
+        """Raises an error with an unknown execution order"""
+        with self.assertRaises(ValueError):
+            make_bench_suite_files("pick_otus.py", ["-i"], [["1.fna"]], "-o",
+                                   order='reverse')
+
 
 class TestMakeBenchSuiteParameters(TestCase):
     """Tests the make_bench_suite_parameters function"""
@@ -127,6 +325,90 @@ class TestMakeBenchSuiteParameters(TestCase):
                                           job_prefix, queue, pbs_extra_args)
         self.assertEqual(obs, exp_bench_suite_parameters_pbs)
 
+    def test_make_bench_suite_parameters_sentinels(self):
+        """Correctly generates the benchmark suite with sentinels"""
+        cmd = "parallel_pick_otus_uclust_ref.py -r ref_file.fna -i input.fna"
+        params = {"jobs_to_start": ["8", "16"],
+                  "similarity": ["0.94", "0.97"]}
+        obs = make_bench_suite_parameters(cmd, params, "-o", sentinels=True)
+        for param in params:
+            self.assertTrue("mkdir $sentinel_dest/%s\n" % param in obs)
+            self.assertTrue("-s $sentinel_dest/%s\n" % param in obs)
+        self.assertTrue(
+            "    touch $sentinel_dest/similarity/0.97_$i.pending\n"
+            "    sentinel_wrapper.sh $sentinel_dest/similarity/0.97_$i "
+            "timing_wrapper.sh $timing_dest/similarity/0.97/$i.txt" in obs)
+
+    def test_make_bench_suite_parameters_process_job(self):
+        """Correctly generates a processing job for each parameter"""
+        cmd = "parallel_pick_otus_uclust_ref.py -r ref_file.fna -i input.fna"
+        params = {"jobs_to_start": ["8", "16"],
+                  "similarity": ["0.94", "0.97"]}
+        obs = make_bench_suite_parameters(cmd, params, "-o", pbs=True,
+                                          process_job=True)
+        self.assertEqual(obs.count("-W depend=afterany:"), 2)
+        for var_job in ["jobs_to_start_jobs", "similarity_jobs"]:
+            self.assertTrue("depend=afterany:${%s//,/:}\n" % var_job in obs)
+        self.assertTrue("-N bench_process0 " in obs)
+        self.assertTrue("-N bench_process1 " in obs)
+        self.assertFalse(" -w $" in obs)
+
+    def test_make_bench_suite_parameters_bundles(self):
+        """Correctly bundles the short cases of each parameter"""
+        cmd = "parallel_pick_otus_uclust_ref.py -r ref_file.fna -i input.fna"
+        params = {"jobs_to_start": ["8", "16"],
+                  "similarity": ["0.94", "0.97"]}
+        estimates = {"jobs_to_start/8": 50, "jobs_to_start/16": 30,
+                     "similarity/0.94": 10, "similarity/0.97": 10}
+        obs = make_bench_suite_parameters(cmd, params, "-o", pbs=True,
+                                          estimates=estimates,
+                                          bundle_time=60)
+        # The cases of different parameters are never bundled together
+        self.assertEqual(obs.count("| qsub"), 3)
+        self.assertTrue("$output_dest/similarity/0.94/$i; timing_wrapper.sh "
+                        "$timing_dest/similarity/0.97/$i.txt" in obs)
+        self.assertTrue("-N bench_2 `" in obs)
+        self.assertFalse("-N bench_3 `" in obs)
+
+    def test_make_bench_suite_parameters_slurm_array(self):
+        """Correctly generates the benchmark suite for SLURM job arrays"""
+        cmd = "parallel_pick_otus_uclust_ref.py -r ref_file.fna -i input.fna"
+        params = {"jobs_to_start": ["8", "16"]}
+        resources = {"jobs_to_start/8": ResourceRequest(60, None, 8),
+                     "jobs_to_start/16": ResourceRequest(30, None, 16)}
+        executor = SlurmExecutor(array=True)
+        obs = make_bench_suite_parameters(cmd, params, "-o", sentinels=True,
+                                          executor=executor,
+                                          resources=resources)
+        self.assertTrue("mkdir $job_ids_dest/jobs_to_start/16\n" in obs)
+        self.assertTrue("--array=1-`wc -l < "
+                        "$dest/jobs_to_start_jobs_manifest.txt` -J bench_0 "
+                        "--time=00:01:00 --cpus-per-task=16 --wrap=" in obs)
+        self.assertTrue('    echo "cd $PWD;     echo \\$SLURM_JOB_ID > '
+                        '$job_ids_dest/jobs_to_start/8/$i.txt; '
+                        'sentinel_wrapper.sh ' in obs)
+        # The sentinels do not name the executor, needed for the accounting
+        self.assertTrue("-j $job_ids_dest/jobs_to_start --executor slurm "
+                        "-s $sentinel_dest/jobs_to_start\n" in obs)
+
+    def test_make_bench_suite_parameters_pbs_array(self):
+        """Correctly generates the benchmark suite for pbs job arrays"""
+        cmd = "parallel_pick_otus_uclust_ref.py -r ref_file.fna -i input.fna"
+        params = {"jobs_to_start": ["8", "16", "32"],
+                  "similarity": ["0.94", "0.97", "0.99"]}
+        executor = PBSExecutor(job_prefix="test", array=True)
+        obs = make_bench_suite_parameters(cmd, params, "-o",
+                                          executor=executor)
+        # A job array is submitted for each parameter
+        self.assertEqual(obs.count("qsub"), 2)
+        for var_job in ["jobs_to_start_jobs", "similarity_jobs"]:
+            manifest = "$dest/%s_manifest.txt" % var_job
+            self.assertTrue("touch %s\n" % manifest in obs)
+            self.assertEqual(obs.count(">> %s" % manifest), 3)
+            self.assertTrue('-w "$%s"\n' % var_job in obs)
+        self.assertTrue("-k oe -N test0)\n" in obs)
+        self.assertTrue("-k oe -N test1)\n" in obs)
+
 exp_bench_suite_files_single = """#!/bin/bash
 
 # Number of times each command should be executed
@@ -436,5 +718,63 @@ scaling process-bench-results -i $timing_dest/jobs_to_start -o $dest/plots/jobs_
 scaling process-bench-results -i $timing_dest/similarity -o $dest/plots/similarity -w $similarity_jobs
 """
 
+exp_bench_suite_files_interleaved = """#!/bin/bash
+
+# Number of times each command should be executed
+num_rep=1
+
+# Check if the user supplied a (valid) number of repetitions
+if [[ $# -eq 1 ]]; then
+    if [[ $1 =~ ^[0-9]+$ ]]; then
+        num_rep=$1
+    else
+        echo "USAGE: $0 [num_reps]"
+    fi
+fi
+
+# Get a string with current date (format YYYYMMDD_HHMMSS) to name
+# the directory with the benchmark results
+cdate=`date +_%Y%m%d_%H%M%S`
+dest=$PWD/pick_otus$cdate
+mkdir $dest
+
+# Create output directory structure
+output_dest=$dest"/command_outputs"
+timing_dest=$dest"/timing"
+
+mkdir $output_dest
+mkdir $timing_dest
+mkdir $output_dest/1000000
+mkdir $timing_dest/1000000
+mkdir $output_dest/2000000
+mkdir $timing_dest/2000000
+# Benchmark cases, executed in interleaved order
+case_names=("1000000" "2000000")
+order_fp=$dest/execution_order.txt
+echo -e "#order\\tinterleaved\\n#seed\\tNone\\n#rep\\tcase\\tstart" > $order_fp
+run_case_0() {
+    timing_wrapper.sh $timing_dest/1000000/$i.txt pick_otus.py -i 1000000.fna -o $output_dest/1000000/$i
+}
+run_case_1() {
+    timing_wrapper.sh $timing_dest/2000000/$i.txt pick_otus.py -i 2000000.fna -o $output_dest/2000000/$i
+}
+
+# Loop as many times as desired
+for i in `seq $num_rep`
+do
+    order=(`seq 0 1`)
+    shift=$(( (i-1) % ${#order[@]} ))
+    order=("${order[@]:$shift}" "${order[@]:0:$shift}")
+    for c in ${order[@]}
+    do
+        echo -e "$i\\t${case_names[$c]}\\t`date +%s`" >> $order_fp
+        run_case_$c
+    done
+done
+
+# Get the benchmark results and produce the plots
+scaling process-bench-results -i $timing_dest/ -o $dest/plots/ 
+"""
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase, main
+from warnings import catch_warnings, simplefilter
+
+from os import getpid, kill
+from signal import SIGKILL
+from subprocess import Popen
+from sys import executable
+from time import sleep, time
+
+from scaling.util import TimingRecord, Timeline, Limits
+from scaling.parse import parse_timing_file, parse_timeline_file
+from scaling.measure import (run_measured, format_timing_record,
+                             write_timing_file, write_timeline_file,
+                             read_proc_sample, get_process_tree,
+                             get_tree_measurements, read_proc_io, IO_FIELDS,
+                             LimitEnforcer)
+
+
+class TestMeasure(TestCase):
+
+    def setUp(self):
+        self.output_dir = mkdtemp()
+        self.record = TimingRecord(1.5, 1.25, 0.25, 1024, 10, 1, 5, 2, 8, 16,
+                                   0, 0)
+
+    def tearDown(self):
+        rmtree(self.output_dir)
+
+    def test_run_measured(self):
+        """Correctly measures a command that finishes correctly"""
+        obs, timeline = run_measured(["sh", "-c", "i=0; while [ $i -lt "
+                                      "20000 ]; do i=$((i+1)); done"])
+        self.assertEqual(timeline, None)
+        self.assertEqual(obs.status, 0)
+        self.assertEqual(obs.signal, 0)
+        self.assertTrue(obs.wall > 0)
+        self.assertTrue(obs.user + obs.kernel > 0)
+        self.assertTrue(obs.mem > 0)
+        self.assertTrue(obs.minflt > 0)
+
+    def test_run_measured_exit_status(self):
+        """Correctly records the exit status of the command"""
+        obs, _ = run_measured(["sh", "-c", "exit 3"])
+        self.assertEqual(obs.status, 3)
+        self.assertEqual(obs.signal, 0)
+
+    def test_run_measured_signal(self):
+        """Correctly records the signal that killed the command"""
+        obs, _ = run_measured(["sh", "-c", "kill -9 $$"])
+        self.assertEqual(obs.status, 0)
+        self.assertEqual(obs.signal, 9)
+
+    def test_run_measured_not_found(self):
+        """Correctly records a command that cannot be executed"""
+        obs, _ = run_measured(["/this/command/does/not/exist"])
+        self.assertEqual(obs.status, 127)
+
+    def test_run_measured_sampled(self):
+        """Correctly samples the memory and CPU usage of the command"""
+        obs, timeline = run_measured(["sh", "-c", "i=0; while [ $i -lt "
+                                      "50000 ]; do i=$((i+1)); done"],
+                                     sample_interval=0.01)
+        self.assertEqual(obs.status, 0)
+        self.assertTrue(len(timeline.time) > 1)
+        self.assertEqual(len(timeline.time), len(timeline.rss))
+        self.assertEqual(len(timeline.time), len(timeline.cpu))
+        self.assertEqual(timeline.time, sorted(timeline.time))
+        self.assertTrue(all(rss > 0 for rss in timeline.rss))
+        self.assertTrue(timeline.overhead > 0)
+
+    def test_run_measured_timeout(self):
+        """Correctly kills the process tree of a command running too long"""
+        start = time()
+        obs, _ = run_measured(["sh", "-c", "sleep 10 & wait"],
+                              limits=Limits(wall=0.5))
+        self.assertTrue(time() - start < 5)
+        self.assertEqual(obs.censored, 'timeout')
+        self.assertEqual(obs.signal, 9)
+        self.assertTrue(obs.wall >= 0.5)
+        # The limit is not reached
+        obs, _ = run_measured(["true"], limits=Limits(wall=10))
+        self.assertEqual(obs.censored, None)
+        self.assertEqual(obs.status, 0)
+
+    def test_limit_enforcer_exited(self):
+        """Does not stop a command that exited before the limit was hit"""
+        proc = Popen(["true"])
+        enforcer = LimitEnforcer(proc.pid)
+        # Wait for the command to exit, without reaping it
+        start = time()
+        while True:
+            with open("/proc/%d/stat" % proc.pid) as f:
+                if f.read().rsplit(')', 1)[1].split()[0] == 'Z':
+                    break
+            self.assertTrue(time() - start < 5)
+            sleep(0.01)
+        enforcer.stop('timeout')
+        self.assertEqual(enforcer.censored, None)
+        self.assertEqual(proc.wait(), 0)
+        # Nor once it has been reaped
+        enforcer.stop('timeout')
+        self.assertEqual(enforcer.censored, None)
+
+    def test_run_measured_max_rss(self):
+        """Correctly kills a command using too much memory"""
+        obs, timeline = run_measured(
+            [executable, "-c", "import time; a = ' ' * (100 * 1024 * 1024); "
+             "time.sleep(10)"], limits=Limits(rss=50 * 1024))
+        self.assertEqual(obs.censored, 'rss')
+        self.assertEqual(obs.signal, 9)
+        self.assertTrue(obs.mem > 50 * 1024)
+        # The sampler is only used to enforce the limit
+        self.assertEqual(timeline, None)
+
+    def test_run_measured_max_vmem(self):
+        """Correctly records a command failing under the vmem limit"""
+        with catch_warnings(record=True) as w:
+            simplefilter('always')
+            obs, _ = run_measured(
+                [executable, "-c", "a = ' ' * (500 * 1024 * 1024)"],
+                limits=Limits(vmem=200 * 1024))
+        self.assertEqual(obs.censored, 'vmem')
+        self.assertNotEqual(obs.status, 0)
+        self.assertEqual(len(w), 1)
+        self.assertTrue('memoryerror' in str(w[0].message))
+
+    def test_run_measured_max_vmem_other_failure(self):
+        """Does not censor a failure unrelated to the vmem limit"""
+        with catch_warnings(record=True) as w:
+            simplefilter('always')
+            obs, _ = run_measured(
+                ["sh", "-c", "echo 'no such file' >&2; exit 3"],
+                limits=Limits(vmem=200 * 1024))
+        self.assertEqual(obs.censored, None)
+        self.assertEqual(obs.status, 3)
+        self.assertEqual(w, [])
+
+    def test_format_timing_record_censored(self):
+        """Correctly formats a censored timing record"""
+        record = self.record._replace(signal=9, censored='timeout')
+        obs = format_timing_record(record)
+        exp = ("1.500000;1.250000;0.250000;1024;minflt=10;majflt=1;nvcsw=5;"
+               "nivcsw=2;inblock=8;oublock=16;status=0;signal=9;"
+               "censored=timeout")
+        self.assertEqual(obs, exp)
+
+    def test_read_proc_sample(self):
+        """Correctly reads the memory and CPU usage of a process tree"""
+        rss, cpu, procs, io = read_proc_sample(getpid())
+        self.assertTrue(rss > 0)
+        self.assertTrue(cpu >= 0)
+        self.assertTrue(procs >= 1)
+        self.assertEqual(sorted(io), sorted(IO_FIELDS))
+        self.assertEqual(read_proc_sample(-1), None)
+
+    def test_read_proc_sample_children(self):
+        """Correctly adds the usage of the descendant processes"""
+        proc = Popen(["sh", "-c", "sleep 5 & sleep 5 & wait"])
+        try:
+            # Give the shell some time to spawn its children
+            sleep(0.5)
+            self.assertEqual(len(get_process_tree(proc.pid)), 3)
+            rss, _, procs, _ = read_proc_sample(proc.pid)
+            self.assertEqual(procs, 3)
+            self.assertTrue(rss > 0)
+        finally:
+            kill(proc.pid, SIGKILL)
+            proc.wait()
+
+    def test_run_measured_sampled_tree(self):
+        """Correctly samples the process tree of the command"""
+        _, timeline = run_measured(["sh", "-c", "sleep 0.5 & sleep 0.5 & "
+                                    "wait"], sample_interval=0.05)
+        self.assertEqual(max(timeline.procs), 3)
+        self.assertEqual(len(timeline.procs), len(timeline.time))
+
+    def test_read_proc_io(self):
+        """Correctly reads the I/O counters of a process"""
+        obs = read_proc_io(getpid())
+        self.assertEqual(sorted(obs), sorted(IO_FIELDS))
+        self.assertTrue(obs['rchar'] > 0)
+        self.assertEqual(read_proc_io(-1), None)
+
+    def test_run_measured_sampled_io(self):
+        """Correctly records the I/O of the sampled process tree"""
+        fp = join(self.output_dir, 'data.txt')
+        obs, _ = run_measured(["sh", "-c", "head -c 1048576 /dev/zero > %s; "
+                               "sleep 0.3" % fp], sample_interval=0.05)
+        self.assertEqual(sorted(obs.io), sorted(IO_FIELDS))
+        self.assertTrue(obs.io['wchar'] >= 1048576)
+        self.assertTrue(obs.io['syscw'] > 0)
+        # The I/O is only available when sampling
+        obs, _ = run_measured(["true"])
+        self.assertEqual(obs.io, None)
+
+    def test_format_timing_record_io(self):
+        """Correctly formats a timing record with I/O counters"""
+        io = {'read_bytes': 4096, 'write_bytes': 0, 'rchar': 5000,
+              'wchar': 100, 'syscr': 7, 'syscw': 2}
+        obs = format_timing_record(self.record._replace(io=io))
+        exp = ("1.500000;1.250000;0.250000;1024;minflt=10;majflt=1;nvcsw=5;"
+               "nivcsw=2;inblock=8;oublock=16;status=0;signal=0;"
+               "read_bytes=4096;write_bytes=0;rchar=5000;wchar=100;syscr=7;"
+               "syscw=2")
+        self.assertEqual(obs, exp)
+
+    def test_get_tree_measurements(self):
+        """Correctly summarizes the process tree usage of a timeline"""
+        timeline = Timeline([0.1, 0.2, 0.3], [1024, 4096, 2048],
+                            [0.05, 0.15, 0.30], [1, 3, 2], 0.001)
+        obs = get_tree_measurements(timeline)
+        self.assertEqual(obs, {'tree_rss': 4096, 'tree_cpu': 0.30,
+                               'tree_procs': 3})
+        self.assertEqual(get_tree_measurements(Timeline([], [], [], [], 0.0)),
+                         {})
+
+    def test_format_timing_record(self):
+        """Correctly formats a timing record"""
+        obs = format_timing_record(self.record)
+        exp = ("1.500000;1.250000;0.250000;1024;minflt=10;majflt=1;nvcsw=5;"
+               "nivcsw=2;inblock=8;oublock=16;status=0;signal=0")
+        self.assertEqual(obs, exp)
+
+    def test_write_timing_file(self):
+        """The written timing file can be parsed back"""
+        fp = join(self.output_dir, '1.txt')
+        write_timing_file(fp, self.record)
+        with open(fp, 'U') as f:
+            obs = parse_timing_file(f)
+        exp = (1.5, 1.25, 0.25, 1024,
+               {'minflt': 10, 'majflt': 1, 'nvcsw': 5, 'nivcsw': 2,
+                'inblock': 8, 'oublock': 16})
+        self.assertEqual(obs, exp)
+
+
+    def test_format_timing_record_extra(self):
+        """Correctly formats a timing record with extra measurements"""
+        obs = format_timing_record(self.record,
+                                   {'sampling_overhead': 0.25, 'foo': 1})
+        exp = ("1.500000;1.250000;0.250000;1024;minflt=10;majflt=1;nvcsw=5;"
+               "nivcsw=2;inblock=8;oublock=16;status=0;signal=0;foo=1;"
+               "sampling_overhead=0.25")
+        self.assertEqual(obs, exp)
+
+    def test_write_timeline_file(self):
+        """The written timeline file can be parsed back"""
+        fp = join(self.output_dir, '1.txt')
+        timeline = Timeline([0.1, 0.2], [1024, 2048], [0.05, 0.15], [1, 2],
+                            0.001)
+        write_timeline_file(fp, timeline)
+        with open(fp, 'U') as f:
+            obs = parse_timeline_file(f)
+        self.assertEqual(obs, timeline)
+        timeline = timeline._replace(wall=12.5)
+        write_timeline_file(fp, timeline)
+        with open(fp, 'U') as f:
+            obs = parse_timeline_file(f)
+        self.assertEqual(obs, timeline)
+
+
+if __name__ == '__main__':
+    main()
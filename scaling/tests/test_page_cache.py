@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+import os
+from os import makedirs
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase, main
+
+import scaling.page_cache
+from scaling.page_cache import (get_file_paths, evict_files, preload_files,
+                                prepare_cache, _get_libc_fadvise,
+                                POSIX_FADV_DONTNEED)
+
+
+class TestPageCache(TestCase):
+
+    def setUp(self):
+        self.input_dir = mkdtemp()
+        makedirs(join(self.input_dir, 'reads'))
+        self.files = [join(self.input_dir, 'seqs.fna'),
+                      join(self.input_dir, 'reads', '1.fna'),
+                      join(self.input_dir, 'reads', '2.fna')]
+        for fp in self.files:
+            with open(fp, 'w') as f:
+                f.write(">seq\nACGT\n" * 1000)
+        self.orig_fadvise = scaling.page_cache.posix_fadvise
+
+    def tearDown(self):
+        scaling.page_cache.posix_fadvise = self.orig_fadvise
+        rmtree(self.input_dir)
+
+    def test_get_file_paths(self):
+        """Correctly expands the directories into their files"""
+        obs = get_file_paths([self.files[0], join(self.input_dir, 'reads')])
+        self.assertEqual(obs, self.files)
+
+    def test_evict_files(self):
+        """Correctly evicts the files from the page cache"""
+        calls = []
+        scaling.page_cache.posix_fadvise = \
+            lambda fd, offset, length, advice: calls.append(advice)
+        evict_files([self.files[0], join(self.input_dir, 'reads')])
+        self.assertEqual(calls, [POSIX_FADV_DONTNEED] * 3)
+        # The real posix_fadvise does not fail on the files
+        scaling.page_cache.posix_fadvise = self.orig_fadvise
+        evict_files(self.files)
+
+    def test_evict_files_error(self):
+        """Raises an error if posix_fadvise is not available"""
+        scaling.page_cache.posix_fadvise = None
+        with self.assertRaises(RuntimeError):
+            evict_files(self.files)
+
+    def test_libc_fadvise(self):
+        """The posix_fadvise of the C library works as os.posix_fadvise"""
+        fadvise = _get_libc_fadvise()
+        fd = os.open(self.files[0], os.O_RDONLY)
+        try:
+            fadvise(fd, 0, 0, POSIX_FADV_DONTNEED)
+            # Invalid advice
+            with self.assertRaises(OSError):
+                fadvise(fd, 0, 0, 1000)
+        finally:
+            os.close(fd)
+
+    def test_preload_files(self):
+        """Correctly reads the files"""
+        preload_files([join(self.input_dir, 'reads')])
+        with self.assertRaises(IOError):
+            preload_files([join(self.input_dir, 'missing.fna')])
+
+    def test_prepare_cache(self):
+        """Correctly prepares the page cache for the given mode"""
+        calls = []
+        scaling.page_cache.posix_fadvise = \
+            lambda fd, offset, length, advice: calls.append(advice)
+        prepare_cache(self.files, 'warm')
+        prepare_cache(self.files, None)
+        self.assertEqual(calls, [])
+        prepare_cache(self.files, 'cold')
+        self.assertEqual(len(calls), 3)
+
+
+if __name__ == '__main__':
+    main()
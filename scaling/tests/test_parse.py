@@ -8,10 +8,19 @@ __version__ = "0.0.2-dev"
 __maintainer__ = "Jose Antonio Navas Molina"
 __email__ = "josenavasmolina@gmail.com"
 
+from StringIO import StringIO
 from unittest import TestCase, main
 
-from scaling.util import BenchSummary
-from scaling.parse import parse_parameters_file, parse_summarized_results
+import numpy as np
+from numpy.testing import assert_equal
+
+from scaling.util import (BenchSummary, ResourceRequest, SuiteCase,
+                          get_checksum)
+from scaling.parse import (parse_parameters_file, parse_summarized_results,
+                           parse_summarized_results_npz,
+                           parse_timing_file, parse_manifest_file,
+                           parse_job_list, parse_resources_file,
+                           parse_queue_cases_file, parse_timing_log)
 
 
 class ParseTests(TestCase):
@@ -50,6 +59,153 @@ class ParseTests(TestCase):
         obs = parse_summarized_results(self.summarized_results)
         self.assertEqual(obs, exp)
 
+    def test_parse_summarized_results_extra(self):
+        """Correctly parses the additional columns of the results summary"""
+        obs = parse_summarized_results(summarized_results_extra.splitlines())
+        self.assertEqual(obs.label, ["100", "200"])
+        self.assertEqual(obs.mem_stdev, [0.0, 0.0])
+        self.assertEqual(obs.extra,
+                         {'tree_rss': ([2048.0, 4096.0], [1.0, 2.0]),
+                          'tree_procs': ([3.0, 5.0], [0.0, 0.5])})
+        # The legacy files do not have additional columns
+        obs = parse_summarized_results(self.summarized_results)
+        self.assertEqual(obs.extra, None)
+
+    def test_parse_summarized_results_npz(self):
+        """Correctly parses a binary file with the results summary"""
+        f = StringIO()
+        np.savez(f, label=np.array(["100", "200"]),
+                 wall_mean=np.array([25.0, 50.0]),
+                 wall_std=np.array([1.0, 2.0]),
+                 user_mean=np.array([23.0, 46.0]),
+                 user_std=np.array([0.9, 2.0]),
+                 kernel_mean=np.array([2.0, 4.0]),
+                 kernel_std=np.array([0.1, 0.0]),
+                 mem_mean=np.array([1048576.0, 2097152.0]),
+                 mem_std=np.array([0.0, 0.0]))
+        f.seek(0)
+        obs = parse_summarized_results_npz(f)
+        self.assertEqual(obs.label, ["100", "200"])
+        assert_equal(obs.wall_mean, [25.0, 50.0])
+        assert_equal(obs.user_stdev, [0.9, 2.0])
+        assert_equal(obs.mem_mean, [1048576.0, 2097152.0])
+        self.assertEqual(obs.extra, None)
+
+        f = StringIO()
+        np.savez(f, label=np.array(["100"]), wall_mean=np.array([25.0]),
+                 wall_std=np.array([1.0]), user_mean=np.array([23.0]),
+                 user_std=np.array([0.9]), kernel_mean=np.array([2.0]),
+                 kernel_std=np.array([0.1]), mem_mean=np.array([1024.0]),
+                 mem_std=np.array([0.0]), tree_rss_mean=np.array([2048.0]),
+                 tree_rss_std=np.array([1.0]))
+        f.seek(0)
+        obs = parse_summarized_results_npz(f)
+        self.assertEqual(obs.extra.keys(), ['tree_rss'])
+        assert_equal(obs.extra['tree_rss'], ([2048.0], [1.0]))
+
+    def test_parse_manifest_file(self):
+        """Correctly parses the manifest of completed repetitions"""
+        lines = ["#case\trep\n", "10\t1\n", "20\t1\n", "a/1\t2\n", "foo\n",
+                 "10\tx\n", "20\t2"]
+        obs = parse_manifest_file(lines)
+        self.assertEqual(obs, set([('10', 1), ('20', 1), ('a/1', 2)]))
+
+    def test_parse_job_list(self):
+        """Correctly parses the list of jobs to submit"""
+        lines = ["bench_0 cd /tmp; timing_wrapper.sh 0.txt true\n", "\n",
+                 "bench_1 cd /tmp; true"]
+        obs = parse_job_list(lines)
+        self.assertEqual(obs, [("bench_0",
+                                "cd /tmp; timing_wrapper.sh 0.txt true"),
+                               ("bench_1", "cd /tmp; true")])
+        with self.assertRaises(ValueError):
+            parse_job_list(["bench_0\n"])
+
+    def test_parse_resources_file(self):
+        """Correctly parses the resources requested for each case"""
+        lines = ["#case\ttime\tmem\tcpus\n", "10\t3600\t2048\t4\n", "\n",
+                 "similarity/0.97\t90.5\t-\t-\n"]
+        obs = parse_resources_file(lines)
+        self.assertEqual(obs, {'10': ResourceRequest(3600, 2048, 4),
+                               'similarity/0.97': ResourceRequest(90.5, None,
+                                                                  None)})
+        for line in ["10\t3600\n", "10\t1h\t-\t-\n", "10\t-\t0\t-\n"]:
+            with self.assertRaises(ValueError):
+                parse_resources_file([line])
+
+    def test_parse_queue_cases_file(self):
+        """Correctly parses the cases of a work queue"""
+        lines = ["#case\tout_opt\tnum_inputs\tinputs\tcmd\n",
+                 "10\t-o\t2\t10.fna\t10.qual\tpick_otus.py\t-i\t10.fna\n",
+                 "a/1\t--out\t0\tcmd\t--a\t1 2\n"]
+        obs = parse_queue_cases_file(lines)
+        self.assertEqual(obs, [
+            SuiteCase('10', ['pick_otus.py', '-i', '10.fna'], '-o',
+                      ['10.fna', '10.qual']),
+            SuiteCase('a/1', ['cmd', '--a', '1 2'], '--out')])
+        for line in ["10\t-o\n", "10\t-o\tx\tcmd\n", "10\t-o\t1\tin\n"]:
+            with self.assertRaises(ValueError):
+                parse_queue_cases_file([line])
+
+    def test_parse_timing_file(self):
+        """Correctly parses a timing file"""
+        obs = parse_timing_file(["415.29;388.29;11.35;9710640\n"])
+        self.assertEqual(obs, (415.29, 388.29, 11.35, 9710640, {}))
+
+    def test_parse_timing_file_extended(self):
+        """Correctly parses a timing file with extended measurements"""
+        obs = parse_timing_file(["415.290012;388.290001;11.350002;9710640;"
+                                 "minflt=2048;majflt=3;status=0;signal=0\n"])
+        exp = (415.290012, 388.290001, 11.350002, 9710640,
+               {'minflt': 2048, 'majflt': 3})
+        self.assertEqual(obs, exp)
+
+    def test_parse_timing_file_placement(self):
+        """Correctly parses the non numerical measurements"""
+        obs = parse_timing_file(["1.0;0.5;0.1;1024;status=0;signal=0;"
+                                 "cpus=0-3,8;mem_node=1\n"])
+        self.assertEqual(obs, (1.0, 0.5, 0.1, 1024,
+                               {'cpus': '0-3,8', 'mem_node': 1}))
+
+    def test_parse_timing_file_censored(self):
+        """Correctly parses the executions stopped by a runner limit"""
+        obs = parse_timing_file(["10.0;9.5;0.1;1024;status=0;signal=9;"
+                                 "censored=timeout\n"])
+        self.assertEqual(obs, (10.0, 9.5, 0.1, 1024,
+                               {'censored': 'timeout'}))
+
+    def test_parse_timing_log(self):
+        """Correctly parses a timing log, skipping the damaged lines"""
+        good = ["10\t1\t415.29;388.29;11.35;9710640",
+                "10\t2\t1.0;0.5;0.1;1024;status=1;signal=0",
+                "a/1\tx_1\t10.0;9.5;0.1;1024;censored=timeout"]
+        lines = ["%s\t%s\n" % (line, get_checksum(line)) for line in good]
+        lines.insert(1, "10\t3\t1.0;0.5;0.1;1024\t00000000\n")
+        lines.insert(2, "10\t4\t1.0;0.5\n")
+        # The last line is not complete
+        lines.append(lines[0][:-1])
+        obs = parse_timing_log(lines)
+        exp = ([("10", "1", (415.29, 388.29, 11.35, 9710640, {})),
+                ("10", "2", None),
+                ("a/1", "x_1", (10.0, 9.5, 0.1, 1024,
+                                {'censored': 'timeout'}))],
+               [2, 3, 6])
+        self.assertEqual(obs, exp)
+        self.assertEqual(parse_timing_log([]), ([], []))
+
+    def test_parse_timing_file_error(self):
+        """Returns None if the command didn't finish correctly"""
+        obs = parse_timing_file(["Command exited with non-zero status 1\n",
+                                 "0.01;0.00;0.00;1024\n"])
+        self.assertEqual(obs, None)
+        self.assertEqual(parse_timing_file([]), None)
+        self.assertEqual(parse_timing_file(["a;b;c;d"]), None)
+        self.assertEqual(parse_timing_file(["1.0;0.5;0.1;1024;status=1;"
+                                            "signal=0"]), None)
+        self.assertEqual(parse_timing_file(["1.0;0.5;0.1;1024;status=0;"
+                                            "signal=9"]), None)
+        self.assertEqual(parse_timing_file(["1.0;0.5;0.1;1024;foo"]), None)
+
 single_parameter = """jobs_to_start\t2,4,8,16,32,64"""
 
 multiple_parameter = """jobs_to_start\t2,4,8,16,32,64
@@ -63,5 +219,10 @@ summarized_results = """#label\twall_mean\twall_std\tuser_mean\tuser_std\tkernel
 500\t125\t5\t123\t5\t2\t0.02\t5242880\t0.0
 """
 
+summarized_results_extra = """#label\twall_mean\twall_std\tuser_mean\tuser_std\tkernel_mean\tkernel_std\tmem_mean\tmem_std\ttree_rss_mean\ttree_rss_std\ttree_procs_mean\ttree_procs_std
+100\t25\t1\t23\t0.9\t2\t0.1\t1048576\t0.0\t2048\t1\t3\t0.0
+200\t50\t2\t46\t2\t4\t0.0\t2097152\t0.0\t4096\t2\t5\t0.5
+"""
+
 if __name__ == '__main__':
     main()
@@ -14,10 +14,16 @@ import numpy as np
 from numpy.testing import assert_almost_equal
 
 from scaling.util import (BenchCase, BenchData, FittedCurve, SummarizedResults,
-                          CompData, BenchSummary)
+                          CompData, BenchSummary, JobAccounting,
+                          AccountingCheck)
 from scaling.process_results import (compute_rsquare, curve_fitting,
+                                     compute_relative_ci,
+                                     summarize_extra_measurements, check_drift,
                                      process_benchmark_results,
-                                     compare_benchmark_results)
+                                     compare_benchmark_results,
+                                     cross_check_accounting,
+                                     get_accounting_mismatches,
+                                     get_bench_summary)
 
 
 class TestProcessResults(TestCase):
@@ -135,6 +141,155 @@ class TestProcessResults(TestCase):
         assert_almost_equal(obs_poly, exp_poly)
         self.assertEqual(obs_deg, exp_deg)
 
+    def test_compute_relative_ci(self):
+        """Correctly computes the relative CI of the mean"""
+        # t(0.975, 4) = 2.776; s = 1.5811388; mean = 102
+        obs = compute_relative_ci([100, 101, 102, 103, 104])
+        self.assertAlmostEqual(obs, 2.776 * 1.5811388 / (np.sqrt(5) * 102))
+        # Normal approximation with a large number of values
+        obs = compute_relative_ci([99, 101] * 20)
+        self.assertAlmostEqual(obs, 1.96 * np.std([99, 101] * 20, ddof=1) /
+                               (np.sqrt(40) * 100))
+        # Constant values
+        self.assertEqual(compute_relative_ci([5, 5, 5]), 0.0)
+        # Not enough values
+        self.assertEqual(compute_relative_ci([5]), float('inf'))
+        self.assertEqual(compute_relative_ci([]), float('inf'))
+        # Zero mean
+        self.assertEqual(compute_relative_ci([-1, 1]), float('inf'))
+
+    def test_curve_fitting_lower_bounds(self):
+        """Correctly fits a curve when some values are lower bounds"""
+        x = np.array([1, 2, 3, 4, 5], dtype=np.float64)
+        # The last point was stopped at 20, while the line predicts 25
+        y = np.array([5, 10, 15, 20, 20], dtype=np.float64)
+        lower_bounds = np.array([False, False, False, False, True])
+        poly, deg = curve_fitting(x, y, lower_bounds)
+        self.assertEqual(deg, 1)
+        assert_almost_equal(poly, np.array([5, 0]))
+        # Without the bound, the curve fits through the stopped point
+        poly, deg = curve_fitting(x, y)
+        self.assertTrue(np.polyval(poly, 5) < 25)
+
+        # A bound above the curve pulls it up
+        y = np.array([5, 10, 15, 20, 100], dtype=np.float64)
+        poly, deg = curve_fitting(x, y, lower_bounds)
+        self.assertTrue(np.polyval(poly, 5) >= 99)
+
+        # Not enough exact points: the bounds are used as values
+        lower_bounds = np.array([False, True, True, True, True])
+        obs = curve_fitting(x, y, lower_bounds)
+        exp = curve_fitting(x, y)
+        assert_almost_equal(obs[0], exp[0])
+        self.assertEqual(obs[1], exp[1])
+
+    def test_process_benchmark_results_censored(self):
+        """Correctly processes the benchmark results with censored reps"""
+        cases = [BenchCase('1', [5, 5], [5, 5], [0, 0], [10, 10]),
+                 BenchCase('2', [10, 10], [10, 10], [0, 0], [20, 20]),
+                 BenchCase('3', [15, 15], [15, 15], [0, 0], [30, 30]),
+                 BenchCase('4', [20, 18], [20, 18], [0, 0], [40, 30], None,
+                           [False, True]),
+                 BenchCase('5', [18, 18], [18, 18], [0, 0], [35, 35], None,
+                           [True, True])]
+        obs = process_benchmark_results(cases)
+        assert_almost_equal(obs.means.wall, [5, 10, 15, 19, 18])
+        self.assertEqual(obs.extra, {'censored': ([0.0, 0.0, 0.0, 0.5, 1.0],
+                                                  [0.0] * 5)})
+        # The censored cases do not pull the curves down
+        assert_almost_equal(obs.wall_curve.poly, np.array([5, 0]))
+        self.assertEqual(obs.wall_curve.deg, 1)
+        assert_almost_equal(obs.mem_curve.poly, np.array([10, 0]))
+
+    def test_check_drift(self):
+        """Correctly detects a drift of the wall time along the suite"""
+        # The cases run slower as the suite advances
+        cases = [BenchCase('10', [10, 11, 12, 13], [10, 11, 12, 13],
+                           [0, 0, 0, 0], [5, 5, 5, 5],
+                           {'start': [0, 200, 400, 600]}),
+                 BenchCase('20', [20, 22, 24, 26], [20, 22, 24, 26],
+                           [0, 0, 0, 0], [5, 5, 5, 5],
+                           {'start': [100, 300, 500, 700]})]
+        obs = check_drift(cases)
+        self.assertEqual(obs.n, 8)
+        self.assertTrue(obs.drift)
+        self.assertTrue(obs.slope > 0)
+        self.assertTrue(obs.r > 0.9)
+        # Without trend
+        cases = [BenchCase('10', [10, 12, 11, 11], [10, 12, 11, 11],
+                           [0, 0, 0, 0], [5, 5, 5, 5],
+                           {'start': [0, 200, 400, 600]}),
+                 BenchCase('20', [22, 20, 20, 22], [22, 20, 20, 22],
+                           [0, 0, 0, 0], [5, 5, 5, 5],
+                           {'start': [100, 300, 500, 700]})]
+        obs = check_drift(cases)
+        self.assertEqual(obs.n, 8)
+        self.assertFalse(obs.drift)
+        # The censored repetitions and the cases without start times are
+        # ignored
+        cases = [BenchCase('10', [10, 11, 30], [10, 11, 30], [0, 0, 0],
+                           [5, 5, 5], {'start': [0, 200, 400]},
+                           [False, False, True]),
+                 BenchCase('20', [20, 22], [20, 22], [0, 0], [5, 5])]
+        self.assertEqual(check_drift(cases), None)
+
+    def test_cross_check_accounting(self):
+        """Correctly compares the measurements with the job accounting"""
+        cases = [BenchCase('10', [10, 12], [8, 9], [1, 1], [1000, 1200]),
+                 BenchCase('20', [20, 22], [18, 19], [1, 1], [2000, 2200]),
+                 BenchCase('30', [5, 5], [4, 4], [0, 0], [500, 500]),
+                 BenchCase('40', [5, 5], [4, 4], [0, 0], [500, 500])]
+        case_jobs = {'10': ['1', '2'], '20': ['3'], '30': ['4'],
+                     '40': ['4']}
+        accounting = {'1': JobAccounting(11, 9.5, 1100),
+                      '2': JobAccounting(13, 10.5, None),
+                      '3': JobAccounting(21, None, 2048),
+                      '4': JobAccounting(10, 8, 1000)}
+        obs = cross_check_accounting(cases, case_jobs, accounting)
+        # The job shared by the cases 30 and 40 (a bundle) is not used
+        self.assertEqual(obs, [
+            AccountingCheck('10', 11.0, 12.0, 9.5, 10.0, 1100.0, 1100.0),
+            AccountingCheck('20', 21.0, 21.0, 19.5, None, 2100.0, 2048.0)])
+
+    def test_get_accounting_mismatches(self):
+        """Correctly detects the measurements that disagree"""
+        check = AccountingCheck('10', 11.0, 12.0, 10.0, 10.0, 1100.0, 1100.0)
+        self.assertEqual(get_accounting_mismatches(check), [])
+        check = AccountingCheck('10', 10.0, 20.0, 10.0, None, 1000.0, 3000.0)
+        self.assertEqual(get_accounting_mismatches(check), ['wall', 'mem'])
+        # Short times that differ by less than a second agree
+        check = AccountingCheck('10', 0.2, 0.9, 0.01, 0.5, 1000.0, None)
+        self.assertEqual(get_accounting_mismatches(check), [])
+        self.assertEqual(get_accounting_mismatches(check, 0), [])
+
+    def test_process_benchmark_results_drift(self):
+        """Correctly checks the drift when the start times are known"""
+        obs = process_benchmark_results(self.num_cases)
+        self.assertEqual(obs.drift, None)
+        cases = [case._replace(extra={'start': [i, i + 5, i + 10, i + 15,
+                                                i + 20]})
+                 for i, case in enumerate(self.num_cases)]
+        obs = process_benchmark_results(cases)
+        self.assertEqual(obs.drift.n, 15)
+
+    def test_summarize_extra_measurements(self):
+        """Correctly summarizes the extended measurements of the cases"""
+        nan = float('nan')
+        cases = [BenchCase('10', [1, 1], [1, 1], [0, 0], [10, 10],
+                           {'tree_rss': [100, 300], 'tree_procs': [2, nan],
+                            'minflt': [5, 5]}),
+                 BenchCase('20', [2, 2], [2, 2], [0, 0], [20, 20]),
+                 BenchCase('30', [3, 3], [3, 3], [0, 0], [30, 30],
+                           {'tree_rss': [500, 500]})]
+        obs = summarize_extra_measurements(cases)
+        self.assertEqual(sorted(obs.keys()), ['tree_procs', 'tree_rss'])
+        assert_almost_equal(obs['tree_rss'], ([200, nan, 500],
+                                              [100, nan, 0]))
+        assert_almost_equal(obs['tree_procs'], ([2, nan, nan],
+                                                [0, nan, nan]))
+        # No extended measurements
+        self.assertEqual(summarize_extra_measurements(self.num_cases), None)
+
     def test_process_benchmark_results_num(self):
         """Correctly processes the benchmark results with numerical labels"""
         obs = process_benchmark_results(self.num_cases)
@@ -157,6 +312,7 @@ class TestProcessResults(TestCase):
         self.assertEqual(obs.wall_curve.deg, exp.wall_curve.deg)
         assert_almost_equal(obs.mem_curve.poly, exp.mem_curve.poly)
         self.assertEqual(obs.mem_curve.deg, exp.mem_curve.deg)
+        self.assertEqual(obs.extra, None)
 
     def test_process_benchmark_results_str(self):
         """Correctly processes the benchmark results with numerical labels"""
@@ -181,6 +337,18 @@ class TestProcessResults(TestCase):
         assert_almost_equal(obs.mem_curve.poly, exp.mem_curve.poly)
         self.assertEqual(obs.mem_curve.deg, exp.mem_curve.deg)
 
+    def test_get_bench_summary(self):
+        """Correctly summarizes the processed results"""
+        obs = get_bench_summary(process_benchmark_results(self.num_cases))
+        exp = self.results[0]
+        self.assertEqual(obs.label, exp.label)
+        for attr in BenchSummary._fields[1:-1]:
+            assert_almost_equal(getattr(obs, attr), getattr(exp, attr))
+        self.assertEqual(obs.extra, None)
+        # The summary can be compared with the summaries of other runs
+        obs = compare_benchmark_results([obs, exp], ['db', 'file'])
+        self.assertEqual(obs.x, ['10', '20', '30'])
+
     def test_compare_benchmark_results_error(self):
         """Raises an error if the tests are not from the same bench suite"""
         with self.assertRaises(ValueError):
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+import sqlite3
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase, main
+
+import numpy as np
+from numpy.testing import assert_equal
+
+from scaling.util import BenchCase, BenchRun
+from scaling.results_db import (get_suite_info, ingest_bench_results,
+                                query_bench_runs, load_bench_runs)
+
+
+class TestResultsDB(TestCase):
+    """Tests the storage of the benchmark results in a SQLite database"""
+
+    def setUp(self):
+        self.output_dir = mkdtemp()
+        self.db_fp = join(self.output_dir, 'results.db')
+        self.cases = [BenchCase('0.94', [12.5, 13.0], [10.0, 10.5],
+                                [1.0, 1.5], [1024, 2048]),
+                      BenchCase('0.97', [20.0, 30.0, 25.0],
+                                [18.0, 28.0, 23.0], [1.0, 1.0, 1.0],
+                                [4096, 4096, 4096],
+                                {'minflt': [10, np.nan, 12],
+                                 'cpus': ['0-3', '0-3', '4-7']},
+                                [False, True, False])]
+        self.param_dir = join(self.output_dir, 'pick_otus_20140101_120000',
+                              'timing', 'similarity')
+        self.files_dir = join(self.output_dir, 'bench', 'timing')
+
+    def tearDown(self):
+        rmtree(self.output_dir)
+
+    def test_get_suite_info(self):
+        """Correctly gets the suite information from its directory name"""
+        self.assertEqual(get_suite_info(self.param_dir),
+                         ('pick_otus', '20140101_120000', 'similarity'))
+        self.assertEqual(get_suite_info(self.files_dir),
+                         ('bench', None, None))
+        self.assertEqual(get_suite_info('pick_otus_20140101_120000/timing/'),
+                         ('pick_otus', '20140101_120000', None))
+
+    def test_ingest_bench_results(self):
+        """Stores the runs and loads them back"""
+        obs = ingest_bench_results(self.db_fp,
+                                   [(self.param_dir, self.cases),
+                                    (self.files_dir, self.cases[:1])],
+                                   host='host1', version='1.8.0')
+        self.assertEqual(obs, [1, 2])
+        obs = ingest_bench_results(self.db_fp, [(self.files_dir, [])],
+                                   command='pick_otus', label='empty')
+        self.assertEqual(obs, [3])
+
+        obs = load_bench_runs(self.db_fp, [2, 1])
+        self.assertEqual([run for run, _ in obs],
+                         [BenchRun(2, 'bench', None, 'host1', '1.8.0', None,
+                                   None, self.files_dir, 1, 2),
+                          BenchRun(1, 'pick_otus', 'similarity', 'host1',
+                                   '1.8.0', None, '20140101_120000',
+                                   self.param_dir, 2, 5)])
+        self.assertEqual(obs[0][1], self.cases[:1])
+        cases = obs[1][1]
+        self.assertEqual(cases[0], self.cases[0])
+        obs = cases[1]
+        self.assertEqual(obs[:5], self.cases[1][:5])
+        self.assertEqual(obs.censored, [False, True, False])
+        self.assertEqual(sorted(obs.extra), ['cpus', 'minflt'])
+        assert_equal(obs.extra['minflt'], [10, np.nan, 12])
+        self.assertEqual(obs.extra['cpus'], ['0-3', '0-3', '4-7'])
+
+        obs = load_bench_runs(self.db_fp, [3])
+        self.assertEqual(obs, [(BenchRun(3, 'pick_otus', None, None, None,
+                                         'empty', None, self.files_dir, 0, 0),
+                                [])])
+
+    def test_ingest_bench_results_twice(self):
+        """Does not store the same results of a timing directory twice"""
+        runs = [(self.param_dir, self.cases), (self.files_dir, self.cases)]
+        self.assertEqual(ingest_bench_results(self.db_fp, runs), [1, 2])
+        self.assertEqual(ingest_bench_results(self.db_fp, runs[::-1],
+                                              label='again'), [2, 1])
+        self.assertEqual([(run.run_id, run.label, run.reps)
+                          for run in query_bench_runs(self.db_fp)],
+                         [(1, None, 5), (2, None, 5)])
+        # New results of the same directory are a new run
+        cases = [self.cases[0]._replace(wall=[12.0, 13.0])]
+        self.assertEqual(ingest_bench_results(self.db_fp,
+                                              [(self.files_dir, cases)]),
+                         [3])
+        self.assertEqual(len(query_bench_runs(self.db_fp)), 3)
+
+    def test_ingest_bench_results_old_db(self):
+        """Adds the run checksums to a database created without them"""
+        con = sqlite3.connect(self.db_fp)
+        con.executescript(
+            "CREATE TABLE runs (run_id INTEGER PRIMARY KEY, command TEXT "
+            "NOT NULL, parameter TEXT, host TEXT, version TEXT, label TEXT, "
+            "timestamp TEXT, source TEXT NOT NULL);"
+            "INSERT INTO runs (command, source) VALUES ('bench', '/old');")
+        con.close()
+        runs = [(self.files_dir, self.cases)]
+        self.assertEqual(ingest_bench_results(self.db_fp, runs), [2])
+        self.assertEqual(ingest_bench_results(self.db_fp, runs), [2])
+        self.assertEqual([run.run_id for run in query_bench_runs(self.db_fp)],
+                         [1, 2])
+
+    def test_ingest_bench_results_backfill(self):
+        """Computes the checksums of the runs stored without them"""
+        runs = [(self.param_dir, self.cases), (self.files_dir, self.cases)]
+        ingest_bench_results(self.db_fp, runs)
+        # The runs of a database upgraded by adding the column, including a
+        # duplicated run
+        con = sqlite3.connect(self.db_fp)
+        with con:
+            con.execute("DROP INDEX runs_source")
+            con.execute("UPDATE runs SET checksum = NULL")
+            con.execute("INSERT INTO runs SELECT 3, command, parameter, "
+                        "host, version, label, timestamp, source, checksum "
+                        "FROM runs WHERE run_id = 2")
+            con.execute("INSERT INTO reps SELECT 3, case_idx, case_label, "
+                        "rep, wall, user, kernel, mem, censored, extra "
+                        "FROM reps WHERE run_id = 2")
+        con.close()
+        self.assertEqual(ingest_bench_results(self.db_fp, runs), [1, 2])
+        self.assertEqual([(run.run_id, run.reps)
+                          for run in query_bench_runs(self.db_fp)],
+                         [(1, 5), (2, 5), (3, 5)])
+
+    def test_query_bench_runs(self):
+        """Returns the runs that match all the filters"""
+        ingest_bench_results(self.db_fp, [(self.param_dir, self.cases)],
+                             host='host1', version='1.8.0')
+        ingest_bench_results(self.db_fp, [(self.param_dir, self.cases[:1]),
+                                          (self.files_dir, self.cases)],
+                             host='host2', version='1.8.0', label='new')
+        obs = query_bench_runs(self.db_fp)
+        self.assertEqual([run.run_id for run in obs], [1, 2, 3])
+        obs = query_bench_runs(self.db_fp, host='host2', version='1.8.0')
+        self.assertEqual([run.run_id for run in obs], [2, 3])
+        obs = query_bench_runs(self.db_fp, case='0.97', command='pick_otus')
+        self.assertEqual([run.run_id for run in obs], [1])
+        obs = query_bench_runs(self.db_fp, parameter='similarity',
+                               label=None)
+        self.assertEqual([(run.run_id, run.cases, run.reps) for run in obs],
+                         [(1, 2, 5), (2, 1, 2)])
+        self.assertEqual(query_bench_runs(self.db_fp, version='1.9.0'), [])
+        with self.assertRaises(ValueError):
+            query_bench_runs(self.db_fp, qiime='1.8.0')
+
+    def test_load_bench_runs_error(self):
+        """Raises an error if a run is not in the database"""
+        ingest_bench_results(self.db_fp, [(self.param_dir, self.cases)])
+        with self.assertRaises(ValueError):
+            load_bench_runs(self.db_fp, [1, 2])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,448 @@
+#!/usr/bin/env python
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+from os import listdir, remove
+from os.path import join, isdir, exists
+from shutil import rmtree
+from tempfile import mkdtemp, NamedTemporaryFile
+from unittest import TestCase, main
+
+from scaling.util import SuiteCase, RunOptions, Limits
+from scaling.parse import (parse_timing_file, parse_timing_log,
+                           parse_timeline_file)
+from scaling.affinity import get_available_cpus
+from scaling.run_bench_suite import (get_suite_cases_files,
+                                     get_suite_cases_parameters,
+                                     get_execution_order,
+                                     get_timing_dirs, make_suite_dirs,
+                                     run_bench_case_adaptive,
+                                     run_bench_suite)
+
+
+class TestGetExecutionOrder(TestCase):
+    """Tests the get_execution_order function"""
+
+    def setUp(self):
+        self.cases = [SuiteCase(name, ["sleep", "0"], "-o")
+                      for name in ["10", "20", "30"]]
+
+    def test_get_execution_order_sequential(self):
+        """Correctly executes all the cases once per repetition"""
+        obs = get_execution_order(self.cases, 2)
+        exp = [(self.cases[0], 1), (self.cases[1], 1), (self.cases[2], 1),
+               (self.cases[0], 2), (self.cases[1], 2), (self.cases[2], 2)]
+        self.assertEqual(obs, exp)
+
+    def test_get_execution_order_interleaved(self):
+        """Correctly rotates the cases on each repetition"""
+        obs = get_execution_order(self.cases, 4, 'interleaved')
+        exp = [(self.cases[0], 1), (self.cases[1], 1), (self.cases[2], 1),
+               (self.cases[1], 2), (self.cases[2], 2), (self.cases[0], 2),
+               (self.cases[2], 3), (self.cases[0], 3), (self.cases[1], 3),
+               (self.cases[0], 4), (self.cases[1], 4), (self.cases[2], 4)]
+        self.assertEqual(obs, exp)
+
+    def test_get_execution_order_random(self):
+        """Correctly shuffles the repetitions using the seed"""
+        obs = get_execution_order(self.cases, 5, 'random', 42)
+        self.assertEqual(obs, get_execution_order(self.cases, 5, 'random',
+                                                  42))
+        self.assertNotEqual(obs, get_execution_order(self.cases, 5))
+        self.assertEqual(sorted(obs), sorted(get_execution_order(self.cases,
+                                                                 5)))
+
+    def test_get_execution_order_random_sequence(self):
+        """Shuffles all the (case, repetition) pairs of the suite together"""
+        obs = get_execution_order(self.cases, 2, 'random', 42)
+        exp = [(self.cases[2], 1), (self.cases[2], 2), (self.cases[1], 2),
+               (self.cases[1], 1), (self.cases[0], 1), (self.cases[0], 2)]
+        self.assertEqual(obs, exp)
+
+    def test_get_execution_order_error(self):
+        """Raises an error with an unknown order"""
+        with self.assertRaises(ValueError):
+            get_execution_order(self.cases, 2, 'reverse')
+
+
+class TestGetSuiteCases(TestCase):
+    """Tests the get_suite_cases_* functions"""
+
+    def test_get_suite_cases_files(self):
+        """Correctly generates the cases of a file based suite"""
+        cmd = "split_libraries_fastq.py -m mapping.txt"
+        in_opts = ["-i", "-b"]
+        bench_files = [["reads/1000000.fna", "barcodes/1000000.fna"],
+                       ["reads/2000000.fna", "barcodes/2000000.fna"]]
+        obs = get_suite_cases_files(cmd, in_opts, bench_files, "-o")
+        exp = [SuiteCase("1000000",
+                         ["split_libraries_fastq.py", "-m", "mapping.txt",
+                          "-i", "reads/1000000.fna",
+                          "-b", "barcodes/1000000.fna"], "-o",
+                         ["reads/1000000.fna", "barcodes/1000000.fna"]),
+               SuiteCase("2000000",
+                         ["split_libraries_fastq.py", "-m", "mapping.txt",
+                          "-i", "reads/2000000.fna",
+                          "-b", "barcodes/2000000.fna"], "-o",
+                         ["reads/2000000.fna", "barcodes/2000000.fna"])]
+        self.assertEqual(obs, exp)
+
+    def test_get_suite_cases_files_error(self):
+        """Raises an error if the options and the files do not match"""
+        with self.assertRaises(ValueError):
+            get_suite_cases_files("pick_otus.py", ["-i", "-b"],
+                                  [["1000000.fna"]], "-o")
+
+    def test_get_suite_cases_parameters(self):
+        """Correctly generates the cases of a parameter based suite"""
+        cmd = "pick_otus.py -i seqs.fna"
+        params = {"similarity": ["0.94", "0.97"]}
+        obs = get_suite_cases_parameters(cmd, params, "-o")
+        exp = [SuiteCase("similarity/0.94",
+                         ["pick_otus.py", "-i", "seqs.fna",
+                          "--similarity", "0.94"], "-o"),
+               SuiteCase("similarity/0.97",
+                         ["pick_otus.py", "-i", "seqs.fna",
+                          "--similarity", "0.97"], "-o")]
+        self.assertEqual(obs, exp)
+
+    def test_get_suite_cases_parameters_inputs(self):
+        """Correctly finds the input files of a parameter based suite"""
+        with NamedTemporaryFile(suffix='.fna') as f:
+            cmd = "pick_otus.py -i %s" % f.name
+            obs = get_suite_cases_parameters(cmd, {"similarity": ["0.94"]},
+                                             "-o")
+            self.assertEqual(obs[0].inputs, [f.name])
+
+
+class TestRunBenchSuite(TestCase):
+    """Tests the execution of the benchmark suite"""
+
+    def setUp(self):
+        self.output_dir = mkdtemp()
+        self.dest = join(self.output_dir, 'suite')
+        self.cases = [SuiteCase("10", ["true"], "-o"),
+                      SuiteCase("20", ["true"], "-o")]
+
+    def tearDown(self):
+        rmtree(self.output_dir)
+
+    def test_make_suite_dirs(self):
+        """Correctly creates the suite directory structure"""
+        make_suite_dirs(self.dest, self.cases)
+        for sub_dir in ['command_outputs', 'timing']:
+            self.assertEqual(sorted(listdir(join(self.dest, sub_dir))),
+                             ['10', '20'])
+
+    def test_get_timing_dirs(self):
+        """Correctly returns the timing directories of the suite"""
+        obs = get_timing_dirs(self.dest, self.cases)
+        self.assertEqual(obs, [join(self.dest, 'timing')])
+        cases = [SuiteCase("a/1", [], "-o"), SuiteCase("a/2", [], "-o"),
+                 SuiteCase("b/1", [], "-o")]
+        obs = get_timing_dirs(self.dest, cases)
+        self.assertEqual(obs, [join(self.dest, 'timing', 'a'),
+                               join(self.dest, 'timing', 'b')])
+
+    def test_run_bench_suite(self):
+        """Correctly executes all the cases and repetitions"""
+        obs = run_bench_suite(self.dest, self.cases, num_reps=3, jobs=2)
+        self.assertEqual(obs, [join(self.dest, 'timing')])
+        for case in ['10', '20']:
+            case_dir = join(self.dest, 'timing', case)
+            self.assertTrue(isdir(case_dir))
+            self.assertEqual(sorted(listdir(case_dir)),
+                             ['1.txt', '2.txt', '3.txt'])
+            with open(join(case_dir, '2.txt')) as f:
+                self.assertEqual(len(f.read().split(';')), 13)
+
+    def test_run_bench_suite_timing_log(self):
+        """Appends the timing results to the timing logs of the suite"""
+        obs = run_bench_suite(self.dest, self.cases, num_reps=3, jobs=2,
+                              timing_log=True)
+        self.assertEqual(obs, [join(self.dest, 'timing')])
+        self.assertEqual(listdir(join(self.dest, 'timing')), ['timing.log'])
+        with open(join(self.dest, 'timing', 'timing.log')) as f:
+            records, malformed = parse_timing_log(f)
+        self.assertEqual(malformed, [])
+        self.assertEqual(sorted((case, rep) for case, rep, _ in records),
+                         [('10', '1'), ('10', '2'), ('10', '3'),
+                          ('20', '1'), ('20', '2'), ('20', '3')])
+        self.assertTrue(all(info is not None for _, _, info in records))
+
+        # The parameter suites have a timing log per parameter
+        cases = [SuiteCase("a/1", ["true"], "-o"),
+                 SuiteCase("a/2", ["true"], "-o")]
+        dest = join(self.output_dir, 'params')
+        obs = run_bench_suite(dest, cases, warmup=1, timing_log=True)
+        self.assertEqual(obs, [join(dest, 'timing', 'a')])
+        self.assertEqual(listdir(join(dest, 'timing', 'a')), ['timing.log'])
+        self.assertEqual(listdir(join(dest, 'warmup')), ['timing.log'])
+        with open(join(dest, 'timing', 'a', 'timing.log')) as f:
+            self.assertEqual(
+                sorted((case, rep) for case, rep, _ in parse_timing_log(f)[0]),
+                [('1', '1'), ('2', '1')])
+
+    def test_run_bench_suite_timing_log_resume(self):
+        """Only executes the repetitions missing in the timing log"""
+        log_fp = join(self.output_dir, 'log.txt')
+        cases = [SuiteCase(name,
+                           ["sh", "-c", "echo %s >> %s" % (name, log_fp)],
+                           "-o") for name in ["10", "20"]]
+        run_bench_suite(self.dest, cases, num_reps=2, timing_log=True)
+        timing_log_fp = join(self.dest, 'timing', 'timing.log')
+        with open(timing_log_fp) as f:
+            lines = f.readlines()
+        # Drop a repetition and append a damaged record of another one,
+        # which is ignored
+        with open(timing_log_fp, 'w') as f:
+            f.writelines(line for line in lines
+                         if not line.startswith("10\t2\t"))
+            f.write("20\t1\t0.01;0.00;\tffffffff\n")
+        open(log_fp, 'w').close()
+        run_bench_suite(self.dest, cases, num_reps=2, resume=True,
+                        timing_log=True)
+        with open(log_fp) as f:
+            self.assertEqual(f.read().split(), ['10'])
+
+    def test_run_bench_suite_order(self):
+        """Correctly executes the repetitions in the given order"""
+        log_fp = join(self.output_dir, 'log.txt')
+        cases = [SuiteCase(name,
+                           ["sh", "-c", "echo %s >> %s" % (name, log_fp)],
+                           "-o") for name in ["10", "20", "30"]]
+        run_bench_suite(self.dest, cases, num_reps=3, order='interleaved')
+        with open(log_fp) as f:
+            obs = f.read().split()
+        self.assertEqual(obs, ['10', '20', '30', '20', '30', '10', '30', '10',
+                               '20'])
+        with open(join(self.dest, 'execution_order.txt')) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[:4], ['#order\tinterleaved', '#seed\tNone',
+                                     '#case\trep', '10\t1'])
+        self.assertEqual(len(lines), 12)
+        # The start time of each repetition is recorded
+        with open(join(self.dest, 'timing', '20', '3.txt')) as f:
+            self.assertTrue('start' in parse_timing_file(f)[4])
+
+        # The random order is reproducible using the recorded seed
+        run_bench_suite(self.dest, cases, num_reps=3, order='random')
+        with open(join(self.dest, 'execution_order.txt')) as f:
+            lines = f.read().splitlines()
+        seed = int(lines[1].split('\t')[1])
+        exp = get_execution_order(cases, 3, 'random', seed)
+        self.assertEqual(lines[3:], ["%s\t%d" % (case.name, rep)
+                                     for case, rep in exp])
+
+    def test_run_bench_suite_per_core(self):
+        """Correctly executes the suite using one command per core"""
+        run_bench_suite(self.dest, self.cases, num_reps=2, per_core=True)
+        for case in ['10', '20']:
+            self.assertEqual(
+                sorted(listdir(join(self.dest, 'timing', case))),
+                ['1.txt', '2.txt'])
+
+    def test_run_bench_case_adaptive_converged(self):
+        """Stops repeating once the wall time CI is below the target"""
+        make_suite_dirs(self.dest, self.cases)
+        obs = run_bench_case_adaptive(self.dest, self.cases[0], min_reps=3,
+                                      warmup=2, target_ci=1000)
+        self.assertEqual(obs.name, "10")
+        self.assertEqual(obs.warmup, 2)
+        self.assertEqual(obs.reps, 3)
+        self.assertTrue(obs.rel_ci <= 1000)
+        self.assertEqual(sorted(listdir(join(self.dest, 'timing', '10'))),
+                         ['1.txt', '2.txt', '3.txt'])
+        self.assertEqual(sorted(listdir(join(self.dest, 'warmup', '10'))),
+                         ['1.txt', '2.txt'])
+
+    def test_run_bench_case_adaptive_max_reps(self):
+        """Stops repeating when the maximum number of reps is reached"""
+        make_suite_dirs(self.dest, self.cases)
+        obs = run_bench_case_adaptive(self.dest, self.cases[0], min_reps=2,
+                                      target_ci=1e-12, max_reps=4)
+        self.assertEqual(obs.reps, 4)
+        self.assertTrue(obs.rel_ci > 1e-12)
+
+    def test_run_bench_case_adaptive_failed(self):
+        """Failed repetitions are not used to compute the CI"""
+        make_suite_dirs(self.dest, self.cases)
+        case = SuiteCase("10", ["false"], "-o")
+        obs = run_bench_case_adaptive(self.dest, case, min_reps=2,
+                                      target_ci=1000, max_reps=3)
+        self.assertEqual(obs.reps, 3)
+        self.assertEqual(obs.rel_ci, float('inf'))
+
+    def test_run_bench_case_adaptive_time_budget(self):
+        """Stops repeating when the time budget is exhausted"""
+        make_suite_dirs(self.dest, self.cases)
+        obs = run_bench_case_adaptive(self.dest, self.cases[0], min_reps=5,
+                                      time_budget=0)
+        self.assertEqual(obs.reps, 1)
+
+    def test_run_bench_suite_adaptive(self):
+        """Correctly records the repetitions used by each case"""
+        run_bench_suite(self.dest, self.cases, num_reps=2, jobs=2, warmup=1,
+                        target_ci=1000)
+        with open(join(self.dest, 'repetitions.txt')) as f:
+            obs = [l.split('\t')[:3] for l in f.read().splitlines()]
+        exp = [["#case", "warmup", "reps"], ["10", "1", "2"],
+               ["20", "1", "2"]]
+        self.assertEqual(obs, exp)
+
+    def test_run_bench_suite_sampled(self):
+        """Correctly stores the timelines of each repetition"""
+        run_bench_suite(self.dest, self.cases, num_reps=2,
+                        sample_interval=0.01)
+        for case in ['10', '20']:
+            self.assertEqual(
+                sorted(listdir(join(self.dest, 'timelines', case))),
+                ['1.txt', '2.txt'])
+            with open(join(self.dest, 'timing', case, '1.txt')) as f:
+                record = parse_timing_file(f)
+            self.assertTrue('sampling_overhead' in record[4])
+            # The timeline records the wall time of the repetition
+            with open(join(self.dest, 'timelines', case, '1.txt')) as f:
+                timeline = parse_timeline_file(f)
+            self.assertTrue(abs(timeline.wall - record[0]) <= 0.01)
+
+    def test_run_bench_suite_pinned(self):
+        """Correctly pins each command and records its placement"""
+        cpus = get_available_cpus()
+        run_bench_suite(self.dest, self.cases, num_reps=2, cpus_per_case=1)
+        for case in ['10', '20']:
+            for rep in ['1.txt', '2.txt']:
+                with open(join(self.dest, 'timing', case, rep)) as f:
+                    obs = parse_timing_file(f)
+                self.assertTrue(int(obs[4]['cpus']) in cpus)
+
+    def test_run_bench_suite_resume(self):
+        """Only executes the missing or malformed repetitions on resume"""
+        log_fp = join(self.output_dir, 'log.txt')
+        cases = [SuiteCase(name,
+                           ["sh", "-c", "echo %s >> %s" % (name, log_fp)],
+                           "-o") for name in ["10", "20"]]
+        run_bench_suite(self.dest, cases, num_reps=3)
+        with open(join(self.dest, 'manifest.txt')) as f:
+            self.assertEqual(len(f.readlines()), 7)
+        # Remove a timing file and corrupt another one
+        remove(join(self.dest, 'timing', '10', '2.txt'))
+        with open(join(self.dest, 'timing', '20', '3.txt'), 'w') as f:
+            f.write("0.01;0.00;")
+        open(log_fp, 'w').close()
+        run_bench_suite(self.dest, cases, num_reps=3, resume=True)
+        with open(log_fp) as f:
+            self.assertEqual(sorted(f.read().split()), ['10', '20'])
+        for case in ['10', '20']:
+            for rep in ['1.txt', '2.txt', '3.txt']:
+                with open(join(self.dest, 'timing', case, rep)) as f:
+                    self.assertNotEqual(parse_timing_file(f), None)
+        # Nothing left to do
+        open(log_fp, 'w').close()
+        run_bench_suite(self.dest, cases, num_reps=3, resume=True)
+        with open(log_fp) as f:
+            self.assertEqual(f.read(), "")
+        # Without resume everything is executed again
+        run_bench_suite(self.dest, cases, num_reps=3)
+        with open(log_fp) as f:
+            self.assertEqual(len(f.read().split()), 6)
+
+    def test_run_bench_suite_resume_adaptive(self):
+        """Uses the completed repetitions when resuming an adaptive case"""
+        run_bench_suite(self.dest, self.cases, num_reps=2, warmup=1)
+        rmtree(join(self.dest, 'warmup'))
+        run_bench_suite(self.dest, self.cases, num_reps=3, warmup=1,
+                        resume=True)
+        for case in ['10', '20']:
+            self.assertEqual(
+                sorted(listdir(join(self.dest, 'timing', case))),
+                ['1.txt', '2.txt', '3.txt'])
+            # The warmup is repeated before executing the missing repetition
+            self.assertEqual(listdir(join(self.dest, 'warmup', case)),
+                             ['1.txt'])
+        rmtree(join(self.dest, 'warmup'))
+        run_bench_suite(self.dest, self.cases, num_reps=3, warmup=1,
+                        resume=True)
+        self.assertFalse(exists(join(self.dest, 'warmup')))
+
+    def test_run_bench_suite_cache(self):
+        """Correctly records the cold and warm cache measurements"""
+        input_fp = join(self.output_dir, 'seqs.fna')
+        with open(input_fp, 'w') as f:
+            f.write(">seq\nACGT\n")
+        cases = [SuiteCase("seqs", ["sh", "-c", "cat %s" % input_fp], "-o",
+                           [input_fp])]
+        run_bench_suite(self.dest, cases, num_reps=2, cache_mode='both')
+        for rep in ['1.txt', '2.txt']:
+            with open(join(self.dest, 'timing', 'seqs', rep)) as f:
+                obs = parse_timing_file(f)
+            self.assertEqual(obs[4]['cache'], 'cold')
+            for metric in ['warm_wall', 'warm_user', 'warm_kernel',
+                           'warm_mem']:
+                self.assertTrue(metric in obs[4])
+
+        dest = join(self.output_dir, 'warm')
+        run_bench_suite(dest, cases, cache_mode='warm')
+        with open(join(dest, 'timing', 'seqs', '1.txt')) as f:
+            obs = parse_timing_file(f)
+        self.assertEqual(obs[4]['cache'], 'warm')
+        self.assertFalse('warm_wall' in obs[4])
+
+    def test_run_bench_suite_timeout(self):
+        """Correctly records the commands stopped by the time limit"""
+        cases = [SuiteCase("10", ["true"], "-o"),
+                 SuiteCase("20", ["sh", "-c", "sleep 10"], "-o")]
+        run_bench_suite(self.dest, cases, num_reps=2, timeout=0.5)
+        with open(join(self.dest, 'timing', '10', '1.txt')) as f:
+            self.assertFalse('censored' in f.read())
+        with open(join(self.dest, 'timing', '20', '2.txt')) as f:
+            obs = parse_timing_file(f)
+        self.assertEqual(obs[4]['censored'], 'timeout')
+
+    def test_run_bench_case_adaptive_censored(self):
+        """Stops repeating a case once a repetition is censored"""
+        make_suite_dirs(self.dest, self.cases)
+        case = SuiteCase("10", ["sh", "-c", "sleep 10"], "-o")
+        obs = run_bench_case_adaptive(self.dest, case, min_reps=3,
+                                      run_opts=RunOptions(limits=Limits(0.2)))
+        self.assertEqual(obs.reps, 1)
+
+    def test_run_bench_suite_error(self):
+        """Raises an error with wrong number of repetitions or jobs"""
+        with self.assertRaises(ValueError):
+            run_bench_suite(self.dest, self.cases, num_reps=0)
+        with self.assertRaises(ValueError):
+            run_bench_suite(self.dest, self.cases, jobs=0)
+        with self.assertRaises(ValueError):
+            run_bench_suite(self.dest, self.cases, warmup=-1)
+        with self.assertRaises(ValueError):
+            run_bench_suite(self.dest, self.cases, target_ci=0)
+        with self.assertRaises(ValueError):
+            run_bench_suite(self.dest, self.cases, sample_interval=0)
+        with self.assertRaises(ValueError):
+            run_bench_suite(self.dest, self.cases, cpus_per_case=0)
+        with self.assertRaises(ValueError):
+            run_bench_suite(self.dest, self.cases, numa_bind=True)
+        with self.assertRaises(ValueError):
+            run_bench_suite(self.dest, self.cases, timeout=0)
+        with self.assertRaises(ValueError):
+            run_bench_suite(self.dest, self.cases, max_rss=-1)
+        with self.assertRaises(ValueError):
+            run_bench_suite(self.dest, self.cases, order='reverse')
+        with self.assertRaises(ValueError):
+            run_bench_suite(self.dest, self.cases, cache_mode='hot')
+        # Not enough CPUs
+        with self.assertRaises(ValueError):
+            run_bench_suite(self.dest, self.cases, cpus_per_case=1,
+                            jobs=len(get_available_cpus()) + 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+from os import rename
+from os.path import join, dirname, abspath, exists
+from shutil import rmtree
+from subprocess import call
+from tempfile import mkdtemp
+from threading import Timer
+from time import time
+from unittest import TestCase, main, skipUnless
+
+import scaling.sentinels
+from scaling.sentinels import (read_sentinel, get_sentinels,
+                               wait_on_sentinels, _open_inotify)
+from scaling.util import JobStatus
+
+SCRIPTS_DIR = join(dirname(dirname(dirname(abspath(__file__)))), 'scripts')
+SENTINEL_WRAPPER = join(SCRIPTS_DIR, 'sentinel_wrapper.sh')
+TIMING_WRAPPER = join(SCRIPTS_DIR, 'timing_wrapper.sh')
+
+
+class TestSentinels(TestCase):
+
+    def setUp(self):
+        self.sentinel_dir = mkdtemp()
+        self.orig_open_inotify = scaling.sentinels._open_inotify
+        self.timers = []
+
+    def tearDown(self):
+        scaling.sentinels._open_inotify = self.orig_open_inotify
+        for timer in self.timers:
+            timer.cancel()
+        rmtree(self.sentinel_dir)
+
+    def _touch(self, fn, content=""):
+        with open(join(self.sentinel_dir, fn), 'w') as f:
+            f.write(content)
+
+    def _mark_done(self, name, delay):
+        """Atomically creates the done sentinel of name after delay seconds"""
+        def mark():
+            fp = join(self.sentinel_dir, name + '.done')
+            with open(fp + '.tmp', 'w') as f:
+                f.write("0\t100.0\t102.5\thost\n")
+            rename(fp + '.tmp', fp)
+        timer = Timer(delay, mark)
+        self.timers.append(timer)
+        timer.start()
+
+    def test_read_sentinel(self):
+        """Correctly reads the exit status and run time of the command"""
+        self._touch('1000_1.done', "1\t1400000000.5\t1400000010.0\tnode1\n")
+        obs = read_sentinel(join(self.sentinel_dir, '1000_1.done'))
+        self.assertEqual(obs, JobStatus('1000_1', 'C', 1, None, 9.5))
+
+        self._touch('1000_2.done', "1\n")
+        with self.assertRaises(ValueError):
+            read_sentinel(join(self.sentinel_dir, '1000_2.done'))
+
+    def test_get_sentinels(self):
+        """Correctly lists the pending and done sentinels"""
+        for fn in ['a_1.pending', 'a_2.pending', 'a_1.done', 'a_2.done.tmp',
+                   'other.txt']:
+            self._touch(fn)
+        obs = get_sentinels(self.sentinel_dir)
+        self.assertEqual(obs, (set(['a_1', 'a_2']), set(['a_1'])))
+
+    def test_wait_on_sentinels(self):
+        """Returns soon after the last sentinel is done"""
+        self._touch('a_1.pending')
+        self._touch('a_2.pending')
+        self._mark_done('a_1', 0.2)
+        self._mark_done('a_2', 0.6)
+        start = time()
+        obs = wait_on_sentinels(self.sentinel_dir, poll_interval=5)
+        elapsed = time() - start
+        self.assertTrue(0.6 <= elapsed < 2)
+        self.assertEqual(obs, {'a_1': JobStatus('a_1', 'C', 0, None, 2.5),
+                               'a_2': JobStatus('a_2', 'C', 0, None, 2.5)})
+
+    def test_wait_on_sentinels_polling(self):
+        """Polls the directory if inotify is not available"""
+        scaling.sentinels._open_inotify = lambda dir_fp: None
+        self._touch('a_1.pending')
+        self._mark_done('a_1', 0.3)
+        obs = wait_on_sentinels(self.sentinel_dir, poll_interval=0.1)
+        self.assertEqual(sorted(obs), ['a_1'])
+
+    def test_wait_on_sentinels_timeout(self):
+        """Raises an error if the sentinels are not done in time"""
+        self._touch('a_1.pending')
+        with self.assertRaises(RuntimeError):
+            wait_on_sentinels(self.sentinel_dir, poll_interval=0.1,
+                              timeout=0.3)
+
+    def test_open_inotify(self):
+        """inotify is available in Linux"""
+        fd = _open_inotify(self.sentinel_dir)
+        self.assertTrue(fd is not None)
+        scaling.sentinels.os.close(fd)
+        self.assertEqual(_open_inotify(join(self.sentinel_dir, 'missing')),
+                         None)
+
+    def test_sentinel_wrapper(self):
+        """sentinel_wrapper.sh writes the sentinel once the command is done"""
+        sentinel = join(self.sentinel_dir, 'a_1')
+        self._touch('a_1.pending')
+        ret = call(['bash', SENTINEL_WRAPPER, sentinel, 'bash', '-c',
+                    'sleep 0.1; exit 3'])
+        self.assertEqual(ret, 3)
+        obs = wait_on_sentinels(self.sentinel_dir, timeout=1)
+        self.assertEqual(obs['a_1'].exit_status, 3)
+        self.assertTrue(obs['a_1'].run_time >= 0.1)
+
+    @skipUnless(exists('/usr/bin/time'), "timing_wrapper.sh needs "
+                "/usr/bin/time")
+    def test_sentinel_wrapper_timing_wrapper(self):
+        """The exit status of the command goes through both wrappers"""
+        sentinel = join(self.sentinel_dir, 'a_1')
+        self._touch('a_1.pending')
+        timing_fp = join(self.sentinel_dir, 'a_1.txt')
+        ret = call(['bash', SENTINEL_WRAPPER, sentinel, 'bash',
+                    TIMING_WRAPPER, timing_fp, 'false'])
+        self.assertEqual(ret, 1)
+        obs = wait_on_sentinels(self.sentinel_dir, timeout=1)
+        self.assertEqual(obs['a_1'].exit_status, 1)
+        self.assertTrue(exists(timing_fp))
+
+
+if __name__ == '__main__':
+    main()
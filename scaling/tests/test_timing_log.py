@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+from os import listdir, makedirs
+from os.path import join
+from shutil import rmtree
+from subprocess import Popen
+from sys import executable
+from tempfile import mkdtemp
+from unittest import TestCase, main
+
+from scaling.util import TimingRecord
+from scaling.parse import parse_timing_log
+from scaling.timing_log import (get_timing_log, format_timing_log_line,
+                                append_timing_log, convert_timing_directory)
+
+
+class TestTimingLog(TestCase):
+    """Tests the writing and conversion of the timing logs"""
+
+    def setUp(self):
+        self.output_dir = mkdtemp()
+        self.log_fp = join(self.output_dir, 'timing.log')
+        self.record = TimingRecord(1.5, 1.25, 0.25, 1024, 10, 0, 2, 1, 0, 8,
+                                   0, 0)
+
+    def tearDown(self):
+        rmtree(self.output_dir)
+
+    def _read_log(self, log_fp=None):
+        with open(log_fp or self.log_fp) as f:
+            return parse_timing_log(f)
+
+    def test_get_timing_log(self):
+        """Returns the log of the timing directory of the case"""
+        self.assertEqual(get_timing_log('suite', '10'),
+                         ('suite/timing/timing.log', '10'))
+        self.assertEqual(get_timing_log('suite', 'similarity/0.97'),
+                         ('suite/timing/similarity/timing.log', '0.97'))
+
+    def test_format_timing_log_line(self):
+        """Correctly formats a line of the timing log"""
+        obs = format_timing_log_line('10', '1', '1.0;0.5;0.1;1024')
+        self.assertEqual(obs, "10\t1\t1.0;0.5;0.1;1024\tebf73672\n")
+        self.assertEqual(parse_timing_log([obs]),
+                         ([('10', '1', (1.0, 0.5, 0.1, 1024, {}))], []))
+        with self.assertRaises(ValueError):
+            format_timing_log_line('1\t0', '1', '1.0;0.5;0.1;1024')
+        with self.assertRaises(ValueError):
+            format_timing_log_line('10', '1', '1.0;0.5;0.1;1024\n')
+
+    def test_append_timing_log(self):
+        """Appends a line per repetition to the timing log"""
+        append_timing_log(self.log_fp, '10', 1, self.record)
+        append_timing_log(self.log_fp, '10', 2,
+                          self.record._replace(censored='timeout'),
+                          {'warm_wall': 0.5})
+        records, malformed = self._read_log()
+        self.assertEqual(malformed, [])
+        self.assertEqual(records,
+                         [('10', '1', (1.5, 1.25, 0.25, 1024,
+                                       {'minflt': 10, 'majflt': 0,
+                                        'nvcsw': 2, 'nivcsw': 1,
+                                        'inblock': 0, 'oublock': 8})),
+                          ('10', '2', (1.5, 1.25, 0.25, 1024,
+                                       {'minflt': 10, 'majflt': 0,
+                                        'nvcsw': 2, 'nivcsw': 1,
+                                        'inblock': 0, 'oublock': 8,
+                                        'warm_wall': 0.5,
+                                        'censored': 'timeout'}))])
+
+    def test_append_timing_log_concurrent(self):
+        """The lines of concurrent writers are not interleaved"""
+        script = ("from scaling.util import TimingRecord\n"
+                  "from scaling.timing_log import append_timing_log\n"
+                  "r = TimingRecord(1.5, 1.25, 0.25, 1024, 0, 0, 0, 0, 0, 0,"
+                  " 0, 0)\n"
+                  "for i in range(200):\n"
+                  "    append_timing_log(%r, 'case_%d', i, r, "
+                  "dict(('m%%d' %% j, j) for j in range(20)))\n")
+        procs = [Popen([executable, "-c", script % (self.log_fp, n)])
+                 for n in range(4)]
+        for proc in procs:
+            self.assertEqual(proc.wait(), 0)
+        records, malformed = self._read_log()
+        self.assertEqual(malformed, [])
+        self.assertEqual(len(records), 800)
+        for n in range(4):
+            self.assertEqual([rep for case, rep, _ in records
+                              if case == 'case_%d' % n],
+                             [str(i) for i in range(200)])
+
+    def test_convert_timing_directory(self):
+        """Appends the timing files to the timing log"""
+        timing_dir = join(self.output_dir, 'timing')
+        for case, reps in [('10', ['1.txt', '2.txt', '2.txt.1']),
+                           ('20', ['1.txt'])]:
+            makedirs(join(timing_dir, case))
+            for rep in reps:
+                with open(join(timing_dir, case, rep), 'w') as f:
+                    f.write("%s.5;1.0;0.5;1024\n" % rep[0])
+        with open(join(timing_dir, '20', '2.txt'), 'w') as f:
+            f.write("Command exited with non-zero status 1\n"
+                    "0.5;0.1;0.1;1024\n")
+        log_fp = join(timing_dir, 'timing.log')
+        self.assertEqual(convert_timing_directory(timing_dir), (log_fp, 5))
+        self.assertEqual(sorted(listdir(timing_dir)),
+                         ['10', '20', 'timing.log'])
+        records, malformed = self._read_log(log_fp)
+        self.assertEqual(malformed, [])
+        self.assertEqual(records,
+                         [('10', '1', (1.5, 1.0, 0.5, 1024, {})),
+                          ('10', '2', (2.5, 1.0, 0.5, 1024, {})),
+                          ('10', '2.txt.1', (2.5, 1.0, 0.5, 1024, {})),
+                          ('20', '1', (1.5, 1.0, 0.5, 1024, {})),
+                          ('20', '2', None)])
+
+        # The converted case directories are removed
+        rmtree(join(timing_dir, '10'))
+        self.assertEqual(convert_timing_directory(timing_dir, remove=True),
+                         (log_fp, 2))
+        self.assertEqual(listdir(timing_dir), ['timing.log'])
+        self.assertEqual(len(self._read_log(log_fp)[0]), 7)
+
+    def test_convert_timing_directory_error(self):
+        """Raises an error with a wrong directory structure"""
+        with open(join(self.output_dir, 'foo.txt'), 'w') as f:
+            f.write("1.0;0.5;0.1;1024\n")
+        with self.assertRaises(ValueError):
+            convert_timing_directory(self.output_dir)
+        self.assertEqual(listdir(self.output_dir), ['foo.txt'])
+
+
+if __name__ == '__main__':
+    main()
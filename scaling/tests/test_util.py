@@ -12,7 +12,7 @@ __status__ = "Development"
 from unittest import TestCase, main
 import numpy as np
 
-from scaling.util import natural_sort, generate_poly_label
+from scaling.util import natural_sort, generate_poly_label, get_checksum
 
 
 class TestUtil(TestCase):
@@ -24,6 +24,11 @@ class TestUtil(TestCase):
 
         self.assertEqual(obs, exp)
 
+    def test_get_checksum(self):
+        """Correctly computes the CRC-32 of a string"""
+        self.assertEqual(get_checksum("123456789"), "cbf43926")
+        self.assertEqual(get_checksum(""), "00000000")
+
     def test_generate_poly_label(self):
         """Correctly generates the string representing the polynomial"""
         # Linear test: y = 5*x + 50
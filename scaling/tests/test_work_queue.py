@@ -0,0 +1,312 @@
+#!/usr/bin/env python
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+from os import listdir, rename, getpid, utime, kill
+from os.path import join, exists, getmtime
+from shutil import rmtree
+from signal import SIGINT
+from socket import gethostname
+from subprocess import Popen, PIPE
+from sys import executable
+from tempfile import mkdtemp
+from time import sleep, time
+from unittest import TestCase, main
+
+from scaling.util import SuiteCase
+from scaling.parse import parse_timing_file, parse_timing_log
+from scaling.work_queue import (make_work_queue, load_queue_cases,
+                                claim_task, release_task, complete_task,
+                                requeue_dead_claims, run_worker,
+                                get_queue_timing_dirs, get_worker_id,
+                                ClaimHeartbeat)
+
+
+class TestWorkQueue(TestCase):
+    """Tests the creation and execution of the work queues"""
+
+    def setUp(self):
+        self.output_dir = mkdtemp()
+        self.dest = join(self.output_dir, 'suite')
+        self.cases = [SuiteCase("10", ["true"], "-o", ["10.fna"]),
+                      SuiteCase("20", ["sh", "-c", "exit 3", "--"], "-o")]
+        self.queue_dir = join(self.dest, 'queue')
+
+    def tearDown(self):
+        rmtree(self.output_dir)
+
+    def _read_done(self):
+        """Returns the contents of the done task files"""
+        done_dir = join(self.queue_dir, 'done')
+        result = {}
+        for name in listdir(done_dir):
+            with open(join(done_dir, name)) as f:
+                result[name] = f.read().strip().split('\t')
+        return result
+
+    def test_make_work_queue(self):
+        """Correctly creates the queue with a task per repetition"""
+        obs = make_work_queue(self.dest, self.cases, 2, 'interleaved')
+        self.assertEqual(obs, self.queue_dir)
+        self.assertEqual(sorted(listdir(self.queue_dir)),
+                         ['cases.txt', 'claimed', 'done', 'pending'])
+        self.assertEqual(load_queue_cases(self.queue_dir),
+                         [SuiteCase("10", ["true"], "-o", ["10.fna"]),
+                          SuiteCase("20", ["sh", "-c", "exit 3", "--"], "-o")])
+        pending_dir = join(self.queue_dir, 'pending')
+        tasks = []
+        for name in sorted(listdir(pending_dir)):
+            with open(join(pending_dir, name)) as f:
+                tasks.append(f.read())
+        self.assertEqual(tasks, ["10\t1\n", "20\t1\n", "20\t2\n", "10\t2\n"])
+        self.assertTrue(exists(join(self.dest, 'timing', '20')))
+        self.assertTrue(exists(join(self.dest, 'execution_order.txt')))
+        self.assertEqual(get_queue_timing_dirs(self.dest),
+                         [join(self.dest, 'timing')])
+
+        # The queue cannot be created twice
+        with self.assertRaises(ValueError):
+            make_work_queue(self.dest, self.cases)
+        self.assertEqual(sorted(listdir(self.dest)),
+                         ['command_outputs', 'execution_order.txt', 'queue',
+                          'timing'])
+
+    def test_make_work_queue_error(self):
+        """Raises an error if the cases cannot be written to the queue"""
+        with self.assertRaises(ValueError):
+            make_work_queue(self.dest, self.cases, 0)
+        with self.assertRaises(ValueError):
+            make_work_queue(self.dest, self.cases, order='reverse')
+        cases = [SuiteCase("10", ["echo", "a\tb"], "-o")]
+        with self.assertRaises(ValueError):
+            make_work_queue(self.dest, cases)
+        self.assertFalse(exists(self.queue_dir))
+        self.assertEqual(sorted(listdir(self.dest)),
+                         ['command_outputs', 'timing'])
+
+    def test_claim_task(self):
+        """Each task is claimed by a single worker"""
+        make_work_queue(self.dest, self.cases)
+        first = claim_task(self.queue_dir, "host1.1")
+        self.assertEqual(first.name, "00000000")
+        self.assertEqual((first.case, first.rep), ("10", 1))
+        self.assertEqual(first.claim_fp, join(self.queue_dir, 'claimed',
+                                              '00000000@host1.1'))
+        second = claim_task(self.queue_dir, "host2.1")
+        self.assertEqual((second.case, second.rep), ("20", 1))
+        self.assertEqual(claim_task(self.queue_dir, "host1.1"), None)
+
+        release_task(self.queue_dir, first)
+        complete_task(self.queue_dir, second, "host2.1", 3, 10.0, 12.5)
+        self.assertEqual(listdir(join(self.queue_dir, 'pending')),
+                         ["00000000"])
+        self.assertEqual(listdir(join(self.queue_dir, 'claimed')), [])
+        self.assertEqual(self._read_done(),
+                         {"00000001": ["20", "1", "host2.1", "3",
+                                       "10.000000", "12.500000"]})
+
+    def test_requeue_dead_claims(self):
+        """The tasks of the dead workers of this host are requeued"""
+        make_work_queue(self.dest, self.cases, 2)
+        proc = Popen([executable, "-c", "pass"])
+        proc.wait()
+        host = gethostname()
+        dead = claim_task(self.queue_dir, "%s.%d" % (host, proc.pid))
+        alive = claim_task(self.queue_dir, "%s.%d" % (host, getpid()))
+        remote = claim_task(self.queue_dir, "otherhost.%d" % proc.pid)
+        self.assertEqual(requeue_dead_claims(self.queue_dir), [dead.name])
+        self.assertEqual(sorted(listdir(join(self.queue_dir, 'claimed'))),
+                         [alive.claim_fp.split('/')[-1],
+                          remote.claim_fp.split('/')[-1]])
+        self.assertEqual(sorted(listdir(join(self.queue_dir, 'pending'))),
+                         [dead.name, "00000003"])
+
+    def test_requeue_dead_claims_lease(self):
+        """The claims not refreshed within the lease are requeued"""
+        make_work_queue(self.dest, self.cases, 2)
+        # The lease starts when the task is claimed
+        expired = claim_task(self.queue_dir, "otherhost.1")
+        self.assertTrue(time() - getmtime(expired.claim_fp) < 60)
+        fresh = claim_task(self.queue_dir, "otherhost.2")
+        alive = claim_task(self.queue_dir, get_worker_id())
+        old = time() - 120
+        for task in [expired, alive]:
+            utime(task.claim_fp, (old, old))
+        self.assertEqual(requeue_dead_claims(self.queue_dir, lease=60),
+                         [expired.name, alive.name])
+        self.assertEqual(listdir(join(self.queue_dir, 'claimed')),
+                         [fresh.claim_fp.split('/')[-1]])
+        self.assertEqual(requeue_dead_claims(self.queue_dir), [])
+
+    def test_complete_task_requeued(self):
+        """A requeued claim is neither completed nor released again"""
+        make_work_queue(self.dest, self.cases)
+        task = claim_task(self.queue_dir, "otherhost.1")
+        released = claim_task(self.queue_dir, "otherhost.1")
+        old = time() - 120
+        for claimed in [task, released]:
+            utime(claimed.claim_fp, (old, old))
+        requeue_dead_claims(self.queue_dir, lease=60)
+        self.assertFalse(complete_task(self.queue_dir, task, "otherhost.1",
+                                       0, 10.0, 12.5))
+        self.assertFalse(release_task(self.queue_dir, released))
+        self.assertEqual(sorted(listdir(join(self.queue_dir, 'pending'))),
+                         [task.name, released.name])
+        self.assertEqual(listdir(join(self.queue_dir, 'claimed')), [])
+        self.assertEqual(listdir(join(self.queue_dir, 'done')), [])
+
+    def test_run_worker_sigint(self):
+        """The tasks whose command is interrupted are requeued"""
+        cases = [SuiteCase("10", ["sh", "-c", "kill -INT $$"], "-o")]
+        make_work_queue(self.dest, cases, 2)
+        with self.assertRaises(KeyboardInterrupt):
+            run_worker(self.dest)
+        self.assertEqual(sorted(listdir(join(self.queue_dir, 'pending'))),
+                         ["00000000", "00000001"])
+        self.assertEqual(listdir(join(self.queue_dir, 'claimed')), [])
+        self.assertEqual(listdir(join(self.queue_dir, 'done')), [])
+
+    def test_run_worker_interrupted(self):
+        """An interrupted worker stops claiming tasks"""
+        cases = [SuiteCase("10", ["sh", "-c", "sleep 1", "--"], "-o")]
+        make_work_queue(self.dest, cases, 3)
+        # With a limit, the command runs in its own process group and does
+        # not receive the SIGINT. The worker may inherit an ignored SIGINT
+        proc = Popen([executable, "-c", "import signal; signal.signal("
+                      "signal.SIGINT, signal.default_int_handler); "
+                      "from scaling.work_queue import run_worker; "
+                      "run_worker(%r, timeout=30)" % self.dest],
+                     stdin=PIPE, stderr=PIPE)
+        sleep(0.5)
+        kill(proc.pid, SIGINT)
+        _, stderr = proc.communicate("")
+        self.assertNotEqual(proc.returncode, 0)
+        self.assertTrue('KeyboardInterrupt' in stderr)
+        self.assertEqual(listdir(join(self.queue_dir, 'done')), ["00000000"])
+        self.assertEqual(listdir(join(self.queue_dir, 'claimed')), [])
+        self.assertEqual(sorted(listdir(join(self.queue_dir, 'pending'))),
+                         ["00000001", "00000002"])
+
+    def test_run_worker_expired_claim(self):
+        """The worker executes the tasks of the expired foreign claims"""
+        make_work_queue(self.dest, self.cases)
+        task = claim_task(self.queue_dir, "otherhost.1")
+        old = time() - 120
+        utime(task.claim_fp, (old, old))
+        obs = run_worker(self.dest, worker_id="host1.1", claim_lease=60)
+        self.assertEqual(sorted(obs), [("10", 1), ("20", 1)])
+        self.assertEqual(listdir(join(self.queue_dir, 'claimed')), [])
+
+    def test_claim_heartbeat(self):
+        """The claims of a running worker are refreshed"""
+        make_work_queue(self.dest, self.cases)
+        task = claim_task(self.queue_dir, "host1.1")
+        released = claim_task(self.queue_dir, "host1.1")
+        old = time() - 120
+        for claimed in [task, released]:
+            utime(claimed.claim_fp, (old, old))
+        heartbeat = ClaimHeartbeat(0.05)
+        heartbeat.add(task.claim_fp)
+        heartbeat.add(released.claim_fp)
+        release_task(self.queue_dir, released)
+        heartbeat.start()
+        try:
+            sleep(0.3)
+        finally:
+            heartbeat.stop()
+        self.assertTrue(time() - getmtime(task.claim_fp) < 60)
+        self.assertFalse(heartbeat.is_alive())
+
+    def test_run_worker(self):
+        """The worker executes all the pending tasks"""
+        make_work_queue(self.dest, self.cases, 2)
+        obs = run_worker(self.dest, jobs=2, worker_id="host1.1")
+        self.assertEqual(sorted(obs), [("10", 1), ("10", 2), ("20", 1),
+                                       ("20", 2)])
+        self.assertEqual(listdir(join(self.queue_dir, 'pending')), [])
+        self.assertEqual(listdir(join(self.queue_dir, 'claimed')), [])
+        done = self._read_done()
+        self.assertEqual(sorted(done), ["00000000", "00000001", "00000002",
+                                        "00000003"])
+        self.assertEqual([v[:4] for k, v in sorted(done.items())],
+                         [["10", "1", "host1.1", "0"],
+                          ["20", "1", "host1.1", "3"],
+                          ["10", "2", "host1.1", "0"],
+                          ["20", "2", "host1.1", "3"]])
+        with open(join(self.dest, 'timing', '10', '2.txt')) as f:
+            self.assertNotEqual(parse_timing_file(f), None)
+        # The failed repetitions are recorded as the runner does
+        with open(join(self.dest, 'timing', '20', '1.txt')) as f:
+            self.assertEqual(parse_timing_file(f), None)
+        # Nothing is left for a second worker
+        self.assertEqual(run_worker(self.dest), [])
+
+    def test_run_worker_timing_log(self):
+        """The workers append the timing records to the timing log"""
+        make_work_queue(self.dest, self.cases, 2, timing_log=True)
+        self.assertTrue(exists(join(self.queue_dir, 'timing_log')))
+        self.assertEqual(listdir(join(self.dest, 'timing')), [])
+        run_worker(self.dest, max_tasks=1, worker_id="host1.1")
+        run_worker(self.dest, jobs=2, worker_id="host2.1")
+        self.assertEqual(listdir(join(self.dest, 'timing')), ['timing.log'])
+        with open(join(self.dest, 'timing', 'timing.log')) as f:
+            records, malformed = parse_timing_log(f)
+        self.assertEqual(malformed, [])
+        self.assertEqual(sorted((case, rep, info is None)
+                                for case, rep, info in records),
+                         [("10", "1", False), ("10", "2", False),
+                          ("20", "1", True), ("20", "2", True)])
+
+    def test_run_worker_max_tasks(self):
+        """The worker stops after executing max_tasks tasks"""
+        make_work_queue(self.dest, self.cases, 2)
+        obs = run_worker(self.dest, max_tasks=3, sample_interval=0.1)
+        self.assertEqual(obs, [("10", 1), ("20", 1), ("10", 2)])
+        self.assertEqual(listdir(join(self.queue_dir, 'pending')),
+                         ["00000003"])
+        self.assertTrue(exists(join(self.dest, 'timelines', '10', '1.txt')))
+        self.assertEqual(run_worker(self.dest, worker_id=get_worker_id()),
+                         [("20", 2)])
+
+    def test_run_worker_requeue(self):
+        """The tasks interrupted by an error are requeued"""
+        make_work_queue(self.dest, self.cases)
+        # A case that is not in the cases file cannot be executed
+        rename(join(self.queue_dir, 'cases.txt'),
+               join(self.output_dir, 'cases.txt'))
+        with open(join(self.queue_dir, 'cases.txt'), 'w') as f:
+            f.write("30\t-o\t0\ttrue\n")
+        with self.assertRaises(ValueError):
+            run_worker(self.dest)
+        self.assertEqual(len(listdir(join(self.queue_dir, 'pending'))), 2)
+        self.assertEqual(listdir(join(self.queue_dir, 'claimed')), [])
+
+    def test_run_worker_error(self):
+        """Raises an error with wrong options or without a queue"""
+        with self.assertRaises(ValueError):
+            run_worker(self.dest)
+        make_work_queue(self.dest, self.cases)
+        with self.assertRaises(ValueError):
+            run_worker(self.dest, jobs=0)
+        with self.assertRaises(ValueError):
+            run_worker(self.dest, max_tasks=0)
+        with self.assertRaises(ValueError):
+            run_worker(self.dest, claim_lease=0)
+        with self.assertRaises(ValueError):
+            run_worker(self.dest, sample_interval=0)
+        with self.assertRaises(ValueError):
+            run_worker(self.dest, timeout=-1)
+        with self.assertRaises(ValueError):
+            run_worker(self.dest, cache_mode='hot')
+        self.assertEqual(len(listdir(join(self.queue_dir, 'pending'))), 2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+# Append-only timing logs. Instead of a timing file per repetition
+# (<timing dir>/<case>/<rep>.txt), each timing directory can hold a single
+# timing.log file with one line per repetition:
+#     <case> <tab> <rep> <tab> <timing record> <tab> <checksum>
+# where the timing record has the format of the timing files and the
+# checksum is the CRC-32 of the rest of the line. Each line is written with a
+# single write on a descriptor opened with O_APPEND, so the lines of
+# concurrent writers are not interleaved. The checksum lets the readers skip
+# the lines damaged by a writer that died while writing or by a file system
+# that does not honour O_APPEND across hosts
+
+import os
+from os import listdir, fsync
+from os.path import join, isdir
+from shutil import rmtree
+
+from scaling.util import (TIMING_LOG_FN, TIMING_CACHE_FN, get_checksum,
+                          natural_sort)
+from scaling.measure import format_timing_record
+
+
+def get_timing_log(dest, case_name):
+    """Returns the timing log of a case and the name of the case in the log
+
+    The log is stored in the timing directory that process-bench-results
+    uses for the case (see run_bench_suite.get_timing_dirs)
+
+    Parameters
+    ----------
+    dest: string
+        The benchmark suite output directory
+    case_name: string
+        The name of the case, e.g. 10 or similarity/0.97
+
+    Returns
+    -------
+    string, string
+        The path to the timing log and the name of the case in the log
+    """
+    if "/" in case_name:
+        param, label = case_name.split("/", 1)
+        return join(dest, "timing", param, TIMING_LOG_FN), label
+    return join(dest, "timing", TIMING_LOG_FN), case_name
+
+
+def format_timing_log_line(case, rep, record_line):
+    """Formats a line of a timing log
+
+    Parameters
+    ----------
+    case: string
+        The name of the case
+    rep: string
+        The repetition
+    record_line: string
+        The timing record, as written in the timing files
+
+    Returns
+    -------
+    string
+        The line, including its checksum and the trailing new line
+
+    Raises
+    ------
+    ValueError
+        If any of the values contains tabs or new lines
+    """
+    values = [case, rep, record_line]
+    if any('\t' in v or '\n' in v for v in values):
+        raise ValueError("The values of a timing log line cannot contain tabs "
+                         "or new lines: %s" % values)
+    line = "\t".join(values)
+    return "%s\t%s\n" % (line, get_checksum(line))
+
+
+def _append(log_fp, data):
+    """Appends data to log_fp with a single write, creating it if needed"""
+    fd = os.open(log_fp, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        written = os.write(fd, data)
+        # Only a full disk or a signal cause a short write. The rest of the
+        # data is still appended, its line will be ignored if damaged
+        while written < len(data):
+            written += os.write(fd, data[written:])
+    finally:
+        os.close(fd)
+
+
+def append_timing_log(log_fp, case, rep, record, extra=None):
+    """Appends the measurements of a repetition to a timing log
+
+    Parameters
+    ----------
+    log_fp: string
+        Path to the timing log
+    case: string
+        The name of the case in the log
+    rep: int or string
+        The repetition
+    record: TimingRecord
+        The measurements of the command execution
+    extra: dict of {string: number}, optional
+        Additional measurements to append to the record
+    """
+    _append(log_fp, format_timing_log_line(
+        case, str(rep), format_timing_record(record, extra)))
+
+
+def convert_timing_directory(timing_dir, remove=False):
+    """Converts the timing files of a timing directory to its timing log
+
+    The first line of each timing file <timing_dir>/<case>/<file> is
+    appended to <timing_dir>/timing.log. The repetition is the name of the
+    file without the .txt extension, so the files renamed by
+    timing_wrapper.sh on collision are kept as different repetitions
+
+    Parameters
+    ----------
+    timing_dir: string
+        The timing directory, as provided to process-bench-results
+    remove: bool, optional
+        If True, the case directories are removed once their timing files
+        are safely stored in the log
+
+    Returns
+    -------
+    string, int
+        The path to the timing log and the number of repetitions converted
+
+    Raises
+    ------
+    ValueError
+        If there is some file other than the timing log (or the parse cache)
+        in timing_dir, or a case or repetition cannot be written to the log
+    """
+    log_fp = join(timing_dir, TIMING_LOG_FN)
+    case_dirs = []
+    lines = []
+    for dirname in natural_sort(listdir(timing_dir)):
+        if dirname in (TIMING_LOG_FN, TIMING_CACHE_FN):
+            continue
+        dirpath = join(timing_dir, dirname)
+        if not isdir(dirpath):
+            raise ValueError("%s contains a file: %s. Only directories are "
+                             "allowed!" % (timing_dir, dirpath))
+        case_dirs.append(dirpath)
+        for filename in natural_sort(listdir(dirpath)):
+            with open(join(dirpath, filename), 'U') as f:
+                record_line = f.readline().strip()
+            rep = filename[:-4] if filename.endswith('.txt') else filename
+            lines.append(format_timing_log_line(dirname, rep, record_line))
+    if lines:
+        _append(log_fp, "".join(lines))
+    if remove:
+        # Make sure the log is on disk before removing the timing files
+        with open(log_fp, 'a') as f:
+            fsync(f.fileno())
+        for dirpath in case_dirs:
+            rmtree(dirpath)
+    return log_fp, len(lines)
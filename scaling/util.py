@@ -11,11 +11,26 @@ __status__ = "Development"
 
 from re import split
 from collections import namedtuple
+from zlib import crc32
 
-BenchCase = namedtuple('BenchCase', ('label', 'wall', 'user', 'kernel', 'mem'))
+BenchCase = namedtuple('BenchCase', ('label', 'wall', 'user', 'kernel', 'mem',
+                                     'extra', 'censored'))
+# extra is a dict of {metric: list of float} with the additional per
+# repetition measurements of the extended timing records, if any. censored is
+# a list of bool with one value per repetition, True if the repetition was
+# stopped by a runner limit (its values are lower bounds), or None if no
+# repetition was stopped
+BenchCase.__new__.__defaults__ = (None, None)
 SummarizedResults = namedtuple('SummarizedResults', ('labels', 'means',
                                                      'stdevs', 'wall_curve',
-                                                     'mem_curve'))
+                                                     'mem_curve', 'extra',
+                                                     'drift'))
+# extra is a dict of {metric: (list of means, list of stdevs)} with the
+# summary of the SUMMARY_EXTRA_METRICS measured in the benchmark suite. The
+# 'censored' metric holds the fraction of censored repetitions of each case,
+# whose means are then lower bounds. drift is the DriftCheck of the suite, if
+# the start time of the repetitions is known
+SummarizedResults.__new__.__defaults__ = (None, None)
 BenchData = namedtuple('BenchData', ('wall', 'user', 'kernel', 'mem'))
 FittedCurve = namedtuple('FittedCurve', ('poly', 'deg'))
 CompData = namedtuple('CompData', ('x', 'time', 'mem'))
@@ -23,7 +38,122 @@ BenchSummary = namedtuple('BenchSummary', ('label', 'wall_mean',
                                            'wall_stdev', 'user_mean',
                                            'user_stdev', 'kernel_mean',
                                            'kernel_stdev', 'mem_mean',
-                                           'mem_stdev'))
+                                           'mem_stdev', 'extra'))
+BenchSummary.__new__.__defaults__ = (None,)
+SuiteCase = namedtuple('SuiteCase', ('name', 'cmd', 'out_opt', 'inputs'))
+# inputs is the list of input files of the case, whose page cache state is
+# controlled by the runner cache modes
+SuiteCase.__new__.__defaults__ = (None,)
+TimingRecord = namedtuple('TimingRecord', ('wall', 'user', 'kernel', 'mem',
+                                           'minflt', 'majflt', 'nvcsw',
+                                           'nivcsw', 'inblock', 'oublock',
+                                           'status', 'signal', 'io',
+                                           'censored'))
+# io is a dict of {counter: int} with the I/O accounting of the process tree,
+# available only if the command has been sampled. censored is the limit that
+# caused the runner to stop the command ('timeout', 'rss' or 'vmem'), if any
+TimingRecord.__new__.__defaults__ = (None, None)
+Timeline = namedtuple('Timeline', ('time', 'rss', 'cpu', 'procs',
+                                   'overhead', 'wall'))
+# wall is the wall time of the sampled command (seconds), used to express the
+# sampling overhead as a percentage of its duration. None if unknown
+Timeline.__new__.__defaults__ = (None,)
+# Limits enforced on each command: wall time (seconds), resident set size of
+# the process tree (KB) and virtual memory of each process (KB)
+Limits = namedtuple('Limits', ('wall', 'rss', 'vmem'))
+Limits.__new__.__defaults__ = (None, None, None)
+# CPUs to which a command is pinned and NUMA node to which its memory is bound
+Placement = namedtuple('Placement', ('cpus', 'node'))
+# Options that control how each command of a suite is executed and measured.
+# cpu_sets is a Queue with the CPU sets that are free to pin a command to.
+# cache_mode is the page cache state of the inputs ('cold', 'warm' or 'both').
+# If timing_log is True, the measurements are appended to the timing log of
+# the timing directory instead of written to a timing file per repetition
+RunOptions = namedtuple('RunOptions', ('sample_interval', 'cpu_sets',
+                                       'numa_bind', 'limits', 'cache_mode',
+                                       'timing_log'))
+RunOptions.__new__.__defaults__ = (None, None, False, None, None, False)
+
+# Extended measurements summarized as additional columns of the
+# summarized_results.txt file, in the order they are written
+SUMMARY_EXTRA_METRICS = ['censored', 'tree_rss', 'tree_cpu', 'tree_procs',
+                         'read_bytes', 'write_bytes', 'rchar', 'wchar',
+                         'syscr', 'syscw', 'warm_wall', 'warm_user',
+                         'warm_kernel', 'warm_mem']
+CaseRepetitions = namedtuple('CaseRepetitions', ('name', 'warmup', 'reps',
+                                                 'rel_ci'))
+# Execution orders of the repetitions of a benchmark suite
+EXECUTION_ORDERS = ['sequential', 'random', 'interleaved']
+# Name of the append-only log that holds the timing records of a timing
+# directory, with one line per repetition (see scaling.timing_log)
+TIMING_LOG_FN = 'timing.log'
+# Name of the cache of the parsed timing files of a timing directory, keyed by
+# the path, size and modification time of each file
+TIMING_CACHE_FN = '.timing_cache'
+# Trend of the relative residuals of the wall time against the start time of
+# the repetitions: slope (per hour), Pearson's r, t statistic and number of
+# repetitions used. drift is True if the trend is significant at the 95% level
+DriftCheck = namedtuple('DriftCheck', ('slope', 'r', 't', 'n', 'drift'))
+# State of a job submitted to a cluster, as reported by the queue system.
+# exit_status is None until the job is completed. queue_wait is the time (in
+# seconds) the job waited in the queue before it started, and run_time the
+# time it was running, both None if unknown
+JobStatus = namedtuple('JobStatus', ('job_id', 'state', 'exit_status',
+                                     'queue_wait', 'run_time'))
+# Resources requested for the job of a benchmark case: wall time limit
+# (seconds), memory (MB) and CPUs. None if the default of the queue is used
+ResourceRequest = namedtuple('ResourceRequest', ('time', 'mem', 'cpus'))
+ResourceRequest.__new__.__defaults__ = (None, None, None)
+# Accounting of a finished job, as reported by the queue system: elapsed time
+# (seconds), CPU time of all its processes (seconds) and maximum resident set
+# size of its processes (KB). Unknown values are None
+JobAccounting = namedtuple('JobAccounting', ('elapsed', 'total_cpu',
+                                             'max_rss'))
+# Comparison of the mean measurements of a benchmark case taken by the timing
+# wrapper (wall, user + kernel cpu and mem) with the mean accounting of its
+# jobs (elapsed, total_cpu and max_rss), in seconds and KB
+AccountingCheck = namedtuple('AccountingCheck', ('label', 'wall', 'elapsed',
+                                                 'cpu', 'total_cpu', 'mem',
+                                                 'max_rss'))
+# Job submitted by the throttled submitter. The times are in seconds since the
+# epoch: the submission time is taken when the job is submitted, and the
+# start and end times are derived from the queue wait and run time reported
+# by the queue system or, if it does not report them, from the poll in which
+# the job was first seen running or done. Unknown values are None
+JobRecord = namedtuple('JobRecord', ('name', 'job_id', 'submit_time',
+                                     'start_time', 'end_time', 'exit_status'))
+# Effective throughput of a set of jobs: number of completed jobs, makespan
+# (seconds from the first submission to the last completion), completed jobs
+# per hour and mean queue wait (seconds)
+Throughput = namedtuple('Throughput', ('jobs', 'makespan', 'jobs_per_hour',
+                                       'mean_queue_wait'))
+# Task of a work queue claimed by a worker: the name of its task file, the
+# case and repetition to execute and the path to the claimed task file
+ClaimedTask = namedtuple('ClaimedTask', ('name', 'case', 'rep', 'claim_fp'))
+# Benchmark suite run stored in a results database: the command benchmarked,
+# the parameter of the suite (None for the input file suites), the host and
+# QIIME version, a free label, the start time of the suite (YYYYMMDD_HHMMSS),
+# the timing directory it was loaded from and its number of cases and
+# repetitions. Unknown values are None
+BenchRun = namedtuple('BenchRun', ('run_id', 'command', 'parameter', 'host',
+                                   'version', 'label', 'timestamp', 'source',
+                                   'cases', 'reps'))
+
+
+def get_checksum(text):
+    """Returns the CRC-32 of text as 8 hexadecimal digits
+
+    Parameters
+    ----------
+    text : string
+        The text to checksum
+
+    Returns
+    -------
+    string
+        The checksum of text
+    """
+    return "%08x" % (crc32(text) & 0xffffffff)
 
 
 def natural_sort(l):
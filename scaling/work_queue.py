@@ -0,0 +1,587 @@
+#!/usr/bin/env python
+
+__author__ = "Jose Antonio Navas Molina"
+__copyright__ = "Copyright 2014, The QIIME Scaling Project"
+__credits__ = ["Jose Antonio Navas Molina"]
+__license__ = "BSD"
+__version__ = "0.0.2-dev"
+__maintainer__ = "Jose Antonio Navas Molina"
+__email__ = "josenavasmolina@gmail.com"
+__status__ = "Development"
+
+# Pull-based execution of a benchmark suite by workers that share a file
+# system, without a queue system or a daemon. The queue directory of the
+# suite holds the definition of its cases and one task file per
+# (case, repetition) in the pending directory. A worker claims a task by
+# renaming its file into the claimed directory: rename is atomic, also on
+# NFS, so only one worker succeeds. The worker executes the task, writing the
+# timing file under the suite directory as the runner does, and moves the
+# task file to the done directory. Each worker keeps claiming tasks until the
+# pending directory is empty, so the faster machines execute more tasks. If
+# the queue is created with a timing log, the workers append their timing
+# records to the timing logs of the suite instead (see scaling.timing_log).
+# A claim is a lease: while executing a task, the worker refreshes the
+# modification time of its claimed task file, and any worker on any host can
+# requeue a claim that has not been refreshed for longer than the lease
+
+import errno
+from os import listdir, makedirs, rename, kill, getpid, utime
+from signal import SIGINT
+from os.path import join, exists, getmtime
+from multiprocessing.pool import ThreadPool
+from shutil import rmtree
+from socket import gethostname
+from threading import Lock, Thread, Event
+from time import time
+from warnings import warn
+
+from scaling.util import RunOptions, Limits, ClaimedTask, EXECUTION_ORDERS
+from scaling.parse import parse_queue_cases_file
+from scaling.page_cache import posix_fadvise, CACHE_MODES
+from scaling.run_bench_suite import (get_execution_order,
+                                     write_execution_order_file,
+                                     make_suite_dirs, get_timing_dirs,
+                                     run_bench_case)
+
+QUEUE_DIR = "queue"
+PENDING_DIR = "pending"
+CLAIMED_DIR = "claimed"
+DONE_DIR = "done"
+CASES_FN = "cases.txt"
+# Present in the queue directory if the workers write to the timing logs
+TIMING_LOG_MARKER_FN = "timing_log"
+
+# The claimed task files are named <task>@<worker id>
+CLAIM_SEP = "@"
+
+# Seconds since the last refresh of a claim after which its worker is
+# considered dead and the task can be requeued by any worker. The clocks of
+# the hosts sharing the queue should agree to well within this time
+CLAIM_LEASE = 600.0
+# Number of times the running workers refresh their claims within a lease
+HEARTBEATS_PER_LEASE = 4
+
+# Seconds between the checks of the main thread of a worker for interrupts
+INTERRUPT_CHECK_INTERVAL = 0.5
+
+
+def get_worker_id():
+    """Returns the id of the current worker: <host name>.<process id>"""
+    return "%s.%d" % (gethostname(), getpid())
+
+
+def write_queue_cases_file(cases_fp, cases):
+    """Writes the definition of the cases of a work queue
+
+    Parameters
+    ----------
+    cases_fp: string
+        Path to the cases file
+    cases: list of SuiteCase
+        The cases of the benchmark suite
+
+    Raises
+    ------
+    ValueError
+        If the name, output option, input files or command arguments of
+        some case contain tabs or new lines
+
+    See Also
+    --------
+    scaling.parse.parse_queue_cases_file
+    """
+    lines = ["#case\tout_opt\tnum_inputs\tinputs\tcmd"]
+    for case in cases:
+        inputs = case.inputs if case.inputs else []
+        values = ([case.name, case.out_opt, str(len(inputs))] + inputs +
+                  case.cmd)
+        if any('\t' in v or '\n' in v for v in values):
+            raise ValueError("The case %s cannot be written to the work "
+                             "queue: its values contain tabs or new lines"
+                             % case.name)
+        lines.append("\t".join(values))
+    with open(cases_fp, 'w') as f:
+        f.write("\n".join(lines))
+        f.write("\n")
+
+
+def make_work_queue(dest, cases, num_reps=1, order='sequential', seed=None,
+                    timing_log=False):
+    """Creates the work queue of a benchmark suite
+
+    The queue is created in a temporary directory and then renamed to
+    dest/queue, so the workers never see a partially written queue. The
+    suite directory structure and the execution order file are created as
+    the runner does
+
+    Parameters
+    ----------
+    dest: string
+        The benchmark suite output directory
+    cases: list of SuiteCase
+        The cases of the benchmark suite
+    num_reps: int, optional
+        Number of times each case should be executed
+    order: {'sequential', 'random', 'interleaved'}, optional
+        The order in which the workers claim the repetitions
+    seed: int, optional
+        Seed of the random order
+    timing_log: bool, optional
+        If True, the workers append the timing records to the timing logs of
+        the suite instead of writing a timing file per repetition
+
+    Returns
+    -------
+    string
+        The path to the queue directory
+
+    Raises
+    ------
+    ValueError
+        If num_reps is lower than 1, order is unknown, the suite already has
+        a work queue or a case cannot be written to the queue
+    """
+    if num_reps < 1:
+        raise ValueError("The number of repetitions should be at least 1")
+    if order not in EXECUTION_ORDERS:
+        raise ValueError("Unknown execution order: %s. Should be one of %s"
+                         % (order, ", ".join(EXECUTION_ORDERS)))
+    queue_dir = join(dest, QUEUE_DIR)
+    if exists(queue_dir):
+        raise ValueError("The work queue %s already exists" % queue_dir)
+    execution = get_execution_order(cases, num_reps, order, seed)
+
+    make_suite_dirs(dest, cases, timing_log)
+    tmp_dir = join(dest, "%s.tmp%d" % (QUEUE_DIR, getpid()))
+    try:
+        for sub_dir in [PENDING_DIR, CLAIMED_DIR, DONE_DIR]:
+            makedirs(join(tmp_dir, sub_dir))
+        write_queue_cases_file(join(tmp_dir, CASES_FN), cases)
+        if timing_log:
+            open(join(tmp_dir, TIMING_LOG_MARKER_FN), 'w').close()
+        # The workers claim the tasks in the order of their names
+        for i, (case, rep) in enumerate(execution):
+            with open(join(tmp_dir, PENDING_DIR, "%08d" % i), 'w') as f:
+                f.write("%s\t%d\n" % (case.name, rep))
+        rename(tmp_dir, queue_dir)
+    finally:
+        if exists(tmp_dir):
+            rmtree(tmp_dir, ignore_errors=True)
+    write_execution_order_file(dest, order, seed, execution)
+    return queue_dir
+
+
+def load_queue_cases(queue_dir):
+    """Returns the cases of a work queue
+
+    Parameters
+    ----------
+    queue_dir: string
+        The queue directory
+
+    Returns
+    -------
+    list of SuiteCase
+        The cases of the benchmark suite
+    """
+    with open(join(queue_dir, CASES_FN), 'U') as f:
+        return parse_queue_cases_file(f)
+
+
+def claim_task(queue_dir, worker_id):
+    """Atomically claims the next pending task of a work queue
+
+    Parameters
+    ----------
+    queue_dir: string
+        The queue directory
+    worker_id: string
+        The id of the worker claiming the task
+
+    Returns
+    -------
+    ClaimedTask or None
+        The claimed task, or None if there are no pending tasks
+    """
+    pending_dir = join(queue_dir, PENDING_DIR)
+    for name in sorted(listdir(pending_dir)):
+        claim_fp = join(queue_dir, CLAIMED_DIR,
+                        "%s%s%s" % (name, CLAIM_SEP, worker_id))
+        try:
+            rename(join(pending_dir, name), claim_fp)
+            # The renamed file keeps the modification time of the pending
+            # task file, so the lease starts now
+            utime(claim_fp, None)
+            with open(claim_fp, 'U') as f:
+                case, rep = f.read().strip().split('\t')
+        except (OSError, IOError) as e:
+            # Another worker claimed the task first
+            if e.errno == errno.ENOENT:
+                continue
+            raise
+        return ClaimedTask(name, case, int(rep), claim_fp)
+    return None
+
+
+def release_task(queue_dir, task):
+    """Returns a claimed task to the pending directory of the work queue
+
+    Parameters
+    ----------
+    queue_dir: string
+        The queue directory
+    task: ClaimedTask
+        The task to release
+
+    Returns
+    -------
+    bool
+        False if the claim had already been requeued by another worker
+    """
+    try:
+        rename(task.claim_fp, join(queue_dir, PENDING_DIR, task.name))
+    except OSError as e:
+        if e.errno == errno.ENOENT:
+            return False
+        raise
+    return True
+
+
+def complete_task(queue_dir, task, worker_id, exit_status, start, end):
+    """Moves a claimed task to the done directory of the work queue
+
+    The done task file has a single tab delimited line with the case, the
+    repetition, the id of the worker that executed it, the exit status of
+    the command and its start and end times. The claim is moved before the
+    line is written, so a claim requeued by another worker (see
+    requeue_dead_claims) is never recreated: the task stays pending and the
+    execution is not recorded
+
+    Parameters
+    ----------
+    queue_dir: string
+        The queue directory
+    task: ClaimedTask
+        The executed task
+    worker_id: string
+        The id of the worker that executed the task
+    exit_status: int
+        The exit status of the command
+    start, end: float
+        The start and end times of the execution, in seconds since the epoch
+
+    Returns
+    -------
+    bool
+        False if the claim had already been requeued by another worker
+    """
+    done_fp = join(queue_dir, DONE_DIR, task.name)
+    try:
+        rename(task.claim_fp, done_fp)
+    except OSError as e:
+        if e.errno == errno.ENOENT:
+            return False
+        raise
+    # The done task file is replaced at once, so it is never seen partially
+    # written
+    tmp_fp = "%s%s%s" % (done_fp, CLAIM_SEP, worker_id)
+    with open(tmp_fp, 'w') as f:
+        f.write("%s\t%d\t%s\t%d\t%.6f\t%.6f\n" % (task.case, task.rep,
+                                                  worker_id, exit_status,
+                                                  start, end))
+    rename(tmp_fp, done_fp)
+    return True
+
+
+def _is_alive(pid):
+    """Returns whether the process pid is running on this host"""
+    try:
+        kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
+
+
+class ClaimHeartbeat(Thread):
+    """Refreshes the modification time of the claims of a running worker
+
+    Parameters
+    ----------
+    interval: float
+        Seconds between the refreshes of the claims
+    """
+    def __init__(self, interval):
+        super(ClaimHeartbeat, self).__init__()
+        self.daemon = True
+        self.interval = interval
+        self._claims = set()
+        self._lock = Lock()
+        self._done = Event()
+
+    def add(self, claim_fp):
+        """Starts refreshing the claimed task file claim_fp"""
+        with self._lock:
+            self._claims.add(claim_fp)
+
+    def remove(self, claim_fp):
+        """Stops refreshing the claimed task file claim_fp"""
+        with self._lock:
+            self._claims.discard(claim_fp)
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            with self._lock:
+                claims = list(self._claims)
+            for claim_fp in claims:
+                try:
+                    utime(claim_fp, None)
+                except OSError:
+                    # The task has just been completed or released
+                    pass
+
+    def stop(self):
+        """Stops refreshing the claims and waits for the thread to end"""
+        self._done.set()
+        self.join()
+
+
+def requeue_dead_claims(queue_dir, lease=CLAIM_LEASE):
+    """Returns to the pending directory the tasks of dead workers
+
+    A claim is dead if it has not been refreshed for longer than lease
+    seconds, whatever the host of its worker, or if its worker ran on the
+    current host and is no longer running
+
+    Parameters
+    ----------
+    queue_dir: string
+        The queue directory
+    lease: float, optional
+        Seconds since the last refresh of a claim after which it is dead
+
+    Returns
+    -------
+    list of strings
+        The names of the requeued tasks
+    """
+    host = gethostname()
+    claimed_dir = join(queue_dir, CLAIMED_DIR)
+    requeued = []
+    for claim in sorted(listdir(claimed_dir)):
+        name, _, worker_id = claim.partition(CLAIM_SEP)
+        worker_host, _, pid = worker_id.rpartition('.')
+        if worker_host != host or not pid.isdigit() or _is_alive(int(pid)):
+            try:
+                expired = time() - getmtime(join(claimed_dir, claim)) > lease
+            except OSError as e:
+                # The task has just been completed or released
+                if e.errno == errno.ENOENT:
+                    continue
+                raise
+            if not expired:
+                continue
+        try:
+            rename(join(queue_dir, CLAIMED_DIR, claim),
+                   join(queue_dir, PENDING_DIR, name))
+        except OSError as e:
+            # Another worker requeued it first
+            if e.errno == errno.ENOENT:
+                continue
+            raise
+        requeued.append(name)
+    return requeued
+
+
+def _release_task(queue_dir, task):
+    """Releases a task, warning instead of raising if it cannot be done"""
+    try:
+        release_task(queue_dir, task)
+    except OSError as e:
+        warn("The task %s cannot be requeued: %s. It is requeued as dead "
+             "once its claim expires" % (task.name, e), RuntimeWarning)
+
+
+def _get_exit_status(record):
+    """Returns the exit status of a TimingRecord, as the shell reports it"""
+    return 128 + record.signal if record.signal else record.status
+
+
+def run_worker(dest, jobs=1, max_tasks=None, sample_interval=None,
+               timeout=None, max_rss=None, max_vmem=None, cache_mode=None,
+               worker_id=None, claim_lease=CLAIM_LEASE):
+    """Executes the pending tasks of the work queue of a benchmark suite
+
+    The worker claims the pending tasks one at a time, executes them and
+    writes their timing files under dest/timing (or appends their records to
+    the timing logs, if the queue uses them), until the queue has no
+    pending tasks. The claims of the worker are refreshed while their tasks
+    run. Before starting, and once no tasks are pending, the tasks of dead
+    workers are requeued (see requeue_dead_claims). The tasks that fail
+    with an error, or whose command is killed by SIGINT, are requeued.
+
+    If the worker is interrupted (e.g. with Ctrl-C), it stops claiming
+    tasks, waits for the running ones and raises KeyboardInterrupt. The
+    commands that run in the foreground process group receive the SIGINT
+    too, so their tasks are requeued. A second interrupt stops the worker
+    at once, and its claims are requeued by the next worker as dead
+
+    Parameters
+    ----------
+    dest: string
+        The benchmark suite output directory, with a work queue created by
+        make_work_queue
+    jobs: int, optional
+        Number of tasks executed concurrently by the worker
+    max_tasks: int, optional
+        Maximum number of tasks executed by the worker. Defaults to execute
+        tasks until the queue has no pending tasks
+    sample_interval: float, optional
+        If provided, the memory and CPU usage of each command are sampled
+        every sample_interval seconds and stored in dest/timelines
+    timeout: float, optional
+        Maximum number of seconds each command can run
+    max_rss: int, optional
+        Maximum RSS, in KB, of the process tree of each command
+    max_vmem: int, optional
+        Maximum virtual memory, in KB, of each process (RLIMIT_AS)
+    cache_mode: {'cold', 'warm', 'both'}, optional
+        The page cache state of the input files of each case
+    worker_id: string, optional
+        The id of the worker. Defaults to <host name>.<process id>
+    claim_lease: float, optional
+        Seconds since the last refresh of a claim after which any worker can
+        requeue its task
+
+    Returns
+    -------
+    list of (string, int)
+        The (case, repetition) pairs executed by the worker, in completion
+        order
+
+    Raises
+    ------
+    ValueError
+        If dest does not have a work queue, jobs or max_tasks are lower than
+        1, sample_interval, claim_lease or any limit are not positive,
+        cache_mode is unknown or the files cannot be evicted from the page
+        cache
+    KeyboardInterrupt
+        If the worker or a command is interrupted
+    """
+    queue_dir = join(dest, QUEUE_DIR)
+    if not exists(join(queue_dir, CASES_FN)):
+        raise ValueError("%s does not have a work queue" % dest)
+    if jobs < 1:
+        raise ValueError("The number of jobs should be at least 1")
+    if max_tasks is not None and max_tasks < 1:
+        raise ValueError("The maximum number of tasks should be at least 1")
+    if sample_interval is not None and sample_interval <= 0:
+        raise ValueError("The sampling interval should be greater than 0")
+    if claim_lease <= 0:
+        raise ValueError("The claim lease should be greater than 0")
+    limits = Limits(timeout, max_rss, max_vmem)
+    if any(limit is not None and limit <= 0 for limit in limits):
+        raise ValueError("The limits should be greater than 0")
+    if cache_mode is not None:
+        if cache_mode not in CACHE_MODES:
+            raise ValueError("Unknown cache mode: %s. Should be one of %s"
+                             % (cache_mode, ", ".join(CACHE_MODES)))
+        if cache_mode != 'warm' and posix_fadvise is None:
+            raise ValueError("posix_fadvise is not available, the input "
+                             "files cannot be evicted from the page cache")
+    run_opts = RunOptions(sample_interval, None, False, limits, cache_mode,
+                          exists(join(queue_dir, TIMING_LOG_MARKER_FN)))
+    if worker_id is None:
+        worker_id = get_worker_id()
+
+    cases = dict((case.name, case) for case in load_queue_cases(queue_dir))
+    requeue_dead_claims(queue_dir, claim_lease)
+    executed = []
+    lock = Lock()
+    # Number of tasks that can still be claimed by the worker
+    remaining = [max_tasks]
+    interrupted = Event()
+
+    def work(_):
+        while True:
+            with lock:
+                if remaining[0] == 0 or interrupted.is_set():
+                    return
+                task = claim_task(queue_dir, worker_id)
+                if (task is None and
+                        requeue_dead_claims(queue_dir, claim_lease)):
+                    task = claim_task(queue_dir, worker_id)
+                if task is None:
+                    return
+                if remaining[0] is not None:
+                    remaining[0] -= 1
+                heartbeat.add(task.claim_fp)
+            try:
+                if task.case not in cases:
+                    raise ValueError("Unknown case in the work queue: %s"
+                                     % task.case)
+                start = time()
+                record = run_bench_case(dest, cases[task.case], task.rep,
+                                        run_opts)
+                end = time()
+            except BaseException:
+                heartbeat.remove(task.claim_fp)
+                _release_task(queue_dir, task)
+                raise
+            heartbeat.remove(task.claim_fp)
+            if record.signal == SIGINT:
+                # The command was interrupted along with the worker
+                interrupted.set()
+                _release_task(queue_dir, task)
+                return
+            if not complete_task(queue_dir, task, worker_id,
+                                 _get_exit_status(record), start, end):
+                warn("The claim of %s was requeued while it ran: its "
+                     "repetition %d of case %s is executed again"
+                     % (task.name, task.rep, task.case), RuntimeWarning)
+                continue
+            with lock:
+                executed.append((task.case, task.rep))
+
+    heartbeat = ClaimHeartbeat(claim_lease / HEARTBEATS_PER_LEASE)
+    heartbeat.start()
+    pool = ThreadPool(jobs)
+    result = pool.map_async(work, range(jobs), chunksize=1)
+    try:
+        try:
+            # Waiting with a timeout lets the main thread get the interrupts
+            while not result.ready():
+                result.wait(INTERRUPT_CHECK_INTERVAL)
+        except KeyboardInterrupt:
+            interrupted.set()
+            while not result.ready():
+                result.wait(INTERRUPT_CHECK_INTERVAL)
+    except KeyboardInterrupt:
+        # Interrupted again: the running commands are not waited for
+        pool.terminate()
+        heartbeat.stop()
+        raise
+    pool.close()
+    pool.join()
+    heartbeat.stop()
+    # Raises the error of any task
+    result.get()
+    if interrupted.is_set():
+        raise KeyboardInterrupt
+    return executed
+
+
+def get_queue_timing_dirs(dest):
+    """Returns the timing directories of a suite executed by workers
+
+    Parameters
+    ----------
+    dest: string
+        The benchmark suite output directory
+
+    Returns
+    -------
+    list of strings
+        The timing directories to process with process-bench-results
+    """
+    return get_timing_dirs(dest, load_queue_cases(join(dest, QUEUE_DIR)))
@@ -0,0 +1,27 @@
+#!/bin/bash
+
+# Check if the user has provided a command to execute
+if [[ $# -le 1 ]]; then
+	echo "USAGE: sentinel_wrapper.sh sentinel_fp command [command args]"
+	exit 1
+fi
+
+# Get the path of the sentinel, without extension
+sentinel_fp=$1
+shift
+
+# Execute the command, recording its start and end times
+start=`date +%s.%N`
+"$@"
+status=$?
+end=`date +%s.%N`
+
+# Write the sentinel with the format
+#   <exit status>\t<start time>\t<end time>\t<host>
+# to a temporary file and rename it, so the sentinel appears atomically and
+# the waiter never reads a partial file
+printf "%s\t%s\t%s\t%s\n" $status $start $end `hostname` \
+	> $sentinel_fp.done.tmp
+mv $sentinel_fp.done.tmp $sentinel_fp.done
+
+exit $status
@@ -36,6 +36,8 @@ fi
 #
 #  We use this output format because it is easy to parse
 /usr/bin/time -o $output_fp -f"%e;%U;%S;%M" $cmd $args
+# time exits with the exit status of the command
+status=$?
 
 # Check if the command cmd has finished correctly
 #  If cmd has finished on success, the time output file will
@@ -46,4 +48,6 @@ fi
 lines=`cat $output_fp | wc -l`
 if [[ $lines -ne 1 ]]; then
 	echo "The command has not finished correctly."
-fi
\ No newline at end of file
+fi
+
+exit $status